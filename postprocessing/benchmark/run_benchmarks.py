@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+"""
+# Offline benchmarks for comstockpostproc.
+- - - - - - - - -
+Generates a synthetic ComStock run (see synthetic_data.py) and times the main postprocessing steps:
+loading and transforming results, national scaling, savings columns, exports, and measure comparison plots.
+No S3 or Athena access is required. Results are written to output/benchmarks as a JSON file per run
+and appended to benchmark_history.csv so timings can be tracked over time.
+
+Example:
+    python run_benchmarks.py --buildings 10000 --upgrades 2 --repeats 3
+"""
+
+import argparse
+import copy
+import csv
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+import types
+
+import pandas as pd
+import polars as pl
+
+import comstockpostproc as cspp
+from synthetic_data import SyntheticComStockRun
+
+logging.basicConfig(level='WARNING')
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+POSTPROC_DIR = os.path.join(CURRENT_DIR, '..')
+TRUTH_DATA_VERSION = 'synthetic'
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=CURRENT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_call(func, repeats=1, setup=None):
+    # Run func repeats times, calling setup() before each run, and return timing statistics in seconds
+    times = []
+    for _ in range(repeats):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        if setup is not None:
+            func(arg)
+        else:
+            func()
+        times.append(time.perf_counter() - start)
+    return {
+        'repeats': repeats,
+        'median_s': statistics.median(times),
+        'min_s': min(times),
+        'max_s': max(times),
+    }
+
+
+def make_comstock(run_version, profile_pipeline=False):
+    return cspp.ComStock(
+        s3_base_dir=None,
+        comstock_run_name=run_version,
+        comstock_run_version=run_version,
+        comstock_year=2018,
+        athena_table_name=None,
+        truth_data_version=TRUTH_DATA_VERSION,
+        buildstock_csv_name='buildstock.csv',
+        acceptable_failure_percentage=0.05,
+        drop_failed_runs=True,
+        skip_missing_columns=True,
+        reload_from_csv=False,
+        include_upgrades=True,
+        make_timeseries_plots=False,
+        profile_pipeline=profile_pipeline
+        )
+
+
+def run_benchmarks(n_buildings, n_upgrades, repeats, seed, skip_plots, plot_workers=1):
+    results = {}
+    run_version = f'synthetic_{n_buildings}x{n_upgrades}'
+    data_dir = os.path.join(POSTPROC_DIR, 'comstock_data', run_version)
+    truth_data_dir = os.path.join(POSTPROC_DIR, 'truth_data', TRUTH_DATA_VERSION)
+
+    # Generate the synthetic run
+    synth = SyntheticComStockRun(n_buildings=n_buildings, n_upgrades=n_upgrades, seed=seed)
+    results['generate_synthetic_data'] = time_call(lambda: synth.write(data_dir, truth_data_dir))
+
+    # Load and transform, with a per-stage breakdown from the pipeline profiler
+    results['load_data_pipeline'] = time_call(lambda: make_comstock(run_version), repeats=repeats)
+    comstock = make_comstock(run_version, profile_pipeline=True)
+    stage_times = {s['stage']: s['wall_time_s'] for s in comstock.profiler.stages}
+    results['load_data_pipeline']['stages_s'] = stage_times
+    loaded_data = comstock.data.clone()
+
+    # National scaling, without the savings columns which are timed separately below
+    cbecs = types.SimpleNamespace(data=synth.generate_cbecs_floor_area(
+        weighted_area_col=comstock.col_name_to_weighted(comstock.FLR_AREA), bldg_type_col=comstock.BLDG_TYPE))
+
+    def reset_data():
+        comstock.data = loaded_data.clone()
+        return comstock
+
+    def national_scaling(cs):
+        cs.include_upgrades = False
+        cs.add_national_scaling_weights(copy.deepcopy(cbecs), remove_non_comstock_bldg_types_from_cbecs=True)
+        cs.include_upgrades = True
+
+    results['national_scaling'] = time_call(national_scaling, repeats=repeats, setup=reset_data)
+    scaled_data = comstock.data.clone()
+
+    # Savings columns
+    def reset_scaled_data():
+        comstock.data = scaled_data.clone()
+        return comstock
+
+    results['energy_savings_columns'] = time_call(
+        lambda cs: cs.add_weighted_energy_savings_columns(), repeats=repeats, setup=reset_scaled_data)
+    results['utility_savings_columns'] = time_call(
+        lambda cs: cs.add_weighted_utility_savings_columns(), repeats=repeats, setup=reset_scaled_data)
+    comstock.add_weighted_energy_savings_columns()
+    comstock.add_weighted_utility_savings_columns()
+    final_data = comstock.data.clone()
+
+    # Exports
+    def reset_final_data():
+        comstock.data = final_data.clone()
+        return comstock
+
+    results['export_to_parquet_wide'] = time_call(
+        lambda cs: cs.export_to_parquet_wide(), repeats=repeats, setup=reset_final_data)
+    results['export_to_csv_wide'] = time_call(
+        lambda cs: cs.export_to_csv_wide(), repeats=repeats, setup=reset_final_data)
+
+    # Representative plots, rendered once because they dominate total runtime
+    if not skip_plots:
+        comstock.data = final_data.clone()
+        results['measure_comparison_plots'] = time_call(
+            lambda: cspp.ComStockMeasureComparison(comstock, states={}, make_comparison_plots=True, make_timeseries_plots=False,
+                                                   max_plot_workers=plot_workers))
+
+    return results
+
+
+def write_results(results, n_buildings, n_upgrades, repeats, seed):
+    output_dir = os.path.join(POSTPROC_DIR, 'output', 'benchmarks')
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    run_info = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'comstockpostproc_version': cspp.__version__,
+        'python': platform.python_version(),
+        'polars': pl.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'n_buildings': n_buildings,
+        'n_upgrades': n_upgrades,
+        'repeats': repeats,
+        'seed': seed,
+    }
+
+    # Full results for this run
+    stamp = run_info['timestamp'].replace(':', '-')
+    file_path = os.path.join(output_dir, f'benchmark_{n_buildings}x{n_upgrades}_{stamp}.json')
+    with open(file_path, 'w') as f:
+        json.dump({'run_info': run_info, 'results': results}, f, indent=2)
+
+    # One row per benchmark appended to the history file for tracking over time
+    history_path = os.path.join(output_dir, 'benchmark_history.csv')
+    fieldnames = list(run_info.keys()) + ['benchmark', 'median_s', 'min_s', 'max_s']
+    write_header = not os.path.exists(history_path)
+    with open(history_path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        if write_header:
+            writer.writeheader()
+        for name, res in results.items():
+            row = dict(run_info)
+            row.update({'benchmark': name, 'median_s': res['median_s'], 'min_s': res['min_s'], 'max_s': res['max_s']})
+            writer.writerow(row)
+
+    # Stable, fixed-width summary for the console
+    print(f"comstockpostproc benchmarks: {n_buildings} buildings x {n_upgrades} upgrades, {repeats} repeats, commit {run_info['git_commit']}")
+    for name, res in results.items():
+        print(f"{name:<32} median {res['median_s']:>9.3f} s  min {res['min_s']:>9.3f} s  max {res['max_s']:>9.3f} s")
+        for stage, t in res.get('stages_s', {}).items():
+            print(f"    {stage:<50} {t:>9.3f} s")
+    print(f'Results written to {file_path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run offline comstockpostproc benchmarks on synthetic data.')
+    parser.add_argument('--buildings', type=int, default=10000, help='Number of buildings per upgrade')
+    parser.add_argument('--upgrades', type=int, default=2, help='Number of upgrades in addition to the baseline')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of times to repeat each timed step')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data')
+    parser.add_argument('--skip-plots', action='store_true', help='Skip the measure comparison plot benchmark')
+    parser.add_argument('--plot-workers', type=int, default=1, help='Number of processes used to render plots, -1 for all CPUs')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.buildings, args.upgrades, args.repeats, args.seed, args.skip_plots, args.plot_workers)
+    write_results(results, args.buildings, args.upgrades, args.repeats, args.seed)
+
+
+# Code to execute the script
+if __name__=="__main__":
+    main()
@@ -0,0 +1,273 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+"""
+# Synthetic ComStock results generator.
+- - - - - - - - -
+Writes results_up*.parquet, buildstock.csv, and the small truth data files needed by
+comstockpostproc.ComStock, using comstock_column_definitions.csv and
+comstock_enumeration_definitions.csv to determine the columns and their values.
+The generated data has realistic column names, dtypes, and categorical domains,
+but the numeric values are random and not physically meaningful.
+It is intended only for benchmarking the postprocessing code without S3 or Athena access.
+"""
+
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESOURCE_DIR = os.path.join(CURRENT_DIR, '..', 'comstockpostproc', 'resources')
+COLUMN_DEFINITION_FILE_NAME = 'comstock_column_definitions.csv'
+ENUM_DEFINITION_FILE_NAME = 'comstock_enumeration_definitions.csv'
+HVAC_METADATA_FILE_NAME = 'hvac_metadata.csv'
+
+BUILDING_TYPES = [
+    'FullServiceRestaurant', 'QuickServiceRestaurant', 'RetailStripmall', 'RetailStandalone',
+    'SmallOffice', 'MediumOffice', 'LargeOffice', 'PrimarySchool', 'SecondarySchool',
+    'Outpatient', 'Hospital', 'SmallHotel', 'LargeHotel', 'Warehouse'
+]
+
+# State abbreviation, state name, FIPS code, census division, census region
+STATES = [
+    ('CO', 'Colorado', '08', 'Mountain', 'West'),
+    ('CA', 'California', '06', 'Pacific', 'West'),
+    ('TX', 'Texas', '48', 'West South Central', 'South'),
+    ('FL', 'Florida', '12', 'South Atlantic', 'South'),
+    ('NY', 'New York', '36', 'Middle Atlantic', 'Northeast'),
+    ('MA', 'Massachusetts', '25', 'New England', 'Northeast'),
+    ('IL', 'Illinois', '17', 'East North Central', 'Midwest'),
+    ('MN', 'Minnesota', '27', 'West North Central', 'Midwest'),
+    ('TN', 'Tennessee', '47', 'East South Central', 'South'),
+]
+
+CLIMATE_ZONES = ['1A', '2A', '2B', '3A', '3B', '3C', '4A', '4B', '4C', '5A', '5B', '6A', '6B', '7', '8']
+
+# Known categorical domains for columns that the pipeline maps or parses
+KNOWN_DOMAINS = {
+    'build_existing_model.create_bar_from_building_type_ratios_bldg_type_a': BUILDING_TYPES,
+    'build_existing_model.building_subtype': ['NA', 'strip_mall_restaurant0', 'strip_mall_restaurant20',
+                                              'largeoffice_datacenter', 'largeoffice_nodatacenter'],
+    'build_existing_model.heating_fuel': ['NaturalGas', 'Electricity', 'FuelOil', 'Propane', 'DistrictHeating'],
+    'build_existing_model.service_water_heating_fuel': ['NaturalGas', 'Electricity', 'FuelOil', 'Propane'],
+    'build_existing_model.number_stories': ['1', '2', '3', '4_7', '8_12'],
+    'climate_zone_ashrae_2006': CLIMATE_ZONES,
+    'climate_zone_building_america': ['Cold', 'Hot-Dry', 'Hot-Humid', 'Marine', 'Mixed-Humid', 'Very Cold'],
+    'iso_region': ['CAISO', 'ERCOT', 'MISO', 'NYISO', 'PJM', 'SPP', 'ISONE', 'None'],
+}
+
+
+class SyntheticComStockRun():
+    def __init__(self, n_buildings=1000, n_upgrades=2, seed=42, applicable_fraction=0.8, failure_fraction=0.0, n_tracts=200):
+        """
+        A class to generate a synthetic ComStock run for offline benchmarking.
+        Args:
+
+            n_buildings (int): Number of buildings (rows) in each results_up*.parquet
+            n_upgrades (int): Number of upgrades in addition to the baseline
+            seed (int): Random seed, so that repeated runs produce identical data
+            applicable_fraction (float): 0-1 fraction of buildings an upgrade applies to
+            failure_fraction (float): 0-1 fraction of simulations marked as failed in each upgrade
+            n_tracts (int): Number of distinct census tracts to assign buildings to
+        """
+        self.n_buildings = n_buildings
+        self.n_upgrades = n_upgrades
+        self.seed = seed
+        self.applicable_fraction = applicable_fraction
+        self.failure_fraction = failure_fraction
+        self.n_tracts = n_tracts
+
+        # Column definitions used to decide which columns to generate
+        col_defs = pl.read_csv(os.path.join(RESOURCE_DIR, COLUMN_DEFINITION_FILE_NAME))
+        self.col_defs = col_defs.filter(
+            (pl.col('full_metadata') == True) & (~pl.col('location').is_in(['calculated', 'timeseries'])))
+
+        # Generic string values come from the enumeration definitions
+        enums = pl.read_csv(os.path.join(RESOURCE_DIR, ENUM_DEFINITION_FILE_NAME))
+        self.enumerations = enums.get_column('enumeration').drop_nulls().to_list()
+
+        # HVAC system types must map to known ventilation/heating/cooling combinations
+        hvac = pd.read_csv(os.path.join(RESOURCE_DIR, HVAC_METADATA_FILE_NAME), na_filter=False)
+        self.hvac_system_types = hvac['system_type'].tolist()
+
+    def _cols(self, location, data_type=None):
+        df = self.col_defs.filter(pl.col('location') == location)
+        if data_type is not None:
+            df = df.filter(pl.col('data_type') == data_type)
+        return df.get_column('original_col_name').to_list()
+
+    def _tracts(self, rng):
+        # Census tracts in nhgis gisjoin format G{state}0{county}0{tract} and census ID format {state}{county}{tract}
+        state_idx = rng.integers(0, len(STATES), self.n_tracts)
+        counties = rng.integers(1, 200, self.n_tracts)
+        tracts = rng.integers(100, 999999, self.n_tracts)
+        census_ids = [f'{STATES[s][2]}{c:03d}{t:06d}' for s, c, t in zip(state_idx, counties, tracts)]
+        gisjoins = [f'G{i[0:2]}0{i[2:5]}0{i[5:11]}' for i in census_ids]
+        return state_idx, census_ids, gisjoins
+
+    def generate_buildstock(self):
+        # Building characteristics that are read from buildstock.csv
+        rng = np.random.default_rng(self.seed)
+        n = self.n_buildings
+        state_idx, census_ids, gisjoins = self._tracts(rng)
+        bldg_tract = rng.integers(0, self.n_tracts, n)
+        bldg_state = state_idx[bldg_tract]
+
+        cols = {'Building': np.arange(1, n + 1)}
+        for c in self._cols('buildstock.csv'):
+            if c == 'nhgis_tract_gisjoin':
+                cols[c] = [gisjoins[i] for i in bldg_tract]
+            elif c == 'nhgis_county_gisjoin':
+                cols[c] = [gisjoins[i][0:8] for i in bldg_tract]
+            elif c == 'nhgis_puma_gisjoin':
+                cols[c] = [f'{gisjoins[i][0:4]}{i % 50:05d}' for i in bldg_tract]
+            elif c == 'resstock_county_id':
+                cols[c] = [f'{STATES[s][0]}, County {i % 200}' for s, i in zip(bldg_state, bldg_tract)]
+            elif c == 'state_abbreviation':
+                cols[c] = [STATES[s][0] for s in bldg_state]
+            elif c == 'state_name':
+                cols[c] = [STATES[s][1] for s in bldg_state]
+            elif c == 'census_division_name':
+                cols[c] = [STATES[s][3] for s in bldg_state]
+            elif c == 'census_region_name':
+                cols[c] = [STATES[s][4] for s in bldg_state]
+            elif c == 'year_built':
+                cols[c] = rng.integers(1900, 2019, n)
+            elif c == 'cluster_id':
+                cols[c] = rng.integers(1, 100, n)
+            elif c == 'airtightness':
+                cols[c] = rng.uniform(0.5, 3.0, n).round(3)
+            elif c in KNOWN_DOMAINS:
+                cols[c] = rng.choice(KNOWN_DOMAINS[c], n)
+            else:
+                cols[c] = rng.choice(self.enumerations[:20], n)
+
+        return pl.DataFrame(cols)
+
+    def generate_results(self, upgrade_id):
+        # Annual results for the baseline (upgrade_id=0) or an upgrade
+        base_rng = np.random.default_rng(self.seed)
+        rng = np.random.default_rng(self.seed + 1000 + upgrade_id)
+        n = self.n_buildings
+
+        cols = {}
+        for c in self._cols('results.csv'):
+            dt = self.col_defs.filter(pl.col('original_col_name') == c).get_column('data_type')[0]
+            if c == 'building_id':
+                cols[c] = np.arange(1, n + 1)
+            elif c == 'upgrade':
+                cols[c] = np.full(n, upgrade_id)
+            elif c == 'completed_status':
+                cols[c] = np.full(n, 'Success', dtype=object)
+            elif c == 'apply_upgrade.upgrade_name':
+                cols[c] = np.full(n, f'Synthetic Upgrade {upgrade_id:02d}', dtype=object)
+            elif c == 'build_existing_model.create_typical_building_from_model_system_type':
+                cols[c] = base_rng.choice(self.hvac_system_types, n)
+            elif c == 'build_existing_model.create_bar_from_building_type_ratios_total_bldg_floor_area':
+                cols[c] = np.exp(base_rng.normal(9.5, 1.2, n)).round(0)
+            elif c in KNOWN_DOMAINS:
+                cols[c] = base_rng.choice(KNOWN_DOMAINS[c], n)
+            elif dt == 'float':
+                # Baseline values are shared across upgrades so that savings are realistic
+                vals = np.exp(base_rng.normal(8.0, 1.5, n))
+                if upgrade_id > 0:
+                    vals = vals * rng.uniform(0.6, 1.05, n)
+                cols[c] = vals
+            elif dt == 'integer':
+                cols[c] = base_rng.integers(1, 100, n)
+            elif dt == 'boolean':
+                cols[c] = base_rng.random(n) < 0.5
+            elif 'rate_name' in c:
+                cols[c] = base_rng.choice(['Synthetic Rate A', 'Synthetic Rate B', 'Synthetic Rate C'], n)
+            else:
+                cols[c] = base_rng.choice(self.enumerations[:20], n)
+
+        # Upgrade applicability and failures
+        if upgrade_id == 0:
+            applicable = np.full(n, True)
+        else:
+            applicable = rng.random(n) < self.applicable_fraction
+            cols['completed_status'] = np.where(applicable, 'Success', 'Invalid').astype(object)
+        if self.failure_fraction > 0:
+            failed = rng.random(n) < self.failure_fraction
+            cols['completed_status'] = np.where(failed, 'Fail', cols['completed_status']).astype(object)
+        cols['apply_upgrade.applicable'] = applicable
+
+        return pl.DataFrame(cols)
+
+    def generate_ejscreen(self):
+        rng = np.random.default_rng(self.seed)
+        _, census_ids, _ = self._tracts(rng)
+        cols = {'ID': census_ids}
+        for c in self._cols('ejscreen', 'float'):
+            cols[c] = rng.uniform(0, 100, len(census_ids)).round(1)
+        return pl.DataFrame(cols)
+
+    def generate_cejst(self):
+        rng = np.random.default_rng(self.seed)
+        _, census_ids, _ = self._tracts(rng)
+        cols = {'Census tract 2010 ID': census_ids}
+        for c in self._cols('cejst', 'boolean'):
+            cols[c] = np.where(rng.random(len(census_ids)) < 0.3, 'True', 'False')
+        return pl.DataFrame(cols)
+
+    def generate_egrid(self):
+        rng = np.random.default_rng(self.seed)
+        return pl.DataFrame({
+            'State': [s[0] for s in STATES],
+            'total_output_emissions_rates_CO2e_lb_per_MWh': rng.uniform(200, 1800, len(STATES)).round(1),
+        })
+
+    def generate_cbecs_floor_area(self, weighted_area_col='calc.weighted.sqft', bldg_type_col='in.comstock_building_type'):
+        # Minimal CBECS-like table of weighted floor area by building type for national scaling
+        rng = np.random.default_rng(self.seed)
+        n = len(BUILDING_TYPES) * 20
+        return pl.DataFrame({
+            bldg_type_col: np.repeat(BUILDING_TYPES, 20),
+            weighted_area_col: rng.uniform(1e7, 1e9, n),
+        }).with_columns(pl.col(bldg_type_col).cast(pl.Categorical))
+
+    def write(self, data_dir, truth_data_dir, buildstock_csv_name='buildstock.csv'):
+        """
+        Writes the synthetic run to disk in the locations ComStock expects.
+        Args:
+
+            data_dir (str): Directory for results_up*.parquet and buildstock.csv, typically comstock_data/<run version>
+            truth_data_dir (str): Directory for the truth data files, typically truth_data/<truth data version>
+            buildstock_csv_name (str): File name of the buildstock.csv
+
+        Return:
+            list: paths of the files written
+        """
+        for p in [data_dir, truth_data_dir]:
+            if not os.path.exists(p):
+                os.makedirs(p)
+
+        file_paths = []
+
+        file_path = os.path.join(data_dir, buildstock_csv_name)
+        self.generate_buildstock().write_csv(file_path)
+        file_paths.append(file_path)
+
+        for upgrade_id in range(0, self.n_upgrades + 1):
+            file_path = os.path.join(data_dir, f'results_up{upgrade_id:02d}.parquet')
+            self.generate_results(upgrade_id).write_parquet(file_path)
+            file_paths.append(file_path)
+
+        truth_files = [
+            ('EJSCREEN_Tract_2020_USPR.csv', self.generate_ejscreen()),
+            ('1.0-communities.csv', self.generate_cejst()),
+            ('egrid_emissions_2019.csv', self.generate_egrid()),
+        ]
+        for file_name, df in truth_files:
+            file_path = os.path.join(truth_data_dir, file_name)
+            df.write_csv(file_path)
+            file_paths.append(file_path)
+
+        logger.info(f'Wrote synthetic run with {self.n_buildings} buildings and {self.n_upgrades} upgrades to {data_dir}')
+
+        return file_paths
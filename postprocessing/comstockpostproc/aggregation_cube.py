@@ -0,0 +1,184 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import logging
+import weakref
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from comstockpostproc.naming_mixin import NamingMixin
+
+logger = logging.getLogger(__name__)
+
+# Cubes keyed on id() of the row-level frame they were built from, see cube_for_frame()
+_CUBES = {}
+
+
+class AggregationCube(NamingMixin):
+    # Dimensions plots are commonly disaggregated by, in addition to the dataset or upgrade grouping column
+    DIMENSIONS = [
+        NamingMixin.CEN_DIV,
+        NamingMixin.BLDG_TYPE,
+        NamingMixin.VINTAGE,
+        NamingMixin.CZ_ASHRAE,
+        NamingMixin.HVAC_SYS,
+    ]
+
+    # Name of the measures added to every grouping set
+    COUNT = 'count'
+    APPLICABLE = 'calc.applicable_building'
+
+    # Quantiles stored for each group, fine enough to interpolate any other quantile
+    QUANTILE_GRID = np.linspace(0, 1, 101)
+
+    def __init__(self, df, column_for_grouping, value_cols=None):
+        """
+        Weighted sums, counts and quantile summaries of a row-level frame over the common plot dimensions.
+        Each grouping set is computed once, on first use, and reused by every plot made from the same frame.
+        Args:
+
+            df (Union[pd.DataFrame, pl.DataFrame]): Row-level data, one row per building per dataset or upgrade
+            column_for_grouping (str): Column the plots compare, like dataset or upgrade name
+            value_cols (list): Columns to sum. Defaults to every calc.weighted column and the building weight.
+        """
+        self.column_for_grouping = column_for_grouping
+        if value_cols is None:
+            value_cols = [c for c in df.columns if c.startswith('calc.weighted.') or c == self.BLDG_WEIGHT]
+        self.value_cols = value_cols
+        self.dimensions = [d for d in self.DIMENSIONS if d in df.columns and d != column_for_grouping]
+        self._sums = {}
+        self._quantiles = {}
+
+        # Weak reference so the cache in cube_for_frame() does not keep the frame alive
+        self._source = weakref.ref(df)
+
+        # Keep only keys and measures, in polars, so grouping is multi-threaded
+        keep_cols = [column_for_grouping] + self.dimensions + [c for c in self.value_cols if c in df.columns]
+        for c in [self.BLDG_ID, self.UPGRADE_NAME, self.UPGRADE_APPL]:
+            if c in df.columns and c not in keep_cols:
+                keep_cols.append(c)
+        if isinstance(df, pd.DataFrame):
+            self.data = pl.from_pandas(df[keep_cols])
+        else:
+            self.data = df.select(keep_cols)
+        self.data = self.data.with_columns(pl.col(pl.Categorical).cast(pl.Utf8))
+        self.data = self.data.with_columns(self._applicable_expr())
+
+    def _applicable_expr(self):
+        # Buildings applicable to any upgrade in this frame, including their baseline rows
+        cols = self.data.columns
+        if not all(c in cols for c in [self.BLDG_ID, self.UPGRADE_NAME, self.UPGRADE_APPL]):
+            return pl.lit(True).alias(self.APPLICABLE)
+        applic_bldgs = self.data.filter(
+            (pl.col(self.UPGRADE_NAME) != self.BASE_NAME) & (pl.col(self.UPGRADE_APPL) == True)
+        ).get_column(self.BLDG_ID).unique()
+        return pl.col(self.BLDG_ID).is_in(applic_bldgs).alias(self.APPLICABLE)
+
+    def _add_source_column(self, col):
+        # Row-level columns are copied from the source frame the first time a quantile summary needs them
+        if col in self.data.columns:
+            return
+        df = self._source()
+        if df is None:
+            logger.error(f'Cannot summarize {col}, the frame used to build this aggregation cube no longer exists')
+            raise Exception(f'Cannot summarize {col}, the frame used to build this aggregation cube no longer exists')
+        if isinstance(df, pd.DataFrame):
+            values = pl.Series(col, df[col].to_numpy())
+        else:
+            values = df.get_column(col)
+        self.data = self.data.with_columns(values)
+
+    def _keys(self, dims):
+        for d in dims:
+            if d not in self.data.columns:
+                logger.error(f'{d} is not a dimension of this aggregation cube')
+                raise Exception(f'{d} is not a dimension of this aggregation cube')
+        return [self.column_for_grouping] + list(dims)
+
+    def sums(self, dims=(), applicable_only=False):
+        """
+        Sums of the value columns and row counts by the grouping column and dims.
+        Args:
+
+            dims (tuple): Dimensions to disaggregate by, in addition to the grouping column
+            applicable_only (bool): If True, only include buildings applicable to an upgrade
+
+        Return:
+            pd.DataFrame: one row per group, sorted by the keys
+        """
+        dims = tuple(dims)
+        set_key = (dims, applicable_only)
+        if set_key not in self._sums:
+            keys = self._keys(dims)
+            data = self.data
+            if applicable_only:
+                data = data.filter(pl.col(self.APPLICABLE))
+            # Rows with missing keys are dropped, like pandas groupby
+            data = data.drop_nulls(subset=keys)
+            value_cols = [c for c in self.value_cols if c in data.columns]
+            agg = data.group_by(keys).agg(
+                [pl.col(c).fill_nan(None).sum() for c in value_cols] + [pl.len().alias(self.COUNT)]
+            ).sort(keys)
+            self._sums[set_key] = agg.to_pandas()
+        # Copy so plots can modify the result without changing the cube
+        return self._sums[set_key].copy()
+
+    def quantiles(self, col, dims=()):
+        """
+        Quantile summary of a row-level column by the grouping column and dims.
+        Args:
+
+            col (str): Column to summarize
+            dims (tuple): Dimensions to disaggregate by, in addition to the grouping column
+
+        Return:
+            pd.DataFrame: keys, 'quantile' and col, with len(QUANTILE_GRID) rows per group
+        """
+        dims = tuple(dims)
+        set_key = (col, dims)
+        if set_key not in self._quantiles:
+            keys = self._keys(dims)
+            self._add_source_column(col)
+            data = self.data.drop_nulls(subset=keys).select(keys + [pl.col(col).fill_nan(None)])
+            qs = self.QUANTILE_GRID
+            agg = data.group_by(keys).agg(
+                [pl.col(col).quantile(q, interpolation='linear').alias(f'q{i}') for i, q in enumerate(qs)]
+            ).sort(keys).to_pandas()
+            # Long format, one row per group and quantile
+            q_cols = [f'q{i}' for i in range(len(qs))]
+            summary = agg.loc[agg.index.repeat(len(qs)), keys].reset_index(drop=True)
+            summary['quantile'] = np.tile(qs, len(agg))
+            summary[col] = agg[q_cols].to_numpy().ravel()
+            self._quantiles[set_key] = summary
+        return self._quantiles[set_key].copy()
+
+    def quantile(self, col, q, dims=()):
+        # Interpolate quantile q of col for each group from the stored quantile summary
+        summary = self.quantiles(col, dims)
+        n = len(self.QUANTILE_GRID)
+        result = summary.loc[::n, self._keys(dims)].reset_index(drop=True)
+        result[col] = [np.interp(q, self.QUANTILE_GRID, v) for v in summary[col].to_numpy().reshape(-1, n)]
+        return result
+
+
+def cube_for_frame(df, column_for_grouping):
+    """
+    Returns the aggregation cube for a row-level frame, building it on first use.
+    Cubes are shared by every plot made from the same frame object and are released with the frame.
+    Args:
+
+        df (pd.DataFrame): Row-level data passed to the plot methods
+        column_for_grouping (str): Column the plots compare
+
+    Return:
+        AggregationCube: cube for df
+    """
+    key = (id(df), column_for_grouping)
+    if key in _CUBES:
+        ref, cube = _CUBES[key]
+        if ref() is df:
+            return cube
+    cube = AggregationCube(df, column_for_grouping)
+    _CUBES[key] = (weakref.ref(df, lambda _, key=key: _CUBES.pop(key, None)), cube)
+    return cube
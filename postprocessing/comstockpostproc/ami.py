@@ -27,22 +27,27 @@ import numpy as np
 import pandas as pd
 import polars as pl
 
+from joblib import Parallel, delayed
 from scipy import stats
+from comstockpostproc.ami_truth_store import AMITruthStore
 from comstockpostproc.naming_mixin import NamingMixin
 from comstockpostproc.units_mixin import UnitsMixin
 from comstockpostproc.s3_utilities_mixin import S3UtilitiesMixin
+from comstockpostproc.truth_data_store import TruthDataStore
 
 # Create logger for AWS queries
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AMI(NamingMixin, UnitsMixin, S3UtilitiesMixin):
-    def __init__(self, truth_data_version, color_hex=NamingMixin.COLOR_AMI, reload_from_csv=False):
+    def __init__(self, truth_data_version, color_hex=NamingMixin.COLOR_AMI, reload_from_csv=False, max_download_workers=16):
         """
         A class to produce calibration graphics based on utility AMI data from the EULP project.
         Args:
             truth_data_version (string): The version of the AMI truth data. Example: 'v01'.
             year (int): The year to perform the comparison
+            reload_from_csv (bool): If True, read the AMI data already in the truth data store instead of downloading it
+            max_download_workers (int): Number of AMI files to download from s3 at the same time
         """
 
         # Initialize members
@@ -119,6 +124,10 @@ class AMI(NamingMixin, UnitsMixin, S3UtilitiesMixin):
             'warehouse'
             ]
 
+        self.max_download_workers = max_download_workers
+        self.truth_store = AMITruthStore(os.path.join(self.truth_data_dir, 'AMI_store'))
+        self.processed_store = TruthDataStore(os.path.join(current_dir, '..', 'truth_data', 'processed'))
+
         # Initialize s3 client
         self.s3_client = boto3.client('s3', config=botocore.client.Config(max_pool_connections=50))
 
@@ -128,131 +137,201 @@ class AMI(NamingMixin, UnitsMixin, S3UtilitiesMixin):
                 os.makedirs(p)
 
         # Load and transform data, preserving all columns
-        logger.info(f'Downloading {self.dataset_name}')
-        self.download_truth_data()
         if reload_from_csv:
-            file_name = f'AMI long.csv'
-            file_path = os.path.join(self.output_dir, file_name)
-            if not os.path.exists(file_path):
-                 raise FileNotFoundError(
-                    f'Cannot find {file_path} to reload data, set reload_from_csv=False to create CSV.')
-            logger.info(f'Reloading from CSV: {file_path}')
-            self.ami_timeseries_data = pd.read_csv(file_path, low_memory=False, index_col='timestamp', parse_dates=True)
+            if not self.truth_store.partitions():
+                raise FileNotFoundError(
+                    f'Cannot find {self.truth_store.store_dir} to reload data, set reload_from_csv=False to create it.')
+            logger.info(f'Reloading from AMI truth data store: {self.truth_store.store_dir}')
         else:
+            logger.info(f'Downloading {self.dataset_name}')
+            self.download_truth_data()
+            self.ingest_truth_data()
+
+        # Skip the aggregation if the store has aggregates of the same AMI data and code
+        artifact_key = self.processed_store.key(self, self.dataset_name, self.truth_store.files(), {
+            'ami_region_map': repr(self.ami_region_map),
+            'building_types': repr(self.building_types),
+        })
+        self.ami_timeseries_data = self.processed_store.load(self.dataset_name, artifact_key)
+        if self.ami_timeseries_data is None:
             self.calculate_ami_aggregates()
+            self.processed_store.save(self.dataset_name, artifact_key, self.ami_timeseries_data)
+
+    def truth_data_file_name(self, region_hash, building_type):
+        lookup_name = str(region_hash['year']) + '_' + region_hash['source_name'] + '_' + region_hash['filter_method']
+        return lookup_name + '_' + building_type + '_kwh_per_sqft.csv'
 
     def download_truth_data(self):
-        # AMI data
+        # AMI data, downloading the files missing from both the truth data directory and the store at the same time
+        file_names = []
         for region_hash in self.ami_region_map:
-            region_source_name = region_hash['source_name']
-            lookup_name = str(region_hash['year']) + '_' + region_source_name + '_' + region_hash['filter_method']
             for building_type in self.building_types:
-                file_name = lookup_name + '_' + building_type + '_kwh_per_sqft.csv'
+                file_name = self.truth_data_file_name(region_hash, building_type)
                 file_path = os.path.join(self.truth_data_dir, file_name)
-                if not os.path.exists(file_path):
-                    s3_file_path = f'truth_data/{self.truth_data_version}/AMI/{file_name}'
-                    if self.isfile_on_S3('eulp', s3_file_path):
-                        self.read_delimited_truth_data_file_from_S3(s3_file_path, ',')
-                    else:
-                        logger.warning(f'Missing data for building type {building_type} in region {region_source_name}.')
-                        continue
+                if not (os.path.exists(file_path) or self.truth_store.has(region_hash['source_name'], building_type, file_name)):
+                    file_names.append(file_name)
 
-    def calculate_ami_aggregates(self):
-        all_ami_df = pd.DataFrame()
-        # load AMI data
+        if len(file_names) > 0:
+            logger.info(f'Downloading {len(file_names)} AMI files from s3 with {self.max_download_workers} workers')
+            Parallel(n_jobs=self.max_download_workers, prefer='threads')(
+                delayed(self.download_truth_data_file)(file_name) for file_name in file_names)
+
+    def download_truth_data_file(self, file_name):
+        """
+        Downloads one AMI truth data file from S3 to the truth data directory.
+        Not all regions have data for every building type, so a missing file is a warning.
+        Args:
+
+            file_name (str): Name of the file, see truth_data_file_name
+
+        Return:
+            bool: True if the file was downloaded
+        """
+        s3_file_path = f'truth_data/{self.truth_data_version}/AMI/{file_name}'
+        file_path = os.path.join(self.truth_data_dir, file_name)
+        try:
+            self.s3_client.download_file('eulp', s3_file_path, file_path)
+        except botocore.exceptions.ClientError:
+            logger.warning(f'Missing AMI data {s3_file_path} on s3.')
+            return False
+
+        return True
+
+    def ingest_truth_data(self):
+        # Store each downloaded file, so later runs read the store instead of parsing CSVs
         for region_hash in self.ami_region_map:
-            region_source_name = region_hash['source_name']
-            region_year = str(region_hash['year'])
-            region_filter_method = region_hash['filter_method']
-            lookup_name = region_year + '_' + region_source_name + '_' + region_filter_method
-            ami_name = 'ami_' + lookup_name
-            ami_raw_df = pd.DataFrame()
             for building_type in self.building_types:
-                file_name = lookup_name + '_' + building_type + '_kwh_per_sqft.csv'
+                file_name = self.truth_data_file_name(region_hash, building_type)
                 file_path = os.path.join(self.truth_data_dir, file_name)
-                if not os.path.isfile(file_path):
-                    logger.warning(f'ami data for ' + file_name + ' does not exist.')
-                    continue
+                if os.path.exists(file_path):
+                    self.truth_store.ingest(file_path, region_hash['source_name'], building_type)
 
-                df = pd.read_csv(file_path, parse_dates=['timestamp'], index_col='timestamp')
-                df['building_type'] = building_type
+    @staticmethod
+    def t_interval(mean, std, count, confidence_interval):
+        """
+        Student's t confidence interval of a mean, for arrays of means, standard deviations, and counts.
+        Equivalent to scipy.stats.t.interval(confidence_interval, count - 1, mean, std / count**0.5) for each element.
+        Args:
 
-                # remove instances where the count of buildings in the timeseries is less than 30% of the max count
-                max_count = df['bldg_count'].max()
-                count_threshold = 0.3 * max_count
-                df = df[df['bldg_count'] > count_threshold]
-                ami_raw_df = pd.concat([ami_raw_df,df])
+            mean (array-like): Sample means
+            std (array-like): Sample standard deviations
+            count (array-like): Sample sizes
+            confidence_interval (float): Confidence level, like 0.8
 
-            if ami_raw_df.empty:
+        Return:
+            tuple: lower and upper bounds as np.ndarray
+        """
+        mean = np.asarray(mean, dtype=float)
+        std_err = np.asarray(std, dtype=float) / np.asarray(count, dtype=float)**0.5
+        t_crit = stats.t.ppf((1.0 + confidence_interval) / 2.0, np.asarray(count, dtype=float) - 1)
+        return mean - t_crit * std_err, mean + t_crit * std_err
+
+    def calculate_ami_aggregates(self):
+        # load AMI data for all regions and building types
+        region_order = {}
+        region_years = {}
+        partitions = []
+        for region_hash in self.ami_region_map:
+            region_source_name = region_hash['source_name']
+            region_types = []
+            for building_type in self.building_types:
+                # only use partitions made from this region's year and filter method
+                file_name = self.truth_data_file_name(region_hash, building_type)
+                if self.truth_store.has(region_source_name, building_type, file_name):
+                    region_types.append(building_type)
+                    partitions.append((region_source_name, building_type))
+                else:
+                    logger.warning(f'ami data for ' + file_name + ' does not exist.')
+            if len(region_types) == 0:
                 logger.warning(f'no ami data for ' + region_source_name)
                 continue
+            region_order[region_source_name] = len(region_order)
+            region_years[region_source_name] = region_hash['year']
 
-            # restrict to target year
-            target_year = region_hash['year']
-            ami_raw_df = ami_raw_df[ami_raw_df.index.year == target_year]
-            ami_raw_df = ami_raw_df[ami_raw_df.index.dayofyear != 366]
-            ami_raw_df['region_name'] = region_source_name
-            ami_raw_df['year'] = region_year
+        if len(region_order) == 0:
+            all_ami_df = pd.DataFrame()
+        else:
+            ami_raw_df = self.truth_store.read(partitions=partitions)
+            ami_raw_df = ami_raw_df.set_index('timestamp')
 
-            # compare against mean by square foot
-            ami_raw_df['kwh_per_sf'] = ami_raw_df['mean_by_sqft']
+            # remove instances where the count of buildings in the timeseries is less than 30% of the max count
+            max_count = ami_raw_df.groupby(['region_name', 'building_type'])['bldg_count'].transform('max')
+            ami_raw_df = ami_raw_df[ami_raw_df['bldg_count'] > 0.3 * max_count]
 
-            # drop other data
-            ami_raw_df = ami_raw_df[['kwh_per_sf', 'total_sqft', 'std_by_count', 'bldg_count', 'building_type', 'region_name', 'year']]
+            # restrict to target year
+            target_year = ami_raw_df['region_name'].map(region_years).to_numpy()
+            ami_raw_df = ami_raw_df[(ami_raw_df.index.year == target_year) & (ami_raw_df.index.dayofyear != 366)].copy()
+            ami_raw_df['year'] = ami_raw_df['region_name'].map(region_years).astype(str)
 
-            def calc_lci(row, confidence_interval):
-                ci = stats.t.interval(confidence_interval, row['bldg_count'] - 1, row['kwh_per_sf'], row['std_by_count'] / (row['bldg_count']**0.5))
-                return ci[0]
+            # order by region and building type, as the files are listed
+            type_order = {t: i for i, t in enumerate(self.building_types)}
+            sort_key = pd.DataFrame({
+                'region': ami_raw_df['region_name'].map(region_order).to_numpy(),
+                'building_type': ami_raw_df['building_type'].map(type_order).to_numpy(),
+            })
+            ami_raw_df = ami_raw_df.iloc[sort_key.sort_values(['region', 'building_type'], kind='stable').index.to_numpy()]
 
-            def calc_uci(row, confidence_interval):
-                ci = stats.t.interval(confidence_interval, row['bldg_count'] - 1, row['kwh_per_sf'], row['std_by_count'] / (row['bldg_count']**0.5))
-                return ci[1]
+            all_ami_df = self.aggregate_ami_data(ami_raw_df, region_order)
+            for region_source_name in region_order.keys():
+                logger.info(f'Adding data for region {region_source_name}.')
 
-            # calculate total kwh
-            temp_df = pd.DataFrame()
-            total_sf = 0.0
-            for building_type in self.building_types:
-                temp_sf = ami_raw_df[ami_raw_df['building_type'] == building_type]['total_sqft'].max()
-                total_sf = total_sf + temp_sf
-                type_df = ami_raw_df[ami_raw_df['building_type'] == building_type].copy()
-                if len(type_df['kwh_per_sf']) < 6000:
-                    continue
-                type_df['kwh'] = type_df['kwh_per_sf'] * temp_sf
-                type_df['lci_80'] = type_df.apply(lambda row: max(0, calc_lci(row, 0.8)), axis=1).values
-                type_df['uci_80'] = type_df.apply(lambda row: calc_uci(row, 0.8), axis=1).values
-                # type_df['sample_uncertainty'] = (type_df['std_by_count'] / (type_df['bldg_count']**0.5)) / type_df['kwh_per_sf']
-                type_df['sample_uncertainty'] = (type_df['uci_80'] / type_df['kwh_per_sf']) - 1
-                temp_df = pd.concat([temp_df, type_df])
-            ami_df = temp_df
-
-            # calculate the total
-            df = ami_df.groupby(['timestamp', 'region_name', 'year']).sum().reset_index().set_index('timestamp')
-            df = df.drop(['kwh_per_sf'], axis=1)
-            df['kwh_per_sf'] = df['kwh'] / total_sf
-            df['lci_80'] = df.apply(lambda row: calc_lci(row, 0.8), axis=1).values
-            df['uci_80'] = df.apply(lambda row: calc_uci(row, 0.8), axis=1).values
-            ### sum std_by_count is divided by total number of buildings to weight them, canceling the sqrt
-            # df['sample_uncertainty'] = (df['std_by_count'] / df['bldg_count']) / df['kwh_per_sf']
-            df['sample_uncertainty'] = (df['uci_80'] / df['kwh_per_sf']) -1
-            df['building_type'] = 'total'
-
-            # save out total aggregated
-            # data_path = os.path.join('data', 'aggregated_dataset', ami_name + '_agg.csv')
-            # df.to_csv(data_path, index=True)
-
-            # add the total data to the AMI
-            ami_df = pd.concat([ami_df, df])
-
-            # drop other data
-            ami_df = ami_df[['kwh_per_sf', 'bldg_count', 'building_type', 'region_name', 'year', 'sample_uncertainty']]
-
-            # save out long data format
-            logger.info(f'Adding data for region {region_source_name}.')
-            # data_path = os.path.join(self.output_dir, ami_name + '_agg_long.csv')
-            # ami_df.to_csv(data_path, index=True)
-            all_ami_df = pd.concat([all_ami_df, ami_df])
-        
         data_path = os.path.join(self.output_dir, 'AMI long.csv')
         all_ami_df.to_csv(data_path, index=True)
         self.ami_timeseries_data = all_ami_df
-        return all_ami_df
\ No newline at end of file
+        return all_ami_df
+
+    def aggregate_ami_data(self, ami_raw_df, region_order):
+        """
+        Computes the 80% confidence interval and sample uncertainty of the mean load for every region, building type,
+        and timestamp at once, and the total of all building types in each region.
+        Args:
+
+            ami_raw_df (pd.DataFrame): AMI data for all regions and building types, indexed by timestamp,
+            with mean_by_sqft, total_sqft, std_by_count, bldg_count, building_type, region_name, and year columns
+            region_order (dict): Position of each region name in the output
+
+        Return:
+            pd.DataFrame: kwh_per_sf, bldg_count, building_type, region_name, year, and sample_uncertainty
+            for each building type followed by the total, region by region
+        """
+        # compare against mean by square foot
+        ami_raw_df = ami_raw_df[['mean_by_sqft', 'total_sqft', 'std_by_count', 'bldg_count', 'building_type', 'region_name', 'year']]
+        ami_raw_df = ami_raw_df.rename(columns={'mean_by_sqft': 'kwh_per_sf'})
+
+        # floor area of each building type, summed into the floor area of each region
+        # missing building types have no floor area, which makes the region total undefined
+        region_type_sf = ami_raw_df.groupby(['region_name', 'building_type'], sort=False)['total_sqft'].max()
+        region_sf = {}
+        for region_source_name in region_order.keys():
+            type_sf = region_type_sf.get(region_source_name, pd.Series(dtype=float)).reindex(self.building_types)
+            region_sf[region_source_name] = type_sf.sum(skipna=False)
+
+        # building types with fewer than 6000 hours of data are not used
+        type_sizes = ami_raw_df.groupby(['region_name', 'building_type'], sort=False)['kwh_per_sf'].transform('size')
+        type_df = ami_raw_df[type_sizes >= 6000].copy()
+        type_sf = type_df.groupby(['region_name', 'building_type'], sort=False)['total_sqft'].transform('max')
+        type_df['kwh'] = type_df['kwh_per_sf'] * type_sf
+        lci_80, uci_80 = self.t_interval(type_df['kwh_per_sf'], type_df['std_by_count'], type_df['bldg_count'], 0.8)
+        type_df['lci_80'] = np.maximum(0, lci_80)
+        type_df['uci_80'] = uci_80
+        type_df['sample_uncertainty'] = (type_df['uci_80'] / type_df['kwh_per_sf']) - 1
+
+        # calculate the total
+        ### sum std_by_count is divided by total number of buildings to weight them, canceling the sqrt
+        sum_cols = ['total_sqft', 'std_by_count', 'bldg_count', 'kwh']
+        total_df = type_df.groupby([type_df.index, 'region_name', 'year'])[sum_cols].sum().reset_index().set_index('timestamp')
+        total_df['kwh_per_sf'] = total_df['kwh'] / total_df['region_name'].map(region_sf)
+        lci_80, uci_80 = self.t_interval(total_df['kwh_per_sf'], total_df['std_by_count'], total_df['bldg_count'], 0.8)
+        total_df['sample_uncertainty'] = (uci_80 / total_df['kwh_per_sf']) - 1
+        total_df['building_type'] = 'total'
+
+        # building types then the total, region by region
+        cols = ['kwh_per_sf', 'bldg_count', 'building_type', 'region_name', 'year', 'sample_uncertainty']
+        ami_df = pd.concat([type_df[cols], total_df[cols]])
+        sort_key = pd.DataFrame({
+            'region': ami_df['region_name'].map(region_order).to_numpy(),
+            'is_total': np.repeat([0, 1], [len(type_df), len(total_df)]),
+        })
+        ami_df = ami_df.iloc[sort_key.sort_values(['region', 'is_total'], kind='stable').index.to_numpy()]
+
+        return ami_df
\ No newline at end of file
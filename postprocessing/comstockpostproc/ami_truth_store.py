@@ -0,0 +1,163 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import os
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+class AMITruthStore():
+    # Partition columns of the store
+    REGION = 'region_name'
+    BLDG_TYPE = 'building_type'
+
+    # Columns of the AMI truth data files. Counts are floats because files can have missing counts.
+    TIMESTAMP = 'timestamp'
+    SCHEMA = pa.schema([
+        (TIMESTAMP, pa.timestamp('ns')),
+        ('mean_by_sqft', pa.float64()),
+        ('total_sqft', pa.float64()),
+        ('std_by_count', pa.float64()),
+        ('bldg_count', pa.float64()),
+    ])
+
+    # Parquet metadata key holding the name of the CSV file a partition was made from. The name includes the
+    # year and filter method, so a partition made from a different file is not mistaken for the requested data.
+    SOURCE_KEY = b'comstock.ami_source_file'
+
+    def __init__(self, store_dir):
+        """
+        AMI truth data for every region and building type, stored as one parquet dataset
+        partitioned by region and building type. Each CSV file is parsed once, when it is ingested,
+        and the name of the file is kept with the partition.
+        Args:
+
+            store_dir (str): Directory of the partitioned parquet dataset, created if it does not exist
+        """
+        self.store_dir = store_dir
+
+    def _partition_path(self, region, building_type):
+        return os.path.join(self.store_dir, f'{self.REGION}={region}', f'{self.BLDG_TYPE}={building_type}', 'part-0.parquet')
+
+    def source_file(self, region, building_type):
+        # Name of the CSV file a partition was made from, None if the partition does not exist
+        path = self._partition_path(region, building_type)
+        if not os.path.exists(path):
+            return None
+        metadata = pq.read_schema(path).metadata or {}
+        return metadata.get(self.SOURCE_KEY, b'').decode('utf-8')
+
+    def has(self, region, building_type, source_file=None):
+        """
+        Whether the store has data for a region and building type.
+        Args:
+
+            region (str): Region source name
+            building_type (str): Building type
+            source_file (str): If given, the partition must have been made from a CSV file with this name
+
+        Return:
+            bool: True if the partition exists and, if requested, came from source_file
+        """
+        stored_source = self.source_file(region, building_type)
+        if stored_source is None:
+            return False
+        return source_file is None or stored_source == os.path.basename(source_file)
+
+    def partitions(self):
+        """
+        Regions and building types in the store.
+
+        Return:
+            list: (region, building_type) tuples
+        """
+        partitions = []
+        if not os.path.exists(self.store_dir):
+            return partitions
+        for region_dir in sorted(os.listdir(self.store_dir)):
+            for bldg_type_dir in sorted(os.listdir(os.path.join(self.store_dir, region_dir))):
+                region = region_dir.split('=', 1)[1]
+                building_type = bldg_type_dir.split('=', 1)[1]
+                if self.has(region, building_type):
+                    partitions.append((region, building_type))
+
+        return partitions
+
+    def files(self):
+        # Paths of the partition files in the store
+        return [self._partition_path(region, building_type) for region, building_type in self.partitions()]
+
+    def ingest(self, csv_path, region, building_type):
+        """
+        Stores one AMI truth data CSV file, unless the store already has a copy of the same file that is newer than it.
+        Args:
+
+            csv_path (str): Path to the CSV, with timestamp, mean_by_sqft, total_sqft, std_by_count, and bldg_count columns
+            region (str): Region source name, like 'fort_collins'
+            building_type (str): Building type, like 'small_office'
+
+        Return:
+            str: path of the partition file
+        """
+        path = self._partition_path(region, building_type)
+        if self.has(region, building_type, csv_path) and os.path.getmtime(path) >= os.path.getmtime(csv_path):
+            return path
+
+        df = pd.read_csv(csv_path, parse_dates=[self.TIMESTAMP])
+        table = pa.Table.from_pandas(df[self.SCHEMA.names], schema=self.SCHEMA, preserve_index=False)
+        table = table.replace_schema_metadata({**table.schema.metadata, self.SOURCE_KEY: os.path.basename(csv_path).encode('utf-8')})
+
+        partition_dir = os.path.dirname(path)
+        if not os.path.exists(partition_dir):
+            os.makedirs(partition_dir)
+        # Write to a temporary file first so an interrupted run does not leave a partial partition.
+        # The dot prefix makes reads of the dataset skip a temporary file left by an interrupted run.
+        tmp_path = os.path.join(partition_dir, f'.{os.path.basename(path)}.tmp')
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        logger.debug(f'Stored {len(df)} rows of AMI data from {csv_path} in {path}')
+
+        return path
+
+    def read(self, regions=None, building_types=None, columns=None, partitions=None):
+        """
+        Reads the AMI data of some regions and building types, only reading the partitions that match.
+        Files are memory-mapped rather than copied into memory before decoding.
+        Args:
+
+            regions (list): Region source names, None for all
+            building_types (list): Building types, None for all
+            columns (list): Data columns to read, None for all
+            partitions (list): (region, building_type) tuples to read, which replaces regions and building_types
+
+        Return:
+            pd.DataFrame: timestamp, the data columns, region_name and building_type
+        """
+        if not os.path.exists(self.store_dir):
+            logger.error(f'No AMI truth data store at {self.store_dir}')
+            raise FileNotFoundError(f'No AMI truth data store at {self.store_dir}')
+        filters = []
+        if regions is not None:
+            filters.append((self.REGION, 'in', list(regions)))
+        if building_types is not None:
+            filters.append((self.BLDG_TYPE, 'in', list(building_types)))
+        if partitions is not None:
+            filters = [[(self.REGION, '==', region), (self.BLDG_TYPE, '==', building_type)] for region, building_type in partitions]
+        if columns is not None:
+            columns = [self.TIMESTAMP] + [c for c in columns if c != self.TIMESTAMP] + [self.REGION, self.BLDG_TYPE]
+        table = pq.read_table(
+            self.store_dir,
+            columns=columns,
+            filters=filters if filters else None,
+            partitioning='hive',
+            memory_map=True
+        )
+        df = table.to_pandas()
+        for col in [self.REGION, self.BLDG_TYPE]:
+            df[col] = df[col].astype(str)
+
+        return df
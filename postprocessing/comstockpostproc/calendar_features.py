@@ -0,0 +1,105 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import logging
+
+import pandas as pd
+from pandas.tseries.holiday import USFederalHolidayCalendar
+
+logger = logging.getLogger(__name__)
+
+# Year of the ComStock weather and timeseries
+SIMULATION_YEAR = 2018
+
+# Season of each month
+SEASONS = {
+    1: 'Winter', 2: 'Winter', 3: 'Spring', 4: 'Spring', 5: 'Spring', 6: 'Summer',
+    7: 'Summer', 8: 'Summer', 9: 'Fall', 10: 'Fall', 11: 'Fall', 12: 'Winter',
+}
+
+# Season of each month, with spring and fall combined
+SHOULDER_SEASONS = {
+    1: 'Winter', 2: 'Winter', 3: 'Shoulder', 4: 'Shoulder', 5: 'Shoulder', 6: 'Summer',
+    7: 'Summer', 8: 'Summer', 9: 'Shoulder', 10: 'Shoulder', 11: 'Shoulder', 12: 'Winter',
+}
+
+# Week number given to Dec 31st, which ISO weeks put in week 1 of the next year
+LAST_WEEK = 55
+
+# Calendars keyed on year and seasons, see calendar_features()
+_CALENDARS = {}
+
+
+def calendar_features(year=SIMULATION_YEAR, seasons=None):
+    """
+    Hourly calendar of a year, to join onto timeseries indexed by timestamp.
+    Built once per year and season definition and shared by every plot, do not modify it.
+    Args:
+
+        year (int): Year of the calendar
+        seasons (dict): Season of each month, SEASONS if None
+
+    Return:
+        pd.DataFrame: indexed by hourly timestamp, with columns Month, Season, Week_of_Year, Day_of_Year,
+        Day_of_Week, Day_Type, Hour_of_Day, Hour_of_Year, Holiday, and Year
+    """
+    if seasons is None:
+        seasons = SEASONS
+    key = (year, tuple(sorted(seasons.items())))
+    if key in _CALENDARS:
+        return _CALENDARS[key]
+
+    times = pd.date_range(f'{year}-01-01', f'{year}-12-31 23:00', freq='h', name='time')
+    cal = pd.DataFrame(index=times)
+    cal['Month'] = times.month
+    cal['Season'] = cal['Month'].map(seasons)
+    cal['Week_of_Year'] = times.isocalendar().week
+    cal['Day_of_Year'] = times.dayofyear
+    cal['Day_of_Week'] = times.dayofweek
+    cal['Day_Type'] = 'Weekday'
+    cal.loc[cal['Day_of_Week'] >= 5, 'Day_Type'] = 'Weekend'
+    cal['Hour_of_Day'] = times.hour
+    cal['Hour_of_Year'] = (cal['Day_of_Year'] - 1) * 24 + cal['Hour_of_Day']
+    holidays = USFederalHolidayCalendar().holidays(start=times[0], end=times[-1])
+    cal['Holiday'] = times.normalize().isin(holidays)
+    cal['Year'] = times.year
+
+    # make dec 31st last week of year
+    cal.loc[cal['Day_of_Year'] == 365, 'Week_of_Year'] = LAST_WEEK
+
+    _CALENDARS[key] = cal
+    return cal
+
+
+def add_calendar_features(df, year=SIMULATION_YEAR, seasons=None):
+    """
+    Joins the calendar onto a timeseries, keeping only the timestamps in the calendar year.
+    Args:
+
+        df (pd.DataFrame): Timeseries indexed by hourly timestamp
+        year (int): Year of the calendar
+        seasons (dict): Season of each month, SEASONS if None
+
+    Return:
+        pd.DataFrame: df with the calendar columns
+    """
+    cal = calendar_features(year, seasons)
+    return df.join(cal, how='inner')
+
+
+def peak_weeks(df, load_col, season_col='Season'):
+    """
+    Week of the highest load in each season, marking the week to plot for each season.
+    Args:
+
+        df (pd.DataFrame): Timeseries with calendar columns, see add_calendar_features
+        load_col (str): Column with the load
+        season_col (str): Column with the season
+
+    Return:
+        dict: Week_of_Year of the peak, keyed on season
+    """
+    # Timestamps repeat for each upgrade, so find the first peak row by position
+    loads = df[[season_col, load_col, 'Week_of_Year']].reset_index(drop=True)
+    peak_rows = loads.groupby(season_col, sort=False)[load_col].idxmax()
+    weeks = loads.loc[peak_rows.to_numpy(), 'Week_of_Year'].to_numpy()
+    return dict(zip(peak_rows.index, weeks))
@@ -5,12 +5,13 @@ import os
 import boto3
 import botocore
 import logging
-import numpy as np
-import pandas as pd
+import polars as pl
 
+from comstockpostproc.cbecs_codebook import compile_codebook, decode_columns
 from comstockpostproc.naming_mixin import NamingMixin
 from comstockpostproc.units_mixin import UnitsMixin
 from comstockpostproc.s3_utilities_mixin import S3UtilitiesMixin
+from comstockpostproc.truth_data_store import TruthDataStore
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +43,7 @@ class CBECS(NamingMixin, UnitsMixin, S3UtilitiesMixin):
         self.weighted_energy_units = weighted_energy_units
         self.weighted_utility_units = weighted_utility_units
         self.s3_client = boto3.client('s3', config=botocore.client.Config(max_pool_connections=50))
+        self.processed_store = TruthDataStore(os.path.join(current_dir, '..', 'truth_data', 'processed'))
         logger.info(f'Creating {self.dataset_name}')
 
         # Make directories
@@ -58,19 +60,27 @@ class CBECS(NamingMixin, UnitsMixin, S3UtilitiesMixin):
                  raise FileNotFoundError(
                     f'Cannot find {file_path} to reload data, set reload_from_csv=False to create CSV.')
             logger.info(f'Reloading from CSV: {file_path}')
-            self.data = pd.read_csv(file_path, low_memory=False)
+            self.data = pl.read_csv(file_path, infer_schema_length=None)
+            self.data = self.data.with_columns([pl.col(c).cast(pl.Categorical) for c, dt in self.data.schema.items() if dt == pl.Utf8])
         else:
-            self.load_data()
-            self.rename_columns_and_convert_units()
-            self.set_column_data_types()
-            self.add_dataset_column()
-            self.add_comstock_building_type_column()
-            self.add_vintage_column()
-            self.add_energy_intensity_columns()
-            self.add_bill_intensity_columns()
-            self.add_energy_rate_columns()
-            # Calculate weighted area and energy consumption columns
-            self.add_weighted_area_and_energy_columns()
+            # Skip processing if the store has the data processed from the same inputs and code
+            artifact_key = self.processed_store.key(self, self.dataset_name, self.input_file_paths(), {
+                'weighted_energy_units': self.weighted_energy_units,
+                'weighted_utility_units': self.weighted_utility_units,
+            })
+            self.data = self.processed_store.load(self.dataset_name, artifact_key)
+            if self.data is None:
+                self.load_data()
+                self.rename_columns_and_convert_units()
+                self.set_column_data_types()
+                self.add_dataset_column()
+                self.add_building_type_and_vintage_columns()
+                self.add_energy_intensity_columns()
+                self.add_bill_intensity_columns()
+                self.add_energy_rate_columns()
+                # Calculate weighted area and energy consumption columns
+                self.add_weighted_area_and_energy_columns()
+                self.processed_store.save(self.dataset_name, artifact_key, self.data)
 
         logger.debug('\nCBECS columns after adding all data')
         for c in self.data.columns:
@@ -99,87 +109,43 @@ class CBECS(NamingMixin, UnitsMixin, S3UtilitiesMixin):
             self.read_delimited_truth_data_file_from_S3(s3_file_path, ',')
     
 
+    def input_file_paths(self):
+        # Files the processed data is made from
+        return [
+            os.path.join(self.truth_data_dir, self.data_file_name),
+            os.path.join(self.truth_data_dir, self.data_codebook_file_name),
+            os.path.join(self.resource_dir, self.building_type_mapping_file_name),
+        ]
+
     def load_data(self):
         # Load raw microdata and codebook and decode numeric keys to strings using codebook
 
         # Load microdata
         file_path = os.path.join(self.truth_data_dir, self.data_file_name)
-        self.data = pd.read_csv(file_path, low_memory=False, na_values=['.'])
+        self.data = pl.read_csv(file_path, null_values=['.'], infer_schema_length=None)
 
         # Load microdata codebook
-        file_path = os.path.join(self.truth_data_dir, self.data_codebook_file_name)
-        codebook = pd.read_csv(file_path, index_col='File order', low_memory=False)
         # Make a dict of column names (e.g. PBA) to labels (e.g. Principal building activity)
-        # and a dict of numeric enumerations to strings for non-numeric variables
-        var_name_to_label = {}
-        var_label_to_enums = {}
-        for file_order, row in codebook.iterrows():
-            var_name = row['Variable name'].strip()
-            var_type = row['Variable type'].strip()
-            var_label = row['Label'].strip()
-            var_vals = row['Values/Format codes']
-            # logger.debug('')
-            # logger.debug('*'*20)
-            # logger.debug(var_name)
-            # logger.debug(var_label)
-            # logger.debug(var_type)
-            # logger.debug(var_vals)
-
-            # Check if this label was already used by CBECS for another column
-            if var_label in list(var_name_to_label.values()):
-                logger.debug(f'CBECS used the label "{var_label}" for multiple columns')
-                logger.debug(f'    - now: {var_name}')
-                for nm, lbl in var_name_to_label.items():
-                    if lbl == var_label:
-                        logger.debug(f'    - prev: {nm}')
-                # If reused, append the column name to the label to differentiate
-                var_label = f'{var_label} {var_name}'
-                logger.debug(f'    Relabeling "{var_name}" to: "{var_label}"')
-
-            # Add the name to label mapping
-            var_name_to_label[var_name] = var_label
-
-            # For non-numeric fields, parse the value/format codes into a dict
-            enum_to_value = {}
-            if not pd.isna(var_vals) and '=' in var_vals:
-                for v in var_vals.split('|'):
-                    if '=' in v:
-                        n, val = v.split('=')
-                        enum_to_value[n] = val.strip()
-            if len(enum_to_value) > 0:
-                var_label_to_enums[var_label] = enum_to_value
-
-        # Rename the columns
-        self.data.rename(columns=var_name_to_label, inplace=True)
-
-        # Double-check for duplicate columns; there should be none
-        for col, dup in zip(self.data.columns, self.data.columns.duplicated()):
-            if dup:
-                logger.warning(f'Dropped column with duplicate label: {col}')
-                self.data.drop(col, axis=1, inplace=True)
-
-        # Decode the column values
-        def decode_variable(val, decoder_map):
-            # logger.debug('***')
-            # logger.debug(f'DECODING {val}')
-            # logger.debug(f'with {decoder_map}')
-            if pd.isna(val):  # NaN = 'Missing' in decoder map
-                val = 'Missing'
-            if val in decoder_map.keys():
-                return decoder_map[val]
-            elif str(int(val)) in decoder_map.keys():
-                return decoder_map[str(int(val))]
-            else:
-                return val
-
-        for col_name in list(self.data):
-            # logger.debug(col_name)
-            if col_name in var_label_to_enums.keys():
-                decoder_map = var_label_to_enums[col_name]
-                # logger.debug(f'Decoding {col_name}')
-                # logger.debug('  value map:')
-                # logger.debug(f'  {decoder_map}')
-                self.data[col_name] = self.data[col_name].apply(lambda key: decode_variable(key, decoder_map))
+        # and a table of numeric enumerations to strings for non-numeric variables
+        file_path = os.path.join(self.truth_data_dir, self.data_codebook_file_name)
+        codebook = pl.read_csv(file_path, infer_schema_length=None)
+        var_name_to_label, codes = compile_codebook(codebook)
+
+        # Rename the columns, dropping any columns that would have a duplicate label; there should be none
+        new_names = [var_name_to_label.get(c, c) for c in self.data.columns]
+        dup_names = set(n for n in new_names if new_names.count(n) > 1)
+        for col in dup_names:
+            logger.warning(f'Dropped column with duplicate label: {col}')
+        self.data = self.data.select([pl.col(c).alias(n) for c, n in zip(self.data.columns, new_names) if n not in dup_names])
+
+        # Decode the column values to categoricals
+        self.data = decode_columns(self.data, codes)
+
+    def to_float(self, col):
+        # Expression converting a column to numbers, with CBECS 'Not applicable' codes as nulls
+        if self.data.schema[col] in [pl.Utf8, pl.Categorical]:
+            return pl.col(col).cast(pl.Utf8).replace({'Not Applicable': None, 'Not applicable': None}).cast(pl.Float64)
+        return pl.col(col).cast(pl.Float64)
 
     def rename_columns_and_convert_units(self):
         column_map = {
@@ -223,7 +189,7 @@ class CBECS(NamingMixin, UnitsMixin, S3UtilitiesMixin):
             'Annual natural gas expenditures ($)': self.UTIL_BILL_GAS,
             'Annual fuel oil expenditures ($)': self.UTIL_BILL_FUEL_OIL
         }
-        self.data.rename(columns=column_map, inplace=True)
+        self.data = self.data.rename({k: v for k, v in column_map.items() if k in self.data.columns})
 
         # Combine some CBECS columns to match ComStock
         combo_cols = [
@@ -242,238 +208,222 @@ class CBECS(NamingMixin, UnitsMixin, S3UtilitiesMixin):
             [['Fuel oil cooking use (thous Btu)',
             'Fuel oil miscellaneous use (thous Btu)'], self.ANN_OTHER_INTEQUIP_KBTU]
         ]
+        to_float = []
+        combos = []
         for cols, new_col_name in combo_cols:
             found_cols = []
             for col in cols:
-                if not col in self.data:
+                if not col in self.data.columns:
                     logger.warning(f'Missing energy column {col}, will not be included in {new_col_name}')
                     continue
-                self.data[col] = self.data[col].replace('Not Applicable', np.nan)
-                self.data[col] = self.data[col].replace('Not applicable', np.nan)
-                self.data[col] = self.data[col].astype('float64')
+                to_float.append(self.to_float(col))
                 found_cols.append(col)
-            new_col_dict = {}
-            new_col_dict[new_col_name] = self.data[found_cols].sum(axis=1)
-            self.data = pd.concat([self.data, pd.DataFrame(new_col_dict)],axis=1)
+            combos.append(pl.sum_horizontal(found_cols).alias(new_col_name) if found_cols else pl.lit(0.0).alias(new_col_name))
+        self.data = self.data.with_columns(to_float)
+        self.data = self.data.with_columns(combos)
 
-        # Convert all energy columns from base CBECS kBtu to kWh
+        # Convert all energy columns from base CBECS kBtu to kWh, and ensure the area and bill columns are numeric
+        base_cbecs_units = 'kbtu'
+        exprs = []
         for col in (self.COLS_TOT_ANN_ENGY + self.COLS_ENDUSE_ANN_ENGY):
             # Skip end-use columns that aren't part of CBECS
-            if not col in self.data:
+            if not col in self.data.columns:
                 continue
-            # Ensure the energy column is numeric then create weighted column
-            self.data[col] = self.data[col].replace('Not Applicable', np.nan)
-            self.data[col] = self.data[col].replace('Not applicable', np.nan)
-            self.data[col] = self.data[col].astype('float64')
-            new_col = self.col_name_to_weighted(col, self.weighted_energy_units)
-
-            # Convert to match units in updated column name
-            base_cbecs_units = 'kbtu'
             target_units = self.units_from_col_name(col)
             conv_fact = self.conv_fact(base_cbecs_units, target_units)
-            self.data[col] = self.data[col] * conv_fact
+            exprs.append((self.to_float(col) * conv_fact).alias(col))
+        for col in [self.FLR_AREA] + self.COLS_UTIL_BILLS:
+            if col in self.data.columns:
+                exprs.append(self.to_float(col).alias(col))
+        self.data = self.data.with_columns(exprs)
 
     def set_column_data_types(self):
-        # TODO generalize this on CBECS loading?
-        for col in self.COLS_TOT_ANN_ENGY:
-            if col in self.data:
-                self.data[col] = self.data[col].replace('Not Applicable', np.nan)
-                self.data[col] = self.data[col].astype('float64')
+        # Numeric columns as Float64 and string columns as Categorical, matching ComStock
+        self.data = self.data.with_columns(
+            [pl.col(c).cast(pl.Float64) for c in self.COLS_TOT_ANN_ENGY if c in self.data.columns])
+        if self.BLDG_WEIGHT in self.data.columns:
+            self.data = self.data.with_columns(pl.col(self.BLDG_WEIGHT).cast(pl.Float64))
 
     def add_dataset_column(self):
-        self.data[self.DATASET] = self.dataset_name
+        self.data = self.data.with_columns(pl.lit(self.dataset_name).cast(pl.Categorical).alias(self.DATASET))
 
     def add_energy_intensity_columns(self):
         # Create EUI column for each annual energy column
+        exprs = []
         for engy_col in (self.COLS_TOT_ANN_ENGY + self.COLS_ENDUSE_ANN_ENGY):
-            # Put in np.nan for end-use columns that aren't part of CBECS
-            if not engy_col in self.data:
-                self.data[engy_col] = np.nan
+            engy = pl.col(engy_col)
+            # Put in nulls for end-use columns that aren't part of CBECS
+            if not engy_col in self.data.columns:
+                engy = pl.lit(None, dtype=pl.Float64)
+                exprs.append(engy.alias(engy_col))
             # Divide energy by area to create intensity
-            eui_col = self.col_name_to_eui(engy_col)
-            self.data[engy_col] = self.data[engy_col].replace('Not Applicable', np.nan)
-            self.data[engy_col] = self.data[engy_col].astype('float64')
-            self.data[eui_col] = self.data[engy_col] / self.data[self.FLR_AREA]
+            exprs.append((engy / pl.col(self.FLR_AREA)).alias(self.col_name_to_eui(engy_col)))
+        self.data = self.data.with_columns(exprs)
 
     def add_bill_intensity_columns(self):
         # Create bill per area column for each annual utility bill column
+        exprs = []
         for bill_col in self.COLS_UTIL_BILLS:
-            # Put in np.nan for bill columns that aren't part of CBECS
-            if not bill_col in self.data:
-                self.data[bill_col] = np.nan
+            bill = pl.col(bill_col)
+            # Put in nulls for bill columns that aren't part of CBECS
+            if not bill_col in self.data.columns:
+                bill = pl.lit(None, dtype=pl.Float64)
+                exprs.append(bill.alias(bill_col))
             # Divide bill by area to create intensity
-            per_area_col = self.col_name_to_area_intensity(bill_col)
-            self.data[bill_col] = self.data[bill_col].replace('Not applicable', np.nan)
-            self.data[bill_col] = self.data[bill_col].astype('float64')
-            self.data[per_area_col] = self.data[bill_col] / self.data[self.FLR_AREA]
+            exprs.append((bill / pl.col(self.FLR_AREA)).alias(self.col_name_to_area_intensity(bill_col)))
+        self.data = self.data.with_columns(exprs)
 
     def add_energy_rate_columns(self):
         # Create energy rate column for each annual utility bill column
-        for bill_col in self.COLS_UTIL_BILLS:
-            # Get the corresponding energy consumption column
-            bill_to_engy_col = {
-                self.UTIL_BILL_ELEC: self.ANN_TOT_ELEC_KBTU,
-                self.UTIL_BILL_GAS: self.ANN_TOT_GAS_KBTU,
-                self.UTIL_BILL_FUEL_OIL: None,
-                self.UTIL_BILL_PROPANE: None
-            }
-            # Only create rate columns for fuels with bills
-            engy_col = bill_to_engy_col[bill_col]
-            if not engy_col:
-                continue
-            # Divide bill by consumption to create rate
-            rate_col = self.col_name_to_energy_rate(bill_col)
-            self.data[bill_col] = self.data[bill_col].replace('Not applicable', np.nan)
-            self.data[bill_col] = self.data[bill_col].astype('float64')
-            self.data[rate_col] = self.data[bill_col] / self.data[engy_col]
-
-    def add_comstock_building_type_column(self):
-        # Add the ComStock building type for each row of CBECS
+        # Get the corresponding energy consumption column, only fuels with bills have rates
+        bill_to_engy_col = {
+            self.UTIL_BILL_ELEC: self.ANN_TOT_ELEC_KBTU,
+            self.UTIL_BILL_GAS: self.ANN_TOT_GAS_KBTU,
+            self.UTIL_BILL_FUEL_OIL: None,
+            self.UTIL_BILL_PROPANE: None
+        }
+        # Divide bill by consumption to create rate
+        self.data = self.data.with_columns([
+            (pl.col(bill_col) / pl.col(bill_to_engy_col[bill_col])).alias(self.col_name_to_energy_rate(bill_col))
+            for bill_col in self.COLS_UTIL_BILLS if bill_to_engy_col[bill_col]
+        ])
 
+    def load_building_type_map(self):
         # Load the building type mapping file
         file_path = os.path.join(self.resource_dir, self.building_type_mapping_file_name)
-        bldg_type_map = pd.read_csv(file_path, index_col='CBECS More specific building activity')
-        bldg_type_map.head()
-
-        def cbecs_to_comstock_bldg_type(row, bldg_type_map):
-            # Get the CBECS properties
-            cbecs_bldg_type = row[self.CBECS_BLDG_TYPE]
-            sqft = row[self.FLR_AREA]
-            nfloor = row['Number of floors']
-            # Recode CBECS 2012 enumerations
-            if nfloor == '15 to 25':
-                nfloor = 15
-            elif nfloor == 'More than 25':
-                nfloor = 26
-            # Recode CBECS 2018 enumerations
-            elif nfloor == '10 to 14':
-                nfloor = 10
-            elif nfloor == '15 or more':
-                nfloor = 15
-
-            # Look up the intermediate comstock building type
-            cstock_bldg_type = bldg_type_map['ComStock Intermediate Building Type'].loc[cbecs_bldg_type]
-
-            # Assign size category to offices
-            if cstock_bldg_type == 'Office':
-                if sqft < 25_000:
-                    if nfloor <=3:
-                        cstock_bldg_type = 'SmallOffice'
-                    else:
-                        cstock_bldg_type = 'MediumOffice'
-                elif sqft >= 25_000 and sqft < 150_000:
-                    if nfloor <= 5:
-                        cstock_bldg_type = 'MediumOffice'
-                    else:
-                        cstock_bldg_type = 'LargeOffice'
-                elif sqft >= 150_000:
-                    cstock_bldg_type = 'LargeOffice'
-                else:
-                    err_msg = f"Should never get here, check logic for {row}"
-                    logger.error(err_msg)
-                    raise Exception(err_msg)
-                assert cstock_bldg_type != 'Office'  # Offices must be assigned a size
-
-            return cstock_bldg_type
-
-        self.data[self.BLDG_TYPE] = self.data.apply(lambda row: cbecs_to_comstock_bldg_type(row, bldg_type_map), axis=1)
+        return pl.read_csv(file_path)
+
+    def map_building_activity(self, bldg_type_map, map_col):
+        # Expression looking up the intermediate building type of each row in a column of the mapping file
+        activity_map = dict(zip(
+            bldg_type_map.get_column('CBECS More specific building activity').to_list(),
+            bldg_type_map.get_column(map_col).to_list()
+        ))
+        bldg_types = pl.col(self.CBECS_BLDG_TYPE).cast(pl.Utf8).replace(activity_map, default=None)
+        unmapped = self.data.filter(bldg_types.is_null()).get_column(self.CBECS_BLDG_TYPE).unique().to_list()
+        if len(unmapped) > 0:
+            err_msg = f'No {map_col} in {self.building_type_mapping_file_name} for CBECS building types: {unmapped}'
+            logger.error(err_msg)
+            raise Exception(err_msg)
+
+        return bldg_types
+
+    def comstock_building_type(self, bldg_type_map):
+        # Expression for the ComStock building type of each row of CBECS
+        cstock_bldg_type = self.map_building_activity(bldg_type_map, 'ComStock Intermediate Building Type')
+        sqft = pl.col(self.FLR_AREA)
+
+        # Recode CBECS 2012 (15 to 25, More than 25) and 2018 (10 to 14, 15 or more) enumerations
+        # Only offices use the floor count, so other building types can have values that are not numbers
+        nfloor_recode = {'15 to 25': '15', 'More than 25': '26', '10 to 14': '10', '15 or more': '15'}
+        nfloor = pl.col('Number of floors').cast(pl.Utf8).replace(nfloor_recode).cast(pl.Float64, strict=False)
+
+        # Assign size category to offices
+        is_office = cstock_bldg_type == 'Office'
+        if self.data.select((is_office & sqft.is_null()).any()).item():
+            err_msg = f'Should never get here, check logic for offices without {self.FLR_AREA}'
+            logger.error(err_msg)
+            raise Exception(err_msg)
+        bad_nfloor = self.data.filter(is_office & nfloor.is_null() & pl.col('Number of floors').is_not_null())
+        if bad_nfloor.height > 0:
+            err_msg = f"Cannot size offices from Number of floors values: {bad_nfloor.get_column('Number of floors').unique().to_list()}"
+            logger.error(err_msg)
+            raise Exception(err_msg)
+        office_size = (
+            pl.when(sqft < 25_000).then(pl.when(nfloor <= 3).then(pl.lit('SmallOffice')).otherwise(pl.lit('MediumOffice')))
+            .when(sqft < 150_000).then(pl.when(nfloor <= 5).then(pl.lit('MediumOffice')).otherwise(pl.lit('LargeOffice')))
+            .otherwise(pl.lit('LargeOffice'))
+        )
+
+        return pl.when(is_office).then(office_size).otherwise(cstock_bldg_type).cast(pl.Categorical).alias(self.BLDG_TYPE)
+
+    def aeo_nems_building_type(self, bldg_type_map):
+        # Expression for the AEO and NEMS building type of each row of CBECS
+        aeo_bldg_type = self.map_building_activity(bldg_type_map, 'NEMS and AEO Intermediate Building Type')
+
+        # Assign size category to offices
+        office_size = pl.when(pl.col(self.FLR_AREA) <= 50_000).then(pl.lit('Office - Small')).otherwise(pl.lit('Office - Large'))
+
+        return pl.when(aeo_bldg_type == 'Office').then(office_size).otherwise(aeo_bldg_type).cast(pl.Categorical).alias(self.AEO_BLDG_TYPE)
+
+    def vintage(self):
+        # Expression for the decadal vintage bins used in CBECS 2018 of each row of CBECS
+        if not self.YEAR_BUILT in self.data.columns:
+            # Use the vintage bins already in CBECS
+            return pl.col('Year of construction category').cast(pl.Categorical).alias(self.VINTAGE)
+
+        year_built = pl.col(self.YEAR_BUILT).cast(pl.Utf8)
+        before_1946 = year_built == 'Before 1946'
+        year = year_built.cast(pl.Float64, strict=False)
+        bad_years = self.data.filter(~before_1946 & year.is_null()).get_column(self.YEAR_BUILT).unique().to_list()
+        if len(bad_years) > 0:
+            err_msg = f'Cannot make vintage bins from {self.YEAR_BUILT} values: {bad_years}'
+            logger.error(err_msg)
+            raise Exception(err_msg)
+        year = year.cast(pl.Int64)
+
+        # Years through 1946 fall in the 1960s bin, as CBECS codes years before 1946 separately
+        return (
+            pl.when(before_1946).then(pl.lit('Before 1946'))
+            .when((1946 < year) & (year < 1960)).then(pl.lit('1946 to 1959'))
+            .when(year < 1970).then(pl.lit('1960 to 1969'))
+            .when(year < 1980).then(pl.lit('1970 to 1979'))
+            .when(year < 1990).then(pl.lit('1980 to 1989'))
+            .when(year < 2000).then(pl.lit('1990 to 1999'))
+            .when(year < 2013).then(pl.lit('2000 to 2012'))
+            .when(year < 2019).then(pl.lit('2013 to 2018'))
+            .otherwise(pl.lit('2019 or newer'))
+            .cast(pl.Categorical)
+            .alias(self.VINTAGE)
+        )
+
+    def add_comstock_building_type_column(self):
+        # Add the ComStock building type for each row of CBECS
+        self.data = self.data.with_columns(self.comstock_building_type(self.load_building_type_map()))
 
     def add_aeo_nems_building_type_column(self):
         # Add the AEO and NEMS building type for each row of CBECS
-
-        # Load the building type mapping file
-        file_path = os.path.join(self.resource_dir, self.building_type_mapping_file_name)
-        bldg_type_map = pd.read_csv(file_path, index_col='CBECS More specific building activity')
-        bldg_type_map.head()
-
-        def cbecs_to_aeo_bldg_type(row, bldg_type_map):
-            # Get the CBECS properties
-            cbecs_bldg_type = row[self.CBECS_BLDG_TYPE]
-            sqft = row[self.FLR_AREA]
-
-            # Look up the intermediate comstock building type
-            aeo_bldg_type = bldg_type_map['NEMS and AEO Intermediate Building Type'].loc[cbecs_bldg_type]
-
-            # Assign size category to offices
-            if aeo_bldg_type == 'Office':
-                if sqft <= 50_000:
-                    aeo_bldg_type = 'Office - Small'
-                else:
-                    aeo_bldg_type = 'Office - Large'
-                assert aeo_bldg_type != 'office'  # Offices must be assigned a size
-
-            return aeo_bldg_type
-
-        self.data[self.AEO_BLDG_TYPE] = self.data.apply(lambda row: cbecs_to_aeo_bldg_type(row, bldg_type_map), axis=1)
+        self.data = self.data.with_columns(self.aeo_nems_building_type(self.load_building_type_map()))
 
     def add_vintage_column(self):
         # Adds decadal vintage bins used in CBECS 2018
+        self.data = self.data.with_columns(self.vintage())
 
-        if self.YEAR_BUILT in self.data.columns:
-            def vintage_bin_from_year(year):
-                if year == 'Before 1946':
-                    return 'Before 1946'
-                year = int(year)
-                if 1946 < year < 1960:
-                    vint = '1946 to 1959'
-                elif year < 1970:
-                    vint = '1960 to 1969'
-                elif year < 1980:
-                    vint = '1970 to 1979'
-                elif year < 1990:
-                    vint = '1980 to 1989'
-                elif year < 2000:
-                    vint = '1990 to 1999'
-                elif year < 2013:
-                    vint = '2000 to 2012'
-                elif year < 2019:
-                    vint = '2013 to 2018'
-                else:
-                    vint = '2019 or newer'
-                return vint
-
-            self.data[self.VINTAGE] = self.data.apply(lambda row: vintage_bin_from_year(row[self.YEAR_BUILT]), axis=1)
-        else:
-            # Use the vintage bins already in CBECS
-            self.data[self.VINTAGE] = self.data['Year of construction category']
+    def add_building_type_and_vintage_columns(self, aeo_nems=False):
+        """
+        Adds the ComStock building type, optionally the AEO and NEMS building type, and vintage columns,
+        reading the building type mapping file once.
+        Args:
+
+            aeo_nems (bool): If True, also add the AEO and NEMS building type column
+        """
+        bldg_type_map = self.load_building_type_map()
+        exprs = [self.comstock_building_type(bldg_type_map)]
+        if aeo_nems:
+            exprs.append(self.aeo_nems_building_type(bldg_type_map))
+        exprs.append(self.vintage())
+        self.data = self.data.with_columns(exprs)
 
     def add_weighted_area_and_energy_columns(self):
-        # # Area
-        # new_area_col = self.col_name_to_weighted(self.FLR_AREA)
-        # self.data[new_area_col] = self.data[self.FLR_AREA] * self.data[self.BLDG_WEIGHT]
-
-        # # Energy
-        # for col in self.COLS_TOT_ANN_ENGY:
-        #     new_col = self.col_name_to_weighted(col)
-        #     self.data[new_col] = self.data[col] * self.data[self.BLDG_WEIGHT]
-
-        # Area - ensure the column is numeric then create weighted column
-        self.data[self.FLR_AREA] = self.data[self.FLR_AREA].replace('Not Applicable', np.nan)
-        self.data[self.FLR_AREA] = self.data[self.FLR_AREA].astype('float64')
+        # Area
         new_area_col = self.col_name_to_weighted(self.FLR_AREA)
-        self.data[new_area_col] = self.data[self.FLR_AREA] * self.data[self.BLDG_WEIGHT]
+        exprs = [(pl.col(self.FLR_AREA) * pl.col(self.BLDG_WEIGHT)).alias(new_area_col)]
 
-        # Energy
-        new_col_dict = {}
+        # Energy, weighted and converted to TBtu
         for col in (self.COLS_TOT_ANN_ENGY + self.COLS_ENDUSE_ANN_ENGY):
             # Skip end-use columns that aren't part of CBECS
-            if not col in self.data:
+            if not col in self.data.columns:
                 continue
-            # Ensure the energy column is numeric then create weighted column
-            self.data[col] = self.data[col].replace('Not Applicable', np.nan)
-            self.data[col] = self.data[col].astype('float64')
             new_col = self.col_name_to_weighted(col, self.weighted_energy_units)
-
-            # Weight and convert to TBtu
             old_units = self.units_from_col_name(col)
             new_units = self.weighted_energy_units
             conv_fact = self.conv_fact(old_units, new_units)
-            new_col_dict[new_col] = self.data[col] * self.data[self.BLDG_WEIGHT] * conv_fact
-        self.data = pd.concat([self.data, pd.DataFrame(new_col_dict)], axis=1)
+            exprs.append((pl.col(col) * pl.col(self.BLDG_WEIGHT) * conv_fact).alias(new_col))
+        self.data = self.data.with_columns(exprs)
 
     def export_to_csv_wide(self):
         # Exports comstock data to CSV in wide format
 
         file_name = f'CBECS wide.csv'
         file_path = os.path.join(self.output_dir, file_name)
-        self.data.to_csv(file_path, index=False)
+        self.data.write_csv(file_path)
@@ -0,0 +1,106 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import logging
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# Code the CBECS codebooks give to blank values
+MISSING_CODE = 'Missing'
+
+
+def compile_codebook(codebook):
+    """
+    Parses a CBECS microdata codebook into column labels and one long table of value codes.
+    Args:
+
+        codebook (pl.DataFrame): Codebook with Variable name, Label, and Values/Format codes columns,
+        where codes are listed like '1=Yes|2=No'
+
+    Return:
+        tuple: dict of column names (e.g. PBA) to labels (e.g. Principal building activity),
+        and pl.DataFrame with Label, Code, and Value columns for each coded (non-numeric) variable
+    """
+    variables = codebook.select([
+        pl.col('Variable name').str.strip_chars().alias('Name'),
+        pl.col('Label').str.strip_chars(),
+        pl.col('Values/Format codes').cast(pl.Utf8).alias('Codes'),
+    ])
+
+    # If CBECS used a label for multiple columns, append the column name to the label to differentiate
+    reused = ~pl.col('Label').is_first_distinct()
+    for var_name, var_label in variables.filter(reused).select(['Name', 'Label']).iter_rows():
+        logger.debug(f'CBECS used the label "{var_label}" for multiple columns, relabeling "{var_name}" to: "{var_label} {var_name}"')
+    variables = variables.with_columns(
+        pl.when(reused).then(pl.concat_str([pl.col('Label'), pl.col('Name')], separator=' ')).otherwise(pl.col('Label')).alias('Label'))
+    var_name_to_label = dict(zip(variables.get_column('Name').to_list(), variables.get_column('Label').to_list()))
+
+    # Split the value/format codes into one row per code
+    codes = (
+        variables
+        .filter(pl.col('Codes').str.contains('=', literal=True))
+        .select([pl.col('Label'), pl.col('Codes').str.split('|').alias('Code')])
+        .explode('Code')
+        .filter(pl.col('Code').str.contains('=', literal=True))
+        .select([
+            pl.col('Label'),
+            pl.col('Code').str.splitn('=', 2).struct.field('field_0').alias('Code'),
+            pl.col('Code').str.splitn('=', 2).struct.field('field_1').str.strip_chars().alias('Value'),
+        ])
+        # A code listed twice for one variable uses the last value
+        .unique(subset=['Label', 'Code'], keep='last', maintain_order=True)
+    )
+
+    return var_name_to_label, codes
+
+
+def decode_columns(data, codes):
+    """
+    Decodes every coded column of the microdata in one batch of expressions.
+    Blank cells use the Missing code if the variable has one. Numbers are matched to codes by their integer part,
+    and values without a code are kept as they are, such as counts that only code their top bins.
+    Args:
+
+        data (pl.DataFrame): Microdata with columns named by label
+        codes (pl.DataFrame): Value codes from compile_codebook
+
+    Return:
+        pl.DataFrame: data with the coded columns decoded, as categoricals if every value of a column has a code,
+        otherwise as strings mixing the decoded values and the kept numbers
+    """
+    code_maps = {}
+    for var_label, code, value in codes.iter_rows():
+        code_maps.setdefault(var_label, {})[code] = value
+    var_labels = [c for c in code_maps.keys() if c in data.columns]
+    if len(var_labels) == 0:
+        return data
+
+    # Match values to codes as strings, then by their integer part
+    decoded = {}
+    for var_label in var_labels:
+        code_map = code_maps[var_label]
+        col = pl.col(var_label)
+        if data.schema[var_label] == pl.Utf8:
+            number_key = col.cast(pl.Float64, strict=False).cast(pl.Int64, strict=False).cast(pl.Utf8)
+            decoded[var_label] = pl.coalesce([col.replace(code_map, default=None), number_key.replace(code_map, default=None)])
+        else:
+            number_key = col.cast(pl.Int64, strict=False).cast(pl.Utf8)
+            decoded[var_label] = number_key.replace(code_map, default=None)
+
+    # Columns with a value that has no code
+    partly_coded = data.select([
+        (decoded[var_label].is_null() & pl.col(var_label).is_not_null()).any().alias(var_label) for var_label in var_labels
+    ]).row(0, named=True)
+
+    exprs = []
+    for var_label in var_labels:
+        col = pl.col(var_label)
+        missing_value = pl.lit(code_maps[var_label].get(MISSING_CODE), dtype=pl.Utf8)
+        if partly_coded[var_label]:
+            expr = pl.when(col.is_null()).then(missing_value).when(decoded[var_label].is_not_null()).then(decoded[var_label]).otherwise(col.cast(pl.Utf8))
+        else:
+            expr = pl.when(col.is_null()).then(missing_value).otherwise(decoded[var_label]).cast(pl.Categorical)
+        exprs.append(expr.alias(var_label))
+
+    return data.with_columns(exprs)
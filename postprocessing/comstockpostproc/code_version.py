@@ -0,0 +1,54 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import hashlib
+import inspect
+import sys
+
+from comstockpostproc.__version__ import __version__
+
+# Code versions keyed on class, see code_version()
+_CODE_VERSIONS = {}
+
+
+def _comstockpostproc_modules(module_name):
+    # Names of the comstockpostproc modules referenced from the namespace of a module
+    names = set()
+    for obj in vars(sys.modules[module_name]).values():
+        name = obj.__name__ if inspect.ismodule(obj) else getattr(obj, '__module__', None)
+        if isinstance(name, str) and name.startswith('comstockpostproc') and name in sys.modules:
+            names.add(name)
+    return names
+
+
+def code_version(owner_cls):
+    """
+    Hash of the source code an object of a class runs: the modules defining the class and its comstockpostproc
+    base classes, and every comstockpostproc module those modules import, directly or through other modules.
+    Used to make stored results stale when the code that made them changes. Cached for each class.
+    Args:
+
+        owner_cls (type): Class of the object, like CBECS or ComStockMeasureComparison
+
+    Return:
+        str: hex digest
+    """
+    if owner_cls not in _CODE_VERSIONS:
+        module_names = set()
+        to_visit = {owner_cls.__module__}
+        to_visit.update(c.__module__ for c in owner_cls.__mro__ if c.__module__.startswith('comstockpostproc'))
+        while len(to_visit) > 0:
+            name = to_visit.pop()
+            module_names.add(name)
+            if name in sys.modules:
+                to_visit.update(_comstockpostproc_modules(name) - module_names)
+
+        h = hashlib.sha256(__version__.encode('utf-8'))
+        for name in sorted(module_names):
+            try:
+                h.update(inspect.getsource(sys.modules[name]).encode('utf-8'))
+            except (KeyError, OSError, TypeError):
+                # Not loaded, built-in or interactively defined, no source to hash
+                continue
+        _CODE_VERSIONS[owner_cls] = h.hexdigest()
+
+    return _CODE_VERSIONS[owner_cls]
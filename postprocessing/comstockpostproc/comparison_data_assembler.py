@@ -0,0 +1,199 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import logging
+
+import pandas as pd
+import polars as pl
+
+from comstockpostproc.naming_mixin import NamingMixin
+from comstockpostproc.units_mixin import UnitsMixin
+
+logger = logging.getLogger(__name__)
+
+
+class ComparisonDataAssembler(NamingMixin, UnitsMixin):
+    # Columns kept for every plot: grouping, filtering and weighting keys
+    KEY_COLS = [
+        NamingMixin.DATASET,
+        NamingMixin.BLDG_ID,
+        NamingMixin.UPGRADE_ID,
+        NamingMixin.UPGRADE_NAME,
+        NamingMixin.UPGRADE_APPL,
+        NamingMixin.BLDG_WEIGHT,
+        NamingMixin.BLDG_TYPE,
+        NamingMixin.CEN_DIV,
+        NamingMixin.STATE_ABBRV,
+        NamingMixin.CZ_ASHRAE,
+        NamingMixin.HVAC_SYS,
+        NamingMixin.VINTAGE,
+        NamingMixin.FLR_AREA,
+        NamingMixin.FLR_AREA_CAT,
+    ]
+
+    def __init__(self, arrow_backed=False):
+        """
+        Builds the inputs for the comparison classes from only the columns their plots use.
+        Frames are projected and filtered in polars, concatenated without copying the underlying
+        Arrow buffers, and converted to pandas once at the end.
+        Args:
+
+            arrow_backed (bool): If True, return pandas frames backed by Arrow extension arrays,
+            which avoids copying the data on conversion. Defaults to False because some plotting
+            code expects numpy-backed columns.
+        """
+        self.arrow_backed = arrow_backed
+        self._plot_columns = None
+
+    def plot_column_requirements(self):
+        # Columns read by each PlottingMixin method, in addition to KEY_COLS
+        if self._plot_columns is not None:
+            return self._plot_columns
+
+        tot_cols = [self.ANN_TOT_ENGY_KBTU, self.ANN_TOT_ELEC_KBTU, self.ANN_TOT_GAS_KBTU]
+        eui_cols = [self.col_name_to_eui(c) for c in tot_cols]
+        wtd_area = self.col_name_to_weighted(self.FLR_AREA)
+        wtd_tot_cols = [wtd_area] + [self.col_name_to_weighted(c, 'tbtu') for c in tot_cols]
+        wtd_enduse_cols = [self.col_name_to_weighted(c, 'tbtu') for c in self.COLS_ENDUSE_ANN_ENGY]
+        bill_cols = [self.UTIL_BILL_TOTAL_MEAN] + self.COLS_UTIL_BILLS
+
+        engy_savings_cols = []
+        for c in [self.ANN_TOT_ENGY_KBTU] + self.COLS_ENDUSE_ANN_ENGY + self.COLS_TOT_ANN_ENGY:
+            engy_savings_cols.append(self.col_name_to_savings(self.col_name_to_eui(c)))
+            engy_savings_cols.append(self.col_name_to_percent_savings(c, 'percent'))
+        bill_savings_cols = []
+        for c in bill_cols:
+            bill_savings_cols.append(self.col_name_to_savings(self.col_name_to_area_intensity(c)))
+            bill_savings_cols.append(self.col_name_to_percent_savings(c, 'percent'))
+
+        self._plot_columns = {
+            'plot_energy_by_enduse_and_fuel_type': wtd_enduse_cols,
+            'plot_emissions_by_fuel_type': [self.col_name_to_weighted(c, 'co2e_mmt') for c in self.GHG_FUEL_COLS],
+            'plot_utility_bills_by_fuel_type': [self.col_name_to_weighted(c, 'billion_usd') for c in (
+                self.COLS_UTIL_BILLS + ['out.utility_bills.electricity_bill_max..usd', 'out.utility_bills.electricity_bill_min..usd'])],
+            'plot_annual_emissions_comparison': [self.col_name_to_weighted(c, 'co2e_mmt') for c in (
+                self.GHG_ELEC_EGRID, self.GHG_NATURAL_GAS, self.GHG_FUEL_OIL, self.GHG_PROPANE)],
+            'plot_floor_area_and_energy_totals': wtd_tot_cols,
+            'plot_floor_area_and_energy_totals_by_building_type': wtd_tot_cols,
+            'plot_end_use_totals_by_building_type': wtd_enduse_cols,
+            'plot_eui_boxplots': eui_cols,
+            'plot_eui_boxplots_by_building_type': eui_cols,
+            'plot_eui_histograms_by_building_type': eui_cols + [wtd_area],
+            'plot_energy_rate_boxplots': [self.col_name_to_energy_rate(c) for c in (self.UTIL_BILL_ELEC, self.UTIL_BILL_GAS)],
+            'plot_measure_savings_distributions_enduse_and_fuel': engy_savings_cols,
+            'plot_measure_savings_distributions_by_building_type': engy_savings_cols,
+            'plot_measure_savings_distributions_by_climate_zone': engy_savings_cols,
+            'plot_measure_savings_distributions_by_hvac_system_type': engy_savings_cols,
+            'plot_measure_utility_savings_distributions_by_fuel': bill_savings_cols,
+            'plot_measure_utility_savings_distributions_by_building_type': bill_savings_cols,
+            'plot_measure_utility_savings_distributions_by_climate_zone': bill_savings_cols,
+            'plot_measure_utility_savings_distributions_by_hvac_system': bill_savings_cols,
+            'plot_qoi_timing': self.QOI_MAX_DAILY_TIMING_COLS,
+            'plot_qoi_max_use': self.QOI_MAX_USE_COLS + self.QOI_MAX_USE_COLS_NORMALIZED,
+            'plot_qoi_min_use': self.QOI_MIN_USE_COLS + self.QOI_MIN_USE_COLS_NORMALIZED,
+            'plot_measure_timeseries_peak_week_by_state': [],
+            'plot_measure_timeseries_season_average_by_state': [],
+            'plot_measure_timeseries_annual_average_by_state_and_enduse': [],
+        }
+
+        return self._plot_columns
+
+    def required_columns(self, plot_names, extra_columns=None):
+        """
+        Returns the columns needed to make a set of plots.
+        Args:
+
+            plot_names (list): Names of the PlottingMixin methods that will be called
+            extra_columns (list): Additional columns to keep, for example for exports
+
+        Return:
+            list: columns in a stable order, or None if any plot is unknown and all columns must be kept
+        """
+        reqs = self.plot_column_requirements()
+        cols = list(self.KEY_COLS)
+        for plot_name in plot_names:
+            if plot_name not in reqs:
+                logger.warning(f'No column requirements defined for {plot_name}, keeping all columns')
+                return None
+            cols += reqs[plot_name]
+        if extra_columns is not None:
+            cols += list(extra_columns)
+
+        # Remove duplicates, preserving order
+        return list(dict.fromkeys(cols))
+
+    def project(self, df, columns=None, filter_expr=None):
+        """
+        Filters and selects columns from a frame without converting it to pandas.
+        Columns missing from the frame are skipped, so one column list can be used for every dataset.
+        Args:
+
+            df (Union[pl.DataFrame, pd.DataFrame]): Frame to project
+            columns (list): Columns to keep, or None to keep all columns
+            filter_expr (pl.Expr): Optional row filter, applied after selecting columns so it must only use kept columns
+
+        Return:
+            pl.DataFrame: projected frame
+        """
+        if isinstance(df, pd.DataFrame):
+            if columns is not None:
+                df = df[[c for c in columns if c in df.columns]]
+            df = pl.from_pandas(df)
+        elif columns is not None:
+            df = df.select([c for c in columns if c in df.columns])
+
+        if filter_expr is not None:
+            df = df.filter(filter_expr)
+
+        return df
+
+    def concat(self, dfs, how='inner'):
+        """
+        Concatenates projected frames. String and categorical columns are unified to strings and
+        numeric columns to their common supertype, matching what pd.concat would produce.
+        Args:
+
+            dfs (list): polars DataFrames to concatenate
+            how (str): 'inner' to keep only columns common to all frames, 'outer' to keep all columns
+
+        Return:
+            pl.DataFrame: concatenated frame
+        """
+        if len(dfs) == 1:
+            return dfs[0]
+
+        if how == 'inner':
+            common_cols = [c for c in dfs[0].columns if all(c in df.columns for df in dfs[1:])]
+            dfs = [df.select(common_cols) for df in dfs]
+        elif how != 'outer':
+            logger.error(f'Unknown concat method {how}, must be inner or outer')
+            raise Exception(f'Unknown concat method {how}, must be inner or outer')
+
+        # Categoricals built under different string caches cannot be concatenated directly
+        cat_cols = set()
+        for df in dfs:
+            cat_cols.update(c for c, dt in df.schema.items() if dt == pl.Categorical)
+        dfs = [df.with_columns([pl.col(c).cast(pl.Utf8) for c in cat_cols if c in df.columns]) for df in dfs]
+
+        # rechunk=False keeps the original Arrow buffers instead of copying them into one chunk
+        if how == 'inner':
+            return pl.concat(dfs, how='vertical_relaxed', rechunk=False)
+        return pl.concat(dfs, how='diagonal_relaxed', rechunk=False)
+
+    def to_pandas(self, df):
+        # Single conversion to pandas at the end of assembly
+        return df.to_pandas(use_pyarrow_extension_array=self.arrow_backed)
+
+    def assemble(self, dfs, columns=None, how='inner'):
+        """
+        Projects, concatenates and converts a list of frames to a single pandas DataFrame.
+        Args:
+
+            dfs (list): polars or pandas DataFrames
+            columns (list): Columns to keep, or None to keep all columns
+            how (str): 'inner' or 'outer', as in pd.concat(join=how)
+
+        Return:
+            pd.DataFrame: assembled frame with a default index
+        """
+        projected = [self.project(df, columns) for df in dfs]
+        return self.to_pandas(self.concat(projected, how=how))
@@ -21,6 +21,7 @@ from comstockpostproc.eia import EIA
 from comstockpostproc.ami import AMI
 from comstockpostproc.gas_correction_model import GasCorrectionModelMixin
 from comstockpostproc.s3_utilities_mixin import S3UtilitiesMixin
+from comstockpostproc.pipeline_profiler import PipelineProfiler
 from buildstock_query import BuildStockQuery
 
 logger = logging.getLogger(__name__)
@@ -64,7 +65,8 @@ class ComStock(NamingMixin, UnitsMixin, GasCorrectionModelMixin, S3UtilitiesMixi
     def __init__(self, s3_base_dir, comstock_run_name, comstock_run_version, comstock_year, athena_table_name,
         truth_data_version, buildstock_csv_name = 'buildstock.csv', acceptable_failure_percentage=0.01, drop_failed_runs=True,
         color_hex=NamingMixin.COLOR_COMSTOCK_BEFORE, weighted_energy_units='tbtu', weighted_ghg_units='co2e_mmt', weighted_utility_units='billion_usd', skip_missing_columns=False,
-        reload_from_csv=False, make_comparison_plots=True, make_timeseries_plots=True, include_upgrades=True, upgrade_ids_to_skip=[], states={}, upgrade_ids_for_comparison={}, rename_upgrades=False):
+        reload_from_csv=False, make_comparison_plots=True, make_timeseries_plots=True, include_upgrades=True, upgrade_ids_to_skip=[], states={}, upgrade_ids_for_comparison={}, rename_upgrades=False,
+        profile_pipeline=False):
         """
         A class to load and transform ComStock data for export, analysis, and comparison.
         Args:
@@ -75,6 +77,9 @@ class ComStock(NamingMixin, UnitsMixin, GasCorrectionModelMixin, S3UtilitiesMixi
             comstock_year (int): The year represented by this ComStock run
             comstock_run_version (str): The version string for this ComStock run
             to differentiate it from other ComStock runs
+            profile_pipeline (bool): If True, record time and memory for each processing stage
+            and write a report to the output directory. Can also be enabled by setting the
+            COMSTOCKPOSTPROC_PROFILE environment variable.
         """
 
         # Initialize members
@@ -120,6 +125,7 @@ class ComStock(NamingMixin, UnitsMixin, GasCorrectionModelMixin, S3UtilitiesMixi
                                                  skip_reports=True)
         self.make_comparison_plots = make_comparison_plots
         self.make_timeseries_plots = make_timeseries_plots
+        self.profiler = PipelineProfiler(self.dataset_name, enabled=profile_pipeline)
         logger.info(f'Creating {self.dataset_name}')
 
         # Make directories
@@ -133,66 +139,102 @@ class ComStock(NamingMixin, UnitsMixin, GasCorrectionModelMixin, S3UtilitiesMixi
             self.s3_inpath = f"s3://{s3_base_dir}/{self.comstock_run_name}/{self.comstock_run_name}"
 
         # Load and transform data, preserving all columns
-        self.download_data()
+        prof = self.profiler
+        with prof.stage('download_data', self):
+            self.download_data()
         pl.enable_string_cache()
         if reload_from_csv:
-            upgrade_pqts = glob.glob(os.path.join(self.output_dir, 'ComStock wide upgrade*.parquet'))
-            upgrade_pqts.sort()
-            if len(upgrade_pqts) > 0:
-                upgrade_dfs = []
-                for file_path in upgrade_pqts:
-                    bn = os.path.basename(file_path)
-                    up_id = int(bn.replace('ComStock wide upgrade', '').replace('.parquet', ''))
-                    if up_id in self.upgrade_ids_to_skip:
-                        logger.info(f'Skipping reload for upgrade {up_id}')
-                        continue
-                    logger.info(f'Reloading data from: {file_path}')
-                    upgrade_dfs.append(pl.read_parquet(file_path))
-                self.data = pl.concat(upgrade_dfs)
-            elif os.path.exists(os.path.join(self.output_dir, 'ComStock wide.csv')):
-                file_path = os.path.join(self.output_dir, 'ComStock wide.csv')
-                logger.info(f'Reloading data from: {file_path}')
-                self.data = pl.read_csv(file_path, dtypes={self.UPGRADE_ID: pl.Int64}, infer_schema_length=10000)
-                self.data = self.reduce_df_memory(self.data)
-            else:
-                raise FileNotFoundError(
-                f'Cannot find wide .csv or .parquet in {self.output_dir} to reload data, set reload_from_csv=False.')
+            with prof.stage('reload_from_csv', self):
+                self.reload_wide_data()
         else:
             # Import columns from buildstock, results.csv, and other files
-            self.load_data(acceptable_failure_percentage, drop_failed_runs)
-            self.add_buildstock_csv_columns()
-            self.add_geospatial_columns()  # TODO remove geospatial join once reliably in buildstock.csv
-            self.add_ejscreen_columns()
-            self.add_cejst_columns()
-            self.data = self.downselect_imported_columns(self.data)
-            self.rename_columns_and_convert_units()
-            self.set_column_data_types()
+            with prof.stage('load_data', self):
+                self.load_data(acceptable_failure_percentage, drop_failed_runs)
+            with prof.stage('add_buildstock_csv_columns', self):
+                self.add_buildstock_csv_columns()
+            with prof.stage('add_geospatial_columns', self):
+                self.add_geospatial_columns()  # TODO remove geospatial join once reliably in buildstock.csv
+            with prof.stage('add_ejscreen_columns', self):
+                self.add_ejscreen_columns()
+            with prof.stage('add_cejst_columns', self):
+                self.add_cejst_columns()
+            with prof.stage('downselect_imported_columns', self):
+                self.data = self.downselect_imported_columns(self.data)
+            with prof.stage('rename_columns_and_convert_units', self):
+                self.rename_columns_and_convert_units()
+            with prof.stage('set_column_data_types', self):
+                self.set_column_data_types()
             # Calculate/generate columns based on imported columns
             # self.add_aeo_nems_building_type_column()  # TODO POLARS figure out apply function
-            self.add_missing_energy_columns()
-            self.combine_utility_cols()
-            self.add_enduse_total_energy_columns()
-            self.add_energy_intensity_columns()
-            self.add_bill_intensity_columns()
-            self.add_energy_rate_columns()
-            self.add_normalized_qoi_columns()
-            self.add_vintage_column()
-            self.add_dataset_column()
+            with prof.stage('add_missing_energy_columns', self):
+                self.add_missing_energy_columns()
+            with prof.stage('combine_utility_cols', self):
+                self.combine_utility_cols()
+            with prof.stage('add_enduse_total_energy_columns', self):
+                self.add_enduse_total_energy_columns()
+            with prof.stage('add_energy_intensity_columns', self):
+                self.add_energy_intensity_columns()
+            with prof.stage('add_bill_intensity_columns', self):
+                self.add_bill_intensity_columns()
+            with prof.stage('add_energy_rate_columns', self):
+                self.add_energy_rate_columns()
+            with prof.stage('add_normalized_qoi_columns', self):
+                self.add_normalized_qoi_columns()
+            with prof.stage('add_vintage_column', self):
+                self.add_vintage_column()
+            with prof.stage('add_dataset_column', self):
+                self.add_dataset_column()
             # self.add_upgrade_building_id_column()  # TODO POLARS figure out apply function
-            self.add_hvac_metadata()
-            self.add_building_type_group()
-            self.data = self.reduce_df_memory(self.data)
-            self.add_enduse_fuel_group_columns()
-            self.add_enduse_group_columns()
-            self.add_addressable_segments_columns()
-            self.combine_emissions_cols()
-            self.add_metadata_index_col()
-            self.get_comstock_unscaled_monthly_energy_consumption()
+            with prof.stage('add_hvac_metadata', self):
+                self.add_hvac_metadata()
+            with prof.stage('add_building_type_group', self):
+                self.add_building_type_group()
+            with prof.stage('reduce_df_memory', self):
+                self.data = self.reduce_df_memory(self.data)
+            with prof.stage('add_enduse_fuel_group_columns', self):
+                self.add_enduse_fuel_group_columns()
+            with prof.stage('add_enduse_group_columns', self):
+                self.add_enduse_group_columns()
+            with prof.stage('add_addressable_segments_columns', self):
+                self.add_addressable_segments_columns()
+            with prof.stage('combine_emissions_cols', self):
+                self.combine_emissions_cols()
+            with prof.stage('add_metadata_index_col', self):
+                self.add_metadata_index_col()
+            with prof.stage('get_comstock_unscaled_monthly_energy_consumption', self):
+                self.get_comstock_unscaled_monthly_energy_consumption()
 
             # logger.debug('\nComStock columns after adding all data:')
             # for c in self.data.columns:
             #     logger.debug(c)
 
+        # Write the pipeline profile if enabled
+        self.profiler.write_report(os.path.join(self.output_dir, 'profiling'))
+
+    def reload_wide_data(self):
+        # Reload previously exported wide data instead of reprocessing the raw results
+        upgrade_pqts = glob.glob(os.path.join(self.output_dir, 'ComStock wide upgrade*.parquet'))
+        upgrade_pqts.sort()
+        if len(upgrade_pqts) > 0:
+            upgrade_dfs = []
+            for file_path in upgrade_pqts:
+                bn = os.path.basename(file_path)
+                up_id = int(bn.replace('ComStock wide upgrade', '').replace('.parquet', ''))
+                if up_id in self.upgrade_ids_to_skip:
+                    logger.info(f'Skipping reload for upgrade {up_id}')
+                    continue
+                logger.info(f'Reloading data from: {file_path}')
+                upgrade_dfs.append(pl.read_parquet(file_path))
+            self.data = pl.concat(upgrade_dfs)
+        elif os.path.exists(os.path.join(self.output_dir, 'ComStock wide.csv')):
+            file_path = os.path.join(self.output_dir, 'ComStock wide.csv')
+            logger.info(f'Reloading data from: {file_path}')
+            self.data = pl.read_csv(file_path, dtypes={self.UPGRADE_ID: pl.Int64}, infer_schema_length=10000)
+            self.data = self.reduce_df_memory(self.data)
+        else:
+            raise FileNotFoundError(
+            f'Cannot find wide .csv or .parquet in {self.output_dir} to reload data, set reload_from_csv=False.')
+
     def download_data(self):
         # baseline/results_up00.parquet
         results_data_path = os.path.join(self.data_dir, self.results_file_name)
@@ -1774,18 +1816,18 @@ class ComStock(NamingMixin, UnitsMixin, GasCorrectionModelMixin, S3UtilitiesMixi
 
     def add_national_scaling_weights(self, cbecs: CBECS, remove_non_comstock_bldg_types_from_cbecs: bool):
         # Remove CBECS entries for building types not included in the ComStock run
-        comstock_bldg_types = self.data[self.BLDG_TYPE].unique()
+        comstock_bldg_types = self.data.get_column(self.BLDG_TYPE).cast(pl.Utf8).unique().to_list()
         bldg_types_to_keep = []
-        for bt in cbecs.data[self.BLDG_TYPE].unique():
+        for bt in cbecs.data.get_column(self.BLDG_TYPE).cast(pl.Utf8).unique(maintain_order=True).to_list():
             if bt in comstock_bldg_types:
                 bldg_types_to_keep.append(bt)
         if remove_non_comstock_bldg_types_from_cbecs:
             # Modify CBECS to remove building types not covered by ComStock
-            cbecs.data = cbecs.data[cbecs.data[self.BLDG_TYPE].isin(bldg_types_to_keep)]
-            cbecs = cbecs.data.copy(deep=True)
+            cbecs.data = cbecs.data.filter(pl.col(self.BLDG_TYPE).cast(pl.Utf8).is_in(bldg_types_to_keep))
+            cbecs = cbecs.data.clone()
         else:
             # Make a copy of CBECS, leaving the original unchanged
-            cbecs = cbecs.data[cbecs.data[self.BLDG_TYPE].isin(bldg_types_to_keep)].copy(deep=True)
+            cbecs = cbecs.data.filter(pl.col(self.BLDG_TYPE).cast(pl.Utf8).is_in(bldg_types_to_keep)).clone()
 
         # Calculate scaling factors used to scale ComStock results to CBECS square footages
         # Only includes successful ComStock simulations, so the failure rate will
@@ -1793,7 +1835,8 @@ class ComStock(NamingMixin, UnitsMixin, GasCorrectionModelMixin, S3UtilitiesMixi
 
         # Total sqft of each building type, CBECS
         wt_area_col = self.col_name_to_weighted(self.FLR_AREA)
-        cbecs_bldg_type_sqft = cbecs[[wt_area_col, self.BLDG_TYPE]].groupby([self.BLDG_TYPE]).sum()
+        cbecs_bldg_type_sqft = cbecs.group_by(pl.col(self.BLDG_TYPE).cast(pl.Utf8)).agg([pl.col(wt_area_col).sum()])
+        cbecs_bldg_type_sqft = cbecs_bldg_type_sqft.sort(self.BLDG_TYPE).to_pandas().set_index(self.BLDG_TYPE)
         logger.debug('CBECS floor area by building type')
         logger.debug(cbecs_bldg_type_sqft)
 
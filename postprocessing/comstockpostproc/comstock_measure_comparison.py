@@ -8,17 +8,67 @@ import numpy as np
 from comstockpostproc.naming_mixin import NamingMixin
 from comstockpostproc.units_mixin import UnitsMixin
 from comstockpostproc.plotting_mixin import PlottingMixin
+from comstockpostproc.comparison_data_assembler import ComparisonDataAssembler
+from comstockpostproc.plot_scheduler import PlotScheduler
+from comstockpostproc.image_export import flush_image_exports
 
 
 logger = logging.getLogger(__name__)
 
 class ComStockMeasureComparison(NamingMixin, UnitsMixin, PlottingMixin):
-    def __init__(self, comstock_object, states, make_comparison_plots, make_timeseries_plots, image_type='jpg', name=None):
-
-        # Initialize members
-        self.data = comstock_object.data.to_pandas()
+    # Plots made by make_plots and make_comparative_plots, used to select the columns to load
+    MEASURE_PLOTS = [
+        'plot_energy_by_enduse_and_fuel_type',
+        'plot_emissions_by_fuel_type',
+        'plot_utility_bills_by_fuel_type',
+        'plot_floor_area_and_energy_totals',
+        'plot_floor_area_and_energy_totals_by_building_type',
+        'plot_end_use_totals_by_building_type',
+        'plot_eui_histograms_by_building_type',
+        'plot_eui_boxplots_by_building_type',
+        'plot_measure_savings_distributions_enduse_and_fuel',
+        'plot_measure_savings_distributions_by_building_type',
+        'plot_measure_savings_distributions_by_climate_zone',
+        'plot_measure_savings_distributions_by_hvac_system_type',
+        'plot_measure_utility_savings_distributions_by_fuel',
+        'plot_measure_utility_savings_distributions_by_building_type',
+        'plot_measure_utility_savings_distributions_by_climate_zone',
+        'plot_measure_utility_savings_distributions_by_hvac_system',
+        'plot_qoi_timing',
+        'plot_qoi_max_use',
+        'plot_qoi_min_use',
+    ]
+    TIMESERIES_PLOTS = [
+        'plot_measure_timeseries_peak_week_by_state',
+        'plot_measure_timeseries_season_average_by_state',
+        'plot_measure_timeseries_annual_average_by_state_and_enduse',
+    ]
+
+    def __init__(self, comstock_object, states, make_comparison_plots, make_timeseries_plots, image_type='jpg', name=None, max_plot_workers=1, image_export_profile=None, incremental_plots=True):
+        """
+        Creates the measure comparison plots for each upgrade and each group of upgrades.
+
+        Args:
+            comstock_object (ComStock): ComStock dataset object with upgrades included.
+            states (dict): State abbreviations and names to make timeseries plots for.
+            make_comparison_plots (bool): Flag to create comparison plots.
+            make_timeseries_plots (bool): Flag to create timeseries plots, which query Athena.
+            image_type (str, optional): Image file type to use. Defaults to 'jpg'.
+            name (str, optional): Name of output directory. Defaults to None.
+            max_plot_workers (int, optional): Number of processes used to render plots, -1 for all CPUs. Defaults to 1.
+            image_export_profile (str, optional): Image export profile, like 'publication' or 'draft'. If None, the
+            COMSTOCKPOSTPROC_IMAGE_PROFILE environment variable or 'publication' is used. Defaults to None.
+            incremental_plots (bool, optional): Skip plots whose input data, arguments and plotting code have not changed
+            since they were last made, using plot_manifest.json in the output directory. Defaults to True.
+        """
+
+        # Initialize members, converting only the columns used by the plots to pandas
+        self.assembler = ComparisonDataAssembler()
+        columns = self.assembler.required_columns(self.MEASURE_PLOTS + self.TIMESERIES_PLOTS)
+        self.data = self.assembler.to_pandas(self.assembler.project(comstock_object.data, columns))
         self.color_map = {}
         self.image_type = image_type
+        self.image_export_profile = image_export_profile
         self.name = name
         self.dict_upid_to_upname = dict(zip(self.data[self.UPGRADE_ID], self.data[self.UPGRADE_NAME]))
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -30,6 +80,8 @@ class ComStockMeasureComparison(NamingMixin, UnitsMixin, PlottingMixin):
         self.comstock_run_name = comstock_object.comstock_run_name
         self.states = states
         self.make_timeseries_plots = make_timeseries_plots
+        manifest_path = os.path.join(self.output_dir, 'plot_manifest.json') if incremental_plots else None
+        self.plot_scheduler = PlotScheduler(max_workers=max_plot_workers, manifest_path=manifest_path, owner=self)
 
         # Ensure that the comstock object has savings columns included
         if not comstock_object.include_upgrades:
@@ -98,30 +150,33 @@ class ComStockMeasureComparison(NamingMixin, UnitsMixin, PlottingMixin):
                 else:
                     logger.info("make_comparison_plots is set to false, so not plots were created. Set make_comparison_plots to True for plots.")
 
+        # Render plots still queued for the worker pool and write the timing report for all upgrades
+        self.plot_scheduler.run(self, report_dir=self.output_dir)
+        flush_image_exports()
 
     def make_plots(self, df, column_for_grouping, states, make_timeseries_plots, color_map, output_dir):
-        # Make plots comparing the upgrades
+        # Queue plots comparing the upgrades, rendered by self.plot_scheduler
 
         logger.info(f'Making comparison plots for upgrade')
-        self.plot_energy_by_enduse_and_fuel_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_emissions_by_fuel_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_utility_bills_by_fuel_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_floor_area_and_energy_totals(df, column_for_grouping, color_map, output_dir)
-        self.plot_floor_area_and_energy_totals_by_building_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_end_use_totals_by_building_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_eui_histograms_by_building_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_eui_boxplots_by_building_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_measure_savings_distributions_enduse_and_fuel(df, output_dir)
-        self.plot_measure_savings_distributions_by_building_type(df, output_dir)
-        self.plot_measure_savings_distributions_by_climate_zone(df, output_dir)
-        self.plot_measure_savings_distributions_by_hvac_system_type(df, output_dir)
-        self.plot_measure_utility_savings_distributions_by_fuel(df, output_dir)
-        self.plot_measure_utility_savings_distributions_by_building_type(df, output_dir)
-        self.plot_measure_utility_savings_distributions_by_climate_zone(df, output_dir)
-        self.plot_measure_utility_savings_distributions_by_hvac_system(df, output_dir)
-        self.plot_qoi_timing(df, column_for_grouping, color_map, output_dir)
-        self.plot_qoi_max_use(df, column_for_grouping, color_map, output_dir)
-        self.plot_qoi_min_use(df, column_for_grouping, color_map, output_dir)
+        self.plot_scheduler.add('plot_energy_by_enduse_and_fuel_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_emissions_by_fuel_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_utility_bills_by_fuel_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_floor_area_and_energy_totals', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_floor_area_and_energy_totals_by_building_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_end_use_totals_by_building_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_eui_histograms_by_building_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_eui_boxplots_by_building_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_measure_savings_distributions_enduse_and_fuel', df, output_dir=output_dir)
+        self.plot_scheduler.add('plot_measure_savings_distributions_by_building_type', df, output_dir=output_dir)
+        self.plot_scheduler.add('plot_measure_savings_distributions_by_climate_zone', df, output_dir=output_dir)
+        self.plot_scheduler.add('plot_measure_savings_distributions_by_hvac_system_type', df, output_dir=output_dir)
+        self.plot_scheduler.add('plot_measure_utility_savings_distributions_by_fuel', df, output_dir=output_dir)
+        self.plot_scheduler.add('plot_measure_utility_savings_distributions_by_building_type', df, output_dir=output_dir)
+        self.plot_scheduler.add('plot_measure_utility_savings_distributions_by_climate_zone', df, output_dir=output_dir)
+        self.plot_scheduler.add('plot_measure_utility_savings_distributions_by_hvac_system', df, output_dir=output_dir)
+        self.plot_scheduler.add('plot_qoi_timing', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_qoi_max_use', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_qoi_min_use', df, column_for_grouping, color_map, output_dir=output_dir)
 
         if make_timeseries_plots==True:
             self.plot_measure_timeseries_peak_week_by_state(df, output_dir, states, color_map, comstock_run_name=self.comstock_run_name)
@@ -129,13 +184,13 @@ class ComStockMeasureComparison(NamingMixin, UnitsMixin, PlottingMixin):
             self.plot_measure_timeseries_annual_average_by_state_and_enduse(df, output_dir, states, color_map, comstock_run_name=self.comstock_run_name)
 
     def make_comparative_plots(self, df, column_for_grouping, states, make_timeseries_plots, color_map, output_dir):
-        # Make plots comparing the upgrades
+        # Queue plots comparing groups of upgrades, rendered by self.plot_scheduler
 
         logger.info(f'Making comparison plots for upgrade groupings')
-        self.plot_energy_by_enduse_and_fuel_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_emissions_by_fuel_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_utility_bills_by_fuel_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_floor_area_and_energy_totals(df, column_for_grouping, color_map, output_dir)
+        self.plot_scheduler.add('plot_energy_by_enduse_and_fuel_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_emissions_by_fuel_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_utility_bills_by_fuel_type', df, column_for_grouping, color_map, output_dir=output_dir)
+        self.plot_scheduler.add('plot_floor_area_and_energy_totals', df, column_for_grouping, color_map, output_dir=output_dir)
 
         if make_timeseries_plots==True:
             self.plot_measure_timeseries_peak_week_by_state(df, output_dir, states, color_map, comstock_run_name=self.comstock_run_name)
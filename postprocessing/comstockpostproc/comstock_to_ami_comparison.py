@@ -12,11 +12,13 @@ from comstockpostproc.units_mixin import UnitsMixin
 from comstockpostproc.plotting_mixin import PlottingMixin
 from comstockpostproc.ami import AMI
 from comstockpostproc.comstock import ComStock
+from comstockpostproc.image_export import flush_image_exports
+from comstockpostproc.plot_scheduler import PlotScheduler
 
 logger = logging.getLogger(__name__)
 
 class ComStockToAMIComparison(NamingMixin, UnitsMixin, PlottingMixin):
-    def __init__(self, comstock_object:ComStock, ami_object:AMI, image_type='jpg', name=None, make_comparison_plots=True):
+    def __init__(self, comstock_object:ComStock, ami_object:AMI, image_type='jpg', name=None, make_comparison_plots=True, image_export_profile=None, incremental_plots=True, max_plot_workers=1):
 
         # Initialize members
         self.comstock_object = comstock_object
@@ -25,6 +27,7 @@ class ComStockToAMIComparison(NamingMixin, UnitsMixin, PlottingMixin):
         self.ami_plot_data = None
         self.color_map = {}
         self.image_type = image_type
+        self.image_export_profile = image_export_profile
         self.name = name
 
         # Concatenate the datasets and create a color map
@@ -62,12 +65,15 @@ class ComStockToAMIComparison(NamingMixin, UnitsMixin, PlottingMixin):
         for p in [self.output_dir]:
             if not os.path.exists(p):
                 os.makedirs(p)
+        manifest_path = os.path.join(self.output_dir, 'plot_manifest.json') if incremental_plots else None
+        self.plot_scheduler = PlotScheduler(max_workers=max_plot_workers, manifest_path=manifest_path, owner=self)
 
         # Make ComStock to AMI comparison plots
         if make_comparison_plots:
             self.make_plots()
         else:
             logger.info("make_comparison_plots is set to false, so not plots were created. Set make_comparison_plots to True for plots.")
+        flush_image_exports()
 
     def export_to_csv_wide(self):
         # Exports comparison data to CSV in wide format
@@ -89,14 +95,19 @@ class ComStockToAMIComparison(NamingMixin, UnitsMixin, PlottingMixin):
         comstock_data_label = list(self.color_map.keys())[0]
         ami_data_label = list(self.color_map.keys())[1]
 
+        # split the data once by region and building type, keeping only the columns the plots use
+        plot_cols = [c for c in ['run', 'enduse', 'kwh_per_sf', 'bldg_count', 'sample_uncertainty'] if c in self.ami_timeseries_data.columns]
+        partitions = {}
+        for (region_name, building_type), partition_df in self.ami_timeseries_data.groupby(['region_name', 'building_type'], sort=False):
+            partitions[(region_name, building_type)] = partition_df[plot_cols]
+        empty_df = self.ami_timeseries_data.iloc[0:0][plot_cols]
+
         # for each region
         dfs_to_concat = []
         for region in self.ami_object.ami_region_map:
-            region_df = self.ami_timeseries_data.loc[self.ami_timeseries_data['region_name'] == region['source_name']]
-
             # for each building type
             for building_type in self.ami_object.building_types:
-                type_region_df = region_df.loc[region_df['building_type'] == building_type]
+                type_region_df = partitions.get((region['source_name'], building_type), empty_df)
                 bldg_type_output_dir = os.path.join(self.output_dir, building_type)
                 if not os.path.exists(bldg_type_output_dir):
                     os.makedirs(bldg_type_output_dir)
@@ -118,11 +129,15 @@ class ComStockToAMIComparison(NamingMixin, UnitsMixin, PlottingMixin):
                     logger.debug(f"dataset contains fewer than 3 {building_type} buildings in {ami_data_label} for region {region['source_name']}. Skipping building specific graphics.")
                     continue
 
-                type_region_plot_data = self.plot_day_type_comparison_stacked_by_enduse(type_region_df, region, building_type, self.color_map, bldg_type_output_dir)
-                dfs_to_concat.append(type_region_plot_data)
-                self.plot_day_type_comparison_stacked_by_enduse(type_region_df, region, building_type, self.color_map, bldg_type_output_dir, normalization='Daytype')
-                self.plot_day_type_comparison_stacked_by_enduse(type_region_df, region, building_type, self.color_map, bldg_type_output_dir, normalization='Annual')
-                self.plot_load_duration_curve(type_region_df, region, building_type, self.color_map, bldg_type_output_dir)
+                # Plot data is always collected because it is exported, the plots are skipped if unchanged
+                aggregates = self.ami_day_type_aggregates(type_region_df, region, self.color_map)
+                dfs_to_concat.append(self.day_type_plot_data(aggregates, region, building_type))
+
+                # The day type comparisons at each normalization and the load duration curve are made together
+                # from the profiles computed above, with each region and building type rendered in parallel
+                self.plot_scheduler.add('plot_ami_region_building_type', type_region_df, region, building_type, self.color_map, output_dir=bldg_type_output_dir, aggregates=aggregates)
+
+        self.plot_scheduler.run(self, report_dir=self.output_dir)
 
         # combine plot data
         self.ami_plot_data = pd.concat(dfs_to_concat, join='outer', ignore_index=True)
\ No newline at end of file
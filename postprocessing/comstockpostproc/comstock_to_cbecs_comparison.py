@@ -13,12 +13,31 @@ from comstockpostproc.units_mixin import UnitsMixin
 from comstockpostproc.plotting_mixin import PlottingMixin
 from comstockpostproc.cbecs import CBECS
 from comstockpostproc.comstock import ComStock
+from comstockpostproc.comparison_data_assembler import ComparisonDataAssembler
+from comstockpostproc.image_export import flush_image_exports
+from comstockpostproc.plot_scheduler import PlotScheduler
 
 
 logger = logging.getLogger(__name__)
 
 class ComStockToCBECSComparison(NamingMixin, UnitsMixin, PlottingMixin):
-    def __init__(self, comstock_list: List[ComStock], cbecs_list: List[CBECS], upgrade_id=0, image_type='jpg', name=None, make_comparison_plots=True):
+    # Plots made by make_plots and make_qoi_plots, used to select the columns to load
+    COMPARISON_PLOTS = [
+        'plot_floor_area_and_energy_totals',
+        'plot_eui_boxplots',
+        'plot_floor_area_and_energy_totals_by_building_type',
+        'plot_end_use_totals_by_building_type',
+        'plot_eui_histograms_by_building_type',
+        'plot_eui_boxplots_by_building_type',
+        'plot_energy_rate_boxplots',
+    ]
+    QOI_PLOTS = [
+        'plot_qoi_timing',
+        'plot_qoi_max_use',
+        'plot_qoi_min_use',
+    ]
+
+    def __init__(self, comstock_list: List[ComStock], cbecs_list: List[CBECS], upgrade_id=0, image_type='jpg', name=None, make_comparison_plots=True, prune_columns=True, image_export_profile=None, incremental_plots=True):
         """
         Creates the ComStock to CBECS comaprison plots.
         
@@ -29,6 +48,12 @@ class ComStockToCBECSComparison(NamingMixin, UnitsMixin, PlottingMixin):
             image_type (str, optional): Image file type to use. Defaults to 'jpg'.
             name (str, optional): Name of output directory. If None, a name will be generated. Defaults to None.
             make_comparison_plots (bool, optional): Flag to create compairison plots. Defaults to True.
+            prune_columns (bool, optional): Keep only the columns used by the plots. Set to False to keep
+            all shared columns in self.data, for example before calling export_to_csv_wide. Defaults to True.
+            image_export_profile (str, optional): Image export profile, like 'publication' or 'draft'. If None, the
+            COMSTOCKPOSTPROC_IMAGE_PROFILE environment variable or 'publication' is used. Defaults to None.
+            incremental_plots (bool, optional): Skip plots whose input data, arguments and plotting code have not changed
+            since they were last made, using plot_manifest.json in the output directory. Defaults to True.
         """
         # Initialize members
         self.comstock_list = comstock_list
@@ -36,9 +61,17 @@ class ComStockToCBECSComparison(NamingMixin, UnitsMixin, PlottingMixin):
         self.data = None
         self.color_map = {}
         self.image_type = image_type
+        self.image_export_profile = image_export_profile
         self.name = name
         self.column_for_grouping = self.DATASET
 
+        # Only the columns used by the plots are projected out of each dataset
+        self.assembler = ComparisonDataAssembler()
+        columns = None
+        if prune_columns:
+            columns = self.assembler.required_columns(self.COMPARISON_PLOTS + self.QOI_PLOTS)
+        qoi_cols = [self.DATASET] + self.QOI_MAX_DAILY_TIMING_COLS + self.QOI_MAX_USE_COLS + self.QOI_MIN_USE_COLS + self.QOI_MAX_USE_COLS_NORMALIZED + self.QOI_MIN_USE_COLS_NORMALIZED
+
         # Concatenate the datasets and create a color map
         dfs_to_concat = []
         comstock_dfs_to_concat = []
@@ -49,14 +82,17 @@ class ComStockToCBECSComparison(NamingMixin, UnitsMixin, PlottingMixin):
             # remove measure data from ComStock
             if isinstance(dataset, ComStock):
                 dataset.add_sightglass_column_units()  # Add units to SightGlass columns if missing
+                dataset_upgrade_name = pl.concat_str([
+                    pl.col(dataset.DATASET).cast(pl.Utf8),
+                    pl.col(dataset.UPGRADE_NAME).cast(pl.Utf8)
+                    ], separator=' - ').alias(dataset.DATASET)
                 if upgrade_id == 'All':
-                    df_data = dataset.data.to_pandas()
-                    # df_data[dataset.DATASET] = df_data[dataset.DATASET] + ' - ' + df_data['upgrade_name']
+                    df_data = self.assembler.project(dataset.data, columns).with_columns(dataset_upgrade_name)
                     comstock_dfs_to_concat.append(df_data)
-                    df_data[dataset.DATASET] = df_data[dataset.DATASET].astype(str) + ' - ' + df_data[dataset.UPGRADE_NAME].astype(str)
                     dfs_to_concat.append(df_data)
-                    up_name_map = dict(zip(df_data[dataset.UPGRADE_ID].unique(), df_data[dataset.UPGRADE_NAME].unique()))
-                    upgrade_list = list(df_data[dataset.UPGRADE_ID].unique())
+                    up_names = df_data.select([dataset.UPGRADE_ID, dataset.UPGRADE_NAME]).unique(subset=dataset.UPGRADE_ID, maintain_order=True)
+                    up_name_map = dict(zip(up_names.get_column(dataset.UPGRADE_ID).to_list(), up_names.get_column(dataset.UPGRADE_NAME).cast(pl.Utf8).to_list()))
+                    upgrade_list = list(up_name_map.keys())
                     color_dict = self.linear_gradient(dataset.COLOR_COMSTOCK_BEFORE, dataset.COLOR_COMSTOCK_AFTER, len(upgrade_list))
                     for idx, upgrade_id in enumerate(upgrade_list):
                         dataset_name = dataset.dataset_name + ' - ' + up_name_map[upgrade_id]
@@ -66,17 +102,15 @@ class ComStockToCBECSComparison(NamingMixin, UnitsMixin, PlottingMixin):
                 elif upgrade_id not in dataset.data[dataset.UPGRADE_ID]:
                     logger.error(f"Upgrade {upgrade_id} not found in {dataset.dataset_name}. Enter a valid upgrade ID in the ComStockToCBECSComparison constructor or \"All\" to include all upgrades.")
                 else:
-                    # df_data = dataset.data.filter(pl.col(self.UPGRADE_NAME) == self.BASE_NAME).to_pandas()
-                    df_data = dataset.data.filter(pl.col(dataset.UPGRADE_ID) == upgrade_id).to_pandas()
-                    df_data[dataset.DATASET] = df_data[dataset.DATASET].astype(str) + ' - ' + df_data[dataset.UPGRADE_NAME].astype(str)
-                    dataset_name = dataset.dataset_name + ' - ' + df_data.iloc[0][dataset.UPGRADE_NAME]
+                    df_data = self.assembler.project(dataset.data, columns, pl.col(dataset.UPGRADE_ID) == upgrade_id).with_columns(dataset_upgrade_name)
+                    dataset_name = dataset.dataset_name + ' - ' + str(df_data.get_column(dataset.UPGRADE_NAME)[0])
                     comstock_dfs_to_concat.append(df_data)
                     dfs_to_concat.append(df_data)
                     comstock_color_map[dataset_name] = dataset.color
                     self.color_map[dataset_name] = dataset.color
                     dataset_names.append(dataset_name)
             else:
-                df_data = dataset.data
+                df_data = self.assembler.project(dataset.data, columns)
                 dfs_to_concat.append(df_data)
                 self.color_map[dataset.dataset_name] = dataset.color
                 dataset_names.append(dataset.dataset_name)
@@ -89,43 +123,42 @@ class ComStockToCBECSComparison(NamingMixin, UnitsMixin, PlottingMixin):
                 self.name = ' vs '.join(sorted(dataset_names))
 
         # Combine into a single dataframe for convenience
-        self.data = pd.concat(dfs_to_concat, join='inner', ignore_index=True)
+        self.data = self.assembler.to_pandas(self.assembler.concat(dfs_to_concat, how='inner'))
         current_dir = os.path.dirname(os.path.abspath(__file__))
 
         # Combine just comstock runs into single dataframe for QOI plots
-        comstock_df = pd.concat(comstock_dfs_to_concat, join='inner', ignore_index=True)
-        comstock_df = comstock_df[[self.DATASET] + self.QOI_MAX_DAILY_TIMING_COLS + self.QOI_MAX_USE_COLS + self.QOI_MIN_USE_COLS + self.QOI_MAX_USE_COLS_NORMALIZED + self.QOI_MIN_USE_COLS_NORMALIZED]
+        comstock_df = self.assembler.concat([df.select(qoi_cols) for df in comstock_dfs_to_concat], how='inner')
+        comstock_df = self.assembler.to_pandas(comstock_df)
 
         # Make directories
         self.output_dir = os.path.join(current_dir, '..', 'output', self.name)
         for p in [self.output_dir]:
             if not os.path.exists(p):
                 os.makedirs(p)
+        manifest_path = os.path.join(self.output_dir, 'plot_manifest.json') if incremental_plots else None
+        self.plot_scheduler = PlotScheduler(manifest_path=manifest_path, owner=self)
 
         # Make ComStock to CBECS comparison plots
         if make_comparison_plots:
             self.make_plots(self.data, self.column_for_grouping, self.color_map, self.output_dir)
             # QOI plots can only be made with comstock data because CBECS data do not have QOI columns
             self.make_qoi_plots(comstock_df, self.column_for_grouping, comstock_color_map, self.output_dir)
+            self.plot_scheduler.run(self, report_dir=self.output_dir)
         else:
             logger.info("make_comparison_plots is set to false, so not plots were created. Set make_comparison_plots to True for plots.")
+        flush_image_exports()
 
     def make_plots(self, df, column_for_grouping, color_map, output_dir):
-        # Make plots comparing the datasets
+        # Queue plots comparing the datasets, rendered by self.plot_scheduler
 
         logger.info('Making comparison plots')
-        self.plot_floor_area_and_energy_totals(df, column_for_grouping, color_map, output_dir)
-        self.plot_eui_boxplots(df, column_for_grouping, color_map, output_dir)
-        self.plot_floor_area_and_energy_totals_by_building_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_end_use_totals_by_building_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_eui_histograms_by_building_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_eui_boxplots_by_building_type(df, column_for_grouping, color_map, output_dir)
-        self.plot_energy_rate_boxplots(df, column_for_grouping, color_map, output_dir)
+        for plot_name in self.COMPARISON_PLOTS:
+            self.plot_scheduler.add(plot_name, df, column_for_grouping, color_map, output_dir=output_dir)
 
     def make_qoi_plots(self, df, column_for_grouping, color_map, output_dir):
-        self.plot_qoi_timing(df, column_for_grouping, color_map, output_dir)
-        self.plot_qoi_max_use(df, column_for_grouping, color_map, output_dir)
-        self.plot_qoi_min_use(df, column_for_grouping, color_map, output_dir)
+        # Queue plots of the quantities of interest, rendered by self.plot_scheduler
+        for plot_name in self.QOI_PLOTS:
+            self.plot_scheduler.add(plot_name, df, column_for_grouping, color_map, output_dir=output_dir)
 
     def export_to_csv_wide(self):
         # Exports comparison data to CSV in wide format
@@ -13,11 +13,18 @@ from comstockpostproc.units_mixin import UnitsMixin
 from comstockpostproc.plotting_mixin import PlottingMixin
 from comstockpostproc.eia import EIA
 from comstockpostproc.comstock import ComStock
+from comstockpostproc.comparison_data_assembler import ComparisonDataAssembler
+from comstockpostproc.image_export import flush_image_exports
 
 logger = logging.getLogger(__name__)
 
 class ComStockToEIAComparison(NamingMixin, UnitsMixin, PlottingMixin):
-    def __init__(self, comstock_list: List[ComStock], eia_list: List[EIA], upgrade_id=0, image_type='jpg', name=None, make_comparison_plots=True):
+    # Plots made from the annual data, used to select the columns to load
+    ANNUAL_PLOTS = [
+        'plot_annual_emissions_comparison',
+    ]
+
+    def __init__(self, comstock_list: List[ComStock], eia_list: List[EIA], upgrade_id=0, image_type='jpg', name=None, make_comparison_plots=True, prune_columns=True, image_export_profile=None):
         """
         Creates the ComStock to EIA comparison plots.
 
@@ -28,6 +35,9 @@ class ComStockToEIAComparison(NamingMixin, UnitsMixin, PlottingMixin):
             image_type (str, optional): Image file type to use. Defaults to 'jpg'.
             name (str, optional): Name of output directory. If None, a name will be generated. Defaults to None.
             make_comparison_plots (bool, optional): Flag to create comparison plots. Defaults to True.
+            prune_columns (bool, optional): Keep only the annual columns used by the plots. Defaults to True.
+            image_export_profile (str, optional): Image export profile, like 'publication' or 'draft'. If None, the
+            COMSTOCKPOSTPROC_IMAGE_PROFILE environment variable or 'publication' is used. Defaults to None.
         """
         # Initialize members
         self.comstock_list = comstock_list
@@ -38,8 +48,15 @@ class ComStockToEIAComparison(NamingMixin, UnitsMixin, PlottingMixin):
         self.color_map = {}
         self.monthly_color_map = {}
         self.image_type = image_type
+        self.image_export_profile = image_export_profile
         self.name = name
 
+        # Only the annual columns used by the plots are projected out of each dataset
+        self.assembler = ComparisonDataAssembler()
+        annual_columns = None
+        if prune_columns:
+            annual_columns = self.assembler.required_columns(self.ANNUAL_PLOTS)
+
         # Concatenate the datasets and create a color map
         monthly_dfs_to_concat = []
         annual_dfs_to_concat = []
@@ -53,7 +70,7 @@ class ComStockToEIAComparison(NamingMixin, UnitsMixin, PlottingMixin):
                 annual_upgrade_ids = [upgrade_id]
                 if upgrade_id == 'All':
                     annual_upgrade_ids = dataset.data.get_column('upgrade').unique().to_list()
-                annual_data = dataset.data.filter(pl.col('upgrade').is_in(annual_upgrade_ids))
+                annual_data = self.assembler.project(dataset.data, annual_columns, pl.col('upgrade').is_in(annual_upgrade_ids))
                 if not annual_upgrade_ids == [0]:
                     annual_data = annual_data.with_columns(
                         pl.concat_str([pl.col(dataset.DATASET), pl.col(dataset.UPGRADE_NAME)], separator=" - ").alias(dataset.DATASET),
@@ -61,7 +78,7 @@ class ComStockToEIAComparison(NamingMixin, UnitsMixin, PlottingMixin):
                 color_dict = self.linear_gradient(dataset.COLOR_COMSTOCK_BEFORE, dataset.COLOR_COMSTOCK_AFTER, len(annual_upgrade_ids))
                 for idx, dataset_upgrade_name in enumerate(annual_data.get_column(dataset.DATASET).unique().sort().to_list()):
                     self.color_map[dataset_upgrade_name] = color_dict['hex'][idx]
-                annual_dfs_to_concat.append(annual_data.to_pandas())
+                annual_dfs_to_concat.append(annual_data)
 
                 # Monthly energy
                 if dataset.monthly_data is None:
@@ -81,7 +98,7 @@ class ComStockToEIAComparison(NamingMixin, UnitsMixin, PlottingMixin):
                 monthly_dfs_to_concat.append(monthly_data.to_pandas())
             else:
                 # Annual emissions
-                annual_dfs_to_concat.append(dataset.emissions_data.to_pandas())
+                annual_dfs_to_concat.append(self.assembler.project(dataset.emissions_data, annual_columns))
                 self.color_map[dataset.dataset_name] = dataset.color
 
                 # Monthly energy
@@ -94,7 +111,7 @@ class ComStockToEIAComparison(NamingMixin, UnitsMixin, PlottingMixin):
 
         # Combine into a single dataframe for convenience
         self.monthly_data = pd.concat(monthly_dfs_to_concat, join='outer', ignore_index=True)
-        self.data = pd.concat(annual_dfs_to_concat, join='inner', ignore_index=True)
+        self.data = self.assembler.to_pandas(self.assembler.concat(annual_dfs_to_concat, how='inner'))
         current_dir = os.path.dirname(os.path.abspath(__file__))
 
         # Make directories
@@ -109,6 +126,7 @@ class ComStockToEIAComparison(NamingMixin, UnitsMixin, PlottingMixin):
             self.make_plots(self.monthly_data, self.monthly_color_map, self.output_dir)
         else:
             logger.info("make_comparison_plots is set to false, so not plots were created. Set make_comparison_plots to True for plots.")
+        flush_image_exports()
 
     def export_to_csv_wide(self):
         # Exports comparison data to CSV in wide format
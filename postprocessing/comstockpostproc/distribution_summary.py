@@ -0,0 +1,430 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import logging
+import weakref
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import polars as pl
+
+from comstockpostproc.naming_mixin import NamingMixin
+
+logger = logging.getLogger(__name__)
+
+# Summaries keyed on id() of the row-level frame they were built from, see summary_for_frame()
+_SUMMARIES = {}
+
+
+class DistributionSummary(NamingMixin):
+    # Whisker length as a multiple of the interquartile range, the matplotlib and plotly default
+    WHIS = 1.5
+
+    # Number of bins the values are spread over before smoothing, and points in each violin outline
+    KDE_BINS = 512
+    OUTLINE_POINTS = 128
+
+    def __init__(self, df):
+        """
+        Box plot statistics and kernel density estimates of a row-level frame, computed for all groups at once.
+        Plots draw from these summaries instead of passing every building to matplotlib or plotly,
+        and summaries are reused by every figure made from the same frame.
+        Args:
+
+            df (Union[pd.DataFrame, pl.DataFrame]): Row-level data, one row per building per dataset or upgrade
+        """
+        self._source = weakref.ref(df)
+        self._summaries = {}
+
+    def _column(self, df, col):
+        if isinstance(df, pd.DataFrame):
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+                return pl.Series(col, values.astype(str).where(values.notna(), None).to_numpy(), dtype=pl.Utf8)
+            return pl.Series(col, values.to_numpy())
+        values = df.get_column(col)
+        if values.dtype == pl.Categorical:
+            values = values.cast(pl.Utf8)
+        return values
+
+    def _long_values(self, value_cols, group_cols, weight_col, drop_zeros, pct_limit, exclude_baseline):
+        # One row per building and value column, with the group keys, after the same filtering the plots used to do
+        df = self._source()
+        if df is None:
+            logger.error('Cannot summarize, the frame used to build this distribution summary no longer exists')
+            raise Exception('Cannot summarize, the frame used to build this distribution summary no longer exists')
+        keys = {c: self._column(df, c).cast(pl.Utf8) for c in group_cols}
+        if weight_col is None:
+            weights = pl.Series('weight', np.ones(len(df)))
+        else:
+            weights = self._column(df, weight_col).alias('weight').cast(pl.Float64)
+        keep = None
+        if exclude_baseline:
+            keep = self._column(df, self.UPGRADE_ID) != 0
+
+        frames = []
+        for col in value_cols:
+            values = self._column(df, col).cast(pl.Float64).fill_nan(None).alias('value')
+            if pct_limit is not None and 'percent_savings' in col:
+                # Same as PlottingMixin.filter_outlier_pct_savings_values
+                values = pl.select(
+                    pl.when(values.abs() > pct_limit).then(None).otherwise(values * 100).alias('value')
+                ).to_series()
+                values = pl.select(pl.when(values > 100).then(None).otherwise(values).alias('value')).to_series()
+            frame = pl.DataFrame([pl.Series('column', [col] * len(df))] + list(keys.values()) + [values, weights])
+            if keep is not None:
+                frame = frame.filter(keep)
+            if drop_zeros:
+                # Missing values are kept in the count, like the original pandas filter value != 0
+                frame = frame.filter(pl.col('value').is_null() | (pl.col('value') != 0))
+            frames.append(frame)
+
+        return pl.concat(frames, how='vertical')
+
+    def summarize(self, value_cols, group_cols=(), weight_col=None, drop_zeros=False, pct_limit=None,
+                  exclude_baseline=False, kde=False):
+        """
+        Box plot statistics, and optionally kernel density estimates, for each value column and group.
+        Args:
+
+            value_cols (list): Columns to summarize
+            group_cols (tuple): Columns to group by. Group values are converted to strings.
+            weight_col (str): Column of weights for the quantiles, mean and KDE, None for unweighted
+            drop_zeros (bool): If True, exclude zero values, as the savings plots do
+            pct_limit (float): If not None, apply PlottingMixin.filter_outlier_pct_savings_values with this
+            fraction to the percent savings columns
+            exclude_baseline (bool): If True, exclude the baseline rows
+            kde (bool): If True, include a kernel density estimate spanning the range of each group
+
+        Return:
+            dict: (value column, *group values) to a dict of statistics using the keys of matplotlib's
+            boxplot_stats, plus 'n', the number of rows, including missing values, 'min', 'max', and
+            'kde_x' and 'kde_y' if requested
+        """
+        value_cols = tuple(value_cols)
+        group_cols = tuple(group_cols)
+        key = (value_cols, group_cols, weight_col, drop_zeros, pct_limit, exclude_baseline)
+        if key in self._summaries and (not kde or self._summaries[key][1]):
+            return self._summaries[key][0]
+
+        data = self._long_values(value_cols, group_cols, weight_col, drop_zeros, pct_limit, exclude_baseline)
+        keys = ['column'] + list(group_cols)
+        counts = data.group_by(keys).agg(pl.len().alias('n'))
+        valid = data.filter(pl.col('value').is_not_null() & (pl.col('weight') > 0))
+        stats = self._box_stats(valid, keys)
+        stats = counts.join(stats, on=keys, how='left').sort(keys)
+
+        summaries = {}
+        for row in stats.iter_rows(named=True):
+            summary = {
+                'label': row[keys[-1]],
+                'n': row['n'],
+                'mean': row['mean'],
+                'med': row['med'],
+                'q1': row['q1'],
+                'q3': row['q3'],
+                'whislo': row['whislo'],
+                'whishi': row['whishi'],
+                'min': row['min'],
+                'max': row['max'],
+                'fliers': np.array(row['fliers'] if row['fliers'] is not None else [], dtype=float),
+            }
+            summaries[tuple(row[k] for k in keys)] = summary
+
+        if kde:
+            self._add_kdes(valid, keys, stats, summaries)
+
+        self._summaries[key] = (summaries, kde)
+        return summaries
+
+    def _box_stats(self, valid, keys):
+        # Quartiles, mean, whiskers and fliers per group, in the same way as matplotlib.cbook.boxplot_stats
+        weighted = valid.get_column('weight').n_unique() > 1
+        if weighted:
+            quartiles = self._weighted_quantiles(valid, keys, {'q1': 0.25, 'med': 0.5, 'q3': 0.75})
+            means = valid.group_by(keys).agg(
+                ((pl.col('value') * pl.col('weight')).sum() / pl.col('weight').sum()).alias('mean'),
+                pl.col('value').min().alias('min'),
+                pl.col('value').max().alias('max'),
+            )
+            stats = means.join(quartiles, on=keys)
+        else:
+            stats = valid.group_by(keys).agg(
+                pl.col('value').mean().alias('mean'),
+                pl.col('value').quantile(0.25, interpolation='linear').alias('q1'),
+                pl.col('value').quantile(0.5, interpolation='linear').alias('med'),
+                pl.col('value').quantile(0.75, interpolation='linear').alias('q3'),
+                pl.col('value').min().alias('min'),
+                pl.col('value').max().alias('max'),
+            )
+        iqr = pl.col('q3') - pl.col('q1')
+        stats = stats.with_columns(
+            (pl.col('q1') - self.WHIS * iqr).alias('lo'),
+            (pl.col('q3') + self.WHIS * iqr).alias('hi'),
+        )
+
+        # Whiskers extend to the furthest values inside the fences, values outside are fliers
+        inside = (pl.col('value') >= pl.col('lo')) & (pl.col('value') <= pl.col('hi'))
+        whiskers = valid.join(stats.select(keys + ['q1', 'q3', 'lo', 'hi']), on=keys).group_by(keys).agg(
+            pl.col('value').filter(inside).min().alias('whislo'),
+            pl.col('value').filter(inside).max().alias('whishi'),
+            pl.col('value').filter(inside.not_()).alias('fliers'),
+            pl.col('q1').first(),
+            pl.col('q3').first(),
+        )
+        # Like matplotlib, whiskers never end inside the box
+        whiskers = whiskers.with_columns(
+            pl.min_horizontal('whislo', 'q1').alias('whislo'),
+            pl.max_horizontal('whishi', 'q3').alias('whishi'),
+        ).drop(['q1', 'q3'])
+
+        return stats.drop(['lo', 'hi']).join(whiskers, on=keys)
+
+    def _weighted_quantiles(self, valid, keys, quantiles):
+        # Inverted weighted CDF per group
+        cdf = valid.sort(keys + ['value']).with_columns(
+            (pl.col('weight').cum_sum().over(keys) / pl.col('weight').sum().over(keys)).alias('cdf')
+        )
+        result = None
+        for name, q in quantiles.items():
+            agg = cdf.group_by(keys).agg(pl.col('value').filter(pl.col('cdf') >= q).first().alias(name))
+            result = agg if result is None else result.join(agg, on=keys)
+        return result
+
+    def _add_kdes(self, valid, keys, stats, summaries):
+        # Gaussian KDE of every group in one pass: values are linearly binned onto a grid spanning each
+        # group with np.bincount, then each group's counts are smoothed with its own kernel.
+        n_bins = self.KDE_BINS
+        stats = stats.filter(pl.col('min').is_not_null()).with_row_index('group_index')
+        data = valid.join(stats.select(keys + ['group_index', 'min', 'max']), on=keys)
+        group_index = data.get_column('group_index').to_numpy().astype(np.int64)
+        values = data.get_column('value').to_numpy()
+        weights = data.get_column('weight').to_numpy()
+        lows = data.get_column('min').to_numpy()
+        spans = data.get_column('max').to_numpy() - lows
+        n_groups = len(stats)
+
+        position = np.divide(values - lows, spans, out=np.zeros_like(values), where=spans > 0) * (n_bins - 1)
+        left = np.clip(np.floor(position).astype(np.int64), 0, n_bins - 2)
+        frac = position - left
+        flat = group_index * n_bins + left
+        binned = np.bincount(flat, weights=weights * (1 - frac), minlength=n_groups * n_bins)
+        binned += np.bincount(flat + 1, weights=weights * frac, minlength=n_groups * n_bins)
+        binned = binned.reshape(n_groups, n_bins)
+
+        # Bandwidth by Silverman's rule of thumb, as used by plotly violins
+        w_sum = np.bincount(group_index, weights=weights, minlength=n_groups)
+        w_mean = np.bincount(group_index, weights=weights * values, minlength=n_groups) / w_sum
+        w_var = np.bincount(group_index, weights=weights * (values - w_mean[group_index]) ** 2, minlength=n_groups) / w_sum
+        counts = np.bincount(group_index, minlength=n_groups)
+        iqr = (stats.get_column('q3') - stats.get_column('q1')).to_numpy()
+        spread = np.where(iqr > 0, np.minimum(np.sqrt(w_var), iqr / 1.349), np.sqrt(w_var))
+        bandwidth = 1.059 * spread * np.power(counts, -0.2)
+
+        outline_index = np.linspace(0, n_bins - 1, self.OUTLINE_POINTS).round().astype(int)
+        for row, counts_g, h, total in zip(stats.iter_rows(named=True), binned, bandwidth, w_sum):
+            summary = summaries[tuple(row[k] for k in keys)]
+            span = row['max'] - row['min']
+            if span <= 0 or h <= 0:
+                summary['kde_x'] = np.array([row['min']])
+                summary['kde_y'] = np.array([1.0])
+                continue
+            dx = span / (n_bins - 1)
+            half_width = min(int(np.ceil(4 * h / dx)), n_bins)
+            offsets = np.arange(-half_width, half_width + 1) * dx
+            kernel = np.exp(-0.5 * (offsets / h) ** 2) / np.sqrt(2 * np.pi)
+            density = np.convolve(counts_g, kernel, mode='same' if len(kernel) <= n_bins else 'full')
+            if len(density) > n_bins:
+                start = (len(density) - n_bins) // 2
+                density = density[start:start + n_bins]
+            density /= total * h
+            summary['kde_x'] = row['min'] + outline_index * dx
+            summary['kde_y'] = density[outline_index]
+
+    def histograms(self, value_cols, group_cols, dataset_col, weight_col=None, n_bins=100):
+        """
+        Weighted histograms of each value column for every group and dataset, binned in one pass.
+        All datasets in a group share bin edges spanning the group's values, and each dataset's
+        weights are normalized to sum to 1, like plt.hist(values, weights=w / w.sum(), range=(min, max)).
+        Args:
+
+            value_cols (list): Columns to bin
+            group_cols (tuple): Columns to group by, each group gets its own bin edges
+            dataset_col (str): Column of the datasets compared within each group
+            weight_col (str): Column of weights, None to weight each row equally
+            n_bins (int): Number of bins
+
+        Return:
+            dict: (value column, *group values) to a dict with 'edges', 'bin_size', and 'datasets', which maps
+            each dataset to its 'counts', number of rows 'n', and weighted 'mean'
+        """
+        value_cols = tuple(value_cols)
+        group_cols = tuple(group_cols)
+        key = ('histograms', value_cols, group_cols, dataset_col, weight_col, n_bins)
+        if key in self._summaries:
+            return self._summaries[key]
+
+        data = self._long_values(value_cols, group_cols + (dataset_col,), weight_col, False, None, False)
+        keys = ['column'] + list(group_cols)
+        ds_keys = keys + [dataset_col]
+
+        # Shared bin edges per group, and weight totals per dataset including rows with missing values
+        ranges = data.group_by(keys).agg(
+            pl.col('value').min().alias('min'),
+            pl.col('value').max().alias('max'),
+        )
+        totals = data.group_by(ds_keys).agg(
+            pl.len().alias('n'),
+            pl.col('weight').sum().alias('weight_sum'),
+            (pl.col('value') * pl.col('weight')).sum().alias('weighted_sum'),
+        ).join(ranges, on=keys).sort(ds_keys).with_row_index('dataset_index')
+
+        valid = data.filter(pl.col('value').is_not_null()).join(
+            totals.select(ds_keys + ['dataset_index', 'min', 'max', 'weight_sum']), on=ds_keys)
+        values = valid.get_column('value').to_numpy()
+        lows = valid.get_column('min').to_numpy()
+        highs = valid.get_column('max').to_numpy()
+        # Like np.histogram, a range with no width is widened to one unit
+        same = lows == highs
+        lows = np.where(same, lows - 0.5, lows)
+        highs = np.where(same, highs + 0.5, highs)
+        bins = self._bin_indices(values, lows, highs, n_bins)
+        dataset_index = valid.get_column('dataset_index').to_numpy().astype(np.int64)
+        weights = valid.get_column('weight').to_numpy() / valid.get_column('weight_sum').to_numpy()
+        counts = np.bincount(dataset_index * n_bins + bins, weights=weights, minlength=len(totals) * n_bins)
+        counts = counts.reshape(len(totals), n_bins)
+
+        histograms = {}
+        for row, dataset_counts in zip(totals.iter_rows(named=True), counts):
+            if row['min'] is None:
+                continue
+            group_key = tuple(row[k] for k in keys)
+            if group_key not in histograms:
+                low, high = row['min'], row['max']
+                bin_size = (high - low) / n_bins
+                if low == high:
+                    low, high = low - 0.5, high + 0.5
+                histograms[group_key] = {
+                    'edges': np.linspace(low, high, n_bins + 1),
+                    'bin_size': bin_size,
+                    'datasets': {},
+                }
+            histograms[group_key]['datasets'][row[dataset_col]] = {
+                'counts': dataset_counts,
+                'n': row['n'],
+                'mean': row['weighted_sum'] / row['weight_sum'] if row['weight_sum'] else np.nan,
+            }
+
+        self._summaries[key] = histograms
+        return histograms
+
+    def _bin_indices(self, values, lows, highs, n_bins):
+        # Bin of each value on its own uniform grid, with the same edge handling as np.histogram
+        bins = ((values - lows) * (n_bins / (highs - lows))).astype(np.int64)
+        bins[bins == n_bins] -= 1
+        step = (highs - lows) / n_bins
+        lower_edges = lows + bins * step
+        upper_edges = lows + (bins + 1) * step
+        bins[values < lower_edges] -= 1
+        bins[(values >= upper_edges) & (bins != n_bins - 1)] += 1
+        return bins
+
+
+def summary_for_frame(df):
+    """
+    Returns the distribution summary for a row-level frame, building it on first use.
+    Summaries are shared by every plot made from the same frame object and are released with the frame.
+    Args:
+
+        df (pd.DataFrame): Row-level data passed to the plot methods
+
+    Return:
+        DistributionSummary: summary for df
+    """
+    key = id(df)
+    if key in _SUMMARIES:
+        ref, summary = _SUMMARIES[key]
+        if ref() is df:
+            return summary
+    summary = DistributionSummary(df)
+    _SUMMARIES[key] = (weakref.ref(df, lambda _, key=key: _SUMMARIES.pop(key, None)), summary)
+    return summary
+
+
+def violin_traces(summary, position, name, fillcolor, box_fillcolor, width=0.95, box_width=0.25, pointpos=1):
+    """
+    Plotly traces drawing a horizontal violin with an inner box, mean line and outliers from a summary,
+    equivalent to go.Violin(box_visible=True, meanline_visible=True, points='outliers', spanmode='hard').
+    Args:
+
+        summary (dict): Statistics from DistributionSummary.summarize with kde=True, or None for an empty violin
+        position (float): Position on the y axis
+        name (str): Name of the traces, shown on hover
+        fillcolor (str): Fill color of the violin
+        box_fillcolor (str): Fill color of the inner box
+        width (float): Width of the violin in y axis units
+        box_width (float): Width of the inner box as a fraction of the violin width
+        pointpos (float): Position of the outliers relative to the violin half width
+
+    Return:
+        list: plotly traces
+    """
+    if summary is None or summary['med'] is None:
+        return []
+    half = width / 2
+    kde_x = summary['kde_x']
+    kde_y = summary['kde_y'] / summary['kde_y'].max() * half
+    line = dict(width=0.7, color='black')
+
+    traces = [go.Scatter(
+        x=np.concatenate([kde_x, kde_x[::-1]]),
+        y=np.concatenate([position + kde_y, position - kde_y[::-1]]),
+        fill='toself',
+        fillcolor=fillcolor,
+        line=line,
+        mode='lines',
+        name=name,
+        showlegend=False,
+        hoverinfo='name',
+    )]
+
+    box_half = half * box_width
+    q1, q3 = summary['q1'], summary['q3']
+    traces.append(go.Scatter(
+        x=[q1, q3, q3, q1, q1],
+        y=[position - box_half, position - box_half, position + box_half, position + box_half, position - box_half],
+        fill='toself',
+        fillcolor=box_fillcolor,
+        line=line,
+        mode='lines',
+        name=name,
+        showlegend=False,
+        hoverinfo='skip',
+    ))
+    # Whiskers, median and the mean line across the violin
+    mean_half = np.interp(summary['mean'], kde_x, kde_y) if len(kde_x) > 1 else half
+    segments_x = [summary['whislo'], q1, None, q3, summary['whishi'], None,
+                  summary['med'], summary['med'], None, summary['mean'], summary['mean']]
+    segments_y = [position, position, None, position, position, None,
+                  position - box_half, position + box_half, None, position - mean_half, position + mean_half]
+    traces.append(go.Scatter(
+        x=segments_x,
+        y=segments_y,
+        line=line,
+        mode='lines',
+        name=name,
+        showlegend=False,
+        hoverinfo='skip',
+    ))
+    if len(summary['fliers']) > 0:
+        traces.append(go.Scatter(
+            x=summary['fliers'],
+            y=np.full(len(summary['fliers']), position + pointpos * half),
+            mode='markers',
+            marker=dict(size=1, color='black'),
+            name=name,
+            showlegend=False,
+            hoverinfo='x',
+        ))
+
+    return traces
@@ -0,0 +1,223 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import os
+
+import boto3
+import botocore
+import logging
+import polars as pl
+
+from comstockpostproc.naming_mixin import NamingMixin
+from comstockpostproc.units_mixin import UnitsMixin
+from comstockpostproc.s3_utilities_mixin import S3UtilitiesMixin
+from comstockpostproc.truth_data_store import TruthDataStore
+
+logger = logging.getLogger(__name__)
+
+# EIA truth data keyed on truth data version, see load_eia_truth_data()
+_EIA_TRUTH_DATA = {}
+
+
+def load_eia_truth_data(truth_data_version):
+    """
+    EIA truth data for every year, parsed once per truth data version and shared by every EIA object.
+    Args:
+
+        truth_data_version (str): The version of the EIA truth data. Example: 'v01'.
+
+    Return:
+        EIATruthData: monthly consumption and annual emissions for every year
+    """
+    if truth_data_version not in _EIA_TRUTH_DATA:
+        _EIA_TRUTH_DATA[truth_data_version] = EIATruthData(truth_data_version)
+
+    return _EIA_TRUTH_DATA[truth_data_version]
+
+
+class EIATruthData(NamingMixin, UnitsMixin, S3UtilitiesMixin):
+    # Source files, with their location on s3 under truth_data/<version>/EIA
+    ELEC_SALES_FILE_NAME = 'eia_form_861M_monthly_electricity_sales_to_commercial_customers_by_state.csv'
+    GAS_VOLUMES_FILE_NAME = 'eia_monthly_natural_gas_volumes_to_commercial_consumers_by_state.csv'
+    GAS_HEAT_CONTENT_FILE_NAME = 'eia_monthly_natural_gas_heat_content_per_volume_by_state.csv'
+    STATE_TABLE_FILE_NAME = 'state_region_division_table.csv'
+    EMISSIONS_FILE_NAME = 'eia_annual_commercial_emissions.csv'
+    S3_DIRS = {
+        ELEC_SALES_FILE_NAME: 'EIA Form 861',
+        GAS_VOLUMES_FILE_NAME: 'EIA Form 861',
+        GAS_HEAT_CONTENT_FILE_NAME: 'EIA Form 861',
+        STATE_TABLE_FILE_NAME: 'CBECS',
+        EMISSIONS_FILE_NAME: 'EIA Emissions Data',
+    }
+
+    # Columns of the monthly consumption table
+    YEAR = 'Year'
+    MONTH = 'Month'
+    GAS_KBTU = 'Natural gas consumption (thous Btu)'
+    ELEC_KWH = 'Electricity consumption (kWh)'
+
+    def __init__(self, truth_data_version):
+        """
+        Parses the EIA monthly electricity sales, natural gas volumes and heat contents, and annual emissions once,
+        keeping every year in one table each. EIA objects for any year are sliced from these tables.
+        Args:
+
+            truth_data_version (str): The version of the EIA truth data. Example: 'v01'.
+        """
+        self.Btu_to_kBtu = (1.0 / 1e3)
+        self.MWh_to_kWh = 1e3
+        self.MMcf_to_cf = 1e6
+        self.truth_data_version = truth_data_version
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        self.truth_data_dir = os.path.join(current_dir, '..', 'truth_data', self.truth_data_version)
+        self.s3_client = boto3.client('s3', config=botocore.client.Config(max_pool_connections=50))
+        self.processed_store = TruthDataStore(os.path.join(current_dir, '..', 'truth_data', 'processed'))
+
+        if not os.path.exists(self.truth_data_dir):
+            os.makedirs(self.truth_data_dir)
+        self.download_truth_data()
+
+        # Skip parsing if the store has the tables processed from the same inputs and code
+        input_paths = [os.path.join(self.truth_data_dir, f) for f in self.S3_DIRS.keys()]
+        artifact_key = self.processed_store.key(self, 'EIA', input_paths)
+        self.monthly = self.processed_store.load('EIA monthly', artifact_key)
+        self.emissions = self.processed_store.load('EIA emissions', artifact_key)
+        if self.monthly is None or self.emissions is None:
+            self.monthly = self.monthly_consumption_by_state()
+            self.emissions = self.annual_emissions_by_fuel()
+            self.processed_store.save('EIA monthly', artifact_key, self.monthly)
+            self.processed_store.save('EIA emissions', artifact_key, self.emissions)
+
+    def download_truth_data(self):
+        for file_name, s3_dir in self.S3_DIRS.items():
+            file_path = os.path.join(self.truth_data_dir, file_name)
+            if not os.path.exists(file_path):
+                s3_file_path = f'truth_data/{self.truth_data_version}/EIA/{s3_dir}/{file_name}'
+                self.read_delimited_truth_data_file_from_S3(s3_file_path, ',')
+
+    def read_truth_data_file(self, file_name):
+        file_path = os.path.join(self.truth_data_dir, file_name)
+        if not os.path.exists(file_path):
+            raise AssertionError(f'{file_name} not found, download truth data')
+
+        return pl.read_csv(file_path, infer_schema_length=None)
+
+    def melt_states(self, file_name, units_label, value_name):
+        # One row per year, month and state from a table with one column per state
+        wide = self.read_truth_data_file(file_name)
+        # remove the units and the leading 'the ' from DC
+        wide = wide.rename({c: c.replace(units_label, '').strip().replace('the ', '').strip() for c in wide.columns})
+        state_cols = [c for c in wide.columns if c not in [self.YEAR, self.MONTH]]
+        wide = wide.with_columns(
+            [pl.col(self.YEAR).cast(pl.Int64), pl.col(self.MONTH).cast(pl.Int64)] + [pl.col(c).cast(pl.Float64) for c in state_cols])
+
+        return wide.melt(id_vars=[self.YEAR, self.MONTH], value_vars=state_cols, variable_name='State', value_name=value_name)
+
+    def monthly_consumption_by_state(self):
+        """
+        Monthly natural gas and electricity consumption by state, for every year in the EIA data.
+        Natural gas energy is the delivered volume times the heat content of the gas in each state and month.
+
+        Return:
+            pl.DataFrame: Year, Month, FIPS Code, state abbreviation, Division, natural gas consumption in kBtu,
+            and electricity consumption in kWh, in the order of the states in the natural gas data
+        """
+        state_table = self.read_truth_data_file(self.STATE_TABLE_FILE_NAME)
+        state_table = state_table.rename({'State': self.STATE_NAME, 'State Code': self.STATE_ABBRV})
+        state_table = state_table.select([self.STATE_NAME, 'FIPS Code', self.STATE_ABBRV, 'Division'])
+
+        # Natural gas energy
+        gas_sales = self.melt_states(self.GAS_VOLUMES_FILE_NAME, '(MMcf)', 'Delivered Volume MMcf')
+        heat_content = self.melt_states(self.GAS_HEAT_CONTENT_FILE_NAME, '(BTU per Cubic Foot)', 'Heat Content BTU per cf')
+        eia_gas = (
+            gas_sales
+            .with_row_index('gas_row')
+            .join(heat_content, on=[self.YEAR, self.MONTH, 'State'], how='inner')
+            .rename({'State': self.STATE_NAME})
+            # Remove U.S. total row, leaving only States
+            .filter(pl.col(self.STATE_NAME) != 'U.S.')
+            .join(state_table, on=self.STATE_NAME, how='left')
+            .select([
+                'gas_row', self.YEAR, self.MONTH, 'FIPS Code', self.STATE_ABBRV, 'Division',
+                (pl.col('Delivered Volume MMcf') * self.MMcf_to_cf * pl.col('Heat Content BTU per cf') * self.Btu_to_kBtu).alias(self.GAS_KBTU),
+            ])
+        )
+
+        # Electricity, without notes at the end of the file
+        eia_electricity = self.read_truth_data_file(self.ELEC_SALES_FILE_NAME)
+        eia_electricity = (
+            eia_electricity
+            .rename({'State': self.STATE_ABBRV})
+            .with_row_index('elec_row')
+            .with_columns([
+                pl.col(self.YEAR).cast(pl.Float64, strict=False).cast(pl.Int64),
+                pl.col(self.MONTH).cast(pl.Float64, strict=False).cast(pl.Int64),
+            ])
+            # Note rows have no Year, and can have text in the other columns, so they are removed before converting sales
+            .filter(pl.col(self.YEAR).is_not_null())
+            .select([
+                'elec_row',
+                self.YEAR,
+                self.MONTH,
+                self.STATE_ABBRV,
+                (pl.col('Sales (Megawatthours)').cast(pl.Float64) * self.MWh_to_kWh).alias(self.ELEC_KWH),
+            ])
+        )
+
+        # Merge EIA gas and electricity datasets
+        eia = eia_gas.join(eia_electricity, on=[self.YEAR, self.MONTH, self.STATE_ABBRV], how='inner')
+
+        return eia.sort(['gas_row', 'elec_row']).drop(['gas_row', 'elec_row'])
+
+    def annual_emissions_by_fuel(self):
+        """
+        Annual commercial sector emissions of the fuels represented in ComStock, for every year in the EIA data.
+
+        Return:
+            pl.DataFrame: Year and the emissions of each fuel, named like the weighted ComStock emissions columns
+        """
+        eia_emissions = self.read_truth_data_file(self.EMISSIONS_FILE_NAME)
+
+        # Rename the EIA data to match ComStock emissions column names
+        weighted_ghg_units = 'co2e_mmt'
+        col_renames = {
+            'Commercial Share of Electric Power Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)':
+                self.col_name_to_weighted(self.GHG_ELEC_EGRID, weighted_ghg_units),
+            'Natural Gas, Excluding Supplemental Gaseous Fuels, Commercial Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)':
+                self.col_name_to_weighted(self.GHG_NATURAL_GAS, weighted_ghg_units),
+            'Distillate Fuel Oil Commercial Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)':
+                self.col_name_to_weighted(self.GHG_FUEL_OIL, weighted_ghg_units),
+            'Petroleum, Excluding Biofuels, Commercial Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)':
+                self.col_name_to_weighted(self.GHG_PROPANE, weighted_ghg_units),
+        }
+
+        # Downselect to the fuels represented in ComStock
+        return eia_emissions.rename(col_renames).select([self.YEAR] + list(col_renames.values()))
+
+    def monthly_consumption(self, year, dataset_name):
+        """
+        Monthly natural gas and electricity consumption by state for one year.
+        Args:
+
+            year (int): The year
+            dataset_name (str): Value of the dataset column
+
+        Return:
+            pl.DataFrame: Month, FIPS Code, state abbreviation, Division, dataset, natural gas consumption in kBtu,
+            and electricity consumption in kWh
+        """
+        return self.monthly.filter(pl.col(self.YEAR) == year).select([
+            self.MONTH, 'FIPS Code', self.STATE_ABBRV, 'Division', pl.lit(dataset_name).alias(self.DATASET), self.GAS_KBTU, self.ELEC_KWH
+        ])
+
+    def annual_emissions(self, year, dataset_name):
+        """
+        Annual emissions by fuel for one year.
+        Args:
+
+            year (int): The year
+            dataset_name (str): Value of the dataset column
+
+        Return:
+            pl.DataFrame: emissions of each fuel and dataset
+        """
+        return self.emissions.filter(pl.col(self.YEAR) == year).drop(self.YEAR).with_columns(pl.lit(dataset_name).alias(self.DATASET))
@@ -109,7 +109,8 @@ class GasCorrectionModelMixin():
         ### Sum CBECS natural gas consumption by building type and census division ###
 
         # create grouped df of values, weighted
-        df_cbecs_gb = cbecs.data.groupby([self.BLDG_TYPE, self.CEN_DIV])[wtd_gas_cols].sum()
+        df_cbecs_gb = cbecs.data.group_by([pl.col(self.BLDG_TYPE).cast(pl.Utf8), pl.col(self.CEN_DIV).cast(pl.Utf8)]).agg(pl.col(wtd_gas_cols).sum())
+        df_cbecs_gb = df_cbecs_gb.sort([self.BLDG_TYPE, self.CEN_DIV]).to_pandas().set_index([self.BLDG_TYPE, self.CEN_DIV])
 
         # determine enduse vs.total correction factor
         df_cbecs_gb.loc[:, 'sum_of_enduse'] = df_cbecs_gb.loc[:, wtd_gas_enduse_cols].sum(axis=1)
@@ -0,0 +1,225 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import os
+import atexit
+import logging
+import time
+
+import matplotlib.pyplot as plt
+import plotly.io as pio
+
+logger = logging.getLogger(__name__)
+
+# Set this environment variable to a profile name to change the profile without changing code
+PROFILE_ENV_VAR = 'COMSTOCKPOSTPROC_IMAGE_PROFILE'
+
+# Image export profiles
+#   max_dpi: upper limit on matplotlib DPI, None to use the DPI requested by the plot
+#   max_scale: upper limit on plotly image scale, None to use the scale requested by the plot
+#   vector: if True, matplotlib figures are saved as SVG and plotly figures as HTML, skipping rasterization
+EXPORT_PROFILES = {
+    'publication': {'max_dpi': None, 'max_scale': None, 'vector': False},
+    'draft': {'max_dpi': 72, 'max_scale': 1, 'vector': False},
+    'draft_vector': {'max_dpi': None, 'max_scale': None, 'vector': True},
+}
+
+# One exporter per process, shared by all plotting objects so the plotly renderer stays warm
+_EXPORTER = None
+
+
+class ImageExporter():
+    def __init__(self, profile='publication', batch_size=20):
+        """
+        Saves matplotlib and plotly figures using a named export profile.
+        Plotly figures are queued and written in batches through a single, long-lived renderer
+        instead of paying renderer startup for every figure. Errors writing a figure are kept
+        against its path and raised by the flush() call that asks for that figure.
+        Args:
+
+            profile (str): Name of a profile in EXPORT_PROFILES, like 'publication' or 'draft'
+            batch_size (int): Number of plotly figures queued before they are written
+        """
+        self.batch_size = batch_size
+        self.set_profile(profile)
+        self.queue = []
+        self.renderer_started = False
+        self.batch_supported = False
+        self.kaleido_server = None
+        # Error for each queued figure that could not be written, keyed on its path
+        self.errors = {}
+        self.n_exported = 0
+        self.export_time_s = 0.0
+        # Every path saved or queued, used to record which images a plot made
+        self.saved_paths = []
+
+    def set_profile(self, profile):
+        if profile not in EXPORT_PROFILES:
+            logger.error(f'Unknown image export profile {profile}, must be one of {list(EXPORT_PROFILES.keys())}')
+            raise Exception(f'Unknown image export profile {profile}, must be one of {list(EXPORT_PROFILES.keys())}')
+        self.profile = profile
+        self.settings = EXPORT_PROFILES[profile]
+
+    def _vector_path(self, fig_path, ext):
+        return f'{os.path.splitext(fig_path)[0]}.{ext}'
+
+    def save_matplotlib(self, fig_path, dpi=None, **kwargs):
+        """
+        Saves the current matplotlib figure, equivalent to plt.savefig(fig_path, dpi=dpi, **kwargs).
+        Args:
+
+            fig_path (str): Path of the image
+            dpi (float): Resolution requested by the plot, None for the figure default
+        """
+        start = time.perf_counter()
+        if self.settings['vector']:
+            fig_path = self._vector_path(fig_path, 'svg')
+        elif self.settings['max_dpi'] is not None:
+            if dpi is None:
+                dpi = plt.gcf().dpi
+            dpi = min(dpi, self.settings['max_dpi'])
+        if dpi is None:
+            plt.savefig(fig_path, **kwargs)
+        else:
+            plt.savefig(fig_path, dpi=dpi, **kwargs)
+        self.n_exported += 1
+        self.export_time_s += time.perf_counter() - start
+        self.saved_paths.append(fig_path)
+
+        return fig_path
+
+    def save_plotly(self, fig, fig_path, scale=None):
+        """
+        Queues a plotly figure for export, equivalent to fig.write_image(fig_path, scale=scale).
+        The figure is copied when queued, so it can be modified afterwards.
+        Args:
+
+            fig (plotly.graph_objects.Figure): Figure to save
+            fig_path (str): Path of the image
+            scale (float): Scale requested by the plot, None for the plotly default
+        """
+        if self.settings['vector']:
+            fig_path = self._vector_path(fig_path, 'html')
+            fig.write_html(fig_path)
+            self.n_exported += 1
+            self.saved_paths.append(fig_path)
+            return fig_path
+
+        if self.settings['max_scale'] is not None:
+            scale = self.settings['max_scale'] if scale is None else min(scale, self.settings['max_scale'])
+        self.queue.append((fig.to_dict(), fig_path, scale))
+        self.saved_paths.append(fig_path)
+        if len(self.queue) >= self.batch_size:
+            self._write(self._take_queue())
+
+        return fig_path
+
+    def _start_renderer(self):
+        # Keep one renderer process for the whole session. Kaleido 1.x needs to be asked to do this and
+        # supports batched writes, older versions keep their renderer alive between calls on their own.
+        if self.renderer_started:
+            return self.batch_supported
+        self.batch_supported = False
+        try:
+            import kaleido
+            if hasattr(kaleido, 'start_sync_server'):
+                kaleido.start_sync_server(silence_warnings=True)
+                self.kaleido_server = kaleido
+                self.batch_supported = hasattr(pio, 'write_images')
+        except Exception as e:
+            logger.debug(f'Could not start a persistent plotly renderer, using the default: {e}')
+        self.renderer_started = True
+        return self.batch_supported
+
+    def _take_queue(self, fig_paths=None):
+        # Remove and return the queued figures with the given paths, or all queued figures if None
+        if fig_paths is None:
+            queue, self.queue = self.queue, []
+            return queue
+        fig_paths = set(fig_paths)
+        queue = [q for q in self.queue if q[1] in fig_paths]
+        self.queue = [q for q in self.queue if q[1] not in fig_paths]
+        return queue
+
+    def _write(self, queue):
+        # Write plotly figures, recording an error against the path of each figure that could not be written
+        if len(queue) == 0:
+            return
+        batch_supported = self._start_renderer()
+        start = time.perf_counter()
+        written = False
+        if batch_supported:
+            figs, paths, scales = [list(x) for x in zip(*queue)]
+            try:
+                pio.write_images(figs, paths, scale=scales)
+                written = True
+            except Exception as e:
+                logger.debug(f'Batch export of {len(queue)} plotly figures failed, writing them one at a time: {e}')
+        if not written:
+            for fig, path, scale in queue:
+                try:
+                    pio.write_image(fig, path, scale=scale)
+                except Exception as e:
+                    logger.error(f'Could not write plotly figure {path}: {type(e).__name__}: {e}')
+                    self.errors[path] = f'{type(e).__name__}: {e}'
+
+        self.n_exported += len(queue)
+        self.export_time_s += time.perf_counter() - start
+        logger.debug(f'Exported {len(queue)} plotly figures in {time.perf_counter() - start:.1f} s')
+
+    def flush(self, fig_paths=None):
+        """
+        Writes queued plotly figures and raises if any of them could not be written.
+        Args:
+
+            fig_paths (list): Paths of the figures to write, like the images saved by one plot, and whose
+            errors are raised. If None, all queued figures are written and all errors are raised.
+        """
+        self._write(self._take_queue(fig_paths))
+        if fig_paths is None:
+            fig_paths = list(self.errors.keys())
+        errors = {p: self.errors.pop(p) for p in fig_paths if p in self.errors}
+        if len(errors) > 0:
+            raise Exception(f'Could not write {len(errors)} plotly figures: ' + '; '.join(f'{p}: {e}' for p, e in errors.items()))
+
+    def close(self):
+        # Write anything still queued, then stop the renderer
+        self.flush()
+        if self.kaleido_server is not None:
+            self.kaleido_server.stop_sync_server(silence_warnings=True)
+            self.kaleido_server = None
+        self.renderer_started = False
+
+
+def default_image_export_profile():
+    return os.environ.get(PROFILE_ENV_VAR, 'publication')
+
+
+def image_exporter(profile=None):
+    """
+    Returns the image exporter for this process, creating it on first use.
+    Args:
+
+        profile (str): Profile to use. If None, the COMSTOCKPOSTPROC_IMAGE_PROFILE environment variable
+        or 'publication' is used.
+
+    Return:
+        ImageExporter: exporter shared by all plotting objects in this process
+    """
+    global _EXPORTER
+    if profile is None:
+        profile = default_image_export_profile()
+    if _EXPORTER is None:
+        _EXPORTER = ImageExporter(profile)
+        # Write anything still queued when the interpreter exits
+        atexit.register(_EXPORTER.close)
+    elif profile != _EXPORTER.profile:
+        # Figures queued with the old profile are written with it, their errors are raised by their own flush
+        _EXPORTER._write(_EXPORTER._take_queue())
+        _EXPORTER.set_profile(profile)
+    return _EXPORTER
+
+
+def flush_image_exports():
+    # Write queued figures, called when a batch of plots is finished
+    if _EXPORTER is not None:
+        _EXPORTER.flush()
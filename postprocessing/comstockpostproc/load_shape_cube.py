@@ -0,0 +1,189 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import os
+import logging
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from comstockpostproc.calendar_features import add_calendar_features, SHOULDER_SEASONS
+from comstockpostproc.naming_mixin import NamingMixin
+from comstockpostproc.timeseries_query_planner import sum_building_types
+
+logger = logging.getLogger(__name__)
+
+
+class LoadShapeCube(NamingMixin):
+    # Columns of the cube, in addition to the upgrade name
+    COMPARISON = 'comparison'
+    STATE = 'state'
+    CUBE_BLDG_TYPE = 'building_type'
+    TIME = 'time'
+    ENDUSE = 'enduse'
+    KWH = 'kwh'
+
+    # Suffix of the weighted columns made by TimeseriesQueryPlanner, like electricity_fans_kwh_weighted
+    WEIGHTED_SUFFIX = '_kwh_weighted'
+
+    def __init__(self, cube_dir):
+        """
+        Weighted hourly loads by comparison, state, building type, upgrade and end use, stored as parquet
+        partitioned by comparison and state. A comparison is one set of upgrades compared to the baseline
+        of their applicable buildings, keyed on TimeseriesQueryPlanner.fingerprint().
+        Loads are queried from Athena once and every timeseries plot reads them from here.
+        Args:
+
+            cube_dir (str): Directory of the partitioned parquet dataset, created if it does not exist
+        """
+        self.cube_dir = cube_dir
+
+    def _partition_path(self, comparison, state):
+        return os.path.join(self.cube_dir, f'{self.COMPARISON}={comparison}', f'{self.STATE}={state}', 'part-0.parquet')
+
+    def has(self, comparison, state):
+        return os.path.exists(self._partition_path(comparison, state))
+
+    def write(self, comparison, state, loads):
+        """
+        Stores the loads of one state.
+        Args:
+
+            comparison (str): Comparison key, see TimeseriesQueryPlanner.fingerprint()
+            state (str): State abbreviation
+            loads (pd.DataFrame): Weighted loads from TimeseriesQueryPlanner.building_type_loads
+
+        Return:
+            str: path of the partition file
+        """
+        kwh_cols = [c for c in loads.columns if c.endswith(self.WEIGHTED_SUFFIX)]
+        bldg_type_col = [c for c in loads.columns if c not in kwh_cols + [self.TIME, self.UPGRADE_NAME]][0]
+        long = loads.melt(
+            id_vars=[bldg_type_col, self.TIME, self.UPGRADE_NAME],
+            value_vars=kwh_cols,
+            var_name=self.ENDUSE,
+            value_name=self.KWH
+        ).rename(columns={bldg_type_col: self.CUBE_BLDG_TYPE})
+        enduses = [c[:-len(self.WEIGHTED_SUFFIX)] for c in kwh_cols]
+        long[self.ENDUSE] = pd.Categorical(long[self.ENDUSE].str[:-len(self.WEIGHTED_SUFFIX)], categories=enduses)
+        for col in [self.CUBE_BLDG_TYPE, self.UPGRADE_NAME]:
+            long[col] = long[col].astype('category')
+
+        path = self._partition_path(comparison, state)
+        partition_dir = os.path.dirname(path)
+        if not os.path.exists(partition_dir):
+            os.makedirs(partition_dir)
+        # Write to a temporary file first so an interrupted run does not leave a partial partition
+        tmp_path = f'{path}.tmp'
+        long.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        logger.debug(f'Wrote {len(long)} rows of load shapes to {path}')
+
+        return path
+
+    def read(self, comparison, state):
+        # Loads of one state in long format
+        return pd.read_parquet(self._partition_path(comparison, state))
+
+    def query(self, comparisons=None, states=None, upgrade_names=None, building_types=None, enduses=None, freq=None):
+        """
+        Reads a slice of the cube, only reading the partitions and rows that match.
+        Args:
+
+            comparisons (list): Comparison keys, None for all
+            states (list): State abbreviations, None for all
+            upgrade_names (list): Upgrade names, including 'baseline', None for all
+            building_types (list): Building types as named in Athena, like 'small_office', None for all
+            enduses (list): End uses, like 'electricity_fans' or 'total_site_electricity', None for all
+            freq (str): If given, loads are summed to this pandas frequency, like 'D' or 'MS'
+
+        Return:
+            pd.DataFrame: loads in long format with comparison and state columns
+        """
+        if not os.path.exists(self.cube_dir):
+            logger.error(f'No load shape cube at {self.cube_dir}')
+            raise Exception(f'No load shape cube at {self.cube_dir}')
+        dataset = ds.dataset(self.cube_dir, format='parquet', partitioning='hive')
+        filters = None
+        for col, values in [
+            (self.COMPARISON, comparisons),
+            (self.STATE, states),
+            (self.UPGRADE_NAME, upgrade_names),
+            (self.CUBE_BLDG_TYPE, building_types),
+            (self.ENDUSE, enduses),
+        ]:
+            if values is None:
+                continue
+            expr = ds.field(col).isin(list(values))
+            filters = expr if filters is None else filters & expr
+        long = dataset.to_table(filter=filters).to_pandas()
+        if freq is not None:
+            long = self.resample(long, freq)
+
+        return long
+
+    def resample(self, long, freq):
+        """
+        Sums loads in long format to a coarser frequency.
+        Args:
+
+            long (pd.DataFrame): Loads from read or query
+            freq (str): pandas frequency, like 'D' or 'MS'
+
+        Return:
+            pd.DataFrame: loads in long format at the new frequency
+        """
+        keys = [c for c in long.columns if c not in [self.TIME, self.KWH]]
+        return long.groupby(keys + [pd.Grouper(key=self.TIME, freq=freq)], observed=True, as_index=False)[self.KWH].sum()
+
+    def wide(self, long, by=(NamingMixin.UPGRADE_NAME,)):
+        """
+        Sums loads over the dimensions not in by and makes one weighted kWh column per end use,
+        which is the layout the timeseries plots use.
+        Args:
+
+            long (pd.DataFrame): Loads from read or query
+            by (tuple): Columns to keep, in addition to time
+
+        Return:
+            pd.DataFrame: time, by and one <enduse>_kwh_weighted column per end use
+        """
+        by = list(by)
+        wide = long.pivot_table(index=[self.TIME] + by, columns=self.ENDUSE, values=self.KWH, aggfunc='sum', observed=True)
+        if isinstance(long[self.ENDUSE].dtype, pd.CategoricalDtype):
+            wide = wide[[e for e in long[self.ENDUSE].cat.categories if e in wide.columns]]
+        wide.columns = [f'{e}{self.WEIGHTED_SUFFIX}' for e in wide.columns]
+
+        return wide.reset_index()
+
+    def weighted_loads(self, comparison, state):
+        """
+        Weighted hourly loads of one state, summed over building types.
+        Args:
+
+            comparison (str): Comparison key, see TimeseriesQueryPlanner.fingerprint()
+            state (str): State abbreviation
+
+        Return:
+            tuple: baseline and upgrade pd.DataFrame with time, upgrade name and weighted kWh columns,
+            the same as TimeseriesQueryPlanner.weighted_loads
+        """
+        loads = self.wide(self.read(comparison, state), by=[self.CUBE_BLDG_TYPE, self.UPGRADE_NAME])
+        loads[self.UPGRADE_NAME] = loads[self.UPGRADE_NAME].astype(str)
+        return sum_building_types(loads)
+
+    def day_type_profile(self, long, by=(NamingMixin.UPGRADE_NAME, 'enduse')):
+        """
+        Average hourly load by season, day type, and hour of day.
+        Args:
+
+            long (pd.DataFrame): Loads from read or query
+            by (tuple): Columns to keep, loads are summed over the others before averaging
+
+        Return:
+            pd.DataFrame: by, Season, Day_Type, Hour_of_Day and the mean kwh, with the seasons of the
+            timeseries average plots
+        """
+        by = list(by)
+        hourly = long.groupby(by + [self.TIME], observed=True)[self.KWH].sum().reset_index(level=by)
+        hourly = add_calendar_features(hourly, seasons=SHOULDER_SEASONS)
+        return hourly.groupby(by + ['Season', 'Day_Type', 'Hour_of_Day'], observed=True, as_index=False)[self.KWH].mean()
@@ -0,0 +1,193 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import os
+import sys
+import contextlib
+import csv
+import json
+import logging
+import time
+
+try:
+    import resource
+except ImportError:
+    # resource is not available on Windows, peak RSS will not be recorded
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Set this environment variable to 1/true/yes to profile without changing the constructor call
+PROFILE_ENV_VAR = 'COMSTOCKPOSTPROC_PROFILE'
+
+# Shared no-op context returned for every stage when profiling is disabled
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def profiling_enabled_from_env():
+    return os.environ.get(PROFILE_ENV_VAR, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def peak_rss_mb():
+    # Peak resident set size of this process so far, in MB
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on MacOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / 1e6
+    return peak / 1e3
+
+
+def frame_shape_and_size(df):
+    # Return (rows, cols, size in MB) for a polars or pandas frame
+    if df is None:
+        return None, None, None
+    if hasattr(df, 'estimated_size'):
+        return df.height, df.width, df.estimated_size() / 1e6
+    if hasattr(df, 'memory_usage'):
+        return df.shape[0], df.shape[1], df.memory_usage(deep=False).sum() / 1e6
+    return None, None, None
+
+
+class PipelineProfiler():
+    def __init__(self, name, enabled=False, data_attr='data'):
+        """
+        Records wall time, CPU time, peak RSS, frame size and shape for each stage of a data pipeline.
+        When disabled, stage() returns a shared no-op context so the overhead is a single attribute check.
+        Args:
+
+            name (str): Name of the pipeline, used as the root of the flame summary and in file names
+            enabled (bool): If True, record stages. Also enabled by the COMSTOCKPOSTPROC_PROFILE environment variable.
+            data_attr (str): Name of the attribute holding the frame on the object passed to stage()
+        """
+        self.name = name
+        self.enabled = enabled or profiling_enabled_from_env()
+        self.data_attr = data_attr
+        self.stages = []
+        self._stack = []
+
+    def stage(self, stage_name, owner=None):
+        """
+        Context manager that profiles one stage of the pipeline.
+        Args:
+
+            stage_name (str): Name of the stage, typically the method being called
+            owner (object): Object whose data attribute is measured before and after the stage
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._record_stage(stage_name, owner)
+
+    @contextlib.contextmanager
+    def _record_stage(self, stage_name, owner):
+        self._stack.append(stage_name)
+        path = ';'.join([self.name] + self._stack)
+        _, _, size_before = frame_shape_and_size(getattr(owner, self.data_attr, None))
+        rss_before = peak_rss_mb()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_s = time.perf_counter() - wall_start
+            cpu_s = time.process_time() - cpu_start
+            rss_after = peak_rss_mb()
+            rows, cols, size_after = frame_shape_and_size(getattr(owner, self.data_attr, None))
+            self._stack.pop()
+            rec = {
+                'stage': stage_name,
+                'path': path,
+                'depth': len(self._stack),
+                'wall_time_s': wall_s,
+                'cpu_time_s': cpu_s,
+                'peak_rss_mb': rss_after,
+                'peak_rss_growth_mb': None if rss_after is None else rss_after - rss_before,
+                'frame_size_mb': size_after,
+                'frame_size_delta_mb': None if size_after is None or size_before is None else size_after - size_before,
+                'rows': rows,
+                'cols': cols,
+            }
+            self.stages.append(rec)
+            logger.debug(f'{self.name} stage {stage_name}: {wall_s:.2f} s wall, {cpu_s:.2f} s cpu, '
+                         f'frame {size_after} MB, {rows} rows x {cols} cols')
+
+    def total_wall_time(self):
+        return sum(s['wall_time_s'] for s in self.stages if s['depth'] == 0)
+
+    def flame_summary(self):
+        # Collapsed-stack lines (path;to;stage <self time in ms>) readable by flamegraph.pl and speedscope
+        child_time = {}
+        for s in self.stages:
+            parent = s['path'].rsplit(';', 1)[0]
+            child_time[parent] = child_time.get(parent, 0.0) + s['wall_time_s']
+        lines = []
+        for s in self.stages:
+            self_time = max(s['wall_time_s'] - child_time.get(s['path'], 0.0), 0.0)
+            lines.append(f"{s['path']} {int(round(self_time * 1000))}")
+        return lines
+
+    def text_summary(self, width=40):
+        # Human-readable table of stages with a bar proportional to wall time
+        total = self.total_wall_time()
+        lines = [f'{self.name} pipeline profile, total {total:.2f} s']
+        for s in self.stages:
+            frac = s['wall_time_s'] / total if total > 0 else 0.0
+            bar = '#' * int(round(frac * width))
+            indent = '  ' * s['depth']
+            lines.append(f"{indent}{s['stage']:<{40 - len(indent)}} {s['wall_time_s']:>9.2f} s {frac:>6.1%} {bar}")
+        return '\n'.join(lines)
+
+    def write_report(self, output_dir):
+        """
+        Writes JSON, CSV, collapsed-stack and text summaries of the recorded stages.
+        Args:
+
+            output_dir (str): Directory to write the report files into
+
+        Return:
+            list: paths of the files written
+        """
+        if not self.enabled or len(self.stages) == 0:
+            return []
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        base_name = f'{self.name} pipeline profile'.replace(' ', '_')
+        file_paths = []
+
+        # JSON run report
+        file_path = os.path.join(output_dir, f'{base_name}.json')
+        report = {
+            'name': self.name,
+            'total_wall_time_s': self.total_wall_time(),
+            'stages': self.stages,
+        }
+        with open(file_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        file_paths.append(file_path)
+
+        # CSV run report
+        file_path = os.path.join(output_dir, f'{base_name}.csv')
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.stages[0].keys()))
+            writer.writeheader()
+            writer.writerows(self.stages)
+        file_paths.append(file_path)
+
+        # Flame-style summaries
+        file_path = os.path.join(output_dir, f'{base_name}.folded')
+        with open(file_path, 'w') as f:
+            f.write('\n'.join(self.flame_summary()) + '\n')
+        file_paths.append(file_path)
+
+        file_path = os.path.join(output_dir, f'{base_name}.txt')
+        summary = self.text_summary()
+        with open(file_path, 'w') as f:
+            f.write(summary + '\n')
+        file_paths.append(file_path)
+
+        logger.info(summary)
+        logger.info(f'Wrote pipeline profile to {output_dir}')
+
+        return file_paths
@@ -0,0 +1,138 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import os
+import json
+import hashlib
+import logging
+import weakref
+
+import pandas as pd
+
+from comstockpostproc.code_version import code_version
+from comstockpostproc.image_export import default_image_export_profile
+
+logger = logging.getLogger(__name__)
+
+
+class PlotManifest():
+    # Increment when the fingerprint definition changes, which invalidates existing manifests
+    MANIFEST_VERSION = 3
+
+    def __init__(self, manifest_path):
+        """
+        Records a fingerprint for each plot so plots whose inputs have not changed can be skipped on rerun.
+        The fingerprint is a hash of the frame passed to the plot, the plot arguments, including frames passed as arguments, the image
+        settings of the plotting object, and the source code the plotting object runs.
+        Args:
+
+            manifest_path (str): Path of the JSON manifest, created if it does not exist
+        """
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self._column_hashes = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == self.MANIFEST_VERSION:
+                self.entries = manifest['plots']
+            else:
+                logger.info(f'Ignoring plot manifest {manifest_path} written by a different version')
+
+    def _column_hash(self, df, col):
+        # Hash of one column, cached for the life of the frame it came from. The cache holds a weak reference
+        # so it does not keep the frame alive, and an id reused by a new frame is not mistaken for the old one.
+        key = (id(df), col)
+        cached = self._column_hashes.get(key)
+        if cached is None or cached[0]() is not df:
+            values = pd.util.hash_pandas_object(df[col], index=False).to_numpy()
+            cached = (weakref.ref(df), hashlib.sha256(values.tobytes()).hexdigest())
+            self._column_hashes[key] = cached
+        return cached[1]
+
+    def data_hash(self, df):
+        """
+        Hash of every column of df. Frames are already projected to the columns their plots use, and hashing
+        what was actually passed does not depend on a list of column requirements being kept up to date.
+        Column hashes are cached, so frames shared by many plots are hashed once.
+        Args:
+
+            df (pd.DataFrame): Input data for the plot
+
+        Return:
+            str: hex digest
+        """
+        h = hashlib.sha256()
+        h.update(pd.util.hash_pandas_object(df.index).to_numpy().tobytes())
+        for col in df.columns:
+            h.update(f'{col}:{self._column_hash(df, col)}'.encode('utf-8'))
+        return h.hexdigest()
+
+    def settings(self, owner):
+        # Simple attributes of the owner, like image_type and name, which plots read in addition to their arguments
+        settings = {k: v for k, v in owner.__dict__.items() if isinstance(v, (str, int, float, bool))}
+        settings['image_export_profile'] = getattr(owner, 'image_export_profile', None) or default_image_export_profile()
+        return sorted(settings.items())
+
+    def _describe(self, value, hash_frames):
+        # Stand-in for a plot argument whose repr identifies it. The reprs of pandas objects are truncated and depend
+        # on display options, so frames and series, also inside dicts, lists and tuples, are replaced by their type,
+        # or by their data hash if hash_frames.
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            if not hash_frames:
+                return type(value).__name__
+            return self.data_hash(value.to_frame() if isinstance(value, pd.Series) else value)
+        if isinstance(value, dict):
+            return sorted(((k, self._describe(v, hash_frames)) for k, v in value.items()), key=lambda kv: repr(kv[0]))
+        if isinstance(value, (list, tuple)):
+            return type(value)(self._describe(v, hash_frames) for v in value)
+        return value
+
+    def key(self, task):
+        # Identifies a plot across runs: method, output directory and arguments other than the data in frames
+        params = repr(self._describe((task['args'], task['kwargs']), hash_frames=False))
+        return f"{task['name']} {hashlib.sha256(params.encode('utf-8')).hexdigest()[:16]}"
+
+    def fingerprint(self, owner, task, df):
+        """
+        Fingerprint of a plot task.
+        Args:
+
+            owner (object): Object with the plot methods
+            task (dict): Task created by PlotScheduler.add
+            df (pd.DataFrame): Input data for the task
+
+        Return:
+            str: hex digest
+        """
+        parts = [
+            task['method'],
+            repr(self._describe(task['args'], hash_frames=True)),
+            repr(self._describe(task['kwargs'], hash_frames=True)),
+            repr(self.settings(owner)),
+            self.data_hash(df),
+            code_version(type(owner)),
+        ]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def is_current(self, key, fingerprint):
+        # True if the plot was made from the same inputs and all of its images still exist
+        entry = self.entries.get(key)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return False
+        return all(os.path.exists(p) for p in entry['images'])
+
+    def record(self, key, fingerprint, images):
+        self.entries[key] = {'fingerprint': fingerprint, 'images': images}
+
+    def save(self):
+        manifest_dir = os.path.dirname(self.manifest_path)
+        if manifest_dir and not os.path.exists(manifest_dir):
+            os.makedirs(manifest_dir)
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'version': self.MANIFEST_VERSION, 'plots': self.entries}, f, indent=2, sort_keys=True)
+        logger.info(f'Wrote plot manifest to {self.manifest_path}')
+
+        # Column hashes of frames from this batch of plots are not needed again
+        self._column_hashes = {}
+
+        return self.manifest_path
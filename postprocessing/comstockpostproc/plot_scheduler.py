@@ -0,0 +1,269 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import os
+import csv
+import logging
+import shutil
+import tempfile
+import time
+import traceback
+
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+from joblib import Parallel, delayed
+from joblib.externals.loky import get_reusable_executor
+
+from comstockpostproc.image_export import image_exporter
+from comstockpostproc.plot_manifest import PlotManifest
+
+logger = logging.getLogger(__name__)
+
+# Frames read by this worker process, keyed on IPC file path, so each frame is loaded once per worker.
+# Only frames of the current run are kept.
+_WORKER_FRAMES = {}
+
+
+def write_frame_to_ipc(df, file_path):
+    # Write a pandas frame to an uncompressed Arrow IPC file that workers can memory-map
+    table = pa.Table.from_pandas(df)
+    with pa.OSFile(file_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_frame_from_ipc(file_path):
+    # Memory-map an Arrow IPC file and convert it to pandas, cached until the worker gets a task from another run.
+    # Columns are converted one block each, so numeric columns without nulls point into the map instead of being copied.
+    if file_path not in _WORKER_FRAMES:
+        run_dir = os.path.dirname(file_path)
+        for cached_path in [p for p in _WORKER_FRAMES if os.path.dirname(p) != run_dir]:
+            del _WORKER_FRAMES[cached_path]
+        table = pa.ipc.open_file(pa.memory_map(file_path, 'r')).read_all()
+        _WORKER_FRAMES[file_path] = table.to_pandas(split_blocks=True)
+    return _WORKER_FRAMES[file_path]
+
+
+def run_plot_task(owner, task, data):
+    # Call one plot method and return its timing record
+    start = time.perf_counter()
+    status = 'ok'
+    error = None
+    exporter = image_exporter(getattr(owner, 'image_export_profile', None))
+    n_saved = len(exporter.saved_paths)
+    try:
+        try:
+            getattr(owner, task['method'])(data, *task['args'], **task['kwargs'])
+        finally:
+            # Write the figures of this plot before it is reported, so an export error fails the plot that made it
+            exporter.flush(exporter.saved_paths[n_saved:])
+    except Exception as e:
+        status = 'failed'
+        error = f'{type(e).__name__}: {e}'
+        logger.error(f"Plot {task['name']} failed:\n{traceback.format_exc()}")
+    return {
+        'task': task['name'],
+        'method': task['method'],
+        'output_dir': task['output_dir'],
+        'worker_pid': os.getpid(),
+        'wall_time_s': time.perf_counter() - start,
+        'status': status,
+        'error': error,
+        'images': exporter.saved_paths[n_saved:],
+    }
+
+
+def run_plot_task_in_worker(owner_cls, owner_state, task, data_path):
+    # Rebuild a lightweight copy of the plotting object in the worker without its data frames
+    owner = owner_cls.__new__(owner_cls)
+    owner.__dict__.update(owner_state)
+    return run_plot_task(owner, task, read_frame_from_ipc(data_path))
+
+
+class PlotScheduler():
+    def __init__(self, max_workers=1, timing_report_name='plot_timing_report.csv', manifest_path=None, owner=None):
+        """
+        Collects plot method calls as tasks and renders them serially or in a pool of worker processes.
+        Input frames are written once to Arrow IPC files which the workers memory-map, so the data
+        is not pickled for every task.
+        Args:
+
+            max_workers (int): Number of worker processes. 1 renders in this process, -1 uses all CPUs.
+            timing_report_name (str): Name of the per-task timing report written by run()
+            manifest_path (str): Path of a PlotManifest. If given, plots whose fingerprint has not changed
+            since they were last made are skipped. If None, all plots are made.
+            owner (object): Object with the plot methods. If given and max_workers is 1, each plot is made
+            when it is added instead of in run(), so its input frame is not kept alive by the scheduler.
+        """
+        self.max_workers = max_workers
+        self.timing_report_name = timing_report_name
+        self.owner = owner
+        self.tasks = []
+        self.frames = {}
+        # Tasks already made by add() and their timing records, reported by the next run()
+        self.rendered = []
+        self.timings = []
+        self.manifest = None
+        if manifest_path is not None:
+            self.manifest = PlotManifest(manifest_path)
+
+    def add(self, method, df, *args, output_dir=None, **kwargs):
+        """
+        Adds a plot task. The call made is owner.method(df, *args, **kwargs).
+        Args:
+
+            method (str): Name of the PlottingMixin method to call
+            df (pd.DataFrame): Input data, shared between tasks that pass the same frame
+            output_dir (str): Directory the plot is written to, passed positionally after args if not None
+        """
+        if output_dir is not None:
+            args = args + (output_dir,)
+        task = {
+            'name': f'{method} {output_dir}',
+            'method': method,
+            'frame_id': id(df),
+            'args': args,
+            'kwargs': kwargs,
+            'output_dir': output_dir,
+        }
+        if self.owner is not None and self.max_workers == 1:
+            # Render now, nothing is gained by holding the frame until run() in a single process
+            self.rendered.append(self._render(self.owner, task, df))
+            return
+        if id(df) not in self.frames:
+            self.frames[id(df)] = df
+        self.tasks.append(task)
+
+    def _render(self, owner, task, df):
+        # Render one task in this process, or return a skipped record if its manifest fingerprint is unchanged
+        if self.manifest is not None:
+            task['manifest_key'] = self.manifest.key(task)
+            task['fingerprint'] = self.manifest.fingerprint(owner, task, df)
+            if self.manifest.is_current(task['manifest_key'], task['fingerprint']):
+                return task, self._skipped_timing(task)
+        return task, run_plot_task(owner, task, df)
+
+    def _skipped_timing(self, task):
+        return {
+            'task': task['name'],
+            'method': task['method'],
+            'output_dir': task['output_dir'],
+            'worker_pid': os.getpid(),
+            'wall_time_s': 0.0,
+            'status': 'skipped',
+            'error': None,
+            'images': self.manifest.entries[task['manifest_key']]['images'],
+        }
+
+    def run(self, owner, report_dir=None):
+        """
+        Renders all queued tasks, reports them with the tasks already made by add(), and clears the queue.
+        Args:
+
+            owner (object): Object with the plot methods, typically a comparison class
+            report_dir (str): Directory for the timing report, not written if None
+
+        Return:
+            list: timing record for each task
+        """
+        if len(self.tasks) == 0 and len(self.rendered) == 0:
+            return []
+
+        start = time.perf_counter()
+        if self.max_workers == 1:
+            # Release each frame once its last task has been made
+            last_use = {t['frame_id']: i for i, t in enumerate(self.tasks)}
+            results = []
+            for i, t in enumerate(self.tasks):
+                results.append(self._render(owner, t, self.frames[t['frame_id']]))
+                if last_use[t['frame_id']] == i:
+                    del self.frames[t['frame_id']]
+        else:
+            tasks, skipped = self._tasks_to_run(owner)
+            timings = self._run_in_pool(owner, tasks) if len(tasks) > 0 else []
+            results = [(None, s) for s in skipped] + list(zip(tasks, timings))
+        results = self.rendered + results
+        total_s = time.perf_counter() - start
+
+        timings = [timing for task, timing in results]
+        n_skipped = len([t for t in timings if t['status'] == 'skipped'])
+        logger.info(f'Rendered {len(timings) - n_skipped} plots in {total_s:.1f} s using {self.max_workers} workers, skipped {n_skipped} unchanged plots')
+        if self.manifest is not None:
+            # Only plots whose images were all written are recorded, anything else is made again next time
+            for task, timing in results:
+                if timing['status'] == 'ok' and all(os.path.exists(p) for p in timing['images']):
+                    self.manifest.record(task['manifest_key'], task['fingerprint'], timing['images'])
+            self.manifest.save()
+        self.timings += timings
+        if report_dir is not None:
+            self.write_timing_report(report_dir)
+
+        self.tasks = []
+        self.frames = {}
+        self.rendered = []
+
+        # Report failures after all other plots have been made
+        failed = [t for t in timings if t['status'] == 'failed']
+        for t in failed:
+            logger.error(f"Plot {t['task']} failed with {t['error']}")
+        if len(failed) > 0:
+            raise Exception(f'{len(failed)} of {len(timings)} plots failed, see log for details')
+
+        return timings
+
+    def _tasks_to_run(self, owner):
+        # Split the queue into tasks to render and timing records for tasks whose fingerprint is unchanged
+        if self.manifest is None:
+            return self.tasks, []
+        tasks = []
+        skipped = []
+        for t in self.tasks:
+            t['manifest_key'] = self.manifest.key(t)
+            t['fingerprint'] = self.manifest.fingerprint(owner, t, self.frames[t['frame_id']])
+            if self.manifest.is_current(t['manifest_key'], t['fingerprint']):
+                skipped.append(self._skipped_timing(t))
+            else:
+                tasks.append(t)
+        return tasks, skipped
+
+    def _run_in_pool(self, owner, tasks):
+        # Share each input frame through an Arrow IPC file and send workers only the file path
+        ipc_dir = tempfile.mkdtemp(prefix='comstock_plots_')
+        try:
+            frame_paths = {}
+            for frame_id in dict.fromkeys(t['frame_id'] for t in tasks):
+                frame_paths[frame_id] = os.path.join(ipc_dir, f'{frame_id}.arrow')
+                write_frame_to_ipc(self.frames[frame_id], frame_paths[frame_id])
+
+            # Attributes of the owner, excluding frames, objects holding frames like datasets, and this scheduler,
+            # are sent to the workers
+            owner_state = {}
+            for k, v in owner.__dict__.items():
+                if isinstance(v, (pd.DataFrame, pl.DataFrame, PlotScheduler)):
+                    continue
+                if any(isinstance(x, (pd.DataFrame, pl.DataFrame)) for x in getattr(v, '__dict__', {}).values()):
+                    continue
+                owner_state[k] = v
+
+            timings = Parallel(n_jobs=self.max_workers, verbose=0)(
+                delayed(run_plot_task_in_worker)(type(owner), owner_state, t, frame_paths[t['frame_id']]) for t in tasks)
+        finally:
+            shutil.rmtree(ipc_dir, ignore_errors=True)
+            # Stop the workers, which frees the frames they loaded instead of keeping them for the life of the process
+            get_reusable_executor().shutdown(wait=True)
+
+        return timings
+
+    def write_timing_report(self, report_dir):
+        # Per-task timing report, slowest first
+        if not os.path.exists(report_dir):
+            os.makedirs(report_dir)
+        file_path = os.path.join(report_dir, self.timing_report_name)
+        timings = sorted(self.timings, key=lambda t: t['wall_time_s'], reverse=True)
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=[k for k in timings[0].keys() if k != 'images'], extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(timings)
+        logger.info(f'Wrote plot timing report to {file_path}')
+
+        return file_path
@@ -11,9 +11,16 @@ from matplotlib import ticker
 import plotly.express as px
 import seaborn as sns
 import plotly.graph_objects as go
-from buildstock_query import BuildStockQuery
 import matplotlib.colors as mcolors
+import matplotlib.patches as mpatches
+import colorsys
 from plotly.subplots import make_subplots
+from comstockpostproc.aggregation_cube import cube_for_frame
+from comstockpostproc.calendar_features import add_calendar_features, peak_weeks, SHOULDER_SEASONS
+from comstockpostproc.distribution_summary import summary_for_frame, violin_traces
+from comstockpostproc.image_export import image_exporter
+from comstockpostproc.load_shape_cube import LoadShapeCube
+from comstockpostproc.timeseries_query_planner import planner_for_frame
 
 matplotlib.use('Agg')
 logger = logging.getLogger(__name__)
@@ -32,18 +39,17 @@ class PlottingMixin():
         wtd_cols_enduse_ann_en = [self.col_name_to_weighted(c, 'tbtu') for c in cols_enduse_ann_en]
 
 
+        # pre-aggregated sums shared with the other plots of this data
+        cube = self.aggregation_cube(df, column_for_grouping)
+
         # plots for both applicable and total stock
         for applicable_scenario in ['stock', 'applicable_only']:
 
-            df_scen = df.copy()
-
+            # sums by grouping column, for all buildings or only buildings applicable to an upgrade
+            df_emi_gb = cube.sums(applicable_only=(applicable_scenario == 'applicable_only'))
+            df_emi_gb = df_emi_gb[[column_for_grouping] + wtd_cols_enduse_ann_en]
 
-            if applicable_scenario == 'applicable_only':
-                applic_bldgs = df_scen.loc[(df_scen[self.UPGRADE_NAME]!='Baseline') & (df_scen['applicability']==True), self.BLDG_ID]
-                df_scen = df_scen.loc[df_scen[self.BLDG_ID].isin(applic_bldgs), :]
-
-            # groupby and long format for plotting
-            df_emi_gb = (df_scen.groupby(column_for_grouping, observed=True)[wtd_cols_enduse_ann_en].sum()).reset_index()
+            # long format for plotting
             df_emi_gb = df_emi_gb.loc[:, (df_emi_gb !=0).any(axis=0)]
             df_emi_gb_long = df_emi_gb.melt(id_vars=[column_for_grouping], value_name='Annual Energy Consumption (TBtu)').sort_values(by='Annual Energy Consumption (TBtu)', ascending=False)
 
@@ -141,7 +147,7 @@ class PlottingMixin():
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
             fig_path_html = os.path.abspath(os.path.join(fig_sub_dir, fig_name_html))
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
             fig.write_html(fig_path_html)
 
     # plot for GHG emissions by fuel type for baseline and upgrade
@@ -151,8 +157,8 @@ class PlottingMixin():
         ghg_cols = self.GHG_FUEL_COLS
         wtd_ghg_cols = [self.col_name_to_weighted(c, 'co2e_mmt') for c in ghg_cols]
 
-        # groupby and long format for plotting
-        df_emi_gb = (df.groupby(column_for_grouping, observed=True)[wtd_ghg_cols].sum()).reset_index()
+        # pre-aggregated sums and long format for plotting
+        df_emi_gb = self.aggregation_cube(df, column_for_grouping).sums()[[column_for_grouping] + wtd_ghg_cols]
         df_emi_gb_long = df_emi_gb.melt(id_vars=[column_for_grouping], value_name='Annual GHG Emissions (MMT CO2e)').sort_values(by='Annual GHG Emissions (MMT CO2e)', ascending=False)
         df_emi_gb_long.loc[:, 'in.upgrade_name'] = df_emi_gb_long['in.upgrade_name'].astype(str)
 
@@ -271,7 +277,7 @@ class PlottingMixin():
         if not os.path.exists(fig_sub_dir):
             os.makedirs(fig_sub_dir)
         fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-        plt.savefig(fig_path, dpi=600, bbox_inches = 'tight')
+        self.save_matplotlib_figure(fig_path, dpi=600, bbox_inches = 'tight')
 
 
 
@@ -282,8 +288,8 @@ class PlottingMixin():
         util_cols = self.COLS_UTIL_BILLS + ['out.utility_bills.electricity_bill_max..usd', 'out.utility_bills.electricity_bill_min..usd']
         wtd_util_cols = [self.col_name_to_weighted(c, 'billion_usd') for c in util_cols]
 
-        # groupby and long format for plotting
-        df_emi_gb = (df.groupby(column_for_grouping, observed=True)[wtd_util_cols].sum()).reset_index()
+        # pre-aggregated sums and long format for plotting
+        df_emi_gb = self.aggregation_cube(df, column_for_grouping).sums()[[column_for_grouping] + wtd_util_cols]
         df_emi_gb_long = df_emi_gb.melt(id_vars=[column_for_grouping], value_name='Annual Utility Bill (Billion USD)').sort_values(by='Annual Utility Bill (Billion USD)', ascending=False)
         df_emi_gb_long.loc[:, 'in.upgrade_name'] = df_emi_gb_long['in.upgrade_name'].astype(str)
 
@@ -409,7 +415,7 @@ class PlottingMixin():
         if not os.path.exists(fig_sub_dir):
             os.makedirs(fig_sub_dir)
         fig_path = os.path.join(fig_sub_dir, fig_name)
-        plt.savefig(fig_path, dpi=600, bbox_inches = 'tight')
+        self.save_matplotlib_figure(fig_path, dpi=600, bbox_inches = 'tight')
 
 
     # Plot for GHG emissions by fuel for baseline and EIA data
@@ -430,15 +436,20 @@ class PlottingMixin():
             None,
         ]
 
+        # Sums by group are read from the pre-aggregated cube, one row per bar
+        cube = self.aggregation_cube(df, column_for_grouping)
+
         for col, agg_method in cols_to_summarize.items(): # loops through column names and provides agg function for specific column
 
             for group_by in group_bys: # loops through group by options
 
                 # Summarize the data
+                dims = () if group_by is None else (group_by,)
+                df_gb = cube.sums(dims)
                 if group_by is None:
                     # No group-by
                     g = sns.catplot(
-                        data=df,
+                        data=df_gb,
                         x=column_for_grouping,
                         hue=column_for_grouping,
                         y=col,
@@ -453,7 +464,7 @@ class PlottingMixin():
                 else:
                     # With group-by
                     g = sns.catplot(
-                        data=df,
+                        data=df_gb,
                         y=col,
                         estimator=agg_method,
                         hue=column_for_grouping,
@@ -495,7 +506,7 @@ class PlottingMixin():
                 title = title.replace('\n', '')
                 fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
                 fig_path = os.path.abspath(os.path.join(output_dir, fig_name))
-                plt.savefig(fig_path, bbox_inches = 'tight')
+                self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                 plt.close()
 
     def plot_floor_area_and_energy_totals(self, df, column_for_grouping, color_map, output_dir):
@@ -521,16 +532,21 @@ class PlottingMixin():
             self.VINTAGE,
         ]
 
+        # Sums by group are read from the pre-aggregated cube, one row per bar
+        cube = self.aggregation_cube(df, column_for_grouping)
+
         for col, agg_method in cols_to_summarize.items(): # loops through column names and provides agg function for specific column
 
             for group_by in group_bys: # loops through group by options
 
                 # Summarize the data
+                dims = () if group_by is None else (group_by,)
+                df_gb = cube.sums(dims)
                 if group_by is None:
 
                     # No group-by
                     g = sns.catplot(
-                        data=df,
+                        data=df_gb,
                         x=column_for_grouping,
                         hue=column_for_grouping,
                         y=col,
@@ -545,7 +561,7 @@ class PlottingMixin():
                 else:
                     # With group-by
                     g = sns.catplot(
-                        data=df,
+                        data=df_gb,
                         y=col,
                         estimator=agg_method,
                         hue=column_for_grouping,
@@ -587,7 +603,7 @@ class PlottingMixin():
                 fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
                 fig_name = fig_name.replace('_total_energy_consumption', '')
                 fig_path = os.path.abspath(os.path.join(output_dir, fig_name))
-                plt.savefig(fig_path, bbox_inches = 'tight')
+                self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                 plt.close()
 
     def plot_eui_boxplots(self, df, column_for_grouping, color_map, output_dir):
@@ -611,47 +627,21 @@ class PlottingMixin():
 
             # Make a plot for each group
             for group_by in group_bys:
+                # Draw from box plot statistics computed once per frame instead of passing every value to seaborn
+                mean_props = {"marker":"d",
+                    "markerfacecolor":"yellow",
+                    "markeredgecolor":"black",
+                    "markersize":"8"
+                }
                 if group_by is None:
                     # No group-by
-                    g = sns.catplot(
-                        data=df,
-                        y=column_for_grouping,
-                        hue=column_for_grouping,
-                        x=col,
-                        order=list(color_map.keys()),
-                        palette=color_map.values(),
-                        kind='box',
-                        orient='h',
-                        fliersize=0,
-                        showmeans=True,
-                        meanprops={"marker":"d",
-                            "markerfacecolor":"yellow",
-                            "markeredgecolor":"black",
-                            "markersize":"8"
-                        },
-                        legend=False
-                    )
+                    summaries = self.distribution_summary(df).summarize([col], [column_for_grouping])
+                    g = self.summary_boxplots(summaries, col, color_map, column_for_grouping, fliersize=0, showmeans=True, meanprops=mean_props)
                 else:
                     # With group-by
-                    g = sns.catplot(
-                        data=df,
-                        x=col,
-                        hue=column_for_grouping,
-                        y=group_by,
-                        order=self.ORDERED_CATEGORIES[group_by],
-                        hue_order=list(color_map.keys()),
-                        palette=color_map.values(),
-                        kind='box',
-                        orient='h',
-                        fliersize=0,
-                        showmeans=True,
-                        meanprops={"marker":"d",
-                            "markerfacecolor":"yellow",
-                            "markeredgecolor":"black",
-                            "markersize":"8"
-                        },
-                        aspect=2
-                    )
+                    summaries = self.distribution_summary(df).summarize([col], [group_by, column_for_grouping])
+                    g = self.summary_boxplots(summaries, col, color_map, column_for_grouping, group_by=group_by, categories=self.ORDERED_CATEGORIES[group_by],
+                                              aspect=2, fliersize=0, showmeans=True, meanprops=mean_props)
                     g._legend.set_title(self.col_name_to_nice_name(column_for_grouping))
 
                 fig = g.figure
@@ -686,7 +676,7 @@ class PlottingMixin():
                 fig_name = fig_name.replace('boxplot_of_', 'bp_')
                 fig_name = fig_name.replace('total_energy_consumption_', '')
                 fig_path = os.path.abspath(os.path.join(output_dir, fig_name))
-                plt.savefig(fig_path, bbox_inches = 'tight')
+                self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                 plt.close()
 
     def plot_energy_rate_boxplots(self, df, column_for_grouping, color_map, output_dir):
@@ -709,47 +699,21 @@ class PlottingMixin():
 
             # Make a plot for each group
             for group_by in group_bys:
+                # Draw from box plot statistics computed once per frame instead of passing every value to seaborn
+                mean_props = {"marker":"d",
+                    "markerfacecolor":"yellow",
+                    "markeredgecolor":"black",
+                    "markersize":"8"
+                }
                 if group_by is None:
                     # No group-by
-                    g = sns.catplot(
-                        data=df,
-                        y=column_for_grouping,
-                        hue=column_for_grouping,
-                        x=col,
-                        order=list(color_map.keys()),
-                        palette=color_map.values(),
-                        kind='box',
-                        orient='h',
-                        showfliers=False,
-                        showmeans=True,
-                        meanprops={"marker":"d",
-                            "markerfacecolor":"yellow",
-                            "markeredgecolor":"black",
-                            "markersize":"8"
-                        },
-                        legend=False
-                    )
+                    summaries = self.distribution_summary(df).summarize([col], [column_for_grouping])
+                    g = self.summary_boxplots(summaries, col, color_map, column_for_grouping, showfliers=False, showmeans=True, meanprops=mean_props)
                 else:
                     # With group-by
-                    g = sns.catplot(
-                        data=df,
-                        x=col,
-                        hue=column_for_grouping,
-                        y=group_by,
-                        order=self.ORDERED_CATEGORIES[group_by],
-                        hue_order=list(color_map.keys()),
-                        palette=color_map.values(),
-                        kind='box',
-                        orient='h',
-                        showfliers=False,
-                        showmeans=True,
-                        meanprops={"marker":"d",
-                            "markerfacecolor":"yellow",
-                            "markeredgecolor":"black",
-                            "markersize":"8"
-                        },
-                        aspect=2
-                    )
+                    summaries = self.distribution_summary(df).summarize([col], [group_by, column_for_grouping])
+                    g = self.summary_boxplots(summaries, col, color_map, column_for_grouping, group_by=group_by, categories=self.ORDERED_CATEGORIES[group_by],
+                                              aspect=2, showfliers=False, showmeans=True, meanprops=mean_props)
                     g._legend.set_title(self.col_name_to_nice_name(column_for_grouping))
 
                 fig = g.figure
@@ -784,7 +748,7 @@ class PlottingMixin():
                 fig_name = fig_name.replace('boxplot_of_', 'bp_')
                 # fig_name = fig_name.replace('total_energy_consumption_', '')
                 fig_path = os.path.abspath(os.path.join(output_dir, fig_name))
-                plt.savefig(fig_path, bbox_inches = 'tight')
+                self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                 plt.close()
 
     def plot_floor_area_and_energy_totals_by_building_type(self, df, column_for_grouping, color_map, output_dir):
@@ -809,11 +773,18 @@ class PlottingMixin():
             # self.VINTAGE,
         ]
 
+        # Sums by building type and group are read from the pre-aggregated cube, one row per bar
+        cube = self.aggregation_cube(df, column_for_grouping)
+        bldg_types = cube.sums((self.BLDG_TYPE,))[self.BLDG_TYPE].unique()
+
         for col, agg_method in cols_to_summarize.items():
-            for bldg_type, bldg_type_ts_df in df.groupby(self.BLDG_TYPE):
+            for bldg_type in bldg_types:
 
                 # Make a plot for each group
                 for group_by in group_bys:
+                    dims = (self.BLDG_TYPE,) if group_by is None else (self.BLDG_TYPE, group_by)
+                    bldg_type_ts_df = cube.sums(dims)
+                    bldg_type_ts_df = bldg_type_ts_df.loc[bldg_type_ts_df[self.BLDG_TYPE] == bldg_type, :]
                     if group_by is None:
                         # No group-by
                         g = sns.catplot(
@@ -880,7 +851,7 @@ class PlottingMixin():
                     if not os.path.exists(fig_sub_dir):
                         os.makedirs(fig_sub_dir)
                     fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-                    plt.savefig(fig_path, bbox_inches = 'tight')
+                    self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                     plt.close()
 
     def plot_end_use_totals_by_building_type(self, df, column_for_grouping, color_map, output_dir):
@@ -904,8 +875,14 @@ class PlottingMixin():
         # Extract the units from the name of the first column
         units = self.nice_units(self.units_from_col_name(wtd_end_use_cols[0]))
 
-        for bldg_type, bldg_type_df in df.groupby(self.BLDG_TYPE):
+        # Sums by building type and group are read from the pre-aggregated cube
+        cube = self.aggregation_cube(df, column_for_grouping)
+        bldg_types = cube.sums((self.BLDG_TYPE,))[self.BLDG_TYPE].unique()
+
+        for bldg_type in bldg_types:
             for group_by in group_bys:
+                bldg_type_df = cube.sums((self.BLDG_TYPE, group_by))
+                bldg_type_df = bldg_type_df.loc[bldg_type_df[self.BLDG_TYPE] == bldg_type, :]
                 var_name = 'End Use'
                 val_name = f'Energy Consumption ({units})'
                 tots_long = pd.melt(
@@ -965,7 +942,7 @@ class PlottingMixin():
                 if not os.path.exists(fig_sub_dir):
                     os.makedirs(fig_sub_dir)
                 fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-                plt.savefig(fig_path, bbox_inches = 'tight')
+                self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                 plt.close()
 
     def plot_eui_histograms_by_building_type(self, df, column_for_grouping, color_map, output_dir):
@@ -986,43 +963,51 @@ class PlottingMixin():
             # self.VINTAGE,
         ]
 
+        # Bin every column, building type and dataset in one pass, the datasets in each group share bin edges
+        n_bins = 100
+        summary = self.distribution_summary(df)
+        weight_col = self.col_name_to_weighted(self.FLR_AREA)
+        bldg_types = list(df.groupby(self.BLDG_TYPE, observed=True).groups.keys())
+        datasets = list(df.groupby(column_for_grouping, observed=True).groups.keys())
+
         for col in cols_to_summarize:
-            for bldg_type, bldg_type_ts_df in df.groupby(self.BLDG_TYPE):
+            for bldg_type in bldg_types:
                 # Group as specified
-                group_ts_dfs = {}
+                group_hists = {}
                 for group_by in group_bys:
                     if group_by is None:
                         # No group-by
-                        group_ts_dfs[None] = bldg_type_ts_df
+                        hists = summary.histograms(cols_to_summarize, [self.BLDG_TYPE], column_for_grouping, weight_col, n_bins)
+                        if (col, bldg_type) in hists:
+                            group_hists[None] = hists[(col, bldg_type)]
                     else:
                         # With group-by
-                        for group, group_ts_df in bldg_type_ts_df.groupby(group_by):
-                            group_ts_dfs[group] = group_ts_df
+                        hists = summary.histograms(cols_to_summarize, [self.BLDG_TYPE, group_by], column_for_grouping, weight_col, n_bins)
+                        for (hist_col, hist_bldg_type, group), hist in hists.items():
+                            if hist_col == col and hist_bldg_type == bldg_type:
+                                group_hists[group] = hist
 
                 # Plot a histogram for each group
-                for group, group_ts_df in group_ts_dfs.items():
-                    # Create a common bin size and count to use for both datasets
-                    min_eui = group_ts_df[col].min()
-                    max_eui = group_ts_df[col].max()
-                    # max_eui = group_ts_df[col].quantile(0.9)  # Could use 90th percentile to trim tails if desired
-                    n_bins = 100
-                    bin_size = (max_eui - min_eui) / n_bins
-                    logger.debug(f'bldg_type: {bldg_type}, min_eui: {min_eui}, max_eui: {max_eui}, n_bins: {n_bins}, bin_size: {bin_size}')
+                for group, hist in group_hists.items():
+                    # Common bin size and count used for all datasets
+                    bin_size = hist['bin_size']
+                    logger.debug(f"bldg_type: {bldg_type}, min_eui: {hist['edges'][0]}, max_eui: {hist['edges'][-1]}, n_bins: {n_bins}, bin_size: {bin_size}")
 
                     # Make the histogram
-                    for dataset, dataset_ts_df in group_ts_df.groupby(column_for_grouping):
-                        euis = dataset_ts_df[col]
-                        n_samples = len(euis)
+                    for dataset in datasets:
+                        if dataset not in hist['datasets']:
+                            continue
+                        dataset_hist = hist['datasets'][dataset]
 
                         # Select the color for this dataset
                         ds_color = color_map[dataset]
 
-                        # Weight each sample by the fraction of total sqft it represents, NOT by the fraction of the building count it represents
-                        wts = dataset_ts_df[self.col_name_to_weighted(self.FLR_AREA)] / dataset_ts_df[self.col_name_to_weighted(self.FLR_AREA)].sum()
-                        n, bins, barcontainer = plt.hist(euis, weights=wts, range=(min_eui, max_eui), bins=n_bins, alpha=0.75, label=f'{dataset}, n={n_samples}', color=ds_color)
+                        # Samples are weighted by the fraction of total sqft they represent, NOT by the fraction of the building count they represent.
+                        # The counts are already binned, so draw one sample at the left edge of each bin weighted by that bin's count.
+                        plt.hist(hist['edges'][:-1], weights=dataset_hist['counts'], bins=hist['edges'], alpha=0.75, label=f"{dataset}, n={dataset_hist['n']}", color=ds_color)
 
-                        # Calculate the area-weighted mean
-                        mean_eui = (euis * wts).sum()
+                        # Area-weighted mean
+                        mean_eui = dataset_hist['mean']
                         plt.axvline(x=mean_eui, ymin=0, ymax=0.02,  alpha=1, ls = '', marker = 'd', mec='black', ms=10, label=f'{dataset} Mean', color=ds_color)
 
                     # Extract the units from the column name
@@ -1051,7 +1036,7 @@ class PlottingMixin():
                     if not os.path.exists(fig_sub_dir):
                         os.makedirs(fig_sub_dir)
                     fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-                    plt.savefig(fig_path, bbox_inches = 'tight')
+                    self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                     plt.cla()
                     plt.close()
 
@@ -1156,7 +1141,7 @@ class PlottingMixin():
                     if not os.path.exists(fig_sub_dir):
                         os.makedirs(fig_sub_dir)
                     fig_path = os.path.abspath((os.path.join(fig_sub_dir, fig_name)))
-                    plt.savefig(fig_path, bbox_inches = 'tight')
+                    self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                     plt.close()
 
     def plot_measure_savings_distributions_by_building_type(self, df, output_dir):
@@ -1191,40 +1176,22 @@ class PlottingMixin():
             # remove unit from group_name
             group_name_wo_unit = group_name.rsplit(" ", 1)[0]
 
-            # filter to group and energy column
-            df_upgrade_plt = df_upgrade.loc[:, [col_group, energy_col]]
-
-            # apply method for filtering percent savings; this will not affect EUI
-            df_upgrade_plt = self.filter_outlier_pct_savings_values(df_upgrade_plt, 1)
+            # summarize each group without 0s and na values, filtering percent savings; this will not affect EUI
+            summaries = self.distribution_summary(df).summarize([energy_col], [col_group], drop_zeros=True, pct_limit=1,
+                                                                exclude_baseline=True, kde=True)
 
             # create figure template
             fig = go.Figure()
 
             # loop through groups, i.e. building type etc.
-            for group in li_group:
+            for i, group in enumerate(li_group):
 
-                # get data for enduse; remove 0s and na values
-                df_enduse = df_upgrade_plt.loc[(df_upgrade_plt[energy_col]!=0) & ((df_upgrade_plt[col_group]==group)), energy_col]
+                # precomputed distribution for the group
+                summary = summaries.get((energy_col, group))
+                n = 0 if summary is None else summary['n']
 
                 # add traces to plot
-                fig.add_trace(go.Violin(
-                    x=df_enduse,
-                    y=np.array(group),
-                    orientation = 'h',
-                    box_visible=True,
-                    points='outliers',
-                    pointpos=1,
-                    spanmode='hard',
-                    marker_size=1,
-                    showlegend=False,
-                    name=str(group) + f' (n={len(df_enduse)})',
-                    meanline_visible=True,
-                    line=dict(width=0.7),
-                    fillcolor=color_violin,
-                    box_fillcolor=color_interquartile,
-                    line_color='black',
-                    width=0.95
-                ))
+                fig.add_traces(violin_traces(summary, i, str(group) + f' (n={n})', color_violin, color_interquartile))
 
             fig.add_annotation(
                 align="right",
@@ -1243,14 +1210,14 @@ class PlottingMixin():
             # formatting and saving image
             fig.update_layout(template='simple_white', margin=dict(l=20, r=20, t=20, b=20), width=800)
             fig.update_xaxes(mirror=True, showgrid=True, zeroline=True, nticks=16, title=group_name)
-            fig.update_yaxes(mirror=True, showgrid=True, type='category', dtick=1)
+            fig.update_yaxes(mirror=True, showgrid=True, tickmode='array', tickvals=list(range(len(li_group))), ticktext=li_group, range=[-0.5, len(li_group) - 0.5])
             fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
             fig_name = fig_name.replace('_total_energy_consumption', '')
             fig_sub_dir = os.path.abspath(os.path.join(output_dir, 'savings_distributions'))
             if not os.path.exists(fig_sub_dir):
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
 
         return
 
@@ -1283,40 +1250,22 @@ class PlottingMixin():
             # remove unit from group_name
             group_name_wo_unit = group_name.rsplit(" ", 1)[0]
 
-            # filter to group and energy column
-            df_upgrade_plt = df_upgrade.loc[:, [col_group, energy_col]]
-
-            # apply method for filtering percent savings; this will not affect EUI
-            df_upgrade_plt = self.filter_outlier_pct_savings_values(df_upgrade_plt, 1)
+            # summarize each group without 0s and na values, filtering percent savings; this will not affect EUI
+            summaries = self.distribution_summary(df).summarize([energy_col], [col_group], drop_zeros=True, pct_limit=1,
+                                                                exclude_baseline=True, kde=True)
 
             # create figure template
             fig = go.Figure()
 
             # loop through groups, i.e. building type etc.
-            for group in li_group:
+            for i, group in enumerate(li_group):
 
-                # get data for enduse; remove 0s and na values
-                df_enduse = df_upgrade_plt.loc[(df_upgrade_plt[energy_col]!=0) & ((df_upgrade_plt[col_group]==group)), energy_col]
+                # precomputed distribution for the group
+                summary = summaries.get((energy_col, group))
+                n = 0 if summary is None else summary['n']
 
                 # add traces to plot
-                fig.add_trace(go.Violin(
-                    x=df_enduse,
-                    y=np.array(group),
-                    orientation = 'h',
-                    box_visible=True,
-                    points='outliers',
-                    pointpos=1,
-                    spanmode='hard',
-                    marker_size=1,
-                    showlegend=False,
-                    name=str(group) + f' (n={len(df_enduse)})',
-                    meanline_visible=True,
-                    line=dict(width=0.7),
-                    fillcolor=color_violin,
-                    box_fillcolor=color_interquartile,
-                    line_color='black',
-                    width=0.95
-                ))
+                fig.add_traces(violin_traces(summary, i, str(group) + f' (n={n})', color_violin, color_interquartile))
 
             fig.add_annotation(
                 align="right",
@@ -1335,14 +1284,14 @@ class PlottingMixin():
             # formatting and saving image
             fig.update_layout(template='simple_white', margin=dict(l=20, r=20, t=20, b=20), width=800)
             fig.update_xaxes(mirror=True, showgrid=True, zeroline=True, nticks=20, title=group_name)
-            fig.update_yaxes(mirror=True, showgrid=True, type='category', dtick=1)
+            fig.update_yaxes(mirror=True, showgrid=True, tickmode='array', tickvals=list(range(len(li_group))), ticktext=li_group, range=[-0.5, len(li_group) - 0.5])
             fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
             fig_name = fig_name.replace(r'_(usd/sqft/year,', '')
             fig_sub_dir = os.path.join(output_dir, 'savings_distributions')
             if not os.path.exists(fig_sub_dir):
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.join(fig_sub_dir, fig_name)
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
 
         return
 
@@ -1375,40 +1324,22 @@ class PlottingMixin():
             # remove unit from group_name
             group_name_wo_unit = group_name.rsplit(" ", 1)[0]
 
-            # filter to group and energy column
-            df_upgrade_plt = df_upgrade.loc[:, [col_group, energy_col]]
-
-            # apply method for filtering percent savings; this will not affect EUI
-            df_upgrade_plt = self.filter_outlier_pct_savings_values(df_upgrade_plt, 1)
+            # summarize each group without 0s and na values, filtering percent savings; this will not affect EUI
+            summaries = self.distribution_summary(df).summarize([energy_col], [col_group], drop_zeros=True, pct_limit=1,
+                                                                exclude_baseline=True, kde=True)
 
             # create figure template
             fig = go.Figure()
 
             # loop through groups, i.e. building type etc.
-            for group in li_group:
+            for i, group in enumerate(li_group):
 
-                # get data for enduse; remove 0s and na values
-                df_enduse = df_upgrade_plt.loc[(df_upgrade_plt[energy_col]!=0) & ((df_upgrade_plt[col_group]==group)), energy_col]
+                # precomputed distribution for the group
+                summary = summaries.get((energy_col, group))
+                n = 0 if summary is None else summary['n']
 
                 # add traces to plot
-                fig.add_trace(go.Violin(
-                    x=df_enduse,
-                    y=np.array(group),
-                    orientation = 'h',
-                    box_visible=True,
-                    points='outliers',
-                    pointpos=1,
-                    spanmode='hard',
-                    marker_size=1,
-                    showlegend=False,
-                    name=str(group) + f' (n={len(df_enduse)})',
-                    meanline_visible=True,
-                    line=dict(width=0.7),
-                    fillcolor=color_violin,
-                    box_fillcolor=color_interquartile,
-                    line_color='black',
-                    width=0.95
-                ))
+                fig.add_traces(violin_traces(summary, i, str(group) + f' (n={n})', color_violin, color_interquartile))
 
             fig.add_annotation(
                 align="right",
@@ -1427,14 +1358,14 @@ class PlottingMixin():
             # formatting and saving image
             fig.update_layout(template='simple_white', margin=dict(l=20, r=20, t=20, b=20), width=800)
             fig.update_xaxes(mirror=True, showgrid=True, zeroline=True, nticks=20, title=group_name)
-            fig.update_yaxes(mirror=True, showgrid=True, type='category', dtick=1)
+            fig.update_yaxes(mirror=True, showgrid=True, tickmode='array', tickvals=list(range(len(li_group))), ticktext=li_group, range=[-0.5, len(li_group) - 0.5])
             fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
             fig_name = fig_name.replace(r'_(usd/sqft/year,', '')
             fig_sub_dir = os.path.join(output_dir, 'savings_distributions')
             if not os.path.exists(fig_sub_dir):
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.join(fig_sub_dir, fig_name)
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
 
         return
 
@@ -1467,40 +1398,22 @@ class PlottingMixin():
             # remove unit from group_name
             group_name_wo_unit = group_name.rsplit(" ", 1)[0]
 
-            # filter to group and energy column
-            df_upgrade_plt = df_upgrade.loc[:, [col_group, energy_col]]
-
-            # apply method for filtering percent savings; this will not affect EUI
-            df_upgrade_plt = self.filter_outlier_pct_savings_values(df_upgrade_plt, 1)
+            # summarize each group without 0s and na values, filtering percent savings; this will not affect EUI
+            summaries = self.distribution_summary(df).summarize([energy_col], [col_group], drop_zeros=True, pct_limit=1,
+                                                                exclude_baseline=True, kde=True)
 
             # create figure template
             fig = go.Figure()
 
             # loop through groups, i.e. building type etc.
-            for group in li_group:
+            for i, group in enumerate(li_group):
 
-                # get data for enduse; remove 0s and na values
-                df_enduse = df_upgrade_plt.loc[(df_upgrade_plt[energy_col]!=0) & ((df_upgrade_plt[col_group]==group)), energy_col]
+                # precomputed distribution for the group
+                summary = summaries.get((energy_col, group))
+                n = 0 if summary is None else summary['n']
 
                 # add traces to plot
-                fig.add_trace(go.Violin(
-                    x=df_enduse,
-                    y=np.array(group),
-                    orientation = 'h',
-                    box_visible=True,
-                    points='outliers',
-                    pointpos=1,
-                    spanmode='hard',
-                    marker_size=1,
-                    showlegend=False,
-                    name=str(group) + f' (n={len(df_enduse)})',
-                    meanline_visible=True,
-                    line=dict(width=0.7),
-                    fillcolor=color_violin,
-                    box_fillcolor=color_interquartile,
-                    line_color='black',
-                    width=0.95
-                ))
+                fig.add_traces(violin_traces(summary, i, str(group) + f' (n={n})', color_violin, color_interquartile))
 
             fig.add_annotation(
                 align="right",
@@ -1519,14 +1432,14 @@ class PlottingMixin():
             # formatting and saving image
             fig.update_layout(template='simple_white', margin=dict(l=20, r=20, t=20, b=20), width=800)
             fig.update_xaxes(mirror=True, showgrid=True, zeroline=True, nticks=20, title=group_name)
-            fig.update_yaxes(mirror=True, showgrid=True, type='category', dtick=1)
+            fig.update_yaxes(mirror=True, showgrid=True, tickmode='array', tickvals=list(range(len(li_group))), ticktext=li_group, range=[-0.5, len(li_group) - 0.5])
             fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
             fig_name = fig_name.replace(r'_(usd/sqft/year,', '')
             fig_sub_dir = os.path.join(output_dir, 'savings_distributions')
             if not os.path.exists(fig_sub_dir):
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.join(fig_sub_dir, fig_name)
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
 
         return
 
@@ -1562,40 +1475,22 @@ class PlottingMixin():
             # remove unit from group_name
             group_name_wo_unit = group_name.rsplit(" ", 1)[0]
 
-            # filter to group and energy column
-            df_upgrade_plt = df_upgrade.loc[:, [col_group, energy_col]]
-
-            # apply method for filtering percent savings; this will not affect EUI metrics
-            df_upgrade_plt = self.filter_outlier_pct_savings_values(df_upgrade_plt, 1)
+            # summarize each group without 0s and na values, filtering percent savings; this will not affect EUI
+            summaries = self.distribution_summary(df).summarize([energy_col], [col_group], drop_zeros=True, pct_limit=1,
+                                                                exclude_baseline=True, kde=True)
 
             # create figure template
             fig = go.Figure()
 
             # loop through groups, i.e. building type etc.
-            for group in li_group:
+            for i, group in enumerate(li_group):
 
-                # get data for enduse; remove 0s and na values
-                df_enduse = df_upgrade_plt.loc[(df_upgrade_plt[energy_col]!=0) & ((df_upgrade_plt[col_group]==group)), energy_col]
+                # precomputed distribution for the group
+                summary = summaries.get((energy_col, group))
+                n = 0 if summary is None else summary['n']
 
                 # add traces to plot
-                fig.add_trace(go.Violin(
-                    x=df_enduse,
-                    y=np.array(group),
-                    orientation = 'h',
-                    box_visible=True,
-                    points='outliers',
-                    pointpos=1,
-                    spanmode='hard',
-                    marker_size=1,
-                    showlegend=False,
-                    name=str(group) + f' (n={len(df_enduse)})',
-                    meanline_visible=True,
-                    line=dict(width=0.7),
-                    fillcolor=color_violin,
-                    box_fillcolor=color_interquartile,
-                    line_color='black',
-                    width=0.95
-                ))
+                fig.add_traces(violin_traces(summary, i, str(group) + f' (n={n})', color_violin, color_interquartile))
 
             fig.add_annotation(
                 align="right",
@@ -1614,13 +1509,13 @@ class PlottingMixin():
             # formatting and saving image
             fig.update_layout(template='simple_white', margin=dict(l=20, r=20, t=20, b=20), width=800)
             fig.update_xaxes(mirror=True, showgrid=True, zeroline=True, nticks=16, title=group_name)
-            fig.update_yaxes(mirror=True, showgrid=True, type='category', dtick=1)
+            fig.update_yaxes(mirror=True, showgrid=True, tickmode='array', tickvals=list(range(len(li_group))), ticktext=li_group, range=[-0.5, len(li_group) - 0.5])
             fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
             fig_sub_dir = os.path.abspath(os.path.join(output_dir, 'savings_distributions'))
             if not os.path.exists(fig_sub_dir):
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
 
         return
 
@@ -1656,40 +1551,22 @@ class PlottingMixin():
             # remove unit from group_name
             group_name_wo_unit = group_name.rsplit(" ", 1)[0]
 
-            # filter to group and energy column
-            df_upgrade_plt = df_upgrade.loc[:, [col_group, energy_col]]
-
-            # apply method for filtering percent savings; this will not affect EUI
-            df_upgrade_plt = self.filter_outlier_pct_savings_values(df_upgrade_plt, 1)
+            # summarize each group without 0s and na values, filtering percent savings; this will not affect EUI
+            summaries = self.distribution_summary(df).summarize([energy_col], [col_group], drop_zeros=True, pct_limit=1,
+                                                                exclude_baseline=True, kde=True)
 
             # create figure template
             fig = go.Figure()
 
             # loop through groups, i.e. building type etc.
-            for group in li_group:
+            for i, group in enumerate(li_group):
 
-                # get data for enduse; remove 0s and na values
-                df_enduse = df_upgrade_plt.loc[(df_upgrade_plt[energy_col]!=0) & ((df_upgrade_plt[col_group]==group)), energy_col]
+                # precomputed distribution for the group
+                summary = summaries.get((energy_col, group))
+                n = 0 if summary is None else summary['n']
 
                 # add traces to plot
-                fig.add_trace(go.Violin(
-                    x=df_enduse,
-                    y=np.array(group),
-                    orientation = 'h',
-                    box_visible=True,
-                    points='outliers',
-                    pointpos=1,
-                    spanmode='hard',
-                    marker_size=1,
-                    showlegend=False,
-                    name=str(group) + f' (n={len(df_enduse)})',
-                    meanline_visible=True,
-                    line=dict(width=0.7),
-                    fillcolor=color_violin,
-                    box_fillcolor=color_interquartile,
-                    line_color='black',
-                    width=0.95
-                ))
+                fig.add_traces(violin_traces(summary, i, str(group) + f' (n={n})', color_violin, color_interquartile))
 
             fig.add_annotation(
                 align="right",
@@ -1708,13 +1585,13 @@ class PlottingMixin():
             # formatting and saving image
             fig.update_layout(template='simple_white', margin=dict(l=20, r=20, t=20, b=20), width=800)
             fig.update_xaxes(mirror=True, showgrid=True, zeroline=True, nticks=16, title=group_name, automargin=True)
-            fig.update_yaxes(mirror=True, showgrid=True, nticks=len(li_group), type='category', dtick=1, automargin=True)
+            fig.update_yaxes(mirror=True, showgrid=True, tickmode='array', tickvals=list(range(len(li_group))), ticktext=li_group, range=[-0.5, len(li_group) - 0.5], automargin=True)
             fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
             fig_sub_dir = os.path.abspath(os.path.join(output_dir, 'savings_distributions'))
             if not os.path.exists(fig_sub_dir):
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
 
 
         return
@@ -1748,40 +1625,27 @@ class PlottingMixin():
             # remove unit from savings_name
             savings_name_wo_unit = savings_name.rsplit(" ", 1)[0]
 
-            # apply method for filtering percent savings; this will not affect EUI
-            df_upgrade_plt = self.filter_outlier_pct_savings_values(df_upgrade[col_list], 1.5)
+            # summarize each column without 0s and na values, filtering percent savings; this will not affect EUI
+            summaries = self.distribution_summary(df).summarize(col_list, drop_zeros=True, pct_limit=1.5,
+                                                                exclude_baseline=True, kde=True)
+            li_col_names = []
 
             # create figure template
             fig = go.Figure()
 
             # loop through enduses
-            for enduse_col in col_list:
+            for i, enduse_col in enumerate(col_list):
 
-                # get data for enduse; remove 0s and na values
-                df_enduse = df_upgrade_plt.loc[(df_upgrade_plt[enduse_col]!=0), enduse_col]
+                # precomputed distribution for the column
+                summary = summaries.get((enduse_col,))
+                n = 0 if summary is None else summary['n']
 
                 # column name
-                col_name = self.col_name_to_nice_saving_name(df_enduse.name)
+                col_name = self.col_name_to_nice_saving_name(enduse_col)
 
                 # add traces to plot
-                fig.add_trace(go.Violin(
-                    x=df_enduse,
-                    y=np.array(col_name),
-                    orientation = 'h',
-                    box_visible=True,
-                    points='outliers',
-                    pointpos=1,
-                    spanmode='hard',
-                    marker_size=1,
-                    showlegend=False,
-                    name=str(col_name) + f'(n={len(df_enduse)})',
-                    meanline_visible=True,
-                    line=dict(width=0.7),
-                    fillcolor=color_violin,
-                    box_fillcolor=color_interquartile,
-                    line_color='black',
-                    width=0.95
-                ))
+                li_col_names.append(col_name)
+                fig.add_traces(violin_traces(summary, i, str(col_name) + f'(n={n})', color_violin, color_interquartile))
 
             fig.add_annotation(
                 align="right",
@@ -1800,13 +1664,13 @@ class PlottingMixin():
             # formatting and saving image
             fig.update_layout(template='simple_white', margin=dict(l=20, r=20, t=20, b=20), width=800)
             fig.update_xaxes(mirror=True, showgrid=True, zeroline=True, nticks=16, title=savings_name)
-            fig.update_yaxes(mirror=True, showgrid=True, nticks=len(li_pct_svgs_enduse_cols), type='category', dtick=1)
+            fig.update_yaxes(mirror=True, showgrid=True, tickmode='array', tickvals=list(range(len(li_col_names))), ticktext=li_col_names, range=[-0.5, len(li_col_names) - 0.5])
             fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
             fig_sub_dir = os.path.abspath(os.path.join(output_dir, 'savings_distributions'))
             if not os.path.exists(fig_sub_dir):
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
 
 
     ######
@@ -1832,20 +1696,23 @@ class PlottingMixin():
             # remove unit from savings_name
             savings_name_wo_unit = savings_name.rsplit(" ", 1)[0]
 
-            # apply method for filtering percent savings; this will not affect EUI
-            df_upgrade_plt = self.filter_outlier_pct_savings_values(df_upgrade[col_list], 1.5)
+            # summarize each column without 0s and na values, filtering percent savings; this will not affect EUI
+            summaries = self.distribution_summary(df).summarize(col_list, drop_zeros=True, pct_limit=1.5,
+                                                                exclude_baseline=True, kde=True)
+            li_col_names = []
 
             # create figure template
             fig = go.Figure()
 
             # loop through enduses
-            for enduse_col in col_list:
+            for i, enduse_col in enumerate(col_list):
 
-                # get data for enduse; remove 0s and na values
-                df_enduse = df_upgrade_plt.loc[(df_upgrade_plt[enduse_col]!=0), enduse_col]
+                # precomputed distribution for the column
+                summary = summaries.get((enduse_col,))
+                n = 0 if summary is None else summary['n']
 
                 # column name
-                col_name = self.col_name_to_nice_saving_name(df_enduse.name)
+                col_name = self.col_name_to_nice_saving_name(enduse_col)
                 # manually add "total"
                 col_name = col_name.replace('Utility Bills  Mean Bill  Intensity', 'Utility Bills Total Bill Intensity')
                 col_name = col_name.replace('Bill  Intensity', 'Bill Intensity')
@@ -1858,24 +1725,8 @@ class PlottingMixin():
 
 
                 # add traces to plot
-                fig.add_trace(go.Violin(
-                    x=df_enduse,
-                    y=np.array(col_name),
-                    orientation = 'h',
-                    box_visible=True,
-                    points='outliers',
-                    pointpos=1,
-                    spanmode='hard',
-                    marker_size=1,
-                    showlegend=False,
-                    name=str(col_name) + f'(n={len(df_enduse)})',
-                    meanline_visible=True,
-                    line=dict(width=0.7),
-                    fillcolor=color_violin,
-                    box_fillcolor=color_interquartile,
-                    line_color='black',
-                    width=0.95
-                ))
+                li_col_names.append(col_name)
+                fig.add_traces(violin_traces(summary, i, str(col_name) + f'(n={n})', color_violin, color_interquartile))
 
             fig.add_annotation(
                 align="right",
@@ -1894,14 +1745,14 @@ class PlottingMixin():
             # formatting and saving image
             fig.update_layout(template='simple_white', margin=dict(l=20, r=20, t=20, b=20), width=800)
             fig.update_xaxes(mirror=True, showgrid=True, zeroline=True, nticks=16, title=savings_name)
-            fig.update_yaxes(mirror=True, showgrid=True, nticks=len(li_pct_svgs_fuel_cols), type='category', dtick=1)
+            fig.update_yaxes(mirror=True, showgrid=True, tickmode='array', tickvals=list(range(len(li_col_names))), ticktext=li_col_names, range=[-0.5, len(li_col_names) - 0.5])
             fig_name = f'{title.replace(" ", "_").lower()}.{self.image_type}'
             fig_name = fig_name.replace(r'_(usd/sqft/year,', '')
             fig_sub_dir = os.path.join(output_dir, 'savings_distributions')
             if not os.path.exists(fig_sub_dir):
                 os.makedirs(fig_sub_dir)
             fig_path = os.path.join(fig_sub_dir, fig_name)
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
 
 
     ######
@@ -1940,7 +1791,7 @@ class PlottingMixin():
         if not os.path.exists(fig_sub_dir):
             os.makedirs(fig_sub_dir)
         fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-        violin_qoi_timing.write_image(fig_path, scale=10)
+        self.save_plotly_figure(violin_qoi_timing, fig_path, scale=10)
 
     def plot_qoi_max_use(self, df, column_for_grouping, color_map, output_dir):
 
@@ -1976,7 +1827,7 @@ class PlottingMixin():
         if not os.path.exists(fig_sub_dir):
             os.makedirs(fig_sub_dir)
         fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-        violin_qoi_timing.write_image(fig_path, scale=10)
+        self.save_plotly_figure(violin_qoi_timing, fig_path, scale=10)
 
     def plot_qoi_min_use(self, df, column_for_grouping, color_map, output_dir):
 
@@ -2012,7 +1863,96 @@ class PlottingMixin():
         if not os.path.exists(fig_sub_dir):
             os.makedirs(fig_sub_dir)
         fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
-        violin_qoi_timing.write_image(fig_path, scale=10)
+        self.save_plotly_figure(violin_qoi_timing, fig_path, scale=10)
+
+    def save_matplotlib_figure(self, fig_path, **kwargs):
+        # Save the current matplotlib figure using the image export profile of this object
+        return image_exporter(getattr(self, 'image_export_profile', None)).save_matplotlib(fig_path, **kwargs)
+
+    def save_plotly_figure(self, fig, fig_path, scale=None):
+        # Queue a plotly figure for export using the image export profile of this object
+        return image_exporter(getattr(self, 'image_export_profile', None)).save_plotly(fig, fig_path, scale=scale)
+
+    def aggregation_cube(self, df, column_for_grouping):
+        # Pre-aggregated sums and quantiles of df, built once and shared by every plot made from df
+        return cube_for_frame(df, column_for_grouping)
+
+    def distribution_summary(self, df):
+        # Box plot statistics and KDEs of df for all groups, built once and shared by every plot made from df
+        return summary_for_frame(df)
+
+    def summary_boxplots(self, summaries, col, color_map, hue_title=None, group_by=None, categories=None, aspect=1, fliersize=5, **kwargs):
+        """
+        Draws horizontal box plots from precomputed statistics, laid out like
+        sns.catplot(kind='box', orient='h') with one box per color_map entry in each category.
+        Args:
+
+            summaries (dict): Statistics from DistributionSummary.summarize keyed on (col, category, hue)
+            or (col, hue) if group_by is None
+            col (str): Column that was summarized
+            color_map (dict): Hue names and colors, in plot order
+            hue_title (str): Title of the legend
+            group_by (str): Column of the categories on the y axis, None for one box per hue
+            categories (list): Categories on the y axis, top to bottom
+            aspect (float): Aspect ratio of the figure, which is 5 inches tall
+            fliersize (float): Size of the outlier markers
+
+        Return:
+            sns.FacetGrid: grid with the box plots on its single axis
+        """
+        g = sns.FacetGrid(pd.DataFrame(), height=5, aspect=aspect)
+        ax = g.ax
+        hues = list(color_map.keys())
+        if group_by is None:
+            categories = hues
+
+        # Colors are desaturated and outlined in gray like seaborn
+        colors = {h: sns.desaturate(c, 0.75) for h, c in zip(hues, color_map.values())}
+        lum = min(colorsys.rgb_to_hls(*mcolors.to_rgb(c))[1] for c in colors.values()) * 0.6
+        linecolor = (lum, lum, lum)
+
+        width = 0.8 if group_by is None else 0.8 / len(hues)
+        for j, hue in enumerate(hues):
+            stats = []
+            positions = []
+            for i, category in enumerate(categories):
+                if group_by is None and category != hue:
+                    continue
+                key = (col, hue) if group_by is None else (col, category, hue)
+                summary = summaries.get(key)
+                if summary is None or summary['med'] is None:
+                    continue
+                stats.append(summary)
+                positions.append(i if group_by is None else i - 0.4 + width * (j + 0.5))
+            if len(stats) == 0:
+                continue
+            ax.bxp(
+                stats,
+                positions=positions,
+                widths=width,
+                capwidths=0.5 * width,
+                patch_artist=True,
+                vert=False,
+                manage_ticks=False,
+                boxprops={'facecolor': colors[hue], 'edgecolor': linecolor},
+                medianprops={'color': linecolor, 'solid_capstyle': 'butt'},
+                whiskerprops={'color': linecolor, 'solid_capstyle': 'butt'},
+                capprops={'color': linecolor},
+                flierprops={'markeredgecolor': linecolor, 'markersize': fliersize},
+                **kwargs
+            )
+
+        ax.set_yticks(range(len(categories)))
+        ax.set_yticklabels(categories)
+        ax.set_ylim(len(categories) - 0.5, -0.5)
+        ax.yaxis.grid(False)
+        g.set_axis_labels(col, hue_title if group_by is None else group_by)
+        g.tight_layout()
+        if group_by is not None:
+            handles = {h: mpatches.Patch(facecolor=colors[h], edgecolor=linecolor) for h in hues}
+            g.add_legend(legend_data=handles, title=hue_title, label_order=hues)
+
+        return g
 
     def filter_outlier_pct_savings_values(self, df, max_fraction_change):
 
@@ -2116,7 +2056,7 @@ class PlottingMixin():
                 title = title.replace('\n', '')
                 fig_name = f'com_eia_{title.replace(" ", "_").lower()}.{self.image_type}'
                 fig_path = os.path.abspath(os.path.join(output_dir, fig_name))
-                plt.savefig(fig_path, bbox_inches = 'tight')
+                self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                 plt.close()
 
     def plot_monthly_energy_consumption_for_eia(self, df, color_map, output_dir):
@@ -2179,7 +2119,7 @@ class PlottingMixin():
                     title = title.replace('\n', '')
                     fig_name = f'com_eia_{title.replace(" ", "_").lower()}.{self.image_type}'
                     fig_path = os.path.abspath(os.path.join(output_dir, fig_name))
-                    plt.savefig(fig_path, bbox_inches = 'tight')
+                    self.save_matplotlib_figure(fig_path, bbox_inches = 'tight')
                     plt.close()
 
 
@@ -2232,17 +2172,16 @@ class PlottingMixin():
 
 
     """
-    Seasonal load stacked area plots by daytype (weekday and weekdend) comparison
+    Seasonal load profiles by day type (weekday and weekend) for a ComStock run and AMI data, which are
+    shared by the day type comparison plots of every normalization
     Args:
         df: long form dataset with a comstock run and ami data
         region: region object from AMI class
-        building_type (str): building type
         color_map: hash with dataset names as the keys
-        output_dir (str): output directory
-        normalization (str): how to normalize the data. Default is 'None' which directly compares kwh_per_sf. Other options are 'Annual' and 'Daytype'. 'Annual' will normalize the data as a fraction compared to the total annual energy use. 'Daytype' will normalize to the energy use for the given day type.
-        save_graph_data (bool): set to true to save graph data
+    Return:
+        dict: hourly mean profiles for each day type, annual totals, and building counts
     """
-    def plot_day_type_comparison_stacked_by_enduse(self, df, region, building_type, color_map, output_dir, normalization='None', save_graph_data=False):
+    def ami_day_type_aggregates(self, df, region, color_map):
         summer_months = region['summer_months']
         winter_months = region['winter_months']
         shoulder_months = region['shoulder_months']
@@ -2297,9 +2236,6 @@ class PlottingMixin():
         comstock_data = comstock_data.reset_index().rename_axis(None, axis=1)
         comstock_data = comstock_data.set_index('timestamp')
         comstock_data = comstock_data.head(8760)
-        if normalization == 'Annual':
-          comstock_annual_total = comstock_data['total'].sum()
-          comstock_data = comstock_data / comstock_annual_total
 
         # Remove missing enduses from enduse list and enduse colors before plotting
         filtered_enduse_list = [col for col in enduse_list if col in comstock_data.columns]
@@ -2317,9 +2253,6 @@ class PlottingMixin():
         ami_data = ami_data.reset_index().rename_axis(None, axis=1)
         ami_data = ami_data.set_index('timestamp')
         ami_data = ami_data.head(8760)
-        if normalization == 'Annual':
-          ami_annual_total = ami_data.sum()
-          ami_data = ami_data / ami_annual_total
 
         # Assign sample uncertainty
         total_data = df.loc[df.enduse.isin(['total'])]
@@ -2330,55 +2263,144 @@ class PlottingMixin():
             sample_uncertainty.rename(columns={energy_column: 'sample_uncertainty'}, inplace=True)
             sample_uncertainty['sample_uncertainty'] = default_uncertainty
 
-        # comstock day type dictionary
-        comstock_day_type_dict = {}
+        # day types in each season
+        day_type_months = {}
         if summer_months:
-            comstock_day_type_dict.update({'Summer_Weekday': (comstock_data.index.weekday < 5)
-                                    & (comstock_data.index.month.isin(summer_months))})
-            comstock_day_type_dict.update({'Summer_Weekend': (comstock_data.index.weekday >= 5)
-                                    & (comstock_data.index.month.isin(summer_months))})
+            day_type_months.update({'Summer_Weekday': (True, summer_months), 'Summer_Weekend': (False, summer_months)})
         if winter_months:
-            comstock_day_type_dict.update({'Winter_Weekday': (comstock_data.index.weekday < 5)
-                                    & (comstock_data.index.month.isin(winter_months))})
-            comstock_day_type_dict.update({'Winter_Weekend': (comstock_data.index.weekday >= 5)
-                                    & (comstock_data.index.month.isin(winter_months))})
+            day_type_months.update({'Winter_Weekday': (True, winter_months), 'Winter_Weekend': (False, winter_months)})
         if shoulder_months:
-            comstock_day_type_dict.update({'Shoulder_Weekday': (comstock_data.index.weekday < 5)
-                                    & (comstock_data.index.month.isin(shoulder_months))})
-            comstock_day_type_dict.update({'Shoulder_Weekend': (comstock_data.index.weekday >= 5)
-                                    & (comstock_data.index.month.isin(shoulder_months))})
+            day_type_months.update({'Shoulder_Weekday': (True, shoulder_months), 'Shoulder_Weekend': (False, shoulder_months)})
+
+        def day_type_mask(index, weekday, months):
+            is_weekday = index.weekday < 5
+            return (is_weekday if weekday else ~is_weekday) & (index.month.isin(months))
+
+        # mean profile by hour of day for each day type
+        comstock_profiles = {}
+        ami_profiles = {}
+        uncertainty_profiles = {}
+        for day_type, (weekday, months) in day_type_months.items():
+            comstock_mask = day_type_mask(comstock_data.index, weekday, months)
+            comstock_profile = pd.DataFrame(comstock_data[comstock_mask])
+            comstock_profile['hour'] = comstock_profile.index.hour
+            comstock_profiles[day_type] = comstock_profile.groupby('hour').mean()
+
+            ami_mask = day_type_mask(ami_data.index, weekday, months)
+            ami_profile = pd.DataFrame(ami_data[ami_mask])
+            ami_profile['hour'] = ami_profile.index.hour
+            ami_profiles[day_type] = ami_profile.groupby('hour').mean()
+
+            s_uncertainty = pd.DataFrame(sample_uncertainty[ami_mask])
+            s_uncertainty['hour'] = s_uncertainty.index.hour
+            uncertainty_profiles[day_type] = s_uncertainty.groupby('hour').mean()
+
+        return {
+            'comstock_data_label': comstock_data_label,
+            'ami_data_label': ami_data_label,
+            'filtered_enduse_list': filtered_enduse_list,
+            'filtered_enduse_colors': filtered_enduse_colors,
+            'comstock_annual_total': comstock_data['total'].sum(),
+            'ami_annual_total': ami_data.sum(),
+            'comstock_profiles': comstock_profiles,
+            'ami_profiles': ami_profiles,
+            'uncertainty_profiles': uncertainty_profiles,
+            'comstock_counts': (comstock_count_min, comstock_count_avg, comstock_count_max),
+            'ami_counts': (ami_count_min, ami_count_avg, ami_count_max),
+        }
 
-        # ami day type dictionary
-        ami_day_type_dict = {}
-        if summer_months:
-            ami_day_type_dict.update({'Summer_Weekday': (ami_data.index.weekday < 5)
-                                    & (ami_data.index.month.isin(summer_months))})
-            ami_day_type_dict.update({'Summer_Weekend': (ami_data.index.weekday >= 5)
-                                    & (ami_data.index.month.isin(summer_months))})
-        if winter_months:
-            ami_day_type_dict.update({'Winter_Weekday': (ami_data.index.weekday < 5)
-                                    & (ami_data.index.month.isin(winter_months))})
-            ami_day_type_dict.update({'Winter_Weekend': (ami_data.index.weekday >= 5)
-                                    & (ami_data.index.month.isin(winter_months))})
-        if shoulder_months:
-            ami_day_type_dict.update({'Shoulder_Weekday': (ami_data.index.weekday < 5)
-                                    & (ami_data.index.month.isin(shoulder_months))})
-            ami_day_type_dict.update({'Shoulder_Weekend': (ami_data.index.weekday >= 5)
-                                    & (ami_data.index.month.isin(shoulder_months))})
+    def _normalized_day_type_profiles(self, aggregates, day_type, normalization):
+        # ComStock end use profile, AMI profile and ComStock total profile of a day type with the normalization applied
+        comstock_profile = aggregates['comstock_profiles'][day_type]
+        truth_data = aggregates['ami_profiles'][day_type]
+        if normalization == 'Annual':
+            comstock_profile = comstock_profile / aggregates['comstock_annual_total']
+            truth_data = truth_data / aggregates['ami_annual_total']
+        comstock_total = pd.DataFrame(comstock_profile['total'])
+        stack_data = comstock_profile[aggregates['filtered_enduse_list']]
+        if normalization == 'Daytype':
+            truth_data = truth_data / truth_data.sum()
+            stack_data = stack_data / stack_data.sum().sum()
+        return stack_data, truth_data, comstock_total
+
+    def _day_type_graph_type(self, normalization):
+        if normalization == 'Annual':
+            return 'Annual Normalized', "annual_normalized_day_type_comparison_by_enduse"
+        elif normalization == 'Daytype':
+            return 'Day Type Normalized', "daytype_normalized_day_type_comparison_by_enduse"
+        return '', "day_type_comparison_by_enduse"
+
+    def _day_type_plot_data(self, aggregates, region, building_type, day_type, graph_type, stack_data, truth_data, comstock_total):
+        # collect graph data
+        ami_count_min, ami_count_avg, ami_count_max = aggregates['ami_counts']
+        comstock_count_min, comstock_count_avg, comstock_count_max = aggregates['comstock_counts']
+        data_df = stack_data.copy()
+        data_df['hour'] = data_df.index
+        data_df['region'] = region['source_name']
+        data_df['building_type'] = building_type
+        data_df['day_type'] = day_type
+        data_df['ami_total'] = truth_data
+        data_df['graph_type'] = graph_type
+        data_df['ami_n_min'] = ami_count_min
+        data_df['ami_n_mean'] = ami_count_avg
+        data_df['ami_n_max'] = ami_count_max
+        data_df['comstock_n_min'] = comstock_count_min
+        data_df['comstock_n_mean'] = comstock_count_avg
+        data_df['comstock_n_max'] = comstock_count_max
+
+        # add comstock total
+        data_df['comstock_total'] = comstock_total
+        data_df['error'] = data_df['ami_total'] - data_df['comstock_total']
+        data_df['relative_error'] = (data_df['ami_total'] - data_df['comstock_total']) / data_df['ami_total']
+
+        return data_df.reset_index(drop=True)
+
+    def day_type_plot_data(self, aggregates, region, building_type, normalization='None'):
+        """
+        Data shown by plot_day_type_comparison_stacked_by_enduse, without drawing the plot.
+        Args:
+
+            aggregates (dict): Profiles from ami_day_type_aggregates
+            region (dict): region object from AMI class
+            building_type (str): building type
+            normalization (str): 'None', 'Annual', or 'Daytype'
+
+        Return:
+            pd.DataFrame: plot data for every day type
+        """
+        graph_type = self._day_type_graph_type(normalization)[1]
+        dfs = []
+        for day_type in aggregates['ami_profiles'].keys():
+            profiles = self._normalized_day_type_profiles(aggregates, day_type, normalization)
+            dfs.append(self._day_type_plot_data(aggregates, region, building_type, day_type, graph_type, *profiles))
+        return pd.concat([pd.DataFrame()] + dfs)
+
+    """
+    Seasonal load stacked area plots by daytype (weekday and weekdend) comparison
+    Args:
+        df: long form dataset with a comstock run and ami data
+        region: region object from AMI class
+        building_type (str): building type
+        color_map: hash with dataset names as the keys
+        output_dir (str): output directory
+        normalization (str): how to normalize the data. Default is 'None' which directly compares kwh_per_sf. Other options are 'Annual' and 'Daytype'. 'Annual' will normalize the data as a fraction compared to the total annual energy use. 'Daytype' will normalize to the energy use for the given day type.
+        save_graph_data (bool): set to true to save graph data
+        aggregates (dict): profiles from ami_day_type_aggregates, computed from df if None
+    """
+    def plot_day_type_comparison_stacked_by_enduse(self, df, region, building_type, color_map, output_dir, normalization='None', save_graph_data=False, aggregates=None):
+        if aggregates is None:
+            aggregates = self.ami_day_type_aggregates(df, region, color_map)
+        comstock_data_label = aggregates['comstock_data_label']
+        ami_data_label = aggregates['ami_data_label']
+        filtered_enduse_list = aggregates['filtered_enduse_list']
+        filtered_enduse_colors = aggregates['filtered_enduse_colors']
+        comstock_count_max = aggregates['comstock_counts'][2]
+        ami_count_max = aggregates['ami_counts'][2]
 
         # plot
         plt.figure(figsize=(20, 20))
         filename = (region['source_name'] + '_' + ami_data_label.lower().replace(' ', '') + '_' + building_type)
-        graph_type = ''
-        if normalization == 'Annual':
-            day_type_label = 'Annual Normalized'
-            graph_type = "annual_normalized_day_type_comparison_by_enduse"
-        elif normalization == 'Daytype':
-            day_type_label = 'Day Type Normalized'
-            graph_type = "daytype_normalized_day_type_comparison_by_enduse"
-        else:
-            day_type_label = ''
-            graph_type = "day_type_comparison_by_enduse"
+        day_type_label, graph_type = self._day_type_graph_type(normalization)
         plt.suptitle('{} Day Type Comparison by Enduse\n{} (n={}) vs. {} (n={})\n{}, {}'.format(day_type_label, comstock_data_label, comstock_count_max, ami_data_label, ami_count_max, region['source_name'], building_type), fontsize=24)
         filename = filename + "_" + graph_type
         plt.subplots_adjust(top=0.9)
@@ -2392,28 +2414,25 @@ class PlottingMixin():
 
         # calculate y_max in the plot
         y_max_buildstock = 0
-        for day_type in comstock_day_type_dict.keys():
-            y_max_temp = pd.DataFrame(comstock_data['total'][comstock_day_type_dict[day_type]])
-            y_max_temp['hour'] = y_max_temp.index.hour
-            y_max_temp = y_max_temp.groupby('hour').mean()
+        y_max_ami = 0
+        for day_type in aggregates['ami_profiles'].keys():
+            comstock_total = self._normalized_day_type_profiles(aggregates, day_type, normalization)[2]
             if normalization == 'Daytype':
-                y_max_temp_value = float(y_max_temp['total'].max()/y_max_temp['total'].sum())
+                y_max_temp_value = float(comstock_total['total'].max()/comstock_total['total'].sum())
             else:
-                y_max_temp_value = float(y_max_temp['total'].max())
+                y_max_temp_value = float(comstock_total['total'].max())
             if y_max_temp_value > y_max_buildstock:
                 y_max_buildstock = y_max_temp_value
 
-        y_max_ami = 0
-        for day_type in ami_day_type_dict.keys():
-            y_max_temp = pd.DataFrame(ami_data[ami_day_type_dict[day_type]])
-            y_max_temp['hour'] = y_max_temp.index.hour
-            y_max_temp_value = float(y_max_temp.groupby('hour').mean().max().iloc[0])
+            # the AMI maximum is not normalized to the day type
+            ami_profile = self._normalized_day_type_profiles(aggregates, day_type, 'Annual' if normalization == 'Annual' else 'None')[1]
+            y_max_temp_value = float(ami_profile.max().iloc[0])
             if y_max_temp_value > y_max_ami:
                 y_max_ami = y_max_temp_value
         y_max = max(y_max_buildstock, y_max_ami)
 
         plot_data_df = pd.DataFrame()
-        for day_type in ami_day_type_dict.keys():
+        for day_type in aggregates['ami_profiles'].keys():
             fig_n = fig_n + 1
             ax = plt.subplot(3, 2, fig_n)
             ax.spines['top'].set_color('black')
@@ -2422,22 +2441,8 @@ class PlottingMixin():
             ax.spines['left'].set_color('black')
             plt.rcParams.update({'font.size': 16})
 
-            # Truth data
-            truth_data = pd.DataFrame(ami_data[ami_data_label][ami_day_type_dict[day_type]])
-            truth_data['hour'] = truth_data.index.hour
-            truth_data = truth_data.groupby('hour').mean()
-            if normalization == 'Daytype':
-                truth_data_total = truth_data.sum()
-                truth_data = truth_data / truth_data_total
-
             # Stacked Enduses Plot
-            processed_data_for_stack_plot = pd.DataFrame(comstock_data[filtered_enduse_list][comstock_day_type_dict[day_type]])
-            processed_data_for_stack_plot['hour'] = processed_data_for_stack_plot.index.hour
-            processed_data_for_stack_plot = processed_data_for_stack_plot.groupby('hour').mean()
-            if normalization == 'Daytype':
-                processed_data_total = processed_data_for_stack_plot.sum().sum()
-                processed_data_for_stack_plot = processed_data_for_stack_plot / processed_data_total
-
+            processed_data_for_stack_plot, truth_data, comstock_total = self._normalized_day_type_profiles(aggregates, day_type, normalization)
             plt.stackplot(
                 processed_data_for_stack_plot.index,
                 processed_data_for_stack_plot.T,
@@ -2447,9 +2452,7 @@ class PlottingMixin():
 
             # Truth Data Plot
             y = truth_data
-            s_uncertainty = pd.DataFrame(sample_uncertainty[ami_day_type_dict[day_type]])
-            s_uncertainty['hour'] = s_uncertainty.index.hour
-            s_uncertainty = s_uncertainty.groupby('hour').mean()
+            s_uncertainty = aggregates['uncertainty_profiles'][day_type]
 
             # Upper Estimate
             upper_truth = pd.DataFrame(
@@ -2494,33 +2497,8 @@ class PlottingMixin():
             if fig_n % 2 != 0:
                 plt.ylabel(ylabel_text, fontsize=24)
 
-            # collect graph data
-            data_df = processed_data_for_stack_plot.copy()
-            data_df['hour'] = data_df.index
-            data_df['region'] = region['source_name']
-            data_df['building_type'] = building_type
-            data_df['day_type'] = day_type
-            #data_df['lci80'] = lower_truth
-            data_df['ami_total'] = truth_data
-            #data_df['uci80'] = upper_truth
-            data_df['graph_type'] = graph_type
-            data_df['ami_n_min'] = ami_count_min
-            data_df['ami_n_mean'] = ami_count_avg
-            data_df['ami_n_max'] = ami_count_max
-            data_df['comstock_n_min'] = comstock_count_min
-            data_df['comstock_n_mean'] = comstock_count_avg
-            data_df['comstock_n_max'] = comstock_count_max
-
-            # add comstock total
-            processed_total_data = pd.DataFrame(comstock_data['total'][comstock_day_type_dict[day_type]])
-            processed_total_data['hour'] = processed_total_data.index.hour
-            processed_total_data = processed_total_data.groupby('hour').mean()
-            data_df['comstock_total'] = processed_total_data
-            data_df['error'] = data_df['ami_total'] - data_df['comstock_total']
-            data_df['relative_error'] = (data_df['ami_total'] - data_df['comstock_total']) / data_df['ami_total']
-
             # add to total plot data
-            data_df = data_df.reset_index(drop=True)
+            data_df = self._day_type_plot_data(aggregates, region, building_type, day_type, graph_type, processed_data_for_stack_plot, truth_data, comstock_total)
             plot_data_df = pd.concat([plot_data_df, data_df])
 
         ax = plt.gca()
@@ -2529,7 +2507,7 @@ class PlottingMixin():
 
         # save plot
         output_path = os.path.abspath(os.path.join(output_dir, '%s.png' % (filename) ))
-        plt.savefig(output_path, bbox_inches='tight')
+        self.save_matplotlib_figure(output_path, bbox_inches='tight')
 
         # save graph data
         if save_graph_data:
@@ -2539,6 +2517,24 @@ class PlottingMixin():
         plt.close('all')
         return plot_data_df
 
+    """
+    Day type comparisons at every normalization and the load duration curve for one region and building type,
+    sharing the day type profiles between the day type comparisons
+    Args:
+        df: long form dataset with a comstock run and ami data for the region and building type
+        region: region object from AMI class
+        building_type (str): building type
+        color_map: hash with dataset names as the keys
+        output_dir (str): output directory
+        aggregates (dict): profiles from ami_day_type_aggregates, computed from df if None
+    """
+    def plot_ami_region_building_type(self, df, region, building_type, color_map, output_dir, aggregates=None):
+        if aggregates is None:
+            aggregates = self.ami_day_type_aggregates(df, region, color_map)
+        for normalization in ['None', 'Daytype', 'Annual']:
+            self.plot_day_type_comparison_stacked_by_enduse(df, region, building_type, color_map, output_dir, normalization=normalization, aggregates=aggregates)
+        self.plot_load_duration_curve(df, region, building_type, color_map, output_dir)
+
     """
     Load duration curve comparison
     Args:
@@ -2622,83 +2618,25 @@ class PlottingMixin():
         # output figure
         filename = region['source_name'] + '_' + ami_data_label.lower().replace(' ', '') + '_' + building_type + '_load_duration_curve_top_' + str(zoom_in_hours) + '_hours.png'
         output_path = os.path.abspath(os.path.join(output_dir, filename))
-        plt.savefig(output_path, bbox_inches='tight')
+        self.save_matplotlib_figure(output_path, bbox_inches='tight')
 
 
     # get weighted load profiles
-    def wgt_by_btype(self, df, run_data, dict_wgts, upgrade_num, state, upgrade_name):
+    def wgt_by_btype(self, df, state, states=None):
         """
         This method weights the timeseries profiles.
-        Returns dataframe with weighted kWh columns.
+        Returns dataframes with weighted kWh columns for the baseline and the upgrades.
+        Loads are read from the load shape cube in the output directory. States missing from the cube are
+        queried together, grouped by building type, see TimeseriesQueryPlanner, and added to the cube.
         """
-        btype_list = df[self.BLDG_TYPE].unique()
-
-        applic_bldgs_list = list(df.loc[(df[self.UPGRADE_NAME].isin(upgrade_name)) & (df[self.UPGRADE_APPL]==True), self.BLDG_ID])
-        applic_bldgs_list = [int(x) for x in applic_bldgs_list]
-
-        dfs_base=[]
-        dfs_up=[]
-        for btype in btype_list:
-
-            # get building weights
-            btype_wgt = dict_wgts[btype]
-
-            # apply weights by building type
-            def apply_wgts(df):
-                # Identify columns that contain 'kwh' in their names
-                kwh_columns = [col for col in df.columns if 'kwh' in col]
-
-                # Apply the weight and add the suffix 'weighted'
-                weighted_df = df[kwh_columns].apply(lambda x: x * btype_wgt).rename(columns=lambda x: x + '_weighted')
-                # Concatenate the new weighted columns with the original DataFrame without the unweighted 'kwh' columns
-                df_wgt = pd.concat([df.drop(columns=kwh_columns), weighted_df], axis=1)
-
-                return df_wgt
-
-            # baseline load data - aggregate electricity total only
-            df_base_ts_agg = run_data.agg.aggregate_timeseries(
-                                                                upgrade_id=0,
-                                                                enduses=(list(self.END_USES_TIMESERIES_DICT.values())+["total_site_electricity_kwh"]),
-                                                                restrict=[(('build_existing_model.building_type', [self.BLDG_TYPE_TO_SNAKE_CASE[btype]])),
-                                                                          ('state_abbreviation', [f"{state}"]),
-                                                                          (run_data.bs_bldgid_column, applic_bldgs_list),
-                                                                          ],
-                                                                timestamp_grouping_func='hour',
-                                                                get_query_only=False
-                                                                )
-
-            # add baseline data
-            df_base_ts_agg_weighted = apply_wgts(df_base_ts_agg)
-            df_base_ts_agg_weighted[self.UPGRADE_NAME] = 'baseline'
-            dfs_base.append(df_base_ts_agg_weighted)
-
-            for upgrade in upgrade_num:
-                # upgrade load data - all enduses
-                upgrade_ts_agg = run_data.agg.aggregate_timeseries(
-                                                                    upgrade_id=upgrade.astype(str),
-                                                                    enduses=(list(self.END_USES_TIMESERIES_DICT.values())+["total_site_electricity_kwh"]),
-                                                                    restrict=[(('build_existing_model.building_type', [self.BLDG_TYPE_TO_SNAKE_CASE[btype]])),
-                                                                            ('state_abbreviation', [f"{state}"]),
-                                                                            ],
-                                                                    timestamp_grouping_func='hour',
-                                                                    get_query_only=False
-                                                                    )
-
-                # add upgrade data
-                df_upgrade_ts_agg_weighted = apply_wgts(upgrade_ts_agg)
-                df_upgrade_ts_agg_weighted[self.UPGRADE_NAME] = self.dict_upid_to_upname[upgrade]
-                dfs_up.append(df_upgrade_ts_agg_weighted)
-
-
-        # concatinate and combine baseline data
-        dfs_base_combined = pd.concat(dfs_base, join='outer', ignore_index=True)
-        dfs_base_combined = dfs_base_combined.groupby(['time', self.UPGRADE_NAME], as_index=False)[dfs_base_combined.loc[:, dfs_base_combined.columns.str.contains('_kwh')].columns].sum()
-
-        # concatinate and combine upgrade data
-        dfs_upgrade_combined = pd.concat(dfs_up, join='outer', ignore_index=True)
-        dfs_upgrade_combined = dfs_upgrade_combined.groupby(['time', self.UPGRADE_NAME], as_index=False)[dfs_upgrade_combined.loc[:, dfs_upgrade_combined.columns.str.contains('_kwh')].columns].sum()
-
-        return dfs_base_combined, dfs_upgrade_combined
+        planner = planner_for_frame(df, self.comstock_run_name, self.dict_upid_to_upname)
+        cube = LoadShapeCube(os.path.join(self.output_dir, 'load_shape_cube'))
+        comparison = planner.fingerprint()
+        if not cube.has(comparison, state):
+            missing = [state] + [s for s in (states or []) if s != state and not cube.has(comparison, s)]
+            for s, loads in planner.building_type_loads(missing).items():
+                cube.write(comparison, s, loads)
+        return cube.weighted_loads(comparison, state)
 
     # plot
     order_list = [
@@ -2715,71 +2653,30 @@ class PlottingMixin():
                 'heat_recovery',
                 ]
 
-    def map_to_season(month):
-        if 3 <= month <= 5:
-            return 'Spring'
-        elif 6 <= month <= 8:
-            return 'Summer'
-        elif 9 <= month <= 11:
-            return 'Fall'
-        else:
-            return 'Winter'
-
     def plot_measure_timeseries_peak_week_by_state(self, df, output_dir, states, color_map, comstock_run_name): #, df, region, building_type, color_map, output_dir
 
-        # run crawler
-        run_data = BuildStockQuery('eulp',
-                                   'enduse',
-                                   self.comstock_run_name,
-                                   buildstock_type='comstock',
-                                   skip_reports=False)
-
         # get upgrade ID
         df_upgrade = df.loc[df[self.UPGRADE_ID]!=0, :]
         upgrade_num = list(df_upgrade[self.UPGRADE_ID].unique())
         upgrade_name = list(df_upgrade[self.UPGRADE_NAME].unique())
 
-        # get weights
-        dict_wgts = df_upgrade.groupby(self.BLDG_TYPE)[self.BLDG_WEIGHT].mean().to_dict()
-
         # apply queries and weighting
         for state, state_name in states.items():
-            dfs_base_combined, dfs_upgrade_combined = self.wgt_by_btype(df, run_data, dict_wgts, upgrade_num, state, upgrade_name)
+            dfs_base_combined, dfs_upgrade_combined = self.wgt_by_btype(df, state, list(states.keys()))
 
             # merge into single dataframe
             dfs_merged = pd.concat([dfs_base_combined, dfs_upgrade_combined], ignore_index=True)
 
-            # set index
+            # set index and add season, week, day, and hour for the simulation year
             dfs_merged.set_index("time", inplace=True)
-            dfs_merged['Month'] = dfs_merged.index.month
-
-            def map_to_season(month):
-                if 3 <= month <= 5:
-                    return 'Spring'
-                elif 6 <= month <= 8:
-                    return 'Summer'
-                elif 9 <= month <= 11:
-                    return 'Fall'
-                else:
-                    return 'Winter'
-
-            # Apply the mapping function to create the "Season" column
-            dfs_merged['Season'] = dfs_merged['Month'].apply(map_to_season)
-            dfs_merged['Week_of_Year'] = dfs_merged.index.isocalendar().week
-            dfs_merged['Day_of_Year'] = dfs_merged.index.dayofyear
-            dfs_merged['Day_of_Week'] = dfs_merged.index.dayofweek
-            dfs_merged['Hour_of_Day'] = dfs_merged.index.hour
-            dfs_merged['Year'] = dfs_merged.index.year
-            # make dec 31st last week of year
-            dfs_merged.loc[dfs_merged['Day_of_Year']==365, 'Week_of_Year'] = 55
-            dfs_merged = dfs_merged.loc[dfs_merged['Year']==2018, :]
+            dfs_merged = add_calendar_features(dfs_merged)
             max_peak = dfs_merged.loc[:, 'total_site_electricity_kwh_weighted'].max()
 
             # find peak week by season
             seasons = ['Spring', 'Summer', 'Fall', 'Winter']
+            season_peak_weeks = peak_weeks(dfs_merged, 'total_site_electricity_kwh_weighted')
             for season in seasons:
-                peak_week = dfs_merged.loc[dfs_merged['Season']==season, ["total_site_electricity_kwh_weighted", "Week_of_Year"]]
-                peak_week = peak_week.loc[peak_week["total_site_electricity_kwh_weighted"] == peak_week["total_site_electricity_kwh_weighted"].max(), "Week_of_Year"][0]
+                peak_week = season_peak_weeks[season]
 
 
                 # filter to the week
@@ -2892,45 +2789,21 @@ class PlottingMixin():
                 fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
                 fig_path_html = os.path.abspath(os.path.join(fig_sub_dir, fig_name_html))
 
-                fig.write_image(fig_path, scale=10)
+                self.save_plotly_figure(fig, fig_path, scale=10)
                 fig.write_html(fig_path_html)
 
             dfs_merged.to_csv(f"{fig_sub_dir}/timeseries_data_{state_name}.csv")
 
     def plot_measure_timeseries_season_average_by_state(self, df, output_dir, states, color_map, comstock_run_name):
 
-        # run crawler
-        run_data = BuildStockQuery('eulp',
-                                'enduse',
-                                self.comstock_run_name,
-                                buildstock_type='comstock',
-                                skip_reports=False)
-
         # get upgrade ID
         df_upgrade = df.loc[df[self.UPGRADE_ID]!=0, :]
         upgrade_num = list(df_upgrade[self.UPGRADE_ID].unique())
         upgrade_name = list(df_upgrade[self.UPGRADE_NAME].unique())
 
-        # get weights
-        dict_wgts = df_upgrade.groupby(self.BLDG_TYPE)[self.BLDG_WEIGHT].mean().to_dict()
-
         standard_colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
         upgrade_colors = {upgrade: standard_colors[i % len(standard_colors)] for i, upgrade in enumerate(upgrade_num)}
 
-        def map_to_season(month):
-            if 3 <= month <= 5 or 9 <= month <= 11:
-                return 'Shoulder'
-            elif 6 <= month <= 8:
-                return 'Summer'
-            else:
-                return 'Winter'
-
-        def map_to_dow(dow):
-            if dow < 5:
-                return 'Weekday'
-            else:
-                return 'Weekend'
-
         # apply queries and weighting
         for state, state_name in states.items():
 
@@ -2940,32 +2813,19 @@ class PlottingMixin():
             file_path = os.path.join(fig_sub_dir, f"timeseries_data_{state_name}.csv")
             dfs_merged=None
             if not os.path.exists(file_path):
-                dfs_base_combined, dfs_upgrade_combined = self.wgt_by_btype(df, run_data, dict_wgts, upgrade_num, state, upgrade_name)
+                dfs_base_combined, dfs_upgrade_combined = self.wgt_by_btype(df, state, list(states.keys()))
 
                 # merge into single dataframe
                 dfs_merged = pd.concat([dfs_base_combined, dfs_upgrade_combined], ignore_index=True)
 
-                # set index
+                # set index and add season, day type, and hour for the simulation year
                 dfs_merged.set_index("time", inplace=True)
-                dfs_merged['Month'] = dfs_merged.index.month
-
-                # Apply the mapping function to create the "Season" column
-                dfs_merged['Season'] = dfs_merged['Month'].apply(map_to_season)
-                dfs_merged['Week_of_Year'] = dfs_merged.index.isocalendar().week
-                dfs_merged['Day_of_Year'] = dfs_merged.index.dayofyear
-                dfs_merged['Hour_of_Day'] = dfs_merged.index.hour
-                dfs_merged['Day_of_Week'] = dfs_merged.index.dayofweek
-                dfs_merged['Day_Type'] = dfs_merged['Day_of_Week'].apply(map_to_dow)
-                dfs_merged['Year'] = dfs_merged.index.year
-
-                # make dec 31st last week of year
-                dfs_merged.loc[dfs_merged['Day_of_Year']==365, 'Week_of_Year'] = 55
-                dfs_merged = dfs_merged.loc[dfs_merged['Year']==2018, :]
+                dfs_merged = add_calendar_features(dfs_merged, seasons=SHOULDER_SEASONS)
             else:
                 print("Using existing timeseries file. Please delete if this is not the intent.")
                 dfs_merged = pd.read_csv(file_path)
-                dfs_merged['Season'] = dfs_merged['Month'].apply(map_to_season)
-                dfs_merged['Day_Type'] = dfs_merged['Day_of_Week'].apply(map_to_dow)
+                dfs_merged['Season'] = dfs_merged['Month'].map(SHOULDER_SEASONS)
+                dfs_merged['Day_Type'] = np.where(dfs_merged['Day_of_Week'] < 5, 'Weekday', 'Weekend')
 
             dfs_merged_gb = dfs_merged.groupby(['in.upgrade_name', 'Season', 'Day_Type', 'Hour_of_Day'])[dfs_merged.loc[:, dfs_merged.columns.str.contains('_kwh')].columns].mean().reset_index()
             max_peak = dfs_merged_gb.loc[:, 'total_site_electricity_kwh_weighted'].max()
@@ -3109,39 +2969,19 @@ class PlottingMixin():
             fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
             fig_path_html = os.path.abspath(os.path.join(fig_sub_dir, fig_name_html))
 
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
             fig.write_html(fig_path_html)
 
     def plot_measure_timeseries_annual_average_by_state_and_enduse(self, df, output_dir, states, color_map, comstock_run_name):
 
-        # run crawler
-        run_data = BuildStockQuery('eulp', 'enduse', self.comstock_run_name, buildstock_type='comstock', skip_reports=False)
-
         # get upgrade ID
         df_upgrade = df.loc[df[self.UPGRADE_ID] != 0, :]
         upgrade_num = list(df_upgrade[self.UPGRADE_ID].unique())
         upgrade_name = list(df_upgrade[self.UPGRADE_NAME].unique())
 
-        # get weights
-        dict_wgts = df_upgrade.groupby(self.BLDG_TYPE)[self.BLDG_WEIGHT].mean().to_dict()
-
         standard_colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
         upgrade_colors = {upgrade: standard_colors[i % len(standard_colors)] for i, upgrade in enumerate(upgrade_num)}
 
-        def map_to_season(month):
-            if 3 <= month <= 5 or 9 <= month <= 11:
-                return 'Shoulder'
-            elif 6 <= month <= 8:
-                return 'Summer'
-            else:
-                return 'Winter'
-
-        def map_to_dow(dow):
-            if dow < 5:
-                return 'Weekday'
-            else:
-                        return 'Weekend'
-
         # apply queries and weighting
         for state, state_name in states.items():
 
@@ -3153,31 +2993,18 @@ class PlottingMixin():
             dfs_merged=None
 
             if not os.path.exists(file_path):
-                dfs_base_combined, dfs_upgrade_combined = self.wgt_by_btype(df, run_data, dict_wgts, upgrade_num, state, upgrade_name)
+                dfs_base_combined, dfs_upgrade_combined = self.wgt_by_btype(df, state, list(states.keys()))
 
                 # merge into single dataframe
                 dfs_merged = pd.concat([dfs_base_combined, dfs_upgrade_combined], ignore_index=True)
 
-                # set index
+                # set index and add season and hour for the simulation year
                 dfs_merged.set_index("time", inplace=True)
-                dfs_merged['Month'] = dfs_merged.index.month
-
-                # Apply the mapping function to create the "Season" column
-                dfs_merged['Season'] = dfs_merged['Month'].apply(map_to_season)
-                dfs_merged['Week_of_Year'] = dfs_merged.index.isocalendar().week
-                dfs_merged['Day_of_Year'] = dfs_merged.index.dayofyear
-                dfs_merged['Hour_of_Day'] = dfs_merged.index.hour
-                dfs_merged['Day_of_Week'] = dfs_merged.index.dayofweek
-                dfs_merged['Day_Type'] = dfs_merged['Day_of_Week'].apply(map_to_dow)
-                dfs_merged['Year'] = dfs_merged.index.year
-
-                # make Dec 31st last week of year
-                dfs_merged.loc[dfs_merged['Day_of_Year'] == 365, 'Week_of_Year'] = 55
-                dfs_merged = dfs_merged.loc[dfs_merged['Year'] == 2018, :]
+                dfs_merged = add_calendar_features(dfs_merged, seasons=SHOULDER_SEASONS)
             else:
                 print("Using existing timeseries file. Please delete if this is not the intent.")
                 dfs_merged = pd.read_csv(file_path)
-                dfs_merged['Season'] = dfs_merged['Month'].apply(map_to_season)
+                dfs_merged['Season'] = dfs_merged['Month'].map(SHOULDER_SEASONS)
 
             dfs_merged_gb = dfs_merged.groupby(['in.upgrade_name', 'Season', 'Hour_of_Day'])[dfs_merged.loc[:, dfs_merged.columns.str.contains('_kwh')].columns].mean().reset_index()
             max_peak = dfs_merged_gb.loc[:, 'total_site_electricity_kwh_weighted'].max()
@@ -3314,6 +3141,6 @@ class PlottingMixin():
             fig_path = os.path.abspath(os.path.join(fig_sub_dir, fig_name))
             fig_path_html = os.path.abspath(os.path.join(fig_sub_dir, fig_name_html))
 
-            fig.write_image(fig_path, scale=10)
+            self.save_plotly_figure(fig, fig_path, scale=10)
             fig.write_html(fig_path_html)
 
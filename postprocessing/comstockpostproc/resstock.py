@@ -7,15 +7,27 @@ import boto3
 import logging
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 from comstockpostproc.resstock_naming_mixin import ResStockNamingMixin
 from comstockpostproc.units_mixin import UnitsMixin
 from comstockpostproc.s3_utilities_mixin import S3UtilitiesMixin
+from comstockpostproc.truth_data_store import TruthDataStore
 
 logger = logging.getLogger(__name__)
 
 
 class ResStock(ResStockNamingMixin, UnitsMixin, S3UtilitiesMixin):
+    # Number of units in the multifamily building, 'None' for other building types
+    MF_UNITS = 'in.geometry_building_number_units_mf'
+
+    # Multifamily building size bins, by the total floor area of the building, and the upper edge of each bin but the last
+    MF_SIZE_BINS = ['_1000', '1001_5000', '5001_10000', '10001_25000', '25001_50000',
+                    '50001_100000', '100001_200000', '200001_500000', '500001_1mil', 'over_1mil']
+    MF_SIZE_BIN_EDGES = [1_000, 5_000, 10_000, 25_000, 50_000, 100_000, 200_000, 500_000, 1_000_000]
+
     def __init__(self, s3_base_dir, resstock_run_name, resstock_run_version, resstock_year,
         truth_data_version, weighted_energy_units='tbtu', reload_from_csv=False, downselect_to_multifamily=True,
         multifamily_building_efficiency_ratio=0.75):
@@ -56,6 +68,7 @@ class ResStock(ResStockNamingMixin, UnitsMixin, S3UtilitiesMixin):
         self.data = None
         self.weighted_energy_units = weighted_energy_units
         self.s3_client = boto3.client('s3')
+        self.processed_store = TruthDataStore(os.path.join(current_dir, '..', 'truth_data', 'processed'))
         logger.info(f'Creating {self.dataset_name}')
 
         # Make directories
@@ -77,14 +90,24 @@ class ResStock(ResStockNamingMixin, UnitsMixin, S3UtilitiesMixin):
             logger.info(f'Reloading from CSV: {file_path}')
             self.data = pd.read_csv(file_path)
         else:
-            self.load_data()
-            self.rename_columns_and_convert_units()
-            self.add_weighted_area_and_energy_columns()
-            self.add_dataset_column()
-            self.add_building_type_group_column()
-            self.down_to_multifamily()
-            self.add_multifamily_size_bin_column()
-            self.reweight_to_multifamily_counts()
+            # Skip processing if the store has the data processed from the same inputs and code
+            artifact_key = self.processed_store.key(self, self.dataset_name, [os.path.join(self.data_dir, self.results_file_name)], {
+                'resstock_run_name': self.resstock_run_name,
+                'weighted_energy_units': self.weighted_energy_units,
+                'downselect_to_multifamily': self.downselect_to_multifamily,
+                'multifamily_building_efficiency_ratio': self.multifamily_building_efficiency_ratio,
+            })
+            self.data = self.processed_store.load(self.dataset_name, artifact_key)
+            if self.data is None:
+                self.load_data()
+                self.rename_columns_and_convert_units()
+                self.add_weighted_area_and_energy_columns()
+                self.add_dataset_column()
+                self.add_building_type_group_column()
+                self.down_to_multifamily()
+                self.add_multifamily_size_bin_column()
+                self.reweight_to_multifamily_counts()
+                self.processed_store.save(self.dataset_name, artifact_key, self.data)
 
             logger.debug('ResStock columns after adding all data:')
             for c in self.data.columns:
@@ -110,12 +133,50 @@ class ResStock(ResStockNamingMixin, UnitsMixin, S3UtilitiesMixin):
             raise FileNotFoundError(
                 f'Missing {data_file_path}, cannot load ResStock data')
 
-        self.data = pd.read_parquet(data_file_path)
+        # Only read the multifamily rows if the others will be dropped
+        if self.downselect_to_multifamily:
+            self.data = self.read_multifamily_rows(data_file_path)
+        else:
+            self.data = pd.read_parquet(data_file_path)
 
         logger.debug('ResStock columns before modification:')
         for c in self.data.columns:
             logger.debug(c)
 
+    def read_multifamily_rows(self, data_file_path):
+        """
+        Reads the multifamily rows of the results one row group at a time, so the other rows are never
+        converted to pandas and only one row group of them is in memory at once.
+        Args:
+
+            data_file_path (str): Path to the results parquet file
+
+        Return:
+            pd.DataFrame: results of the models in multifamily buildings, with the index of the file
+        """
+        parquet_file = pq.ParquetFile(data_file_path)
+        # Start from an empty table so a file without multifamily rows gives an empty frame with the file's columns
+        tables = [parquet_file.schema_arrow.empty_table()]
+        row_positions = [np.array([], dtype='int64')]
+        offset = 0
+        for i in range(parquet_file.num_row_groups):
+            units = parquet_file.read_row_group(i, columns=[self.MF_UNITS]).column(0)
+            is_mf = pc.invert(pc.fill_null(pc.equal(units, 'None'), False))
+            tables.append(parquet_file.read_row_group(i).filter(is_mf))
+            row_positions.append(np.flatnonzero(is_mf.to_numpy(zero_copy_only=False)) + offset)
+            offset += len(units)
+        data = pa.concat_tables(tables).to_pandas()
+
+        # A range index is not stored in the file, rebuild it for the rows that were read
+        pandas_metadata = parquet_file.schema_arrow.pandas_metadata or {}
+        index_cols = pandas_metadata.get('index_columns', [])
+        if len(index_cols) == 1 and isinstance(index_cols[0], dict) and index_cols[0]['kind'] == 'range':
+            index_col = index_cols[0]
+            row_positions = np.concatenate(row_positions)
+            data.index = pd.Index(index_col['start'] + index_col['step'] * row_positions, name=index_col['name'])
+
+        return data
+
     def rename_columns_and_convert_units(self):
         self.data.reset_index(inplace=True)  # bldg_id is the index, make a column
 
@@ -202,8 +263,8 @@ class ResStock(ResStockNamingMixin, UnitsMixin, S3UtilitiesMixin):
         else:
             logger.info('Downselecting ResStock to Multifamily buildings only')
             logger.debug(f'before downselect to multifamily, self.data[weight].sum() = {self.data["weight"].sum()}')
-            self.data = self.data.loc[~(self.data['in.geometry_building_number_units_mf'] == 'None')].copy()
-            self.data.loc[:, 'in.geometry_building_number_units_mf'] = pd.to_numeric(self.data['in.geometry_building_number_units_mf'])
+            self.data = self.data.loc[~(self.data[self.MF_UNITS] == 'None')].copy()
+            self.data[self.MF_UNITS] = pd.to_numeric(self.data[self.MF_UNITS])
             logger.debug(f'after downselect to multifamily, self.data[weight].sum() = {self.data["weight"].sum()}')
 
     def add_multifamily_size_bin_column(self):
@@ -212,44 +273,20 @@ class ResStock(ResStockNamingMixin, UnitsMixin, S3UtilitiesMixin):
             return
 
         # Estimate the rentable floor area of the building this unit is in
-        self.data.loc[:, 'in.rentable_floor_area_of_building_this_unit_is_in..ft2'] = self.data['in.geometry_building_number_units_mf'] * self.data[self.FLR_AREA]
+        self.data['in.rentable_floor_area_of_building_this_unit_is_in..ft2'] = self.data[self.MF_UNITS] * self.data[self.FLR_AREA]
 
         # Estimate the total floor area of the building the unit is in, including common areas
         ber = self.multifamily_building_efficiency_ratio
         logger.info(f'Assuming a rentable area to gross area ratio of {ber:.2f} when setting multifamily building size bins only.')
         logger.info(f'This is reflected ONLY in "{self.FLR_AREA_CAT}" and "in.total_floor_area_of_building_this_unit_is_in..ft2"')
         logger.info(f'It is not reflected in the weighted energy or floor area columns!')
-        self.data.loc[:, 'in.total_floor_area_of_building_this_unit_is_in..ft2'] = self.data['in.geometry_building_number_units_mf'] * self.data[self.FLR_AREA] / ber
-
-        # Put each model into a bin by floor area of the building the unit is inside
-        def size_bin(row):
-            sf = row['in.total_floor_area_of_building_this_unit_is_in..ft2']
-
-            # Bin the square footage
-            if sf < 1_000:
-                b = '_1000'
-            elif sf < 5_000:
-                b = '1001_5000'
-            elif sf < 10_000:
-                b = '5001_10000'
-            elif sf < 25_000:
-                b = '10001_25000'
-            elif sf < 50_000:
-                b = '25001_50000'
-            elif sf < 100_000:
-                b = '50001_100000'
-            elif sf < 200_000:
-                b = '100001_200000'
-            elif sf < 500_000:
-                b = '200001_500000'
-            elif sf < 1_000_000:
-                b = '500001_1mil'
-            else:
-                b = 'over_1mil'
-
-            return b
-
-        self.data.loc[:, self.FLR_AREA_CAT] = self.data.apply(lambda row: size_bin(row), axis=1)
+        self.data['in.total_floor_area_of_building_this_unit_is_in..ft2'] = self.data[self.MF_UNITS] * self.data[self.FLR_AREA] / ber
+
+        # Put each model into a bin by floor area of the building the unit is inside,
+        # with unknown floor areas in the largest bin
+        sf = self.data['in.total_floor_area_of_building_this_unit_is_in..ft2'].to_numpy(dtype='float64')
+        bin_idx = np.digitize(sf, self.MF_SIZE_BIN_EDGES)
+        self.data[self.FLR_AREA_CAT] = np.array(self.MF_SIZE_BINS, dtype=object)[bin_idx]
 
     def reweight_to_multifamily_counts(self):
     # Changes the weights from the ResStock convention of representing number of units
@@ -262,14 +299,9 @@ class ResStock(ResStockNamingMixin, UnitsMixin, S3UtilitiesMixin):
 
         # Reweight to approximate number of multifamily buildings of the given size represented by
         # the results for this model.
-        def reweight_to_bldg_count(row):
-            sf_of_building_unit_is_in = row['in.rentable_floor_area_of_building_this_unit_is_in..ft2']
-            sf_represented_by_results = row[self.FLR_AREA] * row['weight']
-            num_bldgs_represented_by_results = sf_represented_by_results / sf_of_building_unit_is_in
-
-            return num_bldgs_represented_by_results
-
-        self.data.loc[:, self.BLDG_WEIGHT] = self.data.apply(lambda row: reweight_to_bldg_count(row), axis=1)
+        sf_of_building_unit_is_in = self.data['in.rentable_floor_area_of_building_this_unit_is_in..ft2']
+        sf_represented_by_results = self.data[self.FLR_AREA] * self.data['weight']
+        self.data[self.BLDG_WEIGHT] = sf_represented_by_results / sf_of_building_unit_is_in
 
     def add_dataset_column(self):
         self.data.loc[:, 'dataset'] = self.dataset_name
@@ -303,98 +335,134 @@ class ResStock(ResStockNamingMixin, UnitsMixin, S3UtilitiesMixin):
         file_path = os.path.join(self.output_dir, file_name)
         self.data.to_csv(file_path, index=False)
 
-    def export_to_csv_long(self, add_egrid_emissions=True):
-        # Exports resstock data to CSV in long format, with rows for each end use
+    def export_to_csv_long(self, add_egrid_emissions=True, batch_size=100_000):
+        """
+        Exports ResStock data to CSV in long format, with a row for each building and fuel.enduse combination
+        with energy consumption. Buildings are converted and written in batches, so the whole long table
+        is never in memory at once.
+        Args:
 
-        # Convert ResStock into long format, with a new row for each Fuel.Enduse combination
+            add_egrid_emissions (bool): If True, adds GHG emissions using eGRID 2019 factors for electricity
+            batch_size (int): Number of buildings converted and written at a time
+        """
         engy_cols = []
         for col in (self.COLS_ENDUSE_ANN_ENGY):
             engy_cols.append(self.col_name_to_weighted(col, self.weighted_energy_units))
 
-        bldg_cols = []
-        for c in self.data.columns:
-            if not 'out.' in c:
-                bldg_cols.append(c)
-
+        # Parse each fuel.enduse column name once
         var_col = 'type.fuel.enduse.energy_consumption..units'
         val_col = 'weighted_energy_consumption'
-        dl = pd.melt(self.data, id_vars=[self.BLDG_ID, 'in.state_abbreviation'], value_vars=engy_cols, var_name=var_col, value_name=val_col)
+        col_parts = pd.DataFrame([self.engy_col_name_to_parts(c) for c in engy_cols], index=pd.Index(engy_cols, name=var_col))
+        col_parts = col_parts[['fuel', 'enduse', 'units']].rename(columns={'units': 'weighted_energy_consumption_units'})
+
+        emission_factors = None
+        if add_egrid_emissions:
+            logger.info('Adding emissions using eGRID 2019 emissions factors')
+            emission_factors = self.emission_factors(col_parts)
+
+        # Write the buildings in order of building ID, a batch at a time
+        file_name = f'ResStock energy long.csv'
+        file_path = os.path.join(self.output_dir, file_name)
+        tmp_path = f'{file_path}.tmp'
+        id_cols = [self.BLDG_ID, 'in.state_abbreviation']
+        data = self.data[id_cols + engy_cols].sort_values(self.BLDG_ID, kind='stable')
+        n_rows = 0
+        for start in range(0, max(len(data), 1), batch_size):
+            dl = self.long_energy_batch(data.iloc[start:start + batch_size], id_cols, engy_cols, var_col, val_col, col_parts, emission_factors)
+            dl.to_csv(tmp_path, mode='w' if start == 0 else 'a', header=(start == 0), index=False)
+            n_rows += len(dl)
+        os.replace(tmp_path, file_path)
+        logger.info(f'Wrote {n_rows} rows of ResStock energy in long format to {file_path}')
+
+    def emission_factors(self, col_parts):
+        """
+        GHG emissions factor of each state and fuel.
+        Electricity uses the eGRID 2019 factor of the state, the other fuels use national factors.
+        Args:
+
+            col_parts (pd.DataFrame): fuel, enduse and weighted_energy_consumption_units of each energy column
+
+        Return:
+            pd.DataFrame: in.state_abbreviation, fuel, and the emissions factor in million metric tons CO2e per TBtu,
+            with a row for every state in the data and every fuel in col_parts
+        """
+        # Read the emissions data
+        file_name = self.egrid_file_name
+        file_path = os.path.join(self.truth_data_dir, file_name)
+        egrid = pd.read_csv(file_path, index_col='State')
+
+        # metric_ton_to_lb = 2204.62
+        cf = (1.0/1e3)*(1.0/3.412)*(1e9/1.0)*(1.0/2204.62)*(1.0/1e6)
+        egrid['million_metric_ton_CO2e_per_TBtu'] = egrid['total_output_emissions_rates_CO2e_lb_per_MWh'] * cf
+
+        fuel_factors = {
+            # Natural Gas for homes and businesses: 116.65 lb CO2/million BTU
+            # https://www.eia.gov/environment/emissions/co2_vol_mass.php
+            # Plus 2.3% leakage rate of methane calculated from Science paper
+            # https://www.science.org/doi/10.1126/science.aar7204
+            'natural_gas': 141.67/1000000*1000*1E9/2204.62/1000000,
+            # Home Heating Fuel for homes and businesses: 163.45 lb CO2/million BTU
+            # https://www.eia.gov/environment/emissions/co2_vol_mass.php
+            'fuel_oil': 163.45/1000000*1000*1E9/2204.62/1000000,
+            # Propane for homes and businesses: 138.63 lb CO2/million BTU
+            # https://www.eia.gov/environment/emissions/co2_vol_mass.php
+            'propane': 138.63/1000000*1000*1E9/2204.62/1000000,
+            # No data for wood or biomass here
+            # https://www.eia.gov/environment/emissions/co2_vol_mass.php
+            'wood': 0.0,
+        }
+        fuels = col_parts['fuel'].unique().tolist()
+        unknown_fuels = [f for f in fuels if f != 'electricity' and f not in fuel_factors]
+        if len(unknown_fuels) > 0:
+            err_msg = f'Fuel types {unknown_fuels} were not recognized, cannot calculate emissions factors'
+            logger.error(err_msg)
+            raise Exception(err_msg)
+
+        # Emissions are calculated from energy in TBtu
+        units = col_parts.loc[col_parts['fuel'] != 'wood', 'weighted_energy_consumption_units'].unique().tolist()
+        if any(u.lower() != 'tbtu' for u in units):
+            err_msg = f'Emissions require weighted energy in TBtu, found {units}'
+            logger.error(err_msg)
+            raise Exception(err_msg)
+
+        states = self.data['in.state_abbreviation'].drop_duplicates()
+        if states.isna().any():
+            logger.error(f'Missing state for some buildings, setting their emissions to zero')
+        missing_egrid = [s for s in states.dropna() if s not in egrid.index]
+        if 'electricity' in fuels and len(missing_egrid) > 0:
+            err_msg = f'Missing electric emissions factor for states {missing_egrid}'
+            logger.error(err_msg)
+            raise Exception(err_msg)
+
+        # One row per state and fuel
+        factors = pd.MultiIndex.from_product([states, fuels], names=['in.state_abbreviation', 'fuel']).to_frame(index=False)
+        factor_col = 'million_metric_ton_CO2e_per_TBtu'
+        factors[factor_col] = factors['fuel'].map(fuel_factors)
+        is_elec = factors['fuel'] == 'electricity'
+        factors.loc[is_elec, factor_col] = factors.loc[is_elec, 'in.state_abbreviation'].map(egrid[factor_col])
+        factors.loc[factors['in.state_abbreviation'].isna(), factor_col] = 0.0
+
+        return factors
+
+    def long_energy_batch(self, data, id_cols, engy_cols, var_col, val_col, col_parts, emission_factors=None):
+        # Convert a batch of buildings into long format, with a new row for each Fuel.Enduse combination
+        dl = pd.melt(data, id_vars=id_cols, value_vars=engy_cols, var_name=var_col, value_name=val_col)
 
         # Remove rows with zero values for the fuel type/end use combo
         dl = dl.loc[dl[val_col] > 0]
 
         # Sort by building ID
-        dl.sort_values(self.BLDG_ID, inplace=True)
+        dl = dl.sort_values(self.BLDG_ID, kind='stable')
 
         # Separate'type.fuel.enduse.energy_consumption..units' into multiple columns
-        def split_col_name(col_name):
-            p = self.engy_col_name_to_parts(col_name)
-
-            return [p['fuel'], p['enduse'], p['units'], ]
-
-        dl['fuel'], dl['enduse'], dl['weighted_energy_consumption_units'] = zip(*dl[var_col].apply(split_col_name))
-
-        # Drop the combined type.fuel.enduse.energy_consumption..units column
-        dl.drop(var_col, axis=1, inplace=True)
+        dl = dl.join(col_parts, on=var_col).drop(var_col, axis=1)
 
-        if add_egrid_emissions:
-            logger.info('Adding emissions using eGRID 2019 emissions factors')
-            # Read the emissions data
-            file_name = self.egrid_file_name
-            file_path = os.path.join(self.truth_data_dir, file_name)
-            egrid = pd.read_csv(file_path, index_col='State')
-
-            # metric_ton_to_lb = 2204.62
-            cf = (1.0/1e3)*(1.0/3.412)*(1e9/1.0)*(1.0/2204.62)*(1.0/1e6)
-
-            egrid['million_metric_ton_CO2e_per_TBtu'] = egrid['total_output_emissions_rates_CO2e_lb_per_MWh'] * cf
-            egrid.head()
-
-            # Calculate the emissions factors for each row
-            def emissions(egrid, row):
-                # Determine emissions factor by fuel (and location, for electricity)
-                fuel = row['fuel']
-                state = row['in.state_abbreviation']
-                if pd.isna(state):
-                    logger.error(f'Missing electric emissions factor for state {row["in.state_abbreviation"]}')
-                    return 0.0
-                if fuel == 'electricity':
-                    cf_million_metric_tons_per_TBtu = egrid.loc[state]['million_metric_ton_CO2e_per_TBtu']
-                elif fuel == 'natural_gas':
-                    # Natural Gas for homes and businesses: 116.65 lb CO2/million BTU
-                    # https://www.eia.gov/environment/emissions/co2_vol_mass.php
-                    # Plus 2.3% leakage rate of methane calculated from Science paper
-                    # https://www.science.org/doi/10.1126/science.aar7204
-                    cf_million_metric_tons_per_TBtu = 141.67/1000000*1000*1E9/2204.62/1000000
-                elif fuel == 'fuel_oil':
-                    # Home Heating Fuel for homes and businesses: 163.45 lb CO2/million BTU
-                    # https://www.eia.gov/environment/emissions/co2_vol_mass.php
-                    cf_million_metric_tons_per_TBtu = 163.45/1000000*1000*1E9/2204.62/1000000
-                elif fuel == 'propane':
-                    # Propane for homes and businesses: 138.63 lb CO2/million BTU
-                    # https://www.eia.gov/environment/emissions/co2_vol_mass.php
-                    cf_million_metric_tons_per_TBtu = 138.63/1000000*1000*1E9/2204.62/1000000
-                elif fuel == 'wood':
-                    # No data for wood or biomass here
-                    # https://www.eia.gov/environment/emissions/co2_vol_mass.php
-                    return 0.0
-                else:
-                    raise Exception(f'Fuel type {fuel} was not recognized, cannot calculate emissions factor')
-
-                # Calculate emssions (million metric tons)
-                energy_units = row['weighted_energy_consumption_units']
-                assert(energy_units == 'TBtu')
-                energy_TBtu = row['weighted_energy_consumption']
-                emis_mmt = energy_TBtu * cf_million_metric_tons_per_TBtu
-
-                return emis_mmt
-
-            dl['ghg_emissions..million_metric_tons_CO2e)'] = dl.apply(lambda row: emissions(egrid, row), axis=1)
+        if emission_factors is not None:
+            # Calculate emissions (million metric tons) from the factor of each state and fuel
+            dl = dl.merge(emission_factors, on=['in.state_abbreviation', 'fuel'], how='left', sort=False)
+            dl['ghg_emissions..million_metric_tons_CO2e)'] = dl[val_col] * dl.pop('million_metric_ton_CO2e_per_TBtu')
 
             # Drop the in.state_abbreviation column, will be in building characteristics data
-            dl.drop('in.state_abbreviation', axis=1, inplace=True)
+            dl = dl.drop('in.state_abbreviation', axis=1)
 
-        # Save files - separate building energy from characteristics for file size
-        file_name = f'ResStock energy long.csv'
-        file_path = os.path.join(self.output_dir, file_name)
-        dl.to_csv(file_path, index=False)
+        return dl
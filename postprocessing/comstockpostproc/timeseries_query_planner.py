@@ -0,0 +1,222 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import hashlib
+import logging
+import weakref
+
+import pandas as pd
+from buildstock_query import BuildStockQuery
+
+from comstockpostproc.naming_mixin import NamingMixin
+
+logger = logging.getLogger(__name__)
+
+# One Athena client per ComStock run, see run_query_client()
+_CLIENTS = {}
+
+# Planners keyed on run name and id() of the row-level frame they were built from, see planner_for_frame()
+_PLANNERS = {}
+
+
+class TimeseriesQueryPlanner(NamingMixin):
+    # Columns of the Athena baseline table used to group and restrict the timeseries queries
+    ATHENA_BLDG_TYPE = 'build_existing_model.building_type'
+    ATHENA_STATE = 'state_abbreviation'
+
+    def __init__(self, run_data, df, dict_upid_to_upname, comstock_run_name=None):
+        """
+        Plans the timeseries queries for the measure timeseries plots.
+        Instead of one query per building type, state and upgrade, it makes one query per upgrade
+        for all requested states, grouped by state and building type, and weights the results
+        with a join on building type.
+        Args:
+
+            run_data (BuildStockQuery): Athena client for the ComStock run, or None to create it
+            from comstock_run_name when the first query is made
+            df (pd.DataFrame): Row-level results for the baseline and the upgrades
+            dict_upid_to_upname (dict): Upgrade name for each upgrade ID
+            comstock_run_name (str): Name of the ComStock run in Athena
+        """
+        self._run_data = run_data
+        self.comstock_run_name = comstock_run_name
+        self.dict_upid_to_upname = dict_upid_to_upname
+        self.enduses = list(self.END_USES_TIMESERIES_DICT.values()) + ['total_site_electricity_kwh']
+        self.n_queries = 0
+
+        # Upgrades and the buildings applicable to any of them
+        df_upgrade = df.loc[df[self.UPGRADE_ID] != 0, :]
+        self.upgrade_num = list(df_upgrade[self.UPGRADE_ID].unique())
+        upgrade_name = list(df_upgrade[self.UPGRADE_NAME].unique())
+        applic = df[self.UPGRADE_NAME].isin(upgrade_name) & (df[self.UPGRADE_APPL] == True)
+        self.applic_bldgs = [int(x) for x in df.loc[applic, self.BLDG_ID]]
+
+        # Mean building weight of each building type, keyed on the building type names used in Athena
+        self.athena_bldg_types = [self.BLDG_TYPE_TO_SNAKE_CASE[b] for b in df[self.BLDG_TYPE].unique()]
+        wgts = df_upgrade.groupby(self.BLDG_TYPE, observed=True)[self.BLDG_WEIGHT].mean()
+        self.weights = pd.DataFrame({
+            self.ATHENA_BLDG_TYPE: [self.BLDG_TYPE_TO_SNAKE_CASE[b] for b in wgts.index],
+            'weight': wgts.to_numpy(),
+        })
+
+        # Weighted loads by building type for each state that has been queried, keyed on state
+        self._loads = {}
+        self._summed_loads = {}
+
+    @property
+    def run_data(self):
+        if self._run_data is None:
+            self._run_data = run_query_client(self.comstock_run_name)
+        return self._run_data
+
+    def fingerprint(self):
+        """
+        Identifies the loads this planner queries: the run, the upgrades, the applicable buildings and the weights.
+        Used to key stored loads, see LoadShapeCube.
+
+        Return:
+            str: hex digest
+        """
+        parts = [
+            str(self.comstock_run_name),
+            repr(sorted((str(u), self.dict_upid_to_upname[u]) for u in self.upgrade_num)),
+            repr(sorted(self.applic_bldgs)),
+            self.weights.sort_values(self.ATHENA_BLDG_TYPE).to_csv(index=False),
+        ]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+    def _query(self, upgrade_id, states, applicable_only):
+        restrict = [
+            (self.ATHENA_BLDG_TYPE, self.athena_bldg_types),
+            (self.ATHENA_STATE, list(states)),
+        ]
+        if applicable_only:
+            restrict.append((self.run_data.bs_bldgid_column, self.applic_bldgs))
+        self.n_queries += 1
+        return self.run_data.agg.aggregate_timeseries(
+            upgrade_id=upgrade_id,
+            enduses=self.enduses,
+            group_by=[self.ATHENA_STATE, self.ATHENA_BLDG_TYPE, 'time'],
+            restrict=restrict,
+            timestamp_grouping_func='hour',
+            get_query_only=False
+        )
+
+    def apply_weights(self, ts_agg, upgrade_name):
+        """
+        Weights a timeseries grouped by state and building type with a join on building type.
+        Args:
+
+            ts_agg (pd.DataFrame): Hourly loads with state, building type and time columns
+            upgrade_name (str): Value for the upgrade name column
+
+        Return:
+            pd.DataFrame: kWh columns with a _weighted suffix, by state, building type, time and upgrade name
+        """
+        ts_agg = ts_agg.merge(self.weights, on=self.ATHENA_BLDG_TYPE, how='inner')
+        kwh_cols = [c for c in ts_agg.columns if 'kwh' in c]
+        weighted = ts_agg[kwh_cols].mul(ts_agg['weight'], axis=0).add_suffix('_weighted')
+        weighted.insert(0, self.ATHENA_STATE, ts_agg[self.ATHENA_STATE])
+        weighted.insert(1, self.ATHENA_BLDG_TYPE, ts_agg[self.ATHENA_BLDG_TYPE])
+        weighted.insert(2, 'time', ts_agg['time'])
+        weighted.insert(3, self.UPGRADE_NAME, upgrade_name)
+        return weighted
+
+    def _fetch(self, states):
+        # Baseline loads of the applicable buildings, then each upgrade, in one query each for all states
+        loads = [self.apply_weights(self._query(0, states, applicable_only=True), 'baseline')]
+        for upgrade in self.upgrade_num:
+            ts_agg = self._query(str(upgrade), states, applicable_only=False)
+            loads.append(self.apply_weights(ts_agg, self.dict_upid_to_upname[upgrade]))
+        loads = pd.concat(loads, ignore_index=True)
+
+        for state, state_loads in loads.groupby(self.ATHENA_STATE, sort=False):
+            self._loads[state] = state_loads.drop(columns=self.ATHENA_STATE).reset_index(drop=True)
+        for state in states:
+            if state not in self._loads:
+                logger.warning(f'No timeseries returned for {state}')
+                self._loads[state] = loads.iloc[:0].drop(columns=self.ATHENA_STATE)
+        logger.info(f'Queried timeseries for {len(states)} states with {self.n_queries} Athena queries so far')
+
+    def building_type_loads(self, states):
+        """
+        Weighted hourly loads by building type for each state, querying all states not yet queried at once.
+        Args:
+
+            states (list): State abbreviations
+
+        Return:
+            dict: pd.DataFrame with building type, time, upgrade name and weighted kWh columns, keyed on state
+        """
+        to_fetch = [s for s in states if s not in self._loads]
+        if len(to_fetch) > 0:
+            self._fetch(to_fetch)
+        return {s: self._loads[s] for s in states}
+
+    def weighted_loads(self, state, states=None):
+        """
+        Weighted hourly loads of one state, summed over building types.
+        The first call queries every state in states at once, later calls reuse those results.
+        Args:
+
+            state (str): State abbreviation
+            states (list): State abbreviations that will be requested, queried together with state
+
+        Return:
+            tuple: baseline and upgrade pd.DataFrame with time, upgrade name and weighted kWh columns
+        """
+        if state not in self._summed_loads:
+            loads = self.building_type_loads([state] + [s for s in (states or []) if s != state])[state]
+            self._summed_loads[state] = sum_building_types(loads)
+        return self._summed_loads[state]
+
+
+def sum_building_types(loads):
+    """
+    Sums weighted loads over building types and splits them into baseline and upgrades.
+    Args:
+
+        loads (pd.DataFrame): Weighted loads from TimeseriesQueryPlanner.building_type_loads
+
+    Return:
+        tuple: baseline and upgrade pd.DataFrame with time, upgrade name and weighted kWh columns
+    """
+    upgrade_name = TimeseriesQueryPlanner.UPGRADE_NAME
+    kwh_cols = [c for c in loads.columns if c.endswith('_kwh_weighted')]
+    summed = loads.groupby(['time', upgrade_name], as_index=False)[kwh_cols].sum()
+    is_base = summed[upgrade_name] == 'baseline'
+    return summed.loc[is_base].reset_index(drop=True), summed.loc[~is_base].reset_index(drop=True)
+
+
+def run_query_client(comstock_run_name):
+    # Athena client for a ComStock run, created once so the table metadata is only read once
+    if comstock_run_name not in _CLIENTS:
+        _CLIENTS[comstock_run_name] = BuildStockQuery('eulp',
+                                                      'enduse',
+                                                      comstock_run_name,
+                                                      buildstock_type='comstock',
+                                                      skip_reports=False)
+    return _CLIENTS[comstock_run_name]
+
+
+def planner_for_frame(df, comstock_run_name, dict_upid_to_upname):
+    """
+    Returns the timeseries query planner for a run and a row-level frame, building it on first use.
+    Planners are shared by every timeseries plot made from the same frame object, so each state
+    is only queried once, and are released with the frame.
+    Args:
+
+        df (pd.DataFrame): Row-level data passed to the plot methods
+        comstock_run_name (str): Name of the ComStock run in Athena
+        dict_upid_to_upname (dict): Upgrade name for each upgrade ID
+
+    Return:
+        TimeseriesQueryPlanner: planner for df
+    """
+    key = (comstock_run_name, id(df))
+    if key in _PLANNERS:
+        ref, planner = _PLANNERS[key]
+        if ref() is df:
+            return planner
+    planner = TimeseriesQueryPlanner(None, df, dict_upid_to_upname, comstock_run_name=comstock_run_name)
+    _PLANNERS[key] = (weakref.ref(df, lambda _, key=key: _PLANNERS.pop(key, None)), planner)
+    return planner
@@ -0,0 +1,194 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import os
+import json
+import hashlib
+import logging
+
+import pandas as pd
+import polars as pl
+
+from comstockpostproc.code_version import code_version
+
+logger = logging.getLogger(__name__)
+
+
+class TruthDataStore():
+    # Increment when the key definition or file layout changes, which invalidates existing artifacts
+    STORE_VERSION = 1
+
+    # Copies of each table kept, most recently used first, so a few configurations of the same truth data,
+    # like different weighted_energy_units, do not replace each other's tables
+    KEPT_COPIES = 4
+
+    def __init__(self, store_dir):
+        """
+        Processed truth data tables (CBECS, EIA, AMI, ResStock), stored as parquet so repeat runs skip processing.
+        Each table is keyed on the truth data version, year, parameters, input file hashes, and code version of its owner,
+        so changing any of them makes the stored table stale and it is processed again.
+        Args:
+
+            store_dir (str): Directory of the store, created if it does not exist
+        """
+        self.store_dir = store_dir
+        self.file_hashes_path = os.path.join(self.store_dir, 'file_hashes.json')
+        self.file_hashes = {}
+        if os.path.exists(self.file_hashes_path):
+            with open(self.file_hashes_path, 'r') as f:
+                self.file_hashes = json.load(f)
+
+    def file_hash(self, file_path):
+        """
+        SHA-256 hash of the contents of an input file.
+        Hashes are cached on the path, size and modification time of the file, so large files are only read when they change.
+        Args:
+
+            file_path (str): Path to the file
+
+        Return:
+            str: hex digest
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        cached = self.file_hashes.get(file_path)
+        if cached is not None and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['hash']
+
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        self.file_hashes[file_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': h.hexdigest()}
+        self._write_json(self.file_hashes_path, self.file_hashes)
+
+        return h.hexdigest()
+
+    def key(self, owner, table_name, input_paths, params=None):
+        """
+        Key of a processed table.
+        Args:
+
+            owner (object): Truth data object processing the table, with truth_data_version and, optionally, year attributes
+            table_name (str): Name of the table, like 'CBECS 2012'
+            input_paths (list): Paths of the files the table is processed from
+            params (dict): Other settings that change the table, like weighted_energy_units
+
+        Return:
+            str: hex digest
+        """
+        parts = {
+            'table': table_name,
+            'truth_data_version': owner.truth_data_version,
+            'year': getattr(owner, 'year', None),
+            'params': sorted((params or {}).items()),
+            'inputs': sorted((os.path.basename(p), self.file_hash(p)) for p in input_paths),
+            'store_version': self.STORE_VERSION,
+            'code_version': code_version(type(owner)),
+        }
+        return hashlib.sha256(repr(sorted(parts.items())).encode('utf-8')).hexdigest()
+
+    def _table_dir(self, table_name):
+        return os.path.join(self.store_dir, table_name)
+
+    def _artifact_path(self, table_name, key):
+        return os.path.join(self._table_dir(table_name), f'{key}.parquet')
+
+    def _write_json(self, path, obj):
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(obj, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def load(self, table_name, key):
+        """
+        Reads a processed table, if the store has one with this key.
+        Args:
+
+            table_name (str): Name of the table
+            key (str): Key from key()
+
+        Return:
+            pl.DataFrame or pd.DataFrame: the table, as the type it was saved as, or None if there is no current table
+        """
+        path = self._artifact_path(table_name, key)
+        meta_path = path.replace('.parquet', '.json')
+        if not (os.path.exists(path) and os.path.exists(meta_path)):
+            logger.info(f'No current processed {table_name} in {self.store_dir}')
+            return None
+
+        logger.info(f'Reading processed {table_name} from {path}')
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta['frame'] == 'polars':
+                df = pl.read_parquet(path)
+            else:
+                df = pd.read_parquet(path)
+        except FileNotFoundError:
+            # Pruned by another process sharing the store since the check above
+            logger.info(f'Processed {table_name} was removed from {self.store_dir} while reading it')
+            return None
+
+        # Mark the table as recently used, so it is kept when other copies of the table are saved
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+        return df
+
+    def save(self, table_name, key, df):
+        """
+        Stores a processed table with its schema, removing all but the KEPT_COPIES most recently used copies of the table.
+        Args:
+
+            table_name (str): Name of the table
+            key (str): Key from key()
+            df (pl.DataFrame or pd.DataFrame): The table. pandas tables keep their index and dtypes
+
+        Return:
+            str: path of the parquet file
+        """
+        path = self._artifact_path(table_name, key)
+        table_dir = self._table_dir(table_name)
+        if not os.path.exists(table_dir):
+            os.makedirs(table_dir)
+
+        # Write to a temporary file first so an interrupted run does not leave a partial table
+        tmp_path = f'{path}.tmp'
+        if isinstance(df, pl.DataFrame):
+            frame = 'polars'
+            df.write_parquet(tmp_path)
+        else:
+            frame = 'pandas'
+            df.to_parquet(tmp_path, index=True)
+        os.replace(tmp_path, path)
+        self._write_json(path.replace('.parquet', '.json'), {'frame': frame, 'rows': len(df), 'columns': len(df.columns)})
+
+        self._prune(table_name)
+        logger.info(f'Stored processed {table_name} in {path}')
+
+        return path
+
+    def _prune(self, table_name):
+        # Removes all but the KEPT_COPIES most recently used copies of a table, by the latest modification time
+        # of the files of each key. Files removed by another process sharing the store are skipped.
+        table_dir = self._table_dir(table_name)
+        last_used = {}
+        for file_name in os.listdir(table_dir):
+            try:
+                mtime = os.path.getmtime(os.path.join(table_dir, file_name))
+            except FileNotFoundError:
+                continue
+            key = file_name.split('.', 1)[0]
+            last_used[key] = max(mtime, last_used.get(key, mtime))
+
+        stale_keys = sorted(last_used, key=last_used.get, reverse=True)[self.KEPT_COPIES:]
+        for file_name in os.listdir(table_dir):
+            if file_name.split('.', 1)[0] in stale_keys:
+                try:
+                    os.remove(os.path.join(table_dir, file_name))
+                except FileNotFoundError:
+                    continue
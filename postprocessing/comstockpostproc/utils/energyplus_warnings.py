@@ -0,0 +1,293 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+from collections import Counter
+import re
+
+# These regexes are used to find common errors and generalize them so they can be counted.
+# Each match is replaced with the regex itself, so warnings that differ only by object names share one signature.
+WARNING_GENERALIZATION_REGEXES = [
+    # Schedules
+    r"ProcessScheduleInput: DecodeHHMMField, Invalid 'until' field value is not a multiple of the minutes for each timestep: .* Other errors may result. Occurred in Day Schedule=.*",
+    r"Schedule:Day:Interval='.*', Blank Schedule Type Limits Name",
+    r"Schedule:Constant='.*', Blank Schedule Type Limits Name",
+    r"ProcessScheduleInput: Schedule:Year='.*', Blank Schedule Type Limits Name input -- will not be validated.",
+    r"ProcessScheduleInput: Schedule:Day:Interval='.*', , One or more values are not integer as required by Schedule Type Limits Name=ONOFF",
+    r"Fan:ZoneExhaust='.*' has fractional values in Schedule=.*. Only 0.0 in the schedule value turns the fan off.",
+    r"Standard Time Meridian and Time Zone differ by more than 1, Difference='.*' Solar Positions may be incorrect",
+
+    # Outputs
+    r"Output:Meter: invalid Key Name='.*' - not found",
+    r"Output:Meter:MeterFileOnly: invalid Key Name='.*' - not found.",
+    r"In Output:Table:Monthly '.*' invalid Variable or Meter Name '.*'",
+    r"The resource referenced by LifeCycleCost:UsePriceEscalation= '.*' has no energy cost.  .*",
+    r"Output:Meter:MeterFileOnly requested for '.*' \(TimeStep\), already on 'Output:Meter'. Will report to both eplusout.eso and eplusout.mtr",
+    r"The following Report Variables were requested but not generated -- check.rdd file.*",
+    r"Processing Monthly Tabular Reports: Variable names not valid for this simulation.*",
+
+    # Coils
+    r"CalcDoe2DXCoil: Coil:Cooling:DX:SingleSpeed '.*' - Full load outlet air dry-bulb temperature < 2C. This indicates the possibility of coil frost/freeze. .*",
+    r"CalcDoe2DXCoil: Coil:Cooling:DX:SingleSpeed '.*' - Air-cooled condenser inlet dry-bulb temperature below 0 C. .*",
+    r"CalcDoe2DXCoil: Coil:Cooling:DX:SingleSpeed='.*':  Energy Input Ratio Modifier curve \(function of temperature\) output is negative.*",
+    r"CalcDoe2DXCoil: Coil:Cooling:DX:SingleSpeed='.*' - Air volume flow rate per watt of rated total cooling capacity is out of range.*",
+    r"Coil:Cooling:DX:VariableRefrigerantFlow '.*' - Air volume flow rate per watt of rated total cooling capacity is out of range.*",
+    r"GetDXCoils: Coil:Cooling:DX:SingleSpeed='.*', invalid ...Part Load Fraction Correlation Curve Name = .* has out of range value. .*",
+    r"For object = Coil:Cooling:DX:SingleSpeed, name = '.*' Calculated outlet air relative humidity greater than 1..*",
+    r"For object = Coil:Cooling:DX:TwoSpeed, name = '.*' Calculated outlet air relative humidity greater than 1..*",
+    r"For object = Coil:Cooling:DX:VariableRefrigerantFlow, name = '.*' Calculated outlet air relative humidity greater than 1..*",
+    r"GetDXCoils: Coil:Heating:DX:SingleSpeed='.*', invalid ...Part Load Fraction Correlation Curve Name = .* has out of range value. .*",
+    r"GetDXCoils: Coil:Heating:DX:SingleSpeed='.*' curve values ... Defrost Energy Input Ratio Function of Temperature Curve Name = .* output is not equal to 1.0.*",
+    r"GetDXCoils: Coil:Heating:DX:SingleSpeed='.*' curve values ... Energy Input Ratio Function of Temperature Curve Name = .* output is not equal to 1.0.*",
+    r"GetDXCoils: Coil:Cooling:DX:TwoSpeed='.*', invalid ...Part Load Fraction Correlation Curve Name = .* has out of range value. .*",
+    r"Coil:Heating:DX:SingleSpeed '.*' - Air volume flow rate per watt of rated total heating capacity is out of range .*",
+    r"CalcTwoSpeedDXCoilStandardRating: Did not find an appropriate fan associated with DX coil named = '.*'. Standard Ratings will not be calculated.",
+    r"Coil control failed to converge for .*   Iteration limit exceeded in calculating system sensible part-load ratio..*",
+    r"SizeWaterCoil: Coil='.*', Cooling Coil has leaving humidity ratio > entering humidity ratio..*",
+    r"Coil control failed for AirLoopHVAC:UnitarySystem:.*   sensible part-load ratio determined to be outside the range of 0-1..*",
+    r"The design coil load is zero for .* The autosize value for maximum water flow rate is zero To change this, input a value for UA, change the heating design day, or raise the   system heating design supply air temperature. Also check to make sure the Preheat   Design Temperature is not the same as the Central Heating Design Supply Air Temperature.",
+    r"The design air flow rate is zero for Coil:Cooling:Water = .* The autosize value for max air volume flow rate is zero",
+
+    # Other HVAC
+    r"Since Zone Minimum Air Flow Input Method = CONSTANT, input for Fixed Minimum Air Flow Rate will be ignored. Occurs in AirTerminal:SingleDuct:VAV:Reheat = .*",
+    r"Since Damper Heating Action = NORMAL, input for Maximum Flow Fraction During Reheat will be ignored. Occurs in AirTerminal:SingleDuct:VAV:Reheat = .*",
+    r"In zone .* there is unbalanced air flow. .*",
+    r"Calculated design heating load for zone=.* is zero.*",
+    r"Calculated design cooling load for zone=.* is zero.*",
+    r"In calculating the design coil UA for .* the coil bypass factor is unrealistically large.*",
+    r"In calculating the design coil UA for Coil:Cooling:Water .* no apparatus dew-point can be found for the initial entering and leaving conditions.*",
+    r"In calculating the design coil UA for Coil:Cooling:Water .* the apparatus dew-point is below the coil design inlet water temperature; the coil outlet design conditions will be changed to correct the problem..*",
+    r"In calculating the design coil UA for Coil:Cooling:Water .* the apparatus dew-point is below the coil design inlet water temperature; The initial design conditions are.*",
+    r"In calculating the design coil UA for Coil:Cooling:Water .* the outlet chilled water design enthalpy is greater than the inlet air design enthalpy. To correct this condition the design chilled water flow rate will be increased from.*",
+    r"The Standard Ratings is calculated for Coil:Cooling:DX:SingleSpeed = .* but not at the AHRI test condition due to curve out of bound. .*",
+    r"The Standard Ratings is calculated for Coil:Heating:DX:SingleSpeed = .* but not at the AHRI test condition due to curve out of bound. .*",
+    r"Seems like you already tried to get a Handle on this Actuator .*times. Occurred for componentType='SCHEDULE:YEAR', controlType='SCHEDULE VALUE', uniqueKey='.*'.*",
+    r"Temperature out of range \[-100. to 200.\] \(PsyPsatFnTemp\)  Routine=PsyTwbFnTdbWPb, .*",
+    r"CalculateZoneVolume: .* zone is not fully enclosed..*",
+    r"ManageSizing: Calculated Heating Design Air Flow Rate for System=.* is zero.*",
+    r"ManageSizing: Calculated Cooling Design Air Flow Rate for System=.* is zero.*",
+    r"The .* air loop serves a single zone. The Occupant Diversity was calculated or set to a value less than 1.0..*",
+    r"GetDaylightingControls: Fraction of zone or space controlled by the Daylighting reference points is < 1.0. ..discovered in Daylighting:Controls='.*'.*",
+    r"Missing temperature setpoint for LeavingSetpointModulated mode Boiler named .*   A temperature setpoint is needed.* ",
+    r"Water heater = .*:  Recovery Efficiency and Energy Factor could not be calculated",
+    r"ElectricEIRChillerModel - CHILLER:ELECTRIC:EIR '.*' - Air Cooled Condenser Inlet Temperature below 0C.*",
+    r"GetElectricEIRChillerInput: Chiller:Electric:EIR='.*' Energy input ratio as a function of temperature curve output is not equal to 1.0.*",
+    r"Part-load ratio heating control failed in fan coil unit .*   Bad hot part-load ratio limits.*",
+    r"Part-load ratio cooling control failed in fan coil unit .*   Bad part-load ratio limits.*",
+    r"Part-load ratio cooling control failed in fan coil unit .*   Iteration limit exceeded in calculating FCU part-load ratio .*",
+    r"UpdateZoneSizing: Cooling supply air temperature \(calculated\) within 5C of zone temperature ...check zone thermostat set point and design supply air temperatures ...zone name = .*",
+    r"CoolingTower:VariableSpeed '.*' - Tower range temperature is outside model boundaries .*",
+    r"CoolingTower:VariableSpeed '.*' - Inlet air wet-bulb temperature is outside model boundaries .*",
+    r"CoolingTower:VariableSpeed '.*' - Tower approach temperature is outside model boundaries .*",
+    r"CoolingTower:VariableSpeed '.*' - Water flow rate ratio is outside model boundaries .*",
+    r"CoolingTower:VariableSpeed '.*' - Cooling tower air flow rate ratio calculation failed .*",
+    r"GetSpecificHeatGlycol: Temperature is out of range \(too high\) for fluid \[WATER\] specific heat .*",
+    r"GetSpecificHeatGlycol: Temperature is out of range \(too low\) for fluid \[WATER\] specific heat .*",
+    r"GetDensityGlycol: Temperature is out of range \(too high\) for fluid \[WATER\] density .*",
+    r"GetDensityGlycol: Temperature is out of range \(too low\) for fluid \[WATER\] density .*",
+    r"HeatExchanger:AirToAir:SensibleAndLatent '.*' Average air volume flow rate is <50% or >130% of the nominal HX supply air volume flow rate. .*",
+    r"Pump nominal power or motor efficiency is set to 0, for pump=.*",
+    r"AirLoopHVAC:UnitarySystem =.* Method used to determine the cooling supply air flow rate",
+    r"AirLoopHVAC:UnitarySystem =.* Method used to determine the heating supply air flow rate",
+    r"GetOAControllerInputs: Controller:MechanicalVentilation='.* Cannot locate a matching DesignSpecification:ZoneAirDistribution object for Zone='.*'. Using default zone air distribution effectiveness of 1.0 for heating and cooling.",
+    r"CalcEquipmentFlowRates: '.*' - Target water temperature is greater than the hot water temperature .*",
+    r"CalcOAController: Minimum OA fraction > Mechanical Ventilation Controller request for Controller:OutdoorAir=.*, Min OA fraction is used. .*",
+    r"InitController: Controller:WaterCoil='.*', Maximum Actuated Flow is zero.",
+    r"Controller:MechanicalVentilation='.*', Zone OA/person rate For Zone='.*'. Zone outside air per person rate not set in Design Specification Outdoor Air Object='.*'.",
+    r"SizePlantLoop: Calculated Plant Sizing Design Volume Flow Rate=\[0.00\] is too small. Set to 0.0 ..occurs for PlantLoop=.*",
+    r"SizePump: Calculated Pump Nominal Volume Flow Rate=\[0.00\] is too small. Set to 0.0 ..occurs for Pump=.*",
+    r"Check input. Pump nominal flow rate is set or calculated = 0, for pump=.*",
+    r"AirConditioner:VariableRefrigerantFlow '.*'. ...InitVRF: VRF Heat Pump Min/Max Operating Temperature in Heating Mode Limits have been exceeded and VRF system is disabled..*",
+    r"AirConditioner:VariableRefrigerantFlow '.*'. ...InitVRF: VRF Heat Pump Min/Max Outdoor Temperature in Heat Recovery Mode Limits have been exceeded and VRF heat recovery is disabled..*",
+    r"AirConditioner:VariableRefrigerantFlow '.*'. ...InitVRF: VRF Heat Pump Min/Max Operating Temperature in Cooling Mode Limits have been exceeded and VRF system is disabled..*",
+    r"Coil:Cooling:DX:VariableRefrigerantFlow '.*' - Full load outlet air dry-bulb temperature < 2C. This indicates the possibility of coil frost/freeze..*",
+    r"AirLoopHVAC:UnitarySystem '.*' ...For fan type and name = Fan:OnOff '.*' ...Fan power ratio function of speed ratio curve has no impact if fan volumetric flow rate is the same as the unitary system volumetric flow rate..*",
+    r"ZoneTerminalUnitList '.*'",
+
+    # Refrigeration
+    r"GetRefrigerationInput: Refrigeration:System='.*' Suction Piping Zone Name not found .*",
+    r"Refrigeration:WalkIn: .*  This walk-in cooler has insufficient capacity to meet the loads.*",
+
+    # Iteration
+    r"WetBulb not converged after 101 iterations\(PsyTwbFnTdbWPb\)  Routine=.*",
+    r"SimHVAC: Maximum iterations \(.*\) exceeded for all HVAC loops, at .*",
+    r"SimHVAC: Maximum iterations \(.*\) exceeded for all HVAC loops, at .* The solution for one or more of the Air Loop HVAC systems did not appear to converge.*",
+
+    # Psychrometrics
+    r"Entered Humidity Ratio invalid \(PsyTwbFnTdbWPb\)  Routine=ReportCoilSelection::doFinalProcessingOfCoilData .*",
+    r"Temperature out of range \[-100. to 200.\] \(PsyPsatFnTemp\)  Routine=CalcDXHeatingCoil:fullload.*",
+    r"Temperature out of range \[-100. to 200.\] \(PsyPsatFnTemp\)  Routine=PsyWFnTdpPb.*",
+    r"Temperature out of range \[-100. to 200.\] \(PsyPsatFnTemp\)  Routine=CalcMultiSpeedDXCoil:newdewpointconditions.*",
+    r"Enthalpy out of range \(PsyTsatFnHPb\)  Routine=CalcMultiSpeedDXCoil:newdewpointconditions.*",
+    r"Enthalpy out of range \(PsyTsatFnHPb\)  Routine=CalcDoe2DXCoil.*",
+    r"Enthalpy out of range \(PsyTsatFnHPb\)  Routine=Unknown.*",
+    r"Calculated Humidity Ratio invalid \(PsyWFnTdbH\)  Routine=CalcMultiSpeedDXCoil:newdewpointconditions.*",
+    r"Calculated Humidity Ratio invalid \(PsyWFnTdbH\)  Routine=CalcDoe2DXCoil.*",
+    r"Calculated Humidity Ratio invalid \(PsyWFnTdbH\)  Routine=Unknown.*",
+    r"Calculated Relative Humidity out of range \(PsyRhFnTdbWPb\)   Routine=Unknown.*",
+    r"Calculated partial vapor pressure is greater than the barometric pressure, so that calculated humidity ratio is invalid \(PsyWFnTdpPb\).  Routine=Unknown.*",
+    r"Calculated partial vapor pressure is greater than the barometric pressure, so that calculated humidity ratio is invalid \(PsyWFnTdpPb\).  Routine=Unknown.*",
+
+
+    # Other
+    r"CheckUsedConstructions: There are .* nominally unused constructions in input.",
+    r"GetInternalHeatGains: People='.*' has comfort related schedules",
+    r"BuildingSurface:Detailed='.*', underground Floor Area = .* ..which does not match its construction area.",
+    r"GetSurfaceData: There are .* coincident/collinear vertices; These have been deleted unless the deletion would bring the number of surface sides < 3. For explicit details on each problem surface, use Output:Diagnostics,DisplayExtraWarnings;",
+    r"GetSurfaceData: Very small surface area.*, Surface=.*",
+    r"Inside surface heat balance did not converge.*",
+
+    # Recurring warnings
+    r"Controller:OutdoorAir='.*': Min OA fraction > Mechanical ventilation OA fraction, continues...",
+    r"'.*' - Target water temperature should be less than or equal to the hot water temperature error continues...",
+    r"CalcDoe2DXCoil: Coil:Cooling:DX:SingleSpeed='.*' - Full load outlet temperature indicates a possibility of frost/freeze error continues..*",
+    r"CalcDoe2DXCoil: Coil:Cooling:DX:SingleSpeed='.*': Energy Input Ratio Modifier curve \(function of temperature\) output is negative warning continues...",
+    r"CalcDoe2DXCoil: Coil:Cooling:DX:SingleSpeed='.*' - Low condenser dry-bulb temperature error continues...",
+    r"CoolingTower:VariableSpeed '.*' - Tower range temperature is out of range error continues...",
+    r"Plant loop falling below lower temperature limit, PlantLoop='.*'",
+    r"Plant loop exceeding upper temperature limit, PlantLoop='.*'",
+    r"Exceeding Maximum iterations for all HVAC loops, during .* continues",
+    r"SimHVAC: Exceeding Maximum iterations for all HVAC loops, during .* continues",
+    r"AirLoopHVAC:UnitarySystem '.*' - Iteration limit exceeded in calculating sensible part-load ratio error continues..*",
+    r"AirLoopHVAC:UnitarySystem '.*' - sensible part-load ratio out of range error continues..*",
+    r"Part-load ratio heating control failed in fan coil unit .*",
+    r"Part-load ratio cooling iteration limit exceeded in fan coil unit .*",
+    r"Part-load ratio cooling control failed in fan coil unit .*",
+    r"GetSpecificHeatGlycol: Temperature out of range \(too high\) for fluid \[WATER\] specific heat.*",
+    r"GetSpecificHeatGlycol: Temperature out of range \(too low\) for fluid \[WATER\] specific heat.*",
+    r"GetDensityGlycol: Temperature out of range \(too high\) for fluid \[WATER\] density.*",
+    r"GetDensityGlycol: Temperature out of range \(too low\) for fluid \[WATER\] density.*",
+    r"HeatExchanger:AirToAir:SensibleAndLatent '.*':  Average air volume flow rate is <50% or >130% warning continues..*",
+    r"Entered Humidity Ratio invalid \(PsyTwbFnTdbWPb\).*",
+    r"Enthalpy out of range \(PsyTsatFnHPb\).*",
+    r"Calculated Humidity Ratio invalid \(PsyWFnTdbH\).*",
+    r"Actual air mass flow rate is smaller than 25% of water-to-air heat pump coil rated air flow rate..*",
+    r"WetBulb not converged after max iterations\(PsyTwbFnTdbWPb\).*",
+    r"Temperature out of range \[-100. to 200.\] \(PsyPsatFnTemp\).*",
+    r"Coil:Cooling:DX:VariableRefrigerantFlow '.*' - Full load outlet temperature indicates a possibility of frost/freeze error continues..*",
+    r"HeatExchanger:AirToAir:SensibleAndLatent '.*':  Unbalanced air volume flow ratio exceeds 2:1 warning continues..*",
+    r"Entered Humidity Ratio invalid \(PsyWFnTdpPb\).*",
+    r"AirConditioner:VariableRefrigerantFlow '.*' -- Exceeded VRF Heat Pump min/max cooling temperature limit error continues.",
+    r"AirConditioner:VariableRefrigerantFlow '.*' -- Exceeded VRF Heat Pump min/max heating temperature limit error continues..*",
+    r"AirConditioner:VariableRefrigerantFlow '.*' -- Exceeded VRF Heat Recovery min/max outdoor temperature limit error continues..*",
+    r"Calculated Relative Humidity out of range \(PsyRhFnTdbWPb\).*",
+    r"CoolingTower:VariableSpeed '.*' - Inlet air wet-bulb temperature is out of range error continues...",
+    r"CoolingTower:VariableSpeed '.*' - Tower approach temperature is out of range error continues...",
+    r"CoolingTower:VariableSpeed '.*' - Water flow rate ratio is out of range error continues...",
+    r"Inside surface heat balance convergence problem continues.*",
+    r"...Only 1 Terminal Unit connected to system and heat recovery is selected. ...Heat recovery will be disabled.*",
+]
+
+
+# Characters with a special meaning in the regexes, which end a run of literal characters
+REGEX_SPECIAL_CHARS = '.^$*+?{}[]()|'
+
+
+def required_literal(pattern):
+    """The longest run of literal characters that every match of a regex must contain
+
+    :param pattern: A regex without alternation or groups
+
+    :return: A string, empty if the regex has no literal characters or uses alternation or groups
+    """
+    if re.search(r'(?<!\\)[|(]', pattern):
+        return ''
+    runs = ['']
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            # Escaped special character, e.g. \(
+            runs[-1] += pattern[i + 1]
+            i += 2
+            continue
+        if c == '\\' or c == '[':
+            # Character class, e.g. \d or [0-9]
+            runs.append('')
+            i = pattern.index(']', i) + 1 if c == '[' else i + 2
+            continue
+        if c in '*?{':
+            # The preceding character may not be in the match
+            runs[-1] = runs[-1][:-1]
+            runs.append('')
+            if c == '{' and '}' in pattern[i:]:
+                # Quantifier, e.g. {1,3}, whose contents are not literal
+                i = pattern.index('}', i)
+        elif c in REGEX_SPECIAL_CHARS:
+            runs.append('')
+        else:
+            runs[-1] += c
+        i += 1
+    return max(runs, key=len)
+
+
+class EnergyPlusWarningClassifier():
+    """Generalizes warnings from eplusout.err files into signatures that can be counted across models
+
+    The regexes are compiled once. Before a regex is run on a warning, the warning is checked for the
+    longest literal string the regex requires, so most warnings are only searched by the one regex that
+    generalizes them. Each distinct warning is generalized once, repeats are looked up in a cache.
+
+    :param warn_regexs: The generalization regexes, applied in order
+    :param cache_size: The number of generalized warnings to keep before the cache is cleared
+    """
+    RECURRENCE_REGEX = re.compile(r'This error occurred (\d+) total times')
+    PRE_RECURRENCE_REGEX = re.compile(r"(.*)This error occurred.*")
+    RECURRENCE_LINE_REGEX = re.compile(r".*This error occurred.*")
+
+    def __init__(self, warn_regexs=WARNING_GENERALIZATION_REGEXES, cache_size=1000000):
+        self.rules = [(required_literal(warn_regex), re.compile(warn_regex), warn_regex) for warn_regex in warn_regexs]
+        self.cache_size = cache_size
+        self.cache = {}
+
+    def generalize(self, w):
+        """Generalize a warning/error message to replace specific object names and timestamps with .*
+
+        :param w: A single warning or error from an eplusout.err file
+
+        :return: A tuple of the generalized warning/error message and the number of times it occurred
+        """
+        result = self.cache.get(w)
+        if result is None:
+            result = self._generalize(w)
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[w] = result
+        return result
+
+    def _generalize(self, w):
+        w = str.replace(w, '"', "'")  # All quotes inside strings to single quotes for easier coding
+        w = str.replace(w, '*', "")  # All quotes inside strings to single quotes for easier coding
+        w = str.replace(w, '** Warning ** ', "")
+        w = w.strip()
+
+        # Find the number of recurrences
+        m = self.RECURRENCE_REGEX.search(w)
+        if m:
+            n = int(m.group(1))
+            pre_continuation = self.PRE_RECURRENCE_REGEX.search(w).group(1)
+            w = self.RECURRENCE_LINE_REGEX.sub(pre_continuation, w).strip()
+        else:
+            n = 1
+
+        # Each regex sees the message as generalized by the regexes before it
+        for literal, warn_regex, warn_str in self.rules:
+            if literal in w:
+                w = warn_regex.sub(warn_str, w)
+
+        return (w, n)
+
+    def count_warnings(self, errs):
+        """Count the generalized warnings in the contents of eplusout.err files
+
+        :param errs: The text of one or more eplusout.err files
+
+        :return: A Counter of the number of times each generalized warning occurred
+        """
+        errs = str.replace(errs, "\n   **   ~~~   **", "")  # Replace continuation to make each warning 1 line
+        errs = str.replace(errs, "\n   *************  **   ~~~   **", "")
+
+        warn_counts = Counter()
+        for line in errs.split('\n'):
+            if "** Warning **" in line:
+                w, n = self.generalize(line)
+                warn_counts[w] += n
+        return warn_counts
@@ -28,27 +28,40 @@ def main(path, selecting_run=None):
     logger.info("Analyzing log files from {}".format(path))
     count = 0
     for logpath, log in __extract_running_log(path):
-        informationLines = cleanup_original_log(log)
-
-        #logpath example: ./up00/bldg0000001/out.osw
-        if logpath.split("/")[1] not in selecting_run:
+        if not report_log(path, logpath, log, selecting_run):
             continue
 
         count += 1
         if count % 10 == 0:
             logger.info(f"Analyzing log path: {logpath}")
             logger.info(f"processed {count} logs")
+    aggregate_csv(path)
 
-        if not informationLines:
-            logger.info(f">>>>>>> This is Empty >>>>>>  in path: {path}, logpath: {logpath}")
-            continue
+def is_running_log(member_name):
+    """
+    check if a tar.gz member is an out.osw log of the highest level run (which is not the sizing run)
+    """
+    return "SR" not in member_name and "out.osw" in member_name
 
+def report_log(path, logpath, log, selecting_run=None):
+    """
+    parse one out.osw log from the tar.gz at path and append its summary to the report for that tar.gz.
+    returns False if the upgrade of the log is not in selecting_run, None selects every upgrade.
+    """
+    #logpath example: ./up00/bldg0000001/out.osw
+    if selecting_run is not None and logpath.split("/")[1] not in selecting_run:
+        return False
 
-        # timeDeltaFromCleanedLog = generate_nest_log_from_namedtuple(informationLines)
-        timeDeltaFromCleanedLog = _generate_printable_log(informationLines)
-        timeDeltaFromCleanedLog['logpath'] = logpath
-        generatingReport(timeDeltaFromCleanedLog, path)
-    aggregate_csv(path)
+    informationLines = cleanup_original_log(log)
+    if not informationLines:
+        logger.info(f">>>>>>> This is Empty >>>>>>  in path: {path}, logpath: {logpath}")
+        return True
+
+    # timeDeltaFromCleanedLog = generate_nest_log_from_namedtuple(informationLines)
+    timeDeltaFromCleanedLog = _generate_printable_log(informationLines)
+    timeDeltaFromCleanedLog['logpath'] = logpath
+    generatingReport(timeDeltaFromCleanedLog, path)
+    return True
 
 def __compute_delta(timestamps):
     """
@@ -68,10 +81,7 @@ def __extract_running_log(tar_path):
     """
     with tarfile.open(tar_path, 'r') as t:
         for member in t.getmembers():
-            if "SR" in member.name: #in this approach, I will only extract the log from the
-                #highest level (which is not the sizing run)
-                continue
-            if "out.osw" in member.name:
+            if is_running_log(member.name):
                 logfile = t.extractfile(member)
                 try:
                     outoswjson = json.loads(logfile.read())
@@ -0,0 +1,448 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import bisect
+import ctypes
+import ctypes.util
+import io
+import logging
+import os
+import re
+import tarfile
+import zlib
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Index format version, bump when the stored tables change
+INDEX_VERSION = '1'
+
+# Uncompressed bytes between gzip checkpoints, trading index size (32 KiB window per checkpoint)
+# against the bytes decompressed to reach a member
+DEFAULT_SPAN = 16 * 1024 * 1024
+
+# Size of the deflate history window and of the compressed reads
+WINSIZE = 32768
+CHUNK = 256 * 1024
+
+# zlib constants
+Z_OK = 0
+Z_STREAM_END = 1
+Z_NEED_DICT = 2
+Z_BUF_ERROR = -5
+Z_NO_FLUSH = 0
+Z_BLOCK = 5
+
+
+class _ZStream(ctypes.Structure):
+    _fields_ = [
+        ('next_in', ctypes.c_void_p),
+        ('avail_in', ctypes.c_uint),
+        ('total_in', ctypes.c_ulong),
+        ('next_out', ctypes.c_void_p),
+        ('avail_out', ctypes.c_uint),
+        ('total_out', ctypes.c_ulong),
+        ('msg', ctypes.c_char_p),
+        ('state', ctypes.c_void_p),
+        ('zalloc', ctypes.c_void_p),
+        ('zfree', ctypes.c_void_p),
+        ('opaque', ctypes.c_void_p),
+        ('data_type', ctypes.c_int),
+        ('adler', ctypes.c_ulong),
+        ('reserved', ctypes.c_ulong),
+    ]
+
+
+_LIBZ = None
+
+
+def _libz():
+    # The zlib module does not expose Z_BLOCK, inflatePrime, or the bit position of deflate blocks,
+    # which are needed to restart decompression in the middle of a gzip stream, so the C library is used directly
+    global _LIBZ
+    if _LIBZ is None:
+        lib_name = ctypes.util.find_library('z') or 'libz.so.1'
+        try:
+            lib = ctypes.CDLL(lib_name)
+        except OSError as err:
+            raise RuntimeError(f'Could not load the zlib library {lib_name}, which is needed to index tarballs') from err
+        stream_p = ctypes.POINTER(_ZStream)
+        lib.zlibVersion.restype = ctypes.c_char_p
+        lib.inflateInit2_.argtypes = [stream_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        lib.inflate.argtypes = [stream_p, ctypes.c_int]
+        lib.inflateEnd.argtypes = [stream_p]
+        lib.inflatePrime.argtypes = [stream_p, ctypes.c_int, ctypes.c_int]
+        lib.inflateSetDictionary.argtypes = [stream_p, ctypes.c_char_p, ctypes.c_uint]
+        _LIBZ = lib
+
+    return _LIBZ
+
+
+class _Inflater():
+    """A zlib inflate stream, gzip for window_bits=47 or raw deflate for window_bits=-15"""
+    def __init__(self, window_bits):
+        self.lib = _libz()
+        self.strm = _ZStream()
+        self.input = b''
+        ret = self.lib.inflateInit2_(ctypes.byref(self.strm), window_bits, self.lib.zlibVersion(), ctypes.sizeof(_ZStream))
+        if ret != Z_OK:
+            raise RuntimeError(f'inflateInit2 failed with {ret}')
+
+    def set_input(self, data):
+        # Keep a reference to the input for as long as zlib points into it
+        self.input = data
+        self.strm.next_in = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+        self.strm.avail_in = len(data)
+
+    def inflate(self, flush):
+        ret = self.lib.inflate(ctypes.byref(self.strm), flush)
+        if ret not in [Z_OK, Z_STREAM_END, Z_BUF_ERROR]:
+            msg = self.strm.msg.decode() if self.strm.msg else ''
+            raise RuntimeError(f'Corrupt gzip stream, inflate returned {ret} {msg}')
+        return ret
+
+    def close(self):
+        if self.strm is not None:
+            self.lib.inflateEnd(ctypes.byref(self.strm))
+            self.strm = None
+
+
+class GzipIndexReader(io.RawIOBase):
+    """Decompresses a gzip file as a readable stream, recording checkpoints to restart decompression from
+
+    A checkpoint is recorded at the first deflate block boundary after every span uncompressed bytes, with
+    the compressed offset, the number of bits of the block in the preceding byte, and the last 32 KiB
+    of uncompressed data, following zran.c from the zlib examples.
+    """
+    def __init__(self, gz_path, span=DEFAULT_SPAN):
+        self.gz_file = open(gz_path, 'rb')
+        self.span = span
+        self.inflater = _Inflater(47)
+        self.window = (ctypes.c_char * WINSIZE)()
+        self.window_address = ctypes.addressof(self.window)
+        self.total_in = 0
+        self.total_out = 0
+        self.last = 0
+        self.checkpoints = []
+        self.buffer = bytearray()
+        self.at_end = False
+
+    def readable(self):
+        return True
+
+    def _inflate_block(self):
+        strm = self.inflater.strm
+        if strm.avail_in == 0:
+            data = self.gz_file.read(CHUNK)
+            if not data:
+                raise RuntimeError(f'Unexpected end of gzip file {self.gz_file.name}')
+            self.inflater.set_input(data)
+        if strm.avail_out == 0:
+            strm.next_out = self.window_address
+            strm.avail_out = WINSIZE
+        out_start = WINSIZE - strm.avail_out
+
+        self.total_in += strm.avail_in
+        self.total_out += strm.avail_out
+        ret = self.inflater.inflate(Z_BLOCK)
+        self.total_in -= strm.avail_in
+        self.total_out -= strm.avail_out
+        out_end = WINSIZE - strm.avail_out
+        self.buffer += ctypes.string_at(self.window_address + out_start, out_end - out_start)
+
+        if ret == Z_STREAM_END:
+            self.at_end = True
+            return
+
+        # At the end of a block that is not the last block, more than span bytes after the previous checkpoint
+        if (strm.data_type & 128) and not (strm.data_type & 64) and (self.total_out == 0 or self.total_out - self.last > self.span):
+            left = strm.avail_out
+            window = (ctypes.string_at(self.window_address + WINSIZE - left, left)
+                      + ctypes.string_at(self.window_address, WINSIZE - left))
+            self.checkpoints.append((self.total_in, self.total_out, strm.data_type & 7, window))
+            self.last = self.total_out
+
+    def read(self, size=-1):
+        while not self.at_end and (size < 0 or len(self.buffer) < size):
+            self._inflate_block()
+        if size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def close(self):
+        if not self.closed:
+            self.inflater.close()
+            self.gz_file.close()
+        super().close()
+
+
+class TarballIndex():
+    """Random-access index of the members of a simulations_job*.tar.gz
+
+    The index has a table of the file members, with their building ID, upgrade ID, path, and uncompressed offset
+    and size, and a table of gzip checkpoints. It is stored beside the tarball, in <tarball>.members.parquet
+    and <tarball>.checkpoints.parquet, and rebuilt when the tarball changes. A member is read by
+    decompressing from the closest checkpoint before it, instead of from the start of the tarball.
+    """
+    def __init__(self, tar_path, members, checkpoints):
+        self.tar_path = tar_path
+        self.members = members
+        self.checkpoints = checkpoints
+        self.member_names = members['path'].tolist()
+        self.member_rows = {name: i for i, name in enumerate(self.member_names)}
+        self.checkpoint_outs = [c[1] for c in checkpoints]
+
+    @staticmethod
+    def index_paths(tar_path):
+        return f'{tar_path}.members.parquet', f'{tar_path}.checkpoints.parquet'
+
+    @staticmethod
+    def tarball_metadata(tar_path):
+        stat = os.stat(tar_path)
+        return {'index_version': INDEX_VERSION, 'tar_size': str(stat.st_size), 'tar_mtime_ns': str(stat.st_mtime_ns)}
+
+    @classmethod
+    def exists(cls, tar_path):
+        """:return: True if an index of the current contents of the tarball is stored beside it"""
+        members_path, checkpoints_path = cls.index_paths(tar_path)
+        if not (os.path.exists(members_path) and os.path.exists(checkpoints_path)):
+            return False
+        metadata = pq.read_schema(checkpoints_path).metadata or {}
+        stored = {k.decode(): v.decode() for k, v in metadata.items()}
+        return all(stored.get(k) == v for k, v in cls.tarball_metadata(tar_path).items())
+
+    @classmethod
+    def load(cls, tar_path):
+        """Load the stored index of a tarball, building and storing it first if needed
+
+        :param tar_path: The path to the simulations_job*.tar.gz file
+
+        :return: TarballIndex
+        """
+        if not cls.exists(tar_path):
+            return cls.build(tar_path)
+        members_path, checkpoints_path = cls.index_paths(tar_path)
+        members = pd.read_parquet(members_path)
+        checkpoints = pq.read_table(checkpoints_path).to_pylist()
+        checkpoints = [(c['compressed_offset'], c['uncompressed_offset'], c['bits'], zlib.decompress(c['window'])) for c in checkpoints]
+        return cls(tar_path, members, checkpoints)
+
+    @classmethod
+    def build(cls, tar_path, span=DEFAULT_SPAN):
+        """Index a tarball in one pass and store the index beside it
+
+        :param tar_path: The path to the simulations_job*.tar.gz file
+        :param span: The uncompressed bytes between gzip checkpoints
+
+        :return: TarballIndex
+        """
+        with GzipIndexReader(tar_path, span) as reader:
+            with tarfile.open(fileobj=reader, mode='r|') as tar:
+                for tar_member in tar:
+                    pass
+            return cls.from_reader(tar_path, reader, tar.members)
+
+    @classmethod
+    def from_reader(cls, tar_path, reader, tar_members):
+        """Store the index from a GzipIndexReader that has been read to the end of a tarball
+
+        :param tar_path: The path to the simulations_job*.tar.gz file
+        :param reader: The GzipIndexReader the tarball was read through
+        :param tar_members: The TarInfo of every member of the tarball
+
+        :return: TarballIndex
+        """
+        members = cls.members_table([m for m in tar_members if m.isfile()])
+        index = cls(tar_path, members, reader.checkpoints)
+        if index.save():
+            logger.info(f'Indexed {len(members)} members of {tar_path} with {len(reader.checkpoints)} checkpoints')
+        return index
+
+    @staticmethod
+    def members_table(tar_members):
+        rows = []
+        for tar_member in tar_members:
+            # e.g. ./up00/bldg0000012/run/data_point.zip
+            m = re.search(r'up(\d+)/bldg(\d+)', tar_member.name)
+            rows.append({
+                'building_id': int(m.group(2)) if m else None,
+                'upgrade_id': int(m.group(1)) if m else None,
+                'path': tar_member.name,
+                'offset': tar_member.offset_data,
+                'size': tar_member.size,
+            })
+        members = pd.DataFrame(rows, columns=['building_id', 'upgrade_id', 'path', 'offset', 'size'])
+        return members.astype({'building_id': 'Int64', 'upgrade_id': 'Int64', 'offset': 'int64', 'size': 'int64'})
+
+    def save(self):
+        """Store the index beside the tarball. The simulation output directory may be read-only or shared,
+        so an index that cannot be written is a warning, and the index is still usable in this process.
+
+        :return: True if the index was stored
+        """
+        members_path, checkpoints_path = self.index_paths(self.tar_path)
+        metadata = self.tarball_metadata(self.tar_path)
+        members = pa.Table.from_pandas(self.members, preserve_index=False)
+        checkpoints = pa.table({
+            'compressed_offset': pa.array([c[0] for c in self.checkpoints], pa.int64()),
+            'uncompressed_offset': pa.array([c[1] for c in self.checkpoints], pa.int64()),
+            'bits': pa.array([c[2] for c in self.checkpoints], pa.int8()),
+            'window': pa.array([zlib.compress(c[3]) for c in self.checkpoints], pa.binary()),
+        })
+        # The checkpoints are written last, marking the index as complete
+        try:
+            pq.write_table(members, f'{members_path}.tmp')
+            os.replace(f'{members_path}.tmp', members_path)
+            pq.write_table(checkpoints.replace_schema_metadata(metadata), f'{checkpoints_path}.tmp')
+            os.replace(f'{checkpoints_path}.tmp', checkpoints_path)
+        except OSError as err:
+            logger.warning(f'Could not store the index of {self.tar_path}, it will be rebuilt next time: {err}')
+            for tmp_path in [f'{members_path}.tmp', f'{checkpoints_path}.tmp']:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return False
+
+        return True
+
+    def building_members(self, building_id, upgrade_id=None):
+        """
+        Return:
+            pd.DataFrame: The members of one building, in all upgrades if upgrade_id is None
+        """
+        members = self.members.loc[self.members['building_id'] == building_id]
+        if upgrade_id is not None:
+            members = members.loc[members['upgrade_id'] == upgrade_id]
+        return members
+
+    def reader(self):
+        """
+        Return:
+            IndexedTarballReader: A reader for members read in tarball order, open until closed
+        """
+        return IndexedTarballReader(self)
+
+    def member_range(self, member_name):
+        """
+        Return:
+            tuple: The uncompressed offset and size of a member, by its path in the tarball
+        """
+        if member_name not in self.member_rows:
+            raise KeyError(f'{member_name} not found in {self.tar_path}')
+        member = self.members.iloc[self.member_rows[member_name]]
+        return int(member['offset']), int(member['size'])
+
+    def read_member(self, member_name):
+        """
+        Return:
+            bytes: The contents of a member, by its path in the tarball
+        """
+        with self.reader() as reader:
+            return reader.read_member(member_name)
+
+    def read_at(self, offset, length):
+        """
+        Return:
+            bytes: length bytes of the uncompressed tarball, starting at offset
+        """
+        with self.reader() as reader:
+            return reader.read_at(offset, length)
+
+
+class IndexedTarballReader():
+    """Reads ranges of an indexed tarball with one inflate stream
+
+    Ranges read in increasing order continue the stream, which only restarts from a checkpoint to go back,
+    or to skip ahead to a checkpoint closer to the range. Reading many members in order therefore
+    decompresses each part of the tarball at most once, like a sequential scan.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.gz_file = open(index.tar_path, 'rb')
+        self.inflater = None
+        self.out_buf = (ctypes.c_char * CHUNK)()
+        self.out_address = ctypes.addressof(self.out_buf)
+        # Decompressed bytes not yet read, starting at uncompressed offset pos
+        self.pos = 0
+        self.pending = bytearray()
+        self.at_end = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _restart(self, checkpoint):
+        compressed_offset, uncompressed_offset, bits, window = checkpoint
+        if self.inflater is not None:
+            self.inflater.close()
+        self.inflater = _Inflater(-15)
+        lib = self.inflater.lib
+        strm = self.inflater.strm
+        self.gz_file.seek(compressed_offset - (1 if bits else 0))
+        if bits:
+            lib.inflatePrime(ctypes.byref(strm), bits, self.gz_file.read(1)[0] >> (8 - bits))
+        lib.inflateSetDictionary(ctypes.byref(strm), window, WINSIZE)
+        self.pos = uncompressed_offset
+        self.pending = bytearray()
+        self.at_end = False
+
+    def _inflate(self, offset):
+        # Decompress the next chunk, discarding the output before offset
+        strm = self.inflater.strm
+        if strm.avail_in == 0:
+            compressed = self.gz_file.read(CHUNK)
+            if not compressed:
+                raise RuntimeError(f'Unexpected end of gzip file {self.index.tar_path}')
+            self.inflater.set_input(compressed)
+        strm.next_out = self.out_address
+        strm.avail_out = CHUNK
+        ret = self.inflater.inflate(Z_NO_FLUSH)
+        produced = CHUNK - strm.avail_out
+        # Nothing is pending while the output is still before offset
+        skip = min(max(offset - self.pos - len(self.pending), 0), produced)
+        self.pos += skip
+        self.pending += ctypes.string_at(self.out_address + skip, produced - skip)
+        if ret == Z_STREAM_END:
+            self.at_end = True
+
+    def read_member(self, member_name):
+        """
+        Return:
+            bytes: The contents of a member, by its path in the tarball
+        """
+        return self.read_at(*self.index.member_range(member_name))
+
+    def read_at(self, offset, length):
+        """
+        Return:
+            bytes: length bytes of the uncompressed tarball, starting at offset
+        """
+        # Closest checkpoint before the offset
+        checkpoint = self.index.checkpoints[bisect.bisect_right(self.index.checkpoint_outs, offset) - 1]
+        if self.inflater is None or offset < self.pos or checkpoint[1] > self.pos:
+            self._restart(checkpoint)
+        elif self.pos < offset:
+            dropped = min(offset - self.pos, len(self.pending))
+            del self.pending[:dropped]
+            self.pos += dropped
+
+        while self.pos + len(self.pending) < offset + length:
+            if self.at_end:
+                raise RuntimeError(f'Unexpected end of gzip stream in {self.index.tar_path}')
+            self._inflate(offset)
+
+        data = bytes(self.pending[:length])
+        del self.pending[:length]
+        self.pos += length
+        return data
+
+    def close(self):
+        if self.inflater is not None:
+            self.inflater.close()
+            self.inflater = None
+        self.gz_file.close()
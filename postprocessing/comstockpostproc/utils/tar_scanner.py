@@ -0,0 +1,385 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+import glob
+import gzip
+import io
+import json
+import logging
+import os
+from os import path
+import re
+import subprocess
+import tarfile
+import zipfile
+
+from joblib import Parallel, delayed
+import pandas as pd
+
+from .profiling import profilingPerformance
+from .tar_index import TarballIndex
+
+logger = logging.getLogger(__name__)
+
+# Read buffer for the gzip stream, larger than the tarfile default to cut down on read calls
+TAR_BUFSIZE = 1024 * 1024
+
+
+def job_id_from_tar_path(tar_path):
+    return re.search(r'.*simulations_job(\d+).tar.gz', tar_path).group(1)
+
+
+class TarMemberConsumer():
+    """Base class for the consumers of the members of simulations_job*.tar.gz files, see scan_simulation_tarballs
+
+    Each tarball is scanned by a worker with its own copy of the consumer. For each tarball, begin_job is called,
+    then consume for every file member the consumer wants, then end_job. The values returned by end_job
+    for all tarballs are passed to finish in the calling process.
+    """
+    def begin_job(self, tar_path, job_id):
+        """Prepare to consume the members of one tarball
+
+        :param tar_path: The path to the simulations_job*.tar.gz file
+        :param job_id: The job ID of the tarball
+
+        :return: False to skip this tarball, for example because its outputs already exist
+        """
+        return True
+
+    def wants(self, member_name):
+        """:return: True if consume should be called with the contents of this member"""
+        return False
+
+    def consume(self, member_name, data):
+        """Process the contents of one member
+
+        :param member_name: The name of the member in the tarball, e.g. ./up00/bldg0000001/run/data_point.zip
+        :param data: The bytes of the member
+        """
+        pass
+
+    def done(self):
+        """:return: True if no more members of the current tarball are needed, which can end the scan early"""
+        return False
+
+    def end_job(self):
+        """:return: The result for the current tarball, passed to finish"""
+        return None
+
+    def finish(self, job_results):
+        """Combine the results of all tarballs
+
+        :param job_results: The end_job results of each tarball, None for skipped tarballs
+
+        :return: The result of the scan for this consumer
+        """
+        return None
+
+
+def scan_tarball(tar_path, consumers, use_index=False):
+    """Stream one simulations_job*.tar.gz once, dispatching each member to the consumers that want it
+
+    The tarball is decompressed sequentially, without seeking back for members requested by name,
+    so the gzip stream is only decompressed once for all consumers, and the scan stops once the consumers
+    are done. If the tarball has been indexed, see TarballIndex, use_index also skips the parts of the tarball
+    between checkpoints that hold no wanted members. It saves the most for consumers that want a few members.
+
+    :param tar_path: The path to the simulations_job*.tar.gz file
+    :param consumers: A list of TarMemberConsumer
+    :param use_index: Read the members through the index stored beside the tarball, if there is one
+
+    :return: A list of the end_job results of each consumer, None for consumers that skipped the tarball
+    """
+    job_id = job_id_from_tar_path(tar_path)
+    active = [consumer.begin_job(tar_path, job_id) for consumer in consumers]
+    active_consumers = [consumer for consumer, is_active in zip(consumers, active) if is_active]
+    if active_consumers and use_index and TarballIndex.exists(tar_path):
+        index = TarballIndex.load(tar_path)
+        # Members are read in tarball order, continuing one inflate stream between them
+        with index.reader() as reader:
+            for member_name in index.member_names:
+                wanting = [consumer for consumer in active_consumers if consumer.wants(member_name)]
+                if not wanting:
+                    continue
+                data = reader.read_member(member_name)
+                for consumer in wanting:
+                    consumer.consume(member_name, data)
+                if all(consumer.done() for consumer in active_consumers):
+                    break
+    elif active_consumers:
+        with tarfile.open(tar_path, 'r|gz', bufsize=TAR_BUFSIZE) as tar:
+            for tar_member in tar:
+                if not tar_member.isfile():
+                    continue
+                wanting = [consumer for consumer in active_consumers if consumer.wants(tar_member.name)]
+                if not wanting:
+                    continue
+                data = tar.extractfile(tar_member).read()
+                for consumer in wanting:
+                    consumer.consume(tar_member.name, data)
+                if all(consumer.done() for consumer in active_consumers):
+                    break
+
+    return [consumer.end_job() if is_active else None for consumer, is_active in zip(consumers, active)]
+
+
+def scan_simulation_tarballs(tar_paths, consumers, n_jobs=-1, use_index=False):
+    """Scan simulations_job*.tar.gz files in parallel, decompressing each one once for all consumers
+
+    :param tar_paths: A list of paths to simulations_job*.tar.gz files
+    :param consumers: A list of TarMemberConsumer
+    :param n_jobs: The number of worker processes, -1 to use all CPUs
+    :param use_index: Read the members through the index stored beside each tarball, if there is one, see scan_tarball
+
+    :return: A list of the finish results of each consumer
+    """
+    job_results = Parallel(n_jobs=n_jobs, verbose=10)(delayed(scan_tarball)(tar_path, consumers, use_index) for tar_path in tar_paths)
+
+    return [consumer.finish([results[i] for results in job_results]) for i, consumer in enumerate(consumers)]
+
+
+class EnergyPlusErrorFiles(TarMemberConsumer):
+    """Concatenates the eplusout.err files from the data_point.zip files of each job to errs_dir/job*_eplusout.err"""
+    def __init__(self, errs_dir):
+        self.errs_dir = errs_dir
+        if not path.exists(self.errs_dir):
+            os.makedirs(self.errs_dir)
+
+    def begin_job(self, tar_path, job_id):
+        self.job_errs_path = os.path.join(self.errs_dir, f'job{job_id}_eplusout.err')
+        if os.path.exists(self.job_errs_path):
+            print(f'Already extracted errors from job {job_id} to {self.job_errs_path}')
+            return False
+        print(f'Extracting errors from job {job_id} to {self.job_errs_path}')
+        # Written under a temporary name so an interrupted scan is not mistaken for a finished job
+        self.job_errs = open(f'{self.job_errs_path}.tmp', 'w')
+        return True
+
+    def wants(self, member_name):
+        return 'data_point.zip' in member_name
+
+    def consume(self, member_name, data):
+        bldg_id = int(re.search(r'.*bldg(\d+).*', member_name).group(1))
+        with zipfile.ZipFile(io.BytesIO(data)) as zip:
+            try:
+                errs = zip.read('eplusout.err').decode()
+            except KeyError as err:
+                print(f'Did not find eplusout.err in data_point.zip for building {bldg_id}')
+                return
+        self.job_errs.write(f'eplusout.err from building_id={bldg_id}\n')
+        self.job_errs.write(errs)
+
+    def end_job(self):
+        self.job_errs.close()
+        self.job_errs = None
+        os.replace(f'{self.job_errs_path}.tmp', self.job_errs_path)
+        return self.job_errs_path
+
+
+class FailureLogs(TarMemberConsumer):
+    """Writes the ERROR messages from the openstudio_output.log of each failed run to fails_dir/job*_failures.log
+
+    The failed.job marker and the log of a run may come in either order in the tarball,
+    so the ERROR lines of every log are kept until the end of the job.
+    """
+    ERROR_REGEX = re.compile(r'\[.* ERROR\]|\[.*<Error>.*\]')
+
+    def __init__(self, fails_dir):
+        self.fails_dir = fails_dir
+        if not path.exists(self.fails_dir):
+            os.makedirs(self.fails_dir)
+
+    def begin_job(self, tar_path, job_id):
+        self.job_id = job_id
+        self.job_fails_path = os.path.join(self.fails_dir, f'job{job_id}_failures.log')
+        if os.path.exists(self.job_fails_path):
+            print(f'Already extracted failures from job {job_id} to {self.job_fails_path}')
+            return False
+        print(f'Extracting failures from job {job_id} to {self.job_fails_path}')
+        self.failed_runs = []
+        self.log_errors = {}
+        return True
+
+    def wants(self, member_name):
+        return 'failed.job' in member_name or member_name.endswith('/openstudio_output.log')
+
+    def consume(self, member_name, data):
+        if 'failed.job' in member_name:
+            bldg_id = re.search(r'.*bldg(\d+).*', member_name).group(1)
+            up_id = re.search(r'.*up(\d+).*', member_name).group(1)
+            self.failed_runs.append((up_id, bldg_id))
+        else:
+            self.log_errors[member_name] = [l for l in data.decode().split('\n') if self.ERROR_REGEX.search(l)]
+
+    def end_job(self):
+        with open(f'{self.job_fails_path}.tmp', 'w') as job_fails:
+            job_fails.write(f'Errors from job_id={self.job_id}\n')
+            for up_id, bldg_id in self.failed_runs:
+                job_fails.write(f'Errors from up{up_id}/bldg{bldg_id}\n')
+                sing_out_name = f'./up{up_id}/bldg{bldg_id}/openstudio_output.log'
+                if sing_out_name not in self.log_errors:
+                    job_fails.write(f'Did not find openstudio_output.log for up{up_id}/bldg{bldg_id}, cannot extract failure details\n')
+                    continue
+                for l in self.log_errors[sing_out_name]:
+                    job_fails.write(f'{l}\n')
+        os.replace(f'{self.job_fails_path}.tmp', self.job_fails_path)
+        self.log_errors = {}
+        return self.job_fails_path
+
+    def finish(self, job_results):
+        # Concatenate failures for all jobs into one file
+        fail_summary_path = os.path.join(self.fails_dir, 'failure_summary.log')
+        print(f'Writing summary to {fail_summary_path}')
+        with open(fail_summary_path, 'w') as f:
+            for job_fails_path in glob.glob(f'{self.fails_dir}/job*_failures.log'):
+                with open(job_fails_path, 'r') as job_fails:
+                    for line in job_fails:
+                        f.write(line)
+        return fail_summary_path
+
+
+class ProfilingLogs(TarMemberConsumer):
+    """Appends the runtimes from the out.osw files of each job to the profiling_summary reports,
+    see profilingPerformance, and aggregates the reports of all jobs
+    """
+    def __init__(self, selecting_upgrade_ids=None):
+        # selecting_upgrade_ids = ["up00", "up01" ... ], None for all upgrades
+        self.selecting_upgrade_ids = selecting_upgrade_ids
+
+    def begin_job(self, tar_path, job_id):
+        self.tar_path = tar_path
+        logger.info(f'Analyzing log files from {tar_path}')
+        return True
+
+    def wants(self, member_name):
+        return profilingPerformance.is_running_log(member_name)
+
+    def consume(self, member_name, data):
+        try:
+            log = json.loads(data)
+        except Exception as e:
+            logger.info(f'the log file {member_name} is not a valid json file due to {e}')
+            return
+        profilingPerformance.report_log(self.tar_path, member_name, log, self.selecting_upgrade_ids)
+
+    def end_job(self):
+        return self.tar_path
+
+    def finish(self, job_results):
+        tar_paths = [tar_path for tar_path in job_results if tar_path is not None]
+        if tar_paths:
+            profilingPerformance.aggregate_csv(tar_paths[0])
+
+
+class DatapointModelFiles(TarMemberConsumer):
+    """Extracts the in.idf, in.osm, eplustbl.htm, and run.log from selected data_point.zip files
+
+    :param tar_to_members: A dict of simulations_job*.tar.gz paths to dicts of data_point.zip member names,
+        e.g. ./up00/bldg0000012/run/data_point.zip, to the directory to extract the model files of that building into
+    """
+    FILES_TO_EXTRACT = ['in.idf', 'in.osm', 'eplustbl.htm', 'run.log']
+
+    def __init__(self, tar_to_members):
+        self.tar_to_members = {}
+        for tar_path, members_to_dirs in tar_to_members.items():
+            self.tar_to_members[tar_path] = {os.path.normpath(k): v for k, v in members_to_dirs.items()}
+
+    def begin_job(self, tar_path, job_id):
+        self.members_to_dirs = self.tar_to_members.get(tar_path, {})
+        self.remaining = set(self.members_to_dirs.keys())
+        self.failures = []
+        return len(self.remaining) > 0
+
+    def wants(self, member_name):
+        return os.path.normpath(member_name) in self.remaining
+
+    def consume(self, member_name, data):
+        member_name = os.path.normpath(member_name)
+        self.remaining.discard(member_name)
+        model_dir = self.members_to_dirs[member_name]
+        if not path.exists(model_dir):
+            os.makedirs(model_dir)
+        building = re.search(r'.*(bldg\d+).*', member_name).group(1)
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                for file_to_extract in self.FILES_TO_EXTRACT:
+                    with open(os.path.join(model_dir, file_to_extract), 'wb') as f:
+                        f.write(zf.read(file_to_extract))
+        except KeyError as err:
+            self.failures.append({'type': 'extraction failure', 'instance': building, 'subtype': 'file not found in zip', 'details': str(err)})
+        except zipfile.BadZipFile as err:
+            self.failures.append({'type': 'extraction failure', 'instance': building, 'subtype': 'bad zip', 'details': str(err)})
+        except Exception as err:
+            self.failures.append({'type': 'extraction failure', 'instance': building, 'subtype': 'other', 'details': str(err)})
+
+    def done(self):
+        return not self.remaining
+
+    def end_job(self):
+        for member_name in sorted(self.remaining):
+            building = re.search(r'.*(bldg\d+).*', member_name).group(1)
+            self.failures.append({'type': 'extraction failure', 'instance': building, 'subtype': 'not found in tar', 'details': member_name})
+        return self.failures
+
+    def finish(self, job_results):
+        failures = pd.DataFrame([f for failures in job_results if failures for f in failures])
+        for failure in failures.to_dict('records'):
+            print(f"Could not extract {failure['instance']}: {failure['subtype']}, {failure['details']}")
+        return failures
+
+
+class ModelFilesToS3(TarMemberConsumer):
+    """Copies the gzipped in.osm of selected buildings to s3_output_dir/upgrade=<upgrade ID> using s5cmd
+
+    :param model_files_dir: A temporary directory to write the gzipped models to before the transfer
+    :param s3_output_dir: The S3 directory to copy the models to
+    :param bldg_ids: The building IDs of the models to copy
+    """
+    def __init__(self, model_files_dir, s3_output_dir, bldg_ids):
+        self.model_files_dir = model_files_dir
+        self.s3_output_dir = s3_output_dir
+        self.bldg_ids = set(bldg_ids)
+
+    def begin_job(self, tar_path, job_id):
+        self.job_id = job_id
+        print(f'Extracting model files from job {job_id}...', flush=True)
+        self.zip_count = 0
+        self.model_not_found_count = 0
+        return True
+
+    def wants(self, member_name):
+        # get data_point zip file for main run only
+        if not 'data_point.zip' in member_name:
+            return False
+        if 'BuildExistingModel' in member_name or 'ApplyUpgrade' in member_name:
+            return False
+        return int(re.search(r'.*bldg(\d+).*', member_name).group(1)) in self.bldg_ids
+
+    def consume(self, member_name, data):
+        bldg_id = re.search(r'.*bldg(\d+).*', member_name).group(1)
+        upgrade_id = re.search(r'.*up(\d+).*', member_name).group(1)
+        self.zip_count += 1
+        model_name = f'bldg{bldg_id.zfill(7)}-up{upgrade_id}.osm.gz'
+        upgrade_folder = os.path.join(self.model_files_dir, f'upgrade={upgrade_id}')
+        if not path.exists(upgrade_folder):
+            os.makedirs(upgrade_folder)
+        model_path_out = os.path.join(upgrade_folder, model_name)
+        with zipfile.ZipFile(io.BytesIO(data)) as zip:
+            try:
+                osm_file = zip.read('in.osm').decode()
+            except KeyError:
+                self.model_not_found_count += 1
+                return
+
+        # file will be written, copied to new location, then deleted
+        with gzip.open(model_path_out, 'wt') as f_out:
+            f_out.write(osm_file)
+        s3_upgrade_folder = os.path.join(self.s3_output_dir, f'upgrade={upgrade_id}')
+        s3_model_path = os.path.join(s3_upgrade_folder, model_name)
+        if not path.exists(s3_upgrade_folder):
+            os.makedirs(s3_upgrade_folder)
+        subprocess.run(['s5cmd', 'cp', model_path_out, s3_model_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        os.remove(model_path_out)
+
+    def end_job(self):
+        print(f'{self.zip_count} models extracted from job {self.job_id} -- {self.model_not_found_count} models were not found.', flush=True)
+        return self.zip_count
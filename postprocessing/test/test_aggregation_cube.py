@@ -0,0 +1,66 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from comstockpostproc.aggregation_cube import AggregationCube, cube_for_frame
+
+
+def make_data():
+    rng = np.random.default_rng(1)
+    n = 200
+    base = pd.DataFrame({
+        'bldg_id': np.arange(n),
+        'upgrade': 0,
+        'in.upgrade_name': 'Baseline',
+        'applicability': True,
+        'in.comstock_building_type': rng.choice(['Office', 'Warehouse', 'RetailStandalone'], n),
+        'in.census_division_name': rng.choice(['Pacific', 'Mountain', None], n),
+        'calc.weighted.site_energy.total.energy_consumption..tbtu': rng.random(n),
+        'out.site_energy.total.energy_consumption_intensity..kwh_per_ft2': rng.random(n) * 100,
+    })
+    up = base.copy()
+    up['upgrade'] = 1
+    up['in.upgrade_name'] = 'LED Lighting'
+    up['applicability'] = rng.random(n) > 0.5
+    up['calc.weighted.site_energy.total.energy_consumption..tbtu'] *= 0.8
+    return pd.concat([base, up], ignore_index=True)
+
+
+def test_sums_match_pandas_groupby():
+    df = make_data()
+    col = 'calc.weighted.site_energy.total.energy_consumption..tbtu'
+    cube = AggregationCube(df, 'in.upgrade_name')
+
+    sums = cube.sums(('in.comstock_building_type', 'in.census_division_name'))
+    expected = df.groupby(['in.upgrade_name', 'in.comstock_building_type', 'in.census_division_name'])[col].agg(['sum', 'count']).reset_index()
+    assert len(sums) == len(expected)
+    np.testing.assert_allclose(sums[col].to_numpy(), expected['sum'].to_numpy())
+    assert sums['count'].tolist() == expected['count'].tolist()
+
+    # Rows with a missing division are still counted when not grouping by division
+    assert cube.sums()['count'].sum() == len(df)
+
+
+def test_applicable_only_sums():
+    df = make_data()
+    col = 'calc.weighted.site_energy.total.energy_consumption..tbtu'
+    cube = AggregationCube(df, 'in.upgrade_name')
+    applic_bldgs = df.loc[(df['in.upgrade_name'] != 'Baseline') & df['applicability'], 'bldg_id']
+    expected = df.loc[df['bldg_id'].isin(applic_bldgs)].groupby('in.upgrade_name')[col].sum()
+    sums = cube.sums(applicable_only=True).set_index('in.upgrade_name')[col]
+    np.testing.assert_allclose(sums.loc[expected.index].to_numpy(), expected.to_numpy())
+
+
+def test_quantiles_and_cache():
+    df = make_data()
+    eui = 'out.site_energy.total.energy_consumption_intensity..kwh_per_ft2'
+    cube = cube_for_frame(df, 'in.upgrade_name')
+    assert cube_for_frame(df, 'in.upgrade_name') is cube
+
+    medians = cube.quantile(eui, 0.5, ('in.comstock_building_type',))
+    expected = df.groupby(['in.upgrade_name', 'in.comstock_building_type'])[eui].median().reset_index()
+    np.testing.assert_allclose(medians[eui].to_numpy(), expected[eui].to_numpy())
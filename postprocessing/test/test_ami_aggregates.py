@@ -0,0 +1,55 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from comstockpostproc.ami import AMI
+
+
+def test_t_interval_matches_scipy():
+    rng = np.random.default_rng(2)
+    mean = rng.uniform(0, 1, 50)
+    std = rng.uniform(0, 0.5, 50)
+    count = rng.integers(2, 500, 50)
+    lci, uci = AMI.t_interval(mean, std, count, 0.8)
+    for i in range(50):
+        exp_lci, exp_uci = stats.t.interval(0.8, count[i] - 1, mean[i], std[i] / np.sqrt(count[i]))
+        np.testing.assert_allclose([lci[i], uci[i]], [exp_lci, exp_uci])
+
+
+def test_aggregate_ami_data():
+    ami = AMI.__new__(AMI)
+    ami.building_types = ['small_office', 'warehouse', 'hospital']
+    rng = np.random.default_rng(3)
+    times = pd.date_range('2018-01-01', periods=8760, freq='h', name='timestamp')
+    dfs = []
+    # hospital has too few hours to be used but still counts toward the floor area
+    for bldg_type, sqft, n in [('small_office', 1000.0, 8760), ('warehouse', 3000.0, 8760), ('hospital', 2000.0, 100)]:
+        dfs.append(pd.DataFrame({
+            'mean_by_sqft': rng.uniform(0.1, 1, n),
+            'total_sqft': sqft,
+            'std_by_count': rng.uniform(0, 0.1, n),
+            'bldg_count': rng.integers(10, 20, n),
+            'building_type': bldg_type,
+            'region_name': 'denver',
+            'year': '2018',
+        }, index=times[:n]))
+    raw = pd.concat(dfs)
+    agg = ami.aggregate_ami_data(raw, {'denver': 0})
+
+    assert agg['building_type'].unique().tolist() == ['small_office', 'warehouse', 'total']
+    office = agg.loc[agg['building_type'] == 'small_office']
+    raw_office = dfs[0]
+    uci = stats.t.interval(0.8, raw_office['bldg_count'] - 1, raw_office['mean_by_sqft'],
+                           raw_office['std_by_count'] / np.sqrt(raw_office['bldg_count']))[1]
+    np.testing.assert_allclose(office['sample_uncertainty'], uci / raw_office['mean_by_sqft'] - 1)
+
+    total = agg.loc[agg['building_type'] == 'total']
+    assert total.index.is_monotonic_increasing
+    expected_kwh = dfs[0]['mean_by_sqft'] * 1000 + dfs[1]['mean_by_sqft'] * 3000
+    np.testing.assert_allclose(total['kwh_per_sf'], expected_kwh / 6000)
+    np.testing.assert_array_equal(total['bldg_count'], dfs[0]['bldg_count'] + dfs[1]['bldg_count'])
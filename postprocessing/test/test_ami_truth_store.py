@@ -0,0 +1,135 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+
+import botocore
+import numpy as np
+import pandas as pd
+import pytest
+
+from comstockpostproc.ami import AMI
+from comstockpostproc.ami_truth_store import AMITruthStore
+
+
+def write_csv(path, seed, start='2018-01-01'):
+    rng = np.random.default_rng(seed)
+    n = 48
+    df = pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=n, freq='h').strftime('%Y-%m-%d %H:%M:%S'),
+        'mean_by_sqft': rng.uniform(0, 1, n),
+        'total_sqft': 1000.0,
+        'std_by_count': rng.uniform(0, 0.1, n),
+        'bldg_count': rng.integers(1, 20, n),
+    })
+    df.to_csv(path, index=False)
+    return df
+
+
+def test_ingest_and_read(tmp_path):
+    store = AMITruthStore(os.path.join(str(tmp_path), 'store'))
+    csvs = {}
+    for i, (region, bldg_type) in enumerate([('seattle', 'retail'), ('seattle', 'warehouse'), ('epb', 'retail')]):
+        path = os.path.join(str(tmp_path), f'{region}_{bldg_type}.csv')
+        csvs[(region, bldg_type)] = (path, write_csv(path, i))
+        store.ingest(path, region, bldg_type)
+
+    assert store.partitions() == [('epb', 'retail'), ('seattle', 'retail'), ('seattle', 'warehouse')]
+    df = store.read(regions=['seattle'], building_types=['warehouse'], columns=['mean_by_sqft'])
+    assert df.columns.tolist() == ['timestamp', 'mean_by_sqft', 'region_name', 'building_type']
+    assert pd.api.types.is_datetime64_any_dtype(df['timestamp'])
+    expected = csvs[('seattle', 'warehouse')][1]
+    np.testing.assert_allclose(df['mean_by_sqft'], expected['mean_by_sqft'])
+    assert len(store.read()) == 3 * 48
+
+    # Only files changed since they were stored are ingested again
+    path, _ = csvs[('epb', 'retail')]
+    partition = store.ingest(path, 'epb', 'retail')
+    stored_time = os.path.getmtime(partition)
+    store.ingest(path, 'epb', 'retail')
+    assert os.path.getmtime(partition) == stored_time
+    write_csv(path, 10, start='2019-01-01')
+    os.utime(path, (stored_time + 10, stored_time + 10))
+    store.ingest(path, 'epb', 'retail')
+    assert store.read(regions=['epb'])['timestamp'].dt.year.unique().tolist() == [2019]
+    assert store.read(partitions=[('epb', 'retail'), ('seattle', 'warehouse')]).groupby(
+        ['region_name', 'building_type']).size().to_dict() == {('epb', 'retail'): 48, ('seattle', 'warehouse'): 48}
+
+
+def test_partitions_record_their_source_file(tmp_path):
+    store = AMITruthStore(os.path.join(str(tmp_path), 'store'))
+    path_2018 = os.path.join(str(tmp_path), '2018_epb_3xmedian_retail_kwh_per_sqft.csv')
+    path_2019 = os.path.join(str(tmp_path), '2019_epb_3xmedian_retail_kwh_per_sqft.csv')
+    df = write_csv(path_2018, 0)
+    # Missing counts are kept instead of failing the conversion
+    df.loc[3, 'bldg_count'] = np.nan
+    df.to_csv(path_2018, index=False)
+    store.ingest(path_2018, 'epb', 'retail')
+    assert store.has('epb', 'retail', path_2018)
+    assert np.isnan(store.read()['bldg_count'].iloc[3])
+
+    # A file for another year replaces the partition even though the partition is newer
+    write_csv(path_2019, 1, start='2019-01-01')
+    assert not store.has('epb', 'retail', path_2019)
+    os.utime(path_2019, (0, 0))
+    store.ingest(path_2019, 'epb', 'retail')
+    assert store.source_file('epb', 'retail') == os.path.basename(path_2019)
+    assert store.read()['timestamp'].dt.year.unique().tolist() == [2019]
+
+
+def test_read_skips_interrupted_ingest(tmp_path, monkeypatch):
+    store = AMITruthStore(os.path.join(str(tmp_path), 'store'))
+    retail_path = os.path.join(str(tmp_path), 'seattle_retail.csv')
+    warehouse_path = os.path.join(str(tmp_path), 'seattle_warehouse.csv')
+    write_csv(retail_path, 0)
+    write_csv(warehouse_path, 1)
+    store.ingest(retail_path, 'seattle', 'retail')
+
+    # A run interrupted before its temporary file replaces the partition leaves the temporary file behind
+    def interrupt(src, dst):
+        raise KeyboardInterrupt()
+    monkeypatch.setattr('comstockpostproc.ami_truth_store.os.replace', interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        store.ingest(warehouse_path, 'seattle', 'warehouse')
+    monkeypatch.undo()
+
+    assert len(store.read()) == 48
+    assert store.partitions() == [('seattle', 'retail')]
+    store.ingest(warehouse_path, 'seattle', 'warehouse')
+    assert len(store.read()) == 2 * 48
+
+
+class FakeS3Client():
+    # Copies files from a local directory in place of downloading them from s3
+    def __init__(self, source_dir):
+        self.source_dir = source_dir
+
+    def download_file(self, bucket, key, path):
+        source_path = os.path.join(self.source_dir, os.path.basename(key))
+        if not os.path.exists(source_path):
+            raise botocore.exceptions.ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        shutil.copy(source_path, path)
+
+
+def test_download_missing_files(tmp_path):
+    source_dir = os.path.join(str(tmp_path), 's3')
+    truth_data_dir = os.path.join(str(tmp_path), 'truth')
+    for p in [source_dir, truth_data_dir]:
+        os.makedirs(p)
+    ami = AMI.__new__(AMI)
+    ami.truth_data_version = 'v01'
+    ami.truth_data_dir = truth_data_dir
+    ami.truth_store = AMITruthStore(os.path.join(truth_data_dir, 'AMI_store'))
+    ami.max_download_workers = 4
+    ami.s3_client = FakeS3Client(source_dir)
+    ami.ami_region_map = [{'source_name': 'seattle', 'year': 2018, 'filter_method': '3xmedian'}]
+    ami.building_types = ['retail', 'warehouse', 'hospital']
+    for bldg_type in ['retail', 'warehouse']:
+        write_csv(os.path.join(source_dir, f'2018_seattle_3xmedian_{bldg_type}_kwh_per_sqft.csv'), 0)
+
+    ami.download_truth_data()
+    ami.ingest_truth_data()
+    assert ami.truth_store.partitions() == [('seattle', 'retail'), ('seattle', 'warehouse')]
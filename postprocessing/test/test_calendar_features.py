@@ -0,0 +1,38 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from comstockpostproc.calendar_features import add_calendar_features, calendar_features, peak_weeks, SHOULDER_SEASONS
+
+
+def test_calendar_features():
+    cal = calendar_features(2018)
+    assert len(cal) == 8760
+    assert calendar_features(2018) is cal
+    assert cal['Hour_of_Year'].tolist() == list(range(8760))
+    jul_4 = cal.loc['2018-07-04 12:00']
+    assert jul_4['Holiday'] and jul_4['Season'] == 'Summer' and jul_4['Day_Type'] == 'Weekday'
+    assert cal.loc['2018-12-31 05:00', 'Week_of_Year'] == 55
+    assert calendar_features(2018, SHOULDER_SEASONS).loc['2018-04-01 00:00', 'Season'] == 'Shoulder'
+
+
+def test_join_and_peak_weeks():
+    # Two upgrades with the same timestamps, including one from the next year
+    times = pd.date_range('2018-01-01 01:00', '2019-01-01 00:00', freq='h', name='time')
+    rng = np.random.default_rng(0)
+    df = pd.concat([
+        pd.DataFrame({'in.upgrade_name': name, 'kwh': rng.uniform(0, 10, len(times))}, index=times)
+        for name in ['baseline', 'LED']
+    ])
+    df.loc['2018-07-18 15:00', 'kwh'] = 20
+    df = add_calendar_features(df)
+    assert len(df) == 2 * 8759
+    assert (df['Year'] == 2018).all()
+    weeks = peak_weeks(df, 'kwh')
+    assert weeks['Summer'] == 29
+    winter = df.loc[df['Season'] == 'Winter']
+    assert weeks['Winter'] == winter.loc[winter['kwh'].idxmax(), 'Week_of_Year'].iloc[0]
@@ -50,13 +50,13 @@ def test_cbecs_2012(caplog):
     for tot_col, enduse_cols in tot_col_enduse_cols:
         # Unweighted
         sum_tot_col = cbecs.data[tot_col].sum()
-        sum_enduses = cbecs.data[enduse_cols].sum().sum()
+        sum_enduses = cbecs.data[enduse_cols].sum_horizontal().sum()
         assert sum_enduses == pytest.approx(sum_tot_col, rel=engy_tol), f'Error in unweighted {tot_col}'
         # Weighted
         wtd_tot_col = cbecs.col_name_to_weighted(tot_col, cbecs.weighted_energy_units)
         wtd_enduse_cols = [cbecs.col_name_to_weighted(c, cbecs.weighted_energy_units) for c in enduse_cols]
         sum_tot_col = cbecs.data[wtd_tot_col].sum()
-        sum_enduses = cbecs.data[wtd_enduse_cols].sum().sum()
+        sum_enduses = cbecs.data[wtd_enduse_cols].sum_horizontal().sum()
         assert sum_enduses == pytest.approx(sum_tot_col, rel=engy_tol), f'Error in weighted {tot_col}'
 
     cbecs.export_to_csv_wide()
@@ -103,14 +103,14 @@ def test_cbecs_2018(caplog):
     for tot_col, enduse_cols in tot_col_enduse_cols:
         # Unweighted
         sum_tot_col = cbecs.data[tot_col].sum()
-        sum_enduses = cbecs.data[enduse_cols].sum().sum()
+        sum_enduses = cbecs.data[enduse_cols].sum_horizontal().sum()
         print(f'{tot_col} = {sum_tot_col}, sum of enduses = {sum_enduses}')
         assert sum_enduses == pytest.approx(sum_tot_col, rel=engy_tol), f'Error in unweighted {tot_col}'
         # Weighted
         wtd_tot_col = cbecs.col_name_to_weighted(tot_col, cbecs.weighted_energy_units)
         wtd_enduse_cols = [cbecs.col_name_to_weighted(c, cbecs.weighted_energy_units) for c in enduse_cols]
         sum_tot_col = cbecs.data[wtd_tot_col].sum()
-        sum_enduses = cbecs.data[wtd_enduse_cols].sum().sum()
+        sum_enduses = cbecs.data[wtd_enduse_cols].sum_horizontal().sum()
         assert sum_enduses == pytest.approx(sum_tot_col, rel=engy_tol), f'Error in weighted {tot_col}'
 
     cbecs.export_to_csv_wide()
@@ -0,0 +1,59 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import polars as pl
+import pytest
+
+import comstockpostproc.cbecs
+from comstockpostproc.cbecs import CBECS
+
+
+def make_cbecs(data):
+    cbecs = CBECS.__new__(CBECS)
+    cbecs.resource_dir = os.path.join(os.path.dirname(comstockpostproc.cbecs.__file__), 'resources')
+    cbecs.building_type_mapping_file_name = 'CBECS_2012_to_comstock_nems_aeo_building_types.csv'
+    cbecs.data = data
+    return cbecs
+
+
+def test_building_types_and_vintages():
+    offices = ['Administrative/professional office'] * 6
+    data = pl.DataFrame({
+        CBECS.CBECS_BLDG_TYPE: offices + ['Elementary/middle school', 'Non-refrigerated warehouse'],
+        CBECS.FLR_AREA: [10_000.0, 10_000.0, 50_000.0, 50_000.0, 200_000.0, 60_000.0, 10_000.0, 300_000.0],
+        'Number of floors': ['2', '4', '5', '15 to 25', '1', None, '1', '1'],
+        CBECS.YEAR_BUILT: ['Before 1946', '1946', '1959', '1960', '2012', '2013', '2018', '2019'],
+    }).with_columns(pl.col(CBECS.CBECS_BLDG_TYPE).cast(pl.Categorical))
+    cbecs = make_cbecs(data)
+    cbecs.add_building_type_and_vintage_columns(aeo_nems=True)
+
+    assert cbecs.data[CBECS.BLDG_TYPE].to_list() == [
+        'SmallOffice', 'MediumOffice', 'MediumOffice', 'LargeOffice', 'LargeOffice', 'LargeOffice', 'PrimarySchool', 'Warehouse']
+    assert cbecs.data[CBECS.AEO_BLDG_TYPE].to_list()[:6] == ['Office - Small'] * 4 + ['Office - Large'] * 2
+    assert cbecs.data[CBECS.VINTAGE].to_list() == [
+        'Before 1946', '1960 to 1969', '1946 to 1959', '1960 to 1969', '2000 to 2012', '2013 to 2018', '2013 to 2018', '2019 or newer']
+
+
+def test_unmapped_building_type():
+    data = pl.DataFrame({CBECS.CBECS_BLDG_TYPE: ['Spaceport'], CBECS.FLR_AREA: [1000.0], 'Number of floors': ['1']})
+    with pytest.raises(Exception, match='Spaceport'):
+        make_cbecs(data).add_comstock_building_type_column()
+
+
+def test_floor_counts_only_read_for_offices():
+    data = pl.DataFrame({
+        CBECS.CBECS_BLDG_TYPE: ['Elementary/middle school', 'Administrative/professional office'],
+        CBECS.FLR_AREA: [10_000.0, 10_000.0],
+        'Number of floors': ['Not reported', '2'],
+    }).with_columns(pl.col(CBECS.CBECS_BLDG_TYPE).cast(pl.Categorical))
+    cbecs = make_cbecs(data)
+    cbecs.add_comstock_building_type_column()
+    assert cbecs.data[CBECS.BLDG_TYPE].to_list() == ['PrimarySchool', 'SmallOffice']
+
+    data = data.with_columns(pl.Series('Number of floors', ['1', 'Not reported']))
+    with pytest.raises(Exception, match='Not reported'):
+        make_cbecs(data).add_comstock_building_type_column()
@@ -0,0 +1,53 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import polars as pl
+
+from comstockpostproc.cbecs_codebook import compile_codebook, decode_columns
+
+
+def make_codebook():
+    return pl.DataFrame({
+        'Variable name': [' PUBID ', ' PBA ', ' NFLOOR ', ' ELEXP ', ' ZPBA ', ' ZNFLOOR '],
+        'Variable type': ['Numeric', 'Character', 'Numeric', 'Numeric', 'Numeric', 'Numeric'],
+        'Label': ['Building identifier', 'Principal building activity', 'Number of floors',
+                  'Annual electricity expenditures ($)', 'Imputation flag', 'Imputation flag '],
+        'Values/Format codes': [None, '1=Office|2=Warehouse|3=Office', '994=15 to 25|995=More than 25',
+                                'Missing=Not applicable', '0=Not imputed|1=Imputed', '0=Not imputed|1=Imputed'],
+    })
+
+
+def test_compile_codebook():
+    var_name_to_label, codes = compile_codebook(make_codebook())
+    assert var_name_to_label['ZPBA'] == 'Imputation flag'
+    assert var_name_to_label['ZNFLOOR'] == 'Imputation flag ZNFLOOR'
+    pba = codes.filter(pl.col('Label') == 'Principal building activity')
+    assert pba['Code'].to_list() == ['1', '2', '3']
+    assert pba['Value'].to_list() == ['Office', 'Warehouse', 'Office']
+    assert 'Building identifier' not in codes['Label'].to_list()
+
+
+def test_decode_columns():
+    var_name_to_label, codes = compile_codebook(make_codebook())
+    data = pl.DataFrame({
+        'PUBID': [1, 2, 3, 4],
+        'PBA': [1, 2, 3, 1],
+        'NFLOOR': [2, 994, 995, 7],
+        'ELEXP': [10.5, None, 20.0, None],
+        'ZPBA': [0, 1, 0, 0],
+        'ZNFLOOR': [1, 1, 0, 1],
+    }).rename(var_name_to_label)
+    decoded = decode_columns(data, codes)
+
+    # Fully coded columns are categoricals
+    pba = decoded['Principal building activity']
+    assert pba.dtype == pl.Categorical
+    assert pba.to_list() == ['Office', 'Warehouse', 'Office', 'Office']
+    assert decoded['Imputation flag ZNFLOOR'].to_list() == ['Imputed', 'Imputed', 'Not imputed', 'Imputed']
+
+    # Partly coded columns keep the values without a code, as strings
+    assert decoded['Number of floors'].to_list() == ['2', '15 to 25', 'More than 25', '7']
+    assert decoded['Annual electricity expenditures ($)'].to_list() == ['10.5', 'Not applicable', '20.0', 'Not applicable']
+    assert decoded['Building identifier'].to_list() == [1, 2, 3, 4]
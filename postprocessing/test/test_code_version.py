@@ -0,0 +1,25 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from comstockpostproc import code_version as code_version_module
+from comstockpostproc.code_version import code_version
+from comstockpostproc.plot_manifest import PlotManifest
+from comstockpostproc.truth_data_store import TruthDataStore
+
+
+def test_code_version(monkeypatch):
+    version = code_version(TruthDataStore)
+    assert len(version) == 64
+    assert code_version(PlotManifest) != version
+
+    # Cached for each class, and a change to an imported helper changes the version
+    assert code_version(TruthDataStore) == version
+    monkeypatch.setattr(code_version_module, '_CODE_VERSIONS', {})
+    getsource = code_version_module.inspect.getsource
+    def edited_getsource(obj):
+        source = getsource(obj)
+        return source + '# edited\n' if obj is code_version_module else source
+    monkeypatch.setattr(code_version_module.inspect, 'getsource', edited_getsource)
+    assert code_version(TruthDataStore) != version
@@ -0,0 +1,58 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import polars as pl
+
+from comstockpostproc.comparison_data_assembler import ComparisonDataAssembler
+
+
+def test_required_columns_include_keys_and_plot_columns():
+    asm = ComparisonDataAssembler()
+    cols = asm.required_columns(['plot_eui_boxplots', 'plot_qoi_timing'])
+    assert asm.DATASET in cols
+    assert asm.BLDG_TYPE in cols
+    assert asm.col_name_to_eui(asm.ANN_TOT_ENGY_KBTU) in cols
+    assert all(c in cols for c in asm.QOI_MAX_DAILY_TIMING_COLS)
+    assert len(cols) == len(set(cols))
+
+    # Unknown plots keep every column
+    assert asm.required_columns(['plot_something_new']) is None
+
+
+def test_assemble_matches_pandas_concat():
+    asm = ComparisonDataAssembler()
+    eui_col = asm.col_name_to_eui(asm.ANN_TOT_ENGY_KBTU)
+    comstock = pl.DataFrame({
+        asm.DATASET: ['ComStock', 'ComStock', 'ComStock'],
+        asm.UPGRADE_ID: [0, 0, 1],
+        asm.BLDG_TYPE: ['Office', 'Warehouse', 'Office'],
+        eui_col: [10.0, 20.0, 5.0],
+        'out.unused..kwh': [1.0, 2.0, 3.0],
+    }).with_columns(pl.col(asm.BLDG_TYPE).cast(pl.Categorical))
+    cbecs = pd.DataFrame({
+        asm.DATASET: ['CBECS 2018'],
+        asm.BLDG_TYPE: pd.Categorical(['Office']),
+        eui_col: [12],
+        'in.cbecs_only': ['x'],
+    })
+
+    columns = asm.required_columns(['plot_eui_boxplots'])
+    cs = asm.project(comstock, columns, pl.col(asm.UPGRADE_ID) == 0)
+    assert 'out.unused..kwh' not in cs.columns
+    assert cs.height == 2
+
+    df = asm.assemble([cbecs, cs], columns, how='inner')
+    expected = pd.concat([cbecs, comstock.filter(pl.col(asm.UPGRADE_ID) == 0).to_pandas()], join='inner', ignore_index=True)
+    assert list(df.columns) == [asm.DATASET, asm.BLDG_TYPE, eui_col]
+    assert df[asm.DATASET].tolist() == expected[asm.DATASET].tolist()
+    assert df[asm.BLDG_TYPE].astype(str).tolist() == expected[asm.BLDG_TYPE].astype(str).tolist()
+    assert df[eui_col].tolist() == expected[eui_col].tolist()
+
+    # Outer concat keeps columns from every frame
+    df = asm.assemble([cbecs, comstock], None, how='outer')
+    assert 'in.cbecs_only' in df.columns
+    assert 'out.unused..kwh' in df.columns
+    assert len(df) == 4
@@ -53,6 +53,7 @@ def test_comstock_vs_cbecs_2012():
 
     # Total weighted area of each building type, CBECS
     wtd_cbecs_areas = cbecs.data[[wt_area_col, cbecs.BLDG_TYPE]].groupby([cbecs.BLDG_TYPE]).sum()
+    wtd_cbecs_areas = wtd_cbecs_areas.to_pandas().set_index(cbecs.BLDG_TYPE)
     wtd_comstock_areas = comstock.data[[wt_area_col, comstock.BLDG_TYPE]].groupby([comstock.BLDG_TYPE]).sum()
     wtd_comstock_areas = wtd_comstock_areas.to_pandas().set_index(cbecs.BLDG_TYPE)
 
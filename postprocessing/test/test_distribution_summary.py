@@ -0,0 +1,83 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+from matplotlib import cbook
+
+from comstockpostproc.distribution_summary import DistributionSummary, summary_for_frame, violin_traces
+
+
+def make_data():
+    rng = np.random.default_rng(2)
+    n = 400
+    df = pd.DataFrame({
+        'upgrade': np.repeat([0, 1], n // 2),
+        'in.comstock_building_type': pd.Categorical(rng.choice(['Office', 'Warehouse'], n)),
+        'out.savings.eui': rng.lognormal(1, 1, n),
+        'out.percent_savings.energy': rng.normal(0.1, 0.3, n),
+    })
+    df.loc[::10, 'out.savings.eui'] = 0
+    df.loc[::7, 'out.savings.eui'] = np.nan
+    return df
+
+
+def test_box_stats_match_matplotlib():
+    df = make_data()
+    col = 'out.savings.eui'
+    summaries = DistributionSummary(df).summarize([col], ['in.comstock_building_type'])
+    for bldg_type, group in df.groupby('in.comstock_building_type', observed=True):
+        expected = cbook.boxplot_stats(group[col].dropna().to_numpy())[0]
+        summary = summaries[(col, bldg_type)]
+        for stat in ['mean', 'med', 'q1', 'q3', 'whislo', 'whishi']:
+            np.testing.assert_allclose(summary[stat], expected[stat])
+        np.testing.assert_allclose(np.sort(summary['fliers']), np.sort(expected['fliers']))
+        assert summary['n'] == len(group)
+
+
+def test_savings_filters_match_plot_filters():
+    df = make_data()
+    col = 'out.percent_savings.energy'
+    summaries = DistributionSummary(df).summarize([col], drop_zeros=True, pct_limit=1, exclude_baseline=True, kde=True)
+    summary = summaries[(col,)]
+
+    # Same filtering as PlottingMixin.filter_outlier_pct_savings_values followed by dropping zeros
+    values = df.loc[df['upgrade'] != 0, col]
+    values = values.mask(values.abs() > 1) * 100
+    assert summary['n'] == len(values)
+    np.testing.assert_allclose(summary['med'], values.median())
+
+    # The KDE spans the data and integrates to about 1
+    assert summary['kde_x'][0] == values.min() and summary['kde_x'][-1] == values.max()
+    kde_x, kde_y = summary['kde_x'], summary['kde_y']
+    assert 0.8 < np.sum(np.diff(kde_x) * (kde_y[1:] + kde_y[:-1]) / 2) < 1.0
+    assert len(violin_traces(summary, 0, 'All', '#EFF2F1', '#6A9AC3')) >= 3
+
+
+def test_summaries_are_cached_per_frame():
+    df = make_data()
+    engine = summary_for_frame(df)
+    assert summary_for_frame(df) is engine
+    first = engine.summarize(['out.savings.eui'])
+    assert engine.summarize(['out.savings.eui']) is first
+
+
+def test_histograms_match_numpy():
+    df = make_data()
+    df['dataset'] = np.where(df['upgrade'] == 0, 'ComStock', 'CBECS')
+    df['calc.weighted.sqft'] = np.linspace(1, 2, len(df))
+    col = 'out.savings.eui'
+    hists = DistributionSummary(df).histograms([col], ['in.comstock_building_type'], 'dataset', 'calc.weighted.sqft', n_bins=10)
+    for bldg_type, group in df.groupby('in.comstock_building_type', observed=True):
+        hist = hists[(col, bldg_type)]
+        value_range = (group[col].min(), group[col].max())
+        for dataset, ds in group.groupby('dataset'):
+            wts = ds['calc.weighted.sqft'] / ds['calc.weighted.sqft'].sum()
+            valid = ds[col].notna()
+            counts, edges = np.histogram(ds.loc[valid, col], weights=wts[valid], range=value_range, bins=10)
+            np.testing.assert_allclose(hist['datasets'][dataset]['counts'], counts)
+            np.testing.assert_allclose(hist['edges'], edges)
+            np.testing.assert_allclose(hist['datasets'][dataset]['mean'], (ds[col] * wts).sum())
+            assert hist['datasets'][dataset]['n'] == len(ds)
@@ -0,0 +1,74 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import polars as pl
+import pytest
+
+from comstockpostproc.eia_truth_data import EIATruthData
+
+
+def make_truth_data(tmp_path):
+    (tmp_path / EIATruthData.GAS_VOLUMES_FILE_NAME).write_text(
+        'Year,Month,Alabama (MMcf),the District of Columbia (MMcf),U.S. (MMcf)\n'
+        '2018,1,10,2,100\n'
+        '2019,1,20,4,200\n')
+    (tmp_path / EIATruthData.GAS_HEAT_CONTENT_FILE_NAME).write_text(
+        'Year,Month,Alabama (BTU per Cubic Foot),District of Columbia (BTU per Cubic Foot),U.S. (BTU per Cubic Foot)\n'
+        '2018,1,1000,1010,1020\n'
+        '2019,1,1030,1040,1050\n')
+    (tmp_path / EIATruthData.ELEC_SALES_FILE_NAME).write_text(
+        'Year,Month,State,Sales (Megawatthours)\n'
+        '2018,1,AL,5\n'
+        '2018,1,DC,6\n'
+        '2019,1,AL,7\n'
+        '2019,1,DC,8\n'
+        'Source: EIA,,,\n'
+        'Notes,,,Sales for the latest months are preliminary\n')
+    (tmp_path / EIATruthData.STATE_TABLE_FILE_NAME).write_text(
+        'State,State Code,FIPS Code,Division\n'
+        'Alabama,AL,1,East South Central\n'
+        'District of Columbia,DC,11,South Atlantic\n')
+    pl.DataFrame({
+        'Year': [2018, 2019],
+        'Commercial Share of Electric Power Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)': [200.0, 201.0],
+        'Natural Gas, Excluding Supplemental Gaseous Fuels, Commercial Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)': [170.0, 171.0],
+        'Distillate Fuel Oil Commercial Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)': [30.0, 31.0],
+        'Petroleum, Excluding Biofuels, Commercial Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)': [45.0, 46.0],
+        'Coal Commercial Sector CO2 Emissions (Million Metric Tons of Carbon Dioxide)': [1.0, 1.0],
+    }).write_csv(tmp_path / EIATruthData.EMISSIONS_FILE_NAME)
+
+    truth_data = EIATruthData.__new__(EIATruthData)
+    truth_data.Btu_to_kBtu = 1.0 / 1e3
+    truth_data.MWh_to_kWh = 1e3
+    truth_data.MMcf_to_cf = 1e6
+    truth_data.truth_data_dir = str(tmp_path)
+    truth_data.monthly = truth_data.monthly_consumption_by_state()
+    truth_data.emissions = truth_data.annual_emissions_by_fuel()
+    return truth_data
+
+
+def test_monthly_consumption(tmp_path):
+    truth_data = make_truth_data(tmp_path)
+    assert truth_data.monthly.get_column('Year').to_list() == [2018, 2019, 2018, 2019]
+
+    eia_2019 = truth_data.monthly_consumption(2019, 'EIA 2019')
+    assert eia_2019.columns == [
+        'Month', 'FIPS Code', 'in.state', 'Division', 'dataset', EIATruthData.GAS_KBTU, EIATruthData.ELEC_KWH]
+    assert eia_2019.get_column('in.state').to_list() == ['AL', 'DC']
+    assert eia_2019.get_column('dataset').to_list() == ['EIA 2019', 'EIA 2019']
+    assert eia_2019.get_column(EIATruthData.GAS_KBTU).to_list() == pytest.approx([20 * 1030 * 1e3, 4 * 1040 * 1e3])
+    assert eia_2019.get_column(EIATruthData.ELEC_KWH).to_list() == pytest.approx([7e3, 8e3])
+
+
+def test_annual_emissions(tmp_path):
+    truth_data = make_truth_data(tmp_path)
+    emissions = truth_data.annual_emissions(2018, 'EIA 2018')
+    assert emissions.columns == [
+        'calc.weighted.emissions.electricity.egrid_2021_subregion..co2e_mmt',
+        'calc.weighted.emissions.natural_gas..co2e_mmt',
+        'calc.weighted.emissions.fuel_oil..co2e_mmt',
+        'calc.weighted.emissions.propane..co2e_mmt',
+        'dataset']
+    assert emissions.row(0) == (200, 170, 30, 45, 'EIA 2018')
@@ -0,0 +1,52 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from comstockpostproc.utils.energyplus_warnings import (EnergyPlusWarningClassifier, WARNING_GENERALIZATION_REGEXES,
+    required_literal)
+
+
+def test_required_literal():
+    assert required_literal(r"Plant loop exceeding upper temperature limit, PlantLoop='.*'") == "Plant loop exceeding upper temperature limit, PlantLoop='"
+    assert required_literal(r"Temperature out of range \[-100. to 200.\] \(PsyPsatFnTemp\).*") == 'Temperature out of range [-100'
+    assert required_literal(r"Max \(.*\) exceeded for all loops") == ") exceeded for all loops"
+    assert required_literal(r"SimHVACs? exceeded") == ' exceeded'
+    assert required_literal(r"Coil (A|B) failed") == ''
+    assert required_literal(r"Tx{1,3}z .*") == 'z '
+    assert required_literal(r"Node {2}named NODE 1") == 'named NODE 1'
+    # Every regex requires a literal, so warnings are prefiltered before any regex runs
+    assert all(len(required_literal(warn_regex)) >= 8 for warn_regex in WARNING_GENERALIZATION_REGEXES)
+
+
+def test_generalize():
+    classifier = EnergyPlusWarningClassifier()
+    # Asterisks are removed before the warning prefix, which leaves 'Warning  ' at the start of each signature
+    w = "   ** Warning ** Plant loop exceeding upper temperature limit, PlantLoop=\"HW LOOP 1\"  This error occurred 12 total times;"
+    assert classifier.generalize(w) == (r"Warning  Plant loop exceeding upper temperature limit, PlantLoop='.*'", 12)
+    assert classifier.generalize(w) == (r"Warning  Plant loop exceeding upper temperature limit, PlantLoop='.*'", 12)
+    w = '   ** Warning ** Temperature out of range [-100. to 200.] (PsyPsatFnTemp)  Routine=PsyWFnTdpPb, Temperature= -104.2'
+    assert classifier.generalize(w) == (r"Warning  Temperature out of range \[-100. to 200.\] \(PsyPsatFnTemp\)  Routine=PsyWFnTdpPb.*", 1)
+    # Regexes with quantifiers in braces are prefiltered on the literal around the quantifier
+    classifier = EnergyPlusWarningClassifier([r"Tx{1,3}z .*"])
+    assert classifier.generalize('   ** Warning ** Txxz ABC') == ('Warning  Tx{1,3}z .*', 1)
+    classifier = EnergyPlusWarningClassifier()
+    # Warnings without a regex are kept
+    assert classifier.generalize('   ** Warning ** Something new in Zone 3') == ('Warning  Something new in Zone 3', 1)
+
+
+def test_count_warnings():
+    errs = (
+        "eplusout.err from building_id=1\n"
+        "   ** Warning ** GetSurfaceData: Very small surface area(0.25), Surface=WALL 1\n"
+        "   **   ~~~   ** Suspicious, but allowed\n"
+        "   ** Warning ** GetSurfaceData: Very small surface area(0.10), Surface=ROOF\n"
+        "   ************* ** Warning ** Plant loop falling below lower temperature limit, PlantLoop='CHW'\n"
+        "   *************  **   ~~~   **   This error occurred 4 total times;\n"
+        "   ** Severe  ** Not counted\n"
+    )
+    counts = EnergyPlusWarningClassifier().count_warnings(errs)
+    assert counts == {
+        r"Warning  GetSurfaceData: Very small surface area.*, Surface=.*": 2,
+        r"Warning  Plant loop falling below lower temperature limit, PlantLoop='.*'": 4,
+    }
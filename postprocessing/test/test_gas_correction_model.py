@@ -100,7 +100,8 @@ def test_gas_correction_model():
         cstock_gas = cstock_gas.to_pandas().set_index([comstock.BLDG_TYPE, comstock.CEN_DIV])
         cstock_gas.fillna(0.0, inplace=True)
 
-        cbecs_gas = cbecs.data.groupby([cbecs.BLDG_TYPE, cbecs.CEN_DIV])[wtd_enduse_col].sum()
+        cbecs_gas = cbecs.data.groupby([cbecs.BLDG_TYPE, cbecs.CEN_DIV]).agg(pl.col(wtd_enduse_col).sum())
+        cbecs_gas = cbecs_gas.to_pandas().set_index([cbecs.BLDG_TYPE, cbecs.CEN_DIV])
 
         # Merge and compare totals
         both_gas = pd.merge(cstock_gas, cbecs_gas, how='outer', left_index=True, right_index=True, suffixes=('_cstock', '_cbecs'))
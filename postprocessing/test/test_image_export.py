@@ -0,0 +1,71 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import plotly.graph_objects as go
+import pytest
+from PIL import Image
+
+from comstockpostproc import image_export
+from comstockpostproc.image_export import ImageExporter, image_exporter, PROFILE_ENV_VAR
+
+
+def test_draft_profile_caps_dpi(tmp_path):
+    fig_path = os.path.join(str(tmp_path), 'fig.png')
+    plt.figure(figsize=(2, 1))
+    plt.plot([0, 1], [0, 1])
+    exporter = ImageExporter('draft')
+    assert exporter.save_matplotlib(fig_path, dpi=600) == fig_path
+    plt.close()
+    assert Image.open(fig_path).size == (144, 72)
+    assert exporter.n_exported == 1
+
+
+def test_vector_profile_writes_svg(tmp_path):
+    fig_path = os.path.join(str(tmp_path), 'fig.jpg')
+    plt.figure(figsize=(2, 1))
+    plt.plot([0, 1], [0, 1])
+    saved_path = ImageExporter('draft_vector').save_matplotlib(fig_path, dpi=600)
+    plt.close()
+    assert saved_path == os.path.join(str(tmp_path), 'fig.svg')
+    assert os.path.exists(saved_path)
+    assert not os.path.exists(fig_path)
+
+
+def test_profile_selection(monkeypatch):
+    with pytest.raises(Exception, match='Unknown image export profile'):
+        ImageExporter('poster')
+
+    monkeypatch.setenv(PROFILE_ENV_VAR, 'draft')
+    assert image_exporter().profile == 'draft'
+    assert image_exporter('publication').profile == 'publication'
+    assert image_exporter('publication') is image_exporter()
+
+
+def test_plotly_errors_are_raised_for_their_own_figures(tmp_path, monkeypatch):
+    def write_image(fig, path, scale=None):
+        if 'bad' in path:
+            raise ValueError('renderer crashed')
+        with open(path, 'w') as f:
+            f.write('image')
+    monkeypatch.setattr(image_export.pio, 'write_image', write_image)
+    monkeypatch.setattr(ImageExporter, '_start_renderer', lambda self: False)
+
+    exporter = ImageExporter('publication', batch_size=2)
+    bad_path = os.path.join(str(tmp_path), 'bad.png')
+    good_path = os.path.join(str(tmp_path), 'good.png')
+    exporter.save_plotly(go.Figure(), bad_path)
+    # Filling the batch writes both figures without raising in the plot that filled it
+    exporter.save_plotly(go.Figure(), good_path)
+    assert exporter.queue == []
+    exporter.flush([good_path])
+    assert os.path.exists(good_path)
+    with pytest.raises(Exception, match='bad.png: ValueError: renderer crashed'):
+        exporter.flush([bad_path])
+    exporter.flush()
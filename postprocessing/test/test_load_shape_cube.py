@@ -0,0 +1,58 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from comstockpostproc.load_shape_cube import LoadShapeCube
+from comstockpostproc.timeseries_query_planner import sum_building_types
+
+
+def make_loads(seed):
+    # Weighted loads by building type, as returned by TimeseriesQueryPlanner.building_type_loads
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2018-01-01', periods=24 * 14, freq='h')
+    idx = pd.MultiIndex.from_product(
+        [['small_office', 'warehouse'], times, ['baseline', 'LED']],
+        names=['build_existing_model.building_type', 'time', 'in.upgrade_name'])
+    loads = idx.to_frame(index=False)
+    for col in ['electricity_interior_lighting', 'electricity_fans', 'total_site_electricity']:
+        loads[f'{col}_kwh_weighted'] = rng.uniform(0, 10, len(loads))
+    return loads
+
+
+def test_round_trip_matches_summed_loads(tmp_path):
+    cube = LoadShapeCube(os.path.join(str(tmp_path), 'cube'))
+    loads = {'CO': make_loads(1), 'TX': make_loads(2)}
+    for state, state_loads in loads.items():
+        assert not cube.has('abc', state)
+        cube.write('abc', state, state_loads)
+        assert cube.has('abc', state)
+
+    for state, state_loads in loads.items():
+        for got, expected in zip(cube.weighted_loads('abc', state), sum_building_types(state_loads)):
+            pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+def test_query_slices_and_views(tmp_path):
+    cube = LoadShapeCube(os.path.join(str(tmp_path), 'cube'))
+    loads = make_loads(3)
+    cube.write('abc', 'CO', loads)
+    cube.write('abc', 'TX', make_loads(4))
+
+    daily = cube.query(states=['CO'], upgrade_names=['LED'], enduses=['electricity_fans'], freq='D')
+    assert set(daily['state']) == {'CO'}
+    assert len(daily) == 2 * 14
+    led = loads.loc[loads['in.upgrade_name'] == 'LED']
+    np.testing.assert_allclose(daily['kwh'].sum(), led['electricity_fans_kwh_weighted'].sum())
+
+    profile = cube.day_type_profile(cube.read('abc', 'CO'))
+    weekday = profile.loc[(profile['in.upgrade_name'] == 'LED') & (profile['enduse'] == 'electricity_fans')
+                          & (profile['Day_Type'] == 'Weekday') & (profile['Hour_of_Day'] == 8), 'kwh']
+    hourly = led.groupby('time')['electricity_fans_kwh_weighted'].sum()
+    expected = hourly[(hourly.index.dayofweek < 5) & (hourly.index.hour == 8)].mean()
+    np.testing.assert_allclose(weekday.iloc[0], expected)
@@ -0,0 +1,59 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+import polars as pl
+import pytest
+
+from comstockpostproc.pipeline_profiler import PipelineProfiler, PROFILE_ENV_VAR
+
+
+class FakeDataset():
+    def __init__(self):
+        self.data = pl.DataFrame({'a': [1, 2, 3]})
+
+
+def test_disabled_profiler_records_nothing(monkeypatch, tmp_path):
+    monkeypatch.delenv(PROFILE_ENV_VAR, raising=False)
+    prof = PipelineProfiler('ComStock test', enabled=False)
+    obj = FakeDataset()
+    with prof.stage('add_column', obj):
+        obj.data = obj.data.with_columns(pl.lit(1.0).alias('b'))
+    assert prof.stages == []
+    assert prof.write_report(str(tmp_path)) == []
+
+
+def test_enabled_profiler_writes_reports(monkeypatch, tmp_path):
+    monkeypatch.delenv(PROFILE_ENV_VAR, raising=False)
+    prof = PipelineProfiler('ComStock test', enabled=True)
+    obj = FakeDataset()
+    with prof.stage('outer', obj):
+        with prof.stage('add_column', obj):
+            obj.data = obj.data.with_columns(pl.lit(1.0).alias('b'))
+
+    assert [s['stage'] for s in prof.stages] == ['add_column', 'outer']
+    inner = prof.stages[0]
+    assert inner['path'] == 'ComStock test;outer;add_column'
+    assert inner['depth'] == 1
+    assert inner['rows'] == 3
+    assert inner['cols'] == 2
+    assert inner['frame_size_delta_mb'] > 0
+
+    paths = prof.write_report(str(tmp_path))
+    assert len(paths) == 4
+    for p in paths:
+        assert os.path.exists(p)
+    with open(paths[0]) as f:
+        report = json.load(f)
+    assert report['total_wall_time_s'] == pytest.approx(prof.stages[1]['wall_time_s'])
+    assert len(prof.flame_summary()) == 2
+
+
+def test_profiler_enabled_by_env_var(monkeypatch):
+    monkeypatch.setenv(PROFILE_ENV_VAR, '1')
+    prof = PipelineProfiler('ComStock test')
+    assert prof.enabled
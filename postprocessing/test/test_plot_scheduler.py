@@ -0,0 +1,182 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from comstockpostproc import image_export
+from comstockpostproc.image_export import image_exporter
+from comstockpostproc.plot_manifest import PlotManifest
+from comstockpostproc import plot_scheduler
+from comstockpostproc.plot_scheduler import PlotScheduler, write_frame_to_ipc, read_frame_from_ipc
+
+
+class FakePlotter():
+    def __init__(self):
+        self.calls = []
+
+    def plot_total(self, df, column_for_grouping, output_dir):
+        self.calls.append(('plot_total', df[column_for_grouping].sum(), output_dir))
+
+    def plot_broken(self, df, output_dir):
+        raise ValueError('bad data')
+
+    def plot_figure(self, df, file_name, output_dir):
+        image_exporter().save_plotly(go.Figure(), os.path.join(output_dir, file_name))
+
+
+def test_serial_scheduler_runs_tasks_and_writes_report(tmp_path):
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    plotter = FakePlotter()
+    scheduler = PlotScheduler(max_workers=1)
+    scheduler.add('plot_total', df, 'a', output_dir='up01')
+    scheduler.add('plot_total', df, 'a', output_dir='up02')
+    assert len(scheduler.frames) == 1
+
+    timings = scheduler.run(plotter, report_dir=str(tmp_path))
+    assert plotter.calls == [('plot_total', 6, 'up01'), ('plot_total', 6, 'up02')]
+    assert [t['status'] for t in timings] == ['ok', 'ok']
+    assert os.path.exists(os.path.join(str(tmp_path), 'plot_timing_report.csv'))
+    assert scheduler.tasks == []
+
+
+def test_serial_scheduler_with_owner_renders_when_added():
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    plotter = FakePlotter()
+    scheduler = PlotScheduler(owner=plotter)
+    scheduler.add('plot_total', df, 'a', output_dir='up01')
+    # Made immediately, the scheduler does not keep the frame
+    assert plotter.calls == [('plot_total', 6, 'up01')]
+    assert scheduler.frames == {}
+    assert [t['status'] for t in scheduler.run(plotter)] == ['ok']
+    assert scheduler.run(plotter) == []
+
+
+def test_failed_plots_are_reported_after_other_plots():
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    plotter = FakePlotter()
+    scheduler = PlotScheduler(max_workers=1)
+    scheduler.add('plot_broken', df, output_dir='up01')
+    scheduler.add('plot_total', df, 'a', output_dir='up01')
+    with pytest.raises(Exception, match='1 of 2 plots failed'):
+        scheduler.run(plotter)
+    assert len(plotter.calls) == 1
+
+
+def test_ipc_round_trip_preserves_dtypes(tmp_path):
+    df = pd.DataFrame({
+        'name': pd.Categorical(['Baseline', 'Upgrade', 'Baseline']),
+        'value': [1.0, 2.5, 3.0],
+        'applicability': [True, False, True],
+    }, index=[4, 7, 9])
+    file_path = os.path.join(str(tmp_path), 'frame.arrow')
+    write_frame_to_ipc(df, file_path)
+    pd.testing.assert_frame_equal(read_frame_from_ipc(file_path), df)
+
+
+def test_worker_keeps_frames_of_current_run_only(tmp_path):
+    df = pd.DataFrame({'a': [1.0, 2.0, 3.0]})
+    for run_dir in ['run1', 'run2']:
+        os.makedirs(os.path.join(str(tmp_path), run_dir))
+        write_frame_to_ipc(df, os.path.join(str(tmp_path), run_dir, 'frame.arrow'))
+    read_frame_from_ipc(os.path.join(str(tmp_path), 'run1', 'frame.arrow'))
+    read_frame_from_ipc(os.path.join(str(tmp_path), 'run2', 'frame.arrow'))
+    assert list(plot_scheduler._WORKER_FRAMES) == [os.path.join(str(tmp_path), 'run2', 'frame.arrow')]
+
+
+def test_manifest_skips_unchanged_plots(tmp_path):
+    manifest_path = os.path.join(str(tmp_path), 'plot_manifest.json')
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    plotter = FakePlotter()
+
+    scheduler = PlotScheduler(manifest_path=manifest_path)
+    scheduler.add('plot_total', df, 'a', output_dir='up01')
+    assert [t['status'] for t in scheduler.run(plotter)] == ['ok']
+
+    # Same data and arguments in a new session, the plot is skipped
+    scheduler = PlotScheduler(manifest_path=manifest_path)
+    scheduler.add('plot_total', df.copy(), 'a', output_dir='up01')
+    scheduler.add('plot_total', df, 'a', output_dir='up02')
+    assert [t['status'] for t in scheduler.run(plotter)] == ['skipped', 'ok']
+    assert len(plotter.calls) == 2
+
+    # Changed data is plotted again
+    scheduler = PlotScheduler(manifest_path=manifest_path)
+    scheduler.add('plot_total', pd.DataFrame({'a': [1, 2, 4]}), 'a', output_dir='up01')
+    assert [t['status'] for t in scheduler.run(plotter)] == ['ok']
+    assert plotter.calls[-1] == ('plot_total', 7, 'up01')
+
+
+def test_manifest_requires_images_to_exist(tmp_path):
+    image_path = os.path.join(str(tmp_path), 'fig.png')
+    with open(image_path, 'w') as f:
+        f.write('image')
+    manifest = PlotManifest(os.path.join(str(tmp_path), 'plot_manifest.json'))
+    manifest.record('plot_total up01', 'abc', [image_path])
+    manifest.save()
+
+    manifest = PlotManifest(os.path.join(str(tmp_path), 'plot_manifest.json'))
+    assert manifest.is_current('plot_total up01', 'abc')
+    assert not manifest.is_current('plot_total up01', 'def')
+    os.remove(image_path)
+    assert not manifest.is_current('plot_total up01', 'abc')
+
+
+def test_export_errors_fail_the_plot_that_made_the_figure(tmp_path, monkeypatch):
+    def write_image(fig, path, scale=None):
+        if 'bad' in path:
+            raise ValueError('renderer crashed')
+        with open(path, 'w') as f:
+            f.write('image')
+    monkeypatch.setattr(image_export.pio, 'write_image', write_image)
+    monkeypatch.setattr(image_export.ImageExporter, '_start_renderer', lambda self: False)
+
+    manifest_path = os.path.join(str(tmp_path), 'plot_manifest.json')
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    plotter = FakePlotter()
+    scheduler = PlotScheduler(manifest_path=manifest_path, owner=plotter)
+    scheduler.add('plot_figure', df, 'bad.png', output_dir=str(tmp_path))
+    scheduler.add('plot_figure', df, 'good.png', output_dir=str(tmp_path))
+    with pytest.raises(Exception, match='1 of 2 plots failed'):
+        scheduler.run(plotter)
+    assert [t['status'] for t in scheduler.timings] == ['failed', 'ok']
+    assert 'bad.png' in scheduler.timings[0]['error']
+
+    # Only the plot whose image was written is skipped next time
+    manifest = PlotManifest(manifest_path)
+    assert len(manifest.entries) == 1
+    assert [os.path.basename(p) for e in manifest.entries.values() for p in e['images']] == ['good.png']
+
+
+def test_data_hash_uses_every_column_of_the_frame(tmp_path, caplog):
+    manifest = PlotManifest(os.path.join(str(tmp_path), 'plot_manifest.json'))
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']})
+    changed = df.assign(b=['x', 'y', 'w'])
+    assert manifest.data_hash(df) == manifest.data_hash(df.copy())
+    assert manifest.data_hash(df) != manifest.data_hash(changed)
+    assert caplog.records == []
+
+
+def test_frame_arguments_are_hashed_not_printed(tmp_path):
+    manifest = PlotManifest(os.path.join(str(tmp_path), 'plot_manifest.json'))
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    profile = pd.DataFrame({'kwh': [float(i) for i in range(1000)]})
+    changed = profile.copy()
+    changed.loc[500, 'kwh'] = -1.0
+    assert repr(changed) == repr(profile)
+
+    def task(weekday_profile):
+        aggregates = {'profiles': {'weekday': weekday_profile}, 'label': 'AMI'}
+        return {'name': 'plot_ami up01', 'method': 'plot_ami', 'args': ('seattle',),
+                'kwargs': {'output_dir': 'up01', 'aggregates': aggregates}}
+
+    # The plot is identified by its arguments without the frames, and made stale by a change to any frame
+    assert manifest.key(task(profile)) == manifest.key(task(changed))
+    assert manifest.fingerprint(FakePlotter(), task(profile), df) != manifest.fingerprint(FakePlotter(), task(changed), df)
+    assert manifest.fingerprint(FakePlotter(), task(profile), df) == manifest.fingerprint(FakePlotter(), task(profile.copy()), df)
+    assert manifest.fingerprint(FakePlotter(), task(profile['kwh']), df) != manifest.fingerprint(FakePlotter(), task(changed['kwh']), df)
@@ -0,0 +1,59 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+import pytest
+
+from comstockpostproc.resstock import ResStock
+
+
+def test_export_to_csv_long(tmp_path):
+    resstock = ResStock.__new__(ResStock)
+    resstock.weighted_energy_units = 'tbtu'
+    resstock.output_dir = str(tmp_path)
+    resstock.truth_data_dir = str(tmp_path)
+    resstock.egrid_file_name = 'egrid.csv'
+    pd.DataFrame({'State': ['CO', 'VT'], 'total_output_emissions_rates_CO2e_lb_per_MWh': [1300.0, 50.0]}).to_csv(
+        tmp_path / 'egrid.csv', index=False)
+
+    engy_cols = [resstock.col_name_to_weighted(c, 'tbtu') for c in ResStock.COLS_ENDUSE_ANN_ENGY]
+    elec_col = 'out.weighted.electricity.cooling.energy_consumption..tbtu'
+    gas_col = 'out.weighted.natural_gas.heating.energy_consumption..tbtu'
+    data = pd.DataFrame({ResStock.BLDG_ID: [3, 1, 2], 'in.state_abbreviation': ['VT', 'CO', None]})
+    for col in engy_cols:
+        data[col] = 0.0
+    data[elec_col] = [1.0, 2.0, 3.0]
+    data[gas_col] = [0.0, 4.0, 5.0]
+    resstock.data = data
+
+    resstock.export_to_csv_long(batch_size=2)
+    dl = pd.read_csv(os.path.join(tmp_path, 'ResStock energy long.csv'))
+
+    # Rows with energy, in order of building ID
+    assert dl[ResStock.BLDG_ID].tolist() == [1, 1, 2, 2, 3]
+    assert dl['fuel'].tolist() == ['electricity', 'natural_gas', 'electricity', 'natural_gas', 'electricity']
+    assert dl['enduse'].tolist() == ['cooling', 'heating', 'cooling', 'heating', 'cooling']
+    assert (dl['weighted_energy_consumption_units'] == 'tbtu').all()
+
+    # Electricity uses the factor of the state, buildings without a state have no emissions
+    elec_cf = (1.0/1e3)*(1.0/3.412)*(1e9/1.0)*(1.0/2204.62)*(1.0/1e6)
+    gas_cf = 141.67/1000000*1000*1E9/2204.62/1000000
+    assert dl['ghg_emissions..million_metric_tons_CO2e)'].tolist() == pytest.approx([
+        2.0 * 1300.0 * elec_cf, 4.0 * gas_cf, 0.0, 0.0, 1.0 * 50.0 * elec_cf])
+
+
+@pytest.mark.parametrize('units', [['None', 'None', 'None'], ['None', '5+ Units', None]])
+def test_read_multifamily_rows(tmp_path, units):
+    file_path = str(tmp_path / 'results.parquet')
+    df = pd.DataFrame({ResStock.MF_UNITS: units, 'out.value': [1.0, 2.0, 3.0]}, index=pd.RangeIndex(10, 13))
+    df.to_parquet(file_path, row_group_size=2)
+
+    data = ResStock.__new__(ResStock).read_multifamily_rows(file_path)
+    assert data.columns.tolist() == [ResStock.MF_UNITS, 'out.value']
+    expected = df.loc[df[ResStock.MF_UNITS].ne('None').fillna(True)]
+    assert data.index.tolist() == expected.index.tolist()
+    assert data['out.value'].tolist() == expected['out.value'].tolist()
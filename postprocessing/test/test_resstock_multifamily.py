@@ -0,0 +1,42 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pytest
+
+from comstockpostproc.resstock import ResStock
+
+
+def make_resstock(data_dir):
+    resstock = ResStock.__new__(ResStock)
+    resstock.data_dir = str(data_dir)
+    resstock.results_file_name = 'metadata.parquet'
+    resstock.downselect_to_multifamily = True
+    resstock.multifamily_building_efficiency_ratio = 0.75
+    return resstock
+
+
+def test_multifamily_size_bins_and_weights(tmp_path):
+    metadata = pd.DataFrame({
+        'bldg_id': [1, 2, 3, 4, 5],
+        ResStock.MF_UNITS: ['None', '2', '10', '300', 'None'],
+        ResStock.FLR_AREA: [2000.0, 600.0, 750.0, 1000.0, 1500.0],
+        'weight': [250.0, 250.0, 250.0, 250.0, 250.0],
+    }).set_index('bldg_id')
+    metadata.to_parquet(tmp_path / 'metadata.parquet')
+
+    # Only the multifamily rows are read
+    resstock = make_resstock(tmp_path)
+    resstock.load_data()
+    resstock.data.reset_index(inplace=True)
+    assert resstock.data['bldg_id'].tolist() == [2, 3, 4]
+
+    resstock.down_to_multifamily()
+    resstock.add_multifamily_size_bin_column()
+    resstock.reweight_to_multifamily_counts()
+
+    # 2 * 600 / 0.75 = 1600 sf, 10 * 750 / 0.75 = 10000 sf, 300 * 1000 / 0.75 = 400000 sf
+    assert resstock.data[ResStock.FLR_AREA_CAT].tolist() == ['1001_5000', '10001_25000', '200001_500000']
+    assert resstock.data[ResStock.BLDG_WEIGHT].tolist() == pytest.approx([125.0, 25.0, 250.0 / 300])
@@ -0,0 +1,126 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import random
+import tarfile
+
+from comstockpostproc.utils.tar_index import IndexedTarballReader, TarballIndex
+from comstockpostproc.utils.tar_scanner import scan_simulation_tarballs, TarMemberConsumer
+
+
+def make_job_tarball(tar_path, n_bldgs):
+    random.seed(0)
+    words = [''.join(random.choice('abcdefghij') for _ in range(random.randint(2, 8))) for _ in range(500)]
+    members = {}
+    with tarfile.open(tar_path, 'w:gz') as tar:
+        for i in range(1, n_bldgs + 1):
+            for name in [f'./up00/bldg{i:07d}/run/eplusout.err', f'./up01/bldg{i:07d}/run/eplusout.err']:
+                data = ' '.join(random.choice(words) for _ in range(5000)).encode()
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+                members[name] = data
+    return members
+
+
+def test_read_members_through_index(tmp_path):
+    tar_path = str(tmp_path / 'simulations_job3.tar.gz')
+    members = make_job_tarball(tar_path, 40)
+    assert not TarballIndex.exists(tar_path)
+
+    # Small span to restart from many checkpoints, most of them in the middle of a byte
+    index = TarballIndex.build(tar_path, span=16384)
+    assert len(index.checkpoints) > 10
+    assert TarballIndex.exists(tar_path)
+
+    index = TarballIndex.load(tar_path)
+    for name, data in members.items():
+        assert index.read_member(name) == data
+    bldg = index.building_members(12, upgrade_id=1)
+    assert bldg['path'].tolist() == ['./up01/bldg0000012/run/eplusout.err']
+    assert bldg['size'].tolist() == [len(members['./up01/bldg0000012/run/eplusout.err'])]
+
+    # A changed tarball is indexed again
+    os.utime(tar_path, ns=(0, 0))
+    assert not TarballIndex.exists(tar_path)
+
+
+class CollectMember(TarMemberConsumer):
+    def __init__(self, member_name):
+        self.member_name = member_name
+
+    def begin_job(self, tar_path, job_id):
+        self.data = None
+        return True
+
+    def wants(self, member_name):
+        return member_name == self.member_name
+
+    def consume(self, member_name, data):
+        self.data = data
+
+    def done(self):
+        return self.data is not None
+
+    def end_job(self):
+        return self.data
+
+    def finish(self, job_results):
+        return job_results
+
+
+def test_scan_uses_index(tmp_path):
+    tar_path = str(tmp_path / 'simulations_job3.tar.gz')
+    members = make_job_tarball(tar_path, 5)
+    member_name = './up01/bldg0000004/run/eplusout.err'
+
+    # Without an index, use_index streams the tarball and stops once the consumer is done
+    results = scan_simulation_tarballs([tar_path], [CollectMember(member_name)], n_jobs=1, use_index=True)
+    assert results == [[members[member_name]]]
+    assert not TarballIndex.exists(tar_path)
+
+    TarballIndex.build(tar_path)
+    results = scan_simulation_tarballs([tar_path], [CollectMember(member_name)], n_jobs=1, use_index=True)
+    assert results == [[members[member_name]]]
+
+
+def test_reader_continues_between_members(tmp_path, monkeypatch):
+    tar_path = str(tmp_path / 'simulations_job3.tar.gz')
+    members = make_job_tarball(tar_path, 40)
+    index = TarballIndex.build(tar_path, span=16384)
+
+    restarts = []
+    restart = IndexedTarballReader._restart
+    monkeypatch.setattr(IndexedTarballReader, '_restart', lambda self, checkpoint: restarts.append(checkpoint) or restart(self, checkpoint))
+
+    # Reading every member in order decompresses the tarball once, from the first checkpoint
+    with index.reader() as reader:
+        assert [reader.read_member(name) for name in members] == list(members.values())
+    assert len(restarts) == 1
+
+    # Reading a few members skips ahead to the checkpoint before each of them, and going back restarts
+    names = list(members.keys())
+    restarts.clear()
+    with index.reader() as reader:
+        assert [reader.read_member(name) for name in [names[5], names[60], names[6]]] == [members[names[i]] for i in [5, 60, 6]]
+    assert len(restarts) == 3
+
+
+def test_unwritable_index_is_not_stored(tmp_path, monkeypatch, caplog):
+    tar_path = str(tmp_path / 'simulations_job3.tar.gz')
+    members = make_job_tarball(tar_path, 3)
+
+    def read_only_write(table, where, **kwargs):
+        raise PermissionError(13, 'Permission denied', where)
+
+    # The index of a tarball in a read-only directory is still used, but not stored
+    monkeypatch.setattr('comstockpostproc.utils.tar_index.pq.write_table', read_only_write)
+    index = TarballIndex.build(tar_path)
+    assert 'Could not store the index' in caplog.text
+    assert not TarballIndex.exists(tar_path)
+    assert [index.read_member(name) for name in index.member_names] == list(members.values())
+    assert os.listdir(str(tmp_path)) == ['simulations_job3.tar.gz']
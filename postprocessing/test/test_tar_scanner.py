@@ -0,0 +1,72 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import tarfile
+import zipfile
+
+from comstockpostproc.utils.tar_scanner import (scan_simulation_tarballs, EnergyPlusErrorFiles, FailureLogs,
+    DatapointModelFiles)
+
+
+def data_point_zip(bldg_id):
+    zip_bytes = io.BytesIO()
+    with zipfile.ZipFile(zip_bytes, 'w') as zf:
+        zf.writestr('eplusout.err', f'   ** Warning ** from {bldg_id}\n')
+        for file_name in ['in.idf', 'in.osm', 'eplustbl.htm', 'run.log']:
+            zf.writestr(file_name, f'{file_name} of {bldg_id}')
+    return zip_bytes.getvalue()
+
+
+def make_job_tarball(tar_path, members):
+    with tarfile.open(tar_path, 'w:gz') as tar:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def test_scan_simulation_tarballs(tmp_path):
+    make_job_tarball(tmp_path / 'simulations_job1.tar.gz', [
+        ('./up00/bldg0000001/run/data_point.zip', data_point_zip(1)),
+        # failed.job before and after the log of the run
+        ('./up00/bldg0000002/failed.job', b''),
+        ('./up00/bldg0000002/openstudio_output.log', b'[12:00:00 INFO] ok\n[12:00:01 ERROR] bad input\n'),
+        ('./up00/bldg0000003/openstudio_output.log', b'[12:00:01 ERROR] no weather\n'),
+        ('./up00/bldg0000003/failed.job', b''),
+        ('./up00/bldg0000004/run/data_point.zip', data_point_zip(4)),
+    ])
+    make_job_tarball(tmp_path / 'simulations_job2.tar.gz', [
+        ('./up00/bldg0000005/run/data_point.zip', data_point_zip(5)),
+    ])
+    tar_paths = [str(tmp_path / 'simulations_job1.tar.gz'), str(tmp_path / 'simulations_job2.tar.gz')]
+
+    errs_dir = str(tmp_path / 'eplusout_errors')
+    fails_dir = str(tmp_path / 'failure_summary')
+    model_dir = str(tmp_path / 'model_files' / 'bldg1')
+    models = DatapointModelFiles({tar_paths[0]: {'./up00/bldg0000001/run/data_point.zip': model_dir}})
+    results = scan_simulation_tarballs(tar_paths, [EnergyPlusErrorFiles(errs_dir), FailureLogs(fails_dir), models], n_jobs=1)
+
+    # All reports come from the one pass
+    with open(os.path.join(errs_dir, 'job1_eplusout.err')) as f:
+        assert f.read() == (
+            'eplusout.err from building_id=1\n   ** Warning ** from 1\n'
+            'eplusout.err from building_id=4\n   ** Warning ** from 4\n')
+    with open(os.path.join(fails_dir, 'job1_failures.log')) as f:
+        assert f.read() == (
+            'Errors from job_id=1\n'
+            'Errors from up00/bldg0000002\n[12:00:01 ERROR] bad input\n'
+            'Errors from up00/bldg0000003\n[12:00:01 ERROR] no weather\n')
+    assert os.path.exists(results[1])
+    with open(os.path.join(model_dir, 'in.osm')) as f:
+        assert f.read() == 'in.osm of 1'
+    assert results[2].empty
+    assert not any(f.endswith('.tmp') for f in os.listdir(errs_dir) + os.listdir(fails_dir))
+
+    # Jobs with existing outputs are not read again
+    os.remove(tar_paths[1])
+    results = scan_simulation_tarballs(tar_paths[:1], [EnergyPlusErrorFiles(errs_dir)], n_jobs=1)
+    assert results == [None]
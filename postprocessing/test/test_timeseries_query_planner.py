@@ -0,0 +1,90 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from comstockpostproc.timeseries_query_planner import TimeseriesQueryPlanner
+
+
+class FakeAggregator():
+    # Answers aggregate_timeseries from building-level hourly loads, like buildstock_query does from Athena
+    def __init__(self, loads):
+        self.loads = loads
+        self.calls = []
+
+    def aggregate_timeseries(self, upgrade_id, enduses, group_by, restrict, timestamp_grouping_func, get_query_only):
+        self.calls.append(upgrade_id)
+        ts = self.loads.loc[self.loads['upgrade'] == int(upgrade_id)]
+        for col, values in restrict:
+            ts = ts.loc[ts[col].isin(values)]
+        return ts.groupby(group_by, as_index=False)[enduses].sum()
+
+
+class FakeRunData():
+    bs_bldgid_column = 'building_id'
+
+    def __init__(self, loads):
+        self.agg = FakeAggregator(loads)
+
+
+def make_data():
+    rng = np.random.default_rng(4)
+    n_bldgs = 30
+    bldgs = pd.DataFrame({
+        'bldg_id': np.arange(n_bldgs),
+        'in.comstock_building_type': rng.choice(['SmallOffice', 'Warehouse', 'Hospital'], n_bldgs),
+        'state_abbreviation': rng.choice(['CO', 'TX', 'VT'], n_bldgs),
+        'weight': rng.uniform(1, 10, n_bldgs),
+        'applicability': rng.random(n_bldgs) > 0.3,
+    })
+    df = pd.concat([bldgs.assign(upgrade=u) for u in [0, 1, 2]], ignore_index=True)
+    df['in.upgrade_name'] = df['upgrade'].map({0: 'Baseline', 1: 'Heat Pump', 2: 'LED'})
+    df.loc[df['upgrade'] == 0, 'applicability'] = True
+
+    times = pd.date_range('2018-01-01', periods=6, freq='h')
+    loads = df[['bldg_id', 'upgrade', 'in.comstock_building_type', 'state_abbreviation']].merge(pd.DataFrame({'time': times}), how='cross')
+    loads = loads.rename(columns={'bldg_id': 'building_id'})
+    loads['build_existing_model.building_type'] = loads['in.comstock_building_type'].map(TimeseriesQueryPlanner.BLDG_TYPE_TO_SNAKE_CASE)
+    for col in list(TimeseriesQueryPlanner.END_USES_TIMESERIES_DICT.values()) + ['total_site_electricity_kwh']:
+        loads[col] = rng.uniform(0, 5, len(loads))
+    return df, loads
+
+
+def expected_loads(df, loads, state, dict_upid_to_upname):
+    # One query per building type and upgrade, as the timeseries plots used to do
+    df_upgrade = df.loc[df['upgrade'] != 0]
+    wgts = df_upgrade.groupby('in.comstock_building_type')['weight'].mean()
+    applic = df.loc[(df['upgrade'] != 0) & df['applicability'], 'bldg_id']
+    kwh_cols = [c for c in loads.columns if 'kwh' in c]
+    state_loads = loads.loc[loads['state_abbreviation'] == state]
+    base = state_loads.loc[(state_loads['upgrade'] == 0) & state_loads['building_id'].isin(applic)].copy()
+    base['in.upgrade_name'] = 'baseline'
+    up = state_loads.loc[state_loads['upgrade'] != 0].copy()
+    up['in.upgrade_name'] = up['upgrade'].map(dict_upid_to_upname)
+    results = []
+    for d in [base, up]:
+        d[kwh_cols] = d[kwh_cols].mul(d['in.comstock_building_type'].map(wgts), axis=0)
+        d = d.groupby(['time', 'in.upgrade_name'], as_index=False)[kwh_cols].sum()
+        results.append(d.rename(columns={c: f'{c}_weighted' for c in kwh_cols}))
+    return results
+
+
+def test_one_query_per_upgrade_for_all_states():
+    df, loads = make_data()
+    dict_upid_to_upname = dict(zip(df['upgrade'], df['in.upgrade_name']))
+    run_data = FakeRunData(loads)
+    planner = TimeseriesQueryPlanner(run_data, df, dict_upid_to_upname)
+    states = ['CO', 'TX', 'VT']
+    for state in states:
+        base, up = planner.weighted_loads(state, states)
+        exp_base, exp_up = expected_loads(df, loads, state, dict_upid_to_upname)
+        pd.testing.assert_frame_equal(base, exp_base[base.columns], check_dtype=False)
+        pd.testing.assert_frame_equal(up, exp_up[up.columns], check_dtype=False)
+
+    # Baseline plus one query per upgrade, instead of one per state, building type and upgrade
+    assert run_data.agg.calls == [0, '1', '2']
+    assert planner.weighted_loads('TX')[0] is planner.weighted_loads('TX', states)[0]
+    assert len(run_data.agg.calls) == 3
@@ -0,0 +1,73 @@
+# ComStock™, Copyright (c) 2023 Alliance for Sustainable Energy, LLC. All rights reserved.
+# See top level LICENSE.txt file for license terms.
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+import polars as pl
+
+from comstockpostproc.truth_data_store import TruthDataStore
+
+
+class Owner():
+    truth_data_version = 'v01'
+    year = 2012
+
+
+def test_key_invalidation(tmp_path):
+    input_path = tmp_path / 'microdata.csv'
+    input_path.write_text('a,b\n1,2\n')
+    store = TruthDataStore(str(tmp_path / 'store'))
+    key = store.key(Owner(), 'CBECS 2012', [str(input_path)], {'weighted_energy_units': 'tbtu'})
+    assert store.key(Owner(), 'CBECS 2012', [str(input_path)], {'weighted_energy_units': 'tbtu'}) == key
+    assert store.key(Owner(), 'CBECS 2012', [str(input_path)], {'weighted_energy_units': 'kwh'}) != key
+
+    # Hashes are reused until the file changes
+    assert TruthDataStore(str(tmp_path / 'store')).file_hashes == store.file_hashes
+    input_path.write_text('a,b\n1,23\n')
+    assert store.key(Owner(), 'CBECS 2012', [str(input_path)], {'weighted_energy_units': 'tbtu'}) != key
+
+
+def test_save_and_load(tmp_path):
+    store = TruthDataStore(str(tmp_path))
+    assert store.load('CBECS 2012', 'abc') is None
+
+    cbecs = pl.DataFrame({'in.comstock_building_type': ['Warehouse', 'Outpatient'], 'weight': [1.5, 2.0]})
+    cbecs = cbecs.with_columns(pl.col('in.comstock_building_type').cast(pl.Categorical))
+    store.save('CBECS 2012', 'abc', cbecs)
+    loaded = store.load('CBECS 2012', 'abc')
+    assert loaded.schema == cbecs.schema
+    assert loaded.equals(cbecs)
+
+    ami = pd.DataFrame(
+        {'kwh_per_sf': [0.1, 0.2], 'region_name': ['maine', 'maine']},
+        index=pd.DatetimeIndex(['2018-01-01 00:00', '2018-01-01 01:00'], name='timestamp'))
+    store.save('AMI v01', 'abc', ami)
+    pd.testing.assert_frame_equal(store.load('AMI v01', 'abc'), ami)
+
+    # Copies of a table with other keys are kept until they are among the least recently used
+    table_dir = tmp_path / 'CBECS 2012'
+    for i, key in enumerate(['def', 'ghi', 'jkl']):
+        store.save('CBECS 2012', key, cbecs)
+        for file_name in os.listdir(table_dir):
+            if file_name.startswith(key):
+                os.utime(table_dir / file_name, (1000 + i, 1000 + i))
+    for file_name in ['abc.json', 'abc.parquet']:
+        os.utime(table_dir / file_name, (900, 900))
+    assert store.load('CBECS 2012', 'abc').equals(cbecs)
+    store.save('CBECS 2012', 'mno', cbecs)
+    assert sorted(os.listdir(table_dir)) == sorted(f'{key}.{ext}' for key in ['abc', 'ghi', 'jkl', 'mno'] for ext in ['json', 'parquet'])
+    assert store.load('CBECS 2012', 'def') is None
+
+
+def test_load_table_removed_while_reading(tmp_path, monkeypatch):
+    store = TruthDataStore(str(tmp_path))
+    store.save('EIA monthly', 'abc', pl.DataFrame({'state': ['CO'], 'kwh': [1.0]}))
+
+    # Another process sharing the store removes the table after it is found
+    def read_removed(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr('comstockpostproc.truth_data_store.pl.read_parquet', read_removed)
+    assert store.load('EIA monthly', 'abc') is None